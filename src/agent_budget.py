@@ -0,0 +1,415 @@
+"""
+Budgeted agent runs with speculative tool prefetch.
+
+``AgentRunner.query`` runs an unbounded reasoning loop and serializes every
+LLM call and tool call. ``BudgetedAgent`` drives the same agent step by step
+with two changes:
+
+- budgets: once a run has used ``max_steps`` steps, ``max_seconds`` seconds
+  or ``max_tokens`` tokens, the agent gets one final step without tools and
+  must answer from what it has gathered
+- prefetch: when a question arrives, the tool the router heuristic predicts
+  (summary tool for summary questions, vector tool otherwise) is called with
+  the question in the background while the agent makes its first planning
+  call. If the agent then calls that tool with the same (normalized)
+  arguments it gets the prefetched result; otherwise the result still lands
+  in the tool cache when the tools are memoized.
+
+Budgets come from the environment in the test fixtures:
+
+    AGENT_MAX_STEPS       reasoning steps before the final answer
+    AGENT_MAX_SECONDS     wall time before the final answer
+    AGENT_MAX_TOKENS      LLM tokens before the final answer
+    AGENT_PREFETCH=1      prefetch the predicted tool
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core.base.response.schema import Response
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.chat_engine.types import AgentChatResponse
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.agent import AgentChatWithStepEndEvent, AgentChatWithStepStartEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.tools import ToolOutput
+from llama_index.core.tools.calling import call_tool
+from llama_index.core.tools.types import AsyncBaseTool, ToolMetadata, adapt_to_async_tool
+
+from src.agent_tools import get_agent_worker, get_tool_name, map_agent_tools, transform_agent_tools
+from src.cost import llm_event_usage
+from src.parallel_tools import query_kwargs
+from src.tool_cache import make_cache_key
+
+
+dispatcher = get_dispatcher(__name__)
+
+SUMMARY_CUES = ("summar", "overview", "key points", "main points", "main idea", "gist", "in short", "tl;dr")
+
+_active_run: contextvars.ContextVar[Optional["_BudgetRun"]] = contextvars.ContextVar("agent_budget_run", default=None)
+_prefetching: contextvars.ContextVar[bool] = contextvars.ContextVar("agent_prefetching", default=False)
+
+
+@dataclass(frozen=True)
+class AgentBudget:
+    """Limits on one agent run (None means unlimited)."""
+
+    max_steps: Optional[int] = None
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    def __post_init__(self):
+        for name in ("max_steps", "max_seconds", "max_tokens"):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive")
+
+    @classmethod
+    def from_env(cls) -> "AgentBudget":
+        """
+        Read budgets from ``AGENT_MAX_*`` environment variables.
+
+        Returns:
+            AgentBudget: Budget, unlimited where unset
+        """
+        steps = os.getenv("AGENT_MAX_STEPS")
+        seconds = os.getenv("AGENT_MAX_SECONDS")
+        tokens = os.getenv("AGENT_MAX_TOKENS")
+        return cls(
+            max_steps=int(steps) if steps else None,
+            max_seconds=float(seconds) if seconds else None,
+            max_tokens=int(tokens) if tokens else None,
+        )
+
+    @property
+    def unlimited(self) -> bool:
+        return self.max_steps is None and self.max_seconds is None and self.max_tokens is None
+
+    def exceeded(self, steps: int, seconds: float, tokens: int) -> Optional[str]:
+        """
+        Check usage against the budget.
+
+        Args:
+            steps: Steps run so far
+            seconds: Seconds elapsed
+            tokens: LLM tokens used
+
+        Returns:
+            ``steps``, ``time`` or ``tokens`` for the first exhausted limit,
+            None if within budget
+        """
+        if self.max_steps is not None and steps >= self.max_steps:
+            return "steps"
+        if self.max_seconds is not None and seconds >= self.max_seconds:
+            return "time"
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            return "tokens"
+        return None
+
+
+@dataclass
+class RunStats:
+    """Usage of one budgeted agent run."""
+
+    steps: int = 0
+    seconds: float = 0.0
+    tokens: int = 0
+    stopped_by: Optional[str] = None
+    prefetch_tool: Optional[str] = None
+    prefetch_hit: bool = False
+
+
+@dataclass
+class _BudgetRun:
+    budget: AgentBudget
+    stats: RunStats = field(default_factory=RunStats)
+    final: bool = False
+    # Resolves to the predicted call's cache key (None if nothing is predicted)
+    prefetch_key: Future = field(default_factory=Future)
+    prefetch: Optional[Future] = None
+
+    def __post_init__(self):
+        self._clock = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._clock
+
+    def add_tokens(self, tokens: int) -> None:
+        with self._lock:
+            self.stats.tokens += tokens
+
+    def exceeded(self) -> Optional[str]:
+        return self.budget.exceeded(self.stats.steps, self.elapsed(), self.stats.tokens)
+
+
+class _TokenBudgetHandler(BaseEventHandler):
+    """Adds LLM token usage to the budgeted run active in the caller's context."""
+
+    _models: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TokenBudgetHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        run = _active_run.get()
+        if run is None:
+            return
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            model = (event.model_dict or {}).get("model") or (event.model_dict or {}).get("model_name")
+            self._models[event.span_id or ""] = model or "unknown"
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            model = self._models.pop(event.span_id or "", "unknown")
+            run.add_tokens(sum(llm_event_usage(event, model)))
+
+
+_token_handler: Optional[_TokenBudgetHandler] = None
+_token_handler_lock = threading.Lock()
+
+
+def _install_token_handler() -> None:
+    global _token_handler
+    with _token_handler_lock:
+        if _token_handler is None:
+            _token_handler = _TokenBudgetHandler()
+            get_dispatcher().add_event_handler(_token_handler)
+
+
+def predict_tool(tools: Sequence[Any], message: str) -> Optional[Any]:
+    """
+    Predict the tool an agent will call first, as the router would.
+
+    Summary-style questions go to a summary tool and everything else to a
+    vector tool. Tools are assumed to be ordered by relevance (as a tool
+    index returns them), so the first matching tool wins.
+
+    Args:
+        tools: Tools the agent resolved for the message
+        message: User message
+
+    Returns:
+        The predicted tool, or None if there are no tools
+    """
+    if not tools:
+        return None
+    kind = "summary" if any(cue in message.lower() for cue in SUMMARY_CUES) else "vector"
+    for tool in tools:
+        if kind in get_tool_name(tool):
+            return tool
+    return tools[0]
+
+
+def _call_key(tool: Any, args: Sequence[Any], kwargs: Dict[str, Any]) -> str:
+    # The agent passes a lone argument positionally (see ``call_tool``)
+    if len(args) == 1 and not kwargs:
+        kwargs = query_kwargs(tool, args[0])
+        args = ()
+    return make_cache_key(get_tool_name(tool), args, kwargs)
+
+
+class PrefetchAwareTool(AsyncBaseTool):
+    """LlamaIndex tool that answers from the run's prefetch when the call matches it."""
+
+    def __init__(self, tool: Any):
+        """
+        Wrap a tool.
+
+        Args:
+            tool: Tool the agent calls (e.g. a ``CachedTool``)
+        """
+        self._tool = adapt_to_async_tool(tool)
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self._tool.metadata
+
+    @property
+    def wrapped_tool(self) -> AsyncBaseTool:
+        """The tool being wrapped."""
+        return self._tool
+
+    def _prefetched(self, args: Sequence[Any], kwargs: Dict[str, Any]) -> Optional[Future]:
+        run = _active_run.get()
+        if run is None or run.prefetch is None or _prefetching.get():
+            return None
+        # A prefetch still queued behind others is dropped, not waited for
+        if run.prefetch.cancel():
+            return None
+        # Wait for the predicted tool to be resolved (not called), so a call
+        # made before the prediction is known still matches it
+        if _call_key(self._tool, args, kwargs) != run.prefetch_key.result():
+            return None
+        run.stats.prefetch_hit = True
+        return run.prefetch
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        prefetch = self._prefetched(args, kwargs)
+        if prefetch is not None:
+            return prefetch.result()
+        return self._tool.call(*args, **kwargs)
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        prefetch = self._prefetched(args, kwargs)
+        if prefetch is not None:
+            return prefetch.result()
+        return await self._tool.acall(*args, **kwargs)
+
+
+class BudgetedAgent:
+    """Run an agent step by step under a budget, prefetching the predicted tool."""
+
+    def __init__(
+        self,
+        agent: Any,
+        budget: Optional[AgentBudget] = None,
+        prefetch: bool = True,
+        max_prefetch_workers: int = 2,
+    ):
+        """
+        Wrap an agent.
+
+        Args:
+            agent: ``AgentRunner`` returned by ``create_function_calling_agent``
+                or ``create_multi_document_agent``
+            budget: Limits per run (unlimited if None)
+            prefetch: Prefetch the predicted tool while the agent plans
+            max_prefetch_workers: Prefetches running at once
+        """
+        self.agent = agent
+        self.budget = budget or AgentBudget()
+        self.prefetch = prefetch
+        self.last_run: Optional[RunStats] = None
+        self._worker = get_agent_worker(agent)
+        self._executor = ThreadPoolExecutor(max_workers=max_prefetch_workers, thread_name_prefix="prefetch")
+        self._runs: List[RunStats] = []
+        self._lock = threading.Lock()
+        _install_token_handler()
+        map_agent_tools(agent, lambda tool: tool if isinstance(tool, PrefetchAwareTool) else PrefetchAwareTool(tool))
+        # The final answer step of an exhausted run sees no tools
+        transform_agent_tools(agent, self._hide_tools_when_final)
+
+    @staticmethod
+    def _hide_tools_when_final(tools: List[Any], message: str) -> List[Any]:
+        run = _active_run.get()
+        return [] if run is not None and run.final else tools
+
+    def _start_prefetch(self, run: _BudgetRun, message: str) -> None:
+        # Tool resolution (a tool index lookup for multi-document agents) runs
+        # in the background too, so nothing is added before the first step;
+        # tool calls wait on ``prefetch_key`` until it is done
+        def _prefetch() -> Optional[ToolOutput]:
+            _prefetching.set(True)
+            try:
+                tool = predict_tool(self._worker._get_tools(message), message)
+                if tool is None:
+                    return None
+                arguments = query_kwargs(tool, message)
+                run.stats.prefetch_tool = get_tool_name(tool)
+                run.prefetch_key.set_result(make_cache_key(get_tool_name(tool), (), arguments))
+            finally:
+                if not run.prefetch_key.done():
+                    run.prefetch_key.set_result(None)
+            return call_tool(tool, arguments)
+
+        run.prefetch = self._executor.submit(contextvars.copy_context().run, _prefetch)
+
+    def _force_final_step(self, task: Any) -> None:
+        # Function calling workers stop once this many calls were made, even
+        # if the LLM still asks for a tool
+        max_calls = getattr(self._worker, "_max_function_calls", None)
+        if max_calls is not None and "n_function_calls" in task.extra_state:
+            task.extra_state["n_function_calls"] = max_calls
+
+    @dispatcher.span
+    def chat(self, message: str) -> AgentChatResponse:
+        """
+        Answer a message within the budget.
+
+        Args:
+            message: User message
+
+        Returns:
+            AgentChatResponse: The agent's answer (``last_run`` holds its usage)
+        """
+        run = _BudgetRun(self.budget)
+        token = _active_run.set(run)
+        try:
+            task = self.agent.create_task(message)
+            dispatcher.event(AgentChatWithStepStartEvent(user_msg=message))
+            if self.prefetch:
+                self._start_prefetch(run, message)
+            while True:
+                reason = run.exceeded()
+                if reason is not None:
+                    run.stats.stopped_by = reason
+                    run.final = True
+                    self._force_final_step(task)
+                step_output = self.agent.run_step(task.task_id)
+                run.stats.steps += 1
+                if step_output.is_last or run.final:
+                    break
+            # Workers without a call limit may still request tools on the
+            # final step; its output is the answer either way
+            step_output.is_last = True
+            response = self.agent.finalize_response(task.task_id, step_output)
+            dispatcher.event(AgentChatWithStepEndEvent(response=response))
+            return response
+        finally:
+            _active_run.reset(token)
+            run.stats.seconds = run.elapsed()
+            self.last_run = run.stats
+            with self._lock:
+                self._runs.append(run.stats)
+
+    def query(self, message: str) -> Response:
+        """
+        Answer a question within the budget, like ``AgentRunner.query``.
+
+        Args:
+            message: The question
+
+        Returns:
+            Response: The answer with its source nodes
+        """
+        response = self.chat(str(message))
+        return Response(response=str(response), source_nodes=response.source_nodes)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summarize all runs so far.
+
+        Returns:
+            dict: ``runs``, ``steps`` (mean), ``stopped_by`` counts and
+            ``prefetch`` issued/hit counts and hit rate
+        """
+        with self._lock:
+            runs = list(self._runs)
+        stopped: Dict[str, int] = {}
+        for stats in runs:
+            if stats.stopped_by:
+                stopped[stats.stopped_by] = stopped.get(stats.stopped_by, 0) + 1
+        issued = sum(1 for s in runs if s.prefetch_tool)
+        hits = sum(1 for s in runs if s.prefetch_hit)
+        return {
+            "runs": len(runs),
+            "steps": sum(s.steps for s in runs) / len(runs) if runs else 0.0,
+            "stopped_by": stopped,
+            "prefetch": {"issued": issued, "hits": hits, "hit_rate": hits / issued if issued else 0.0},
+        }
+
+    def close(self) -> None:
+        """Cancel queued prefetches and wait for running ones."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,101 @@
+"""
+Helpers for inspecting and rewiring the tools used by Agentic-RAG agents.
+
+Agents built by ``create_function_calling_agent`` and
+``create_multi_document_agent`` are LlamaIndex ``AgentRunner`` objects whose
+worker resolves its tools per message (either a static list or a tool
+retriever). These helpers hook into that resolution step so tools can be
+wrapped without rebuilding the agent.
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def get_agent_worker(agent: Any) -> Any:
+    """
+    Get the agent worker that owns the tool list.
+
+    Args:
+        agent: An ``AgentRunner`` or an agent worker
+
+    Returns:
+        The agent worker
+
+    Raises:
+        TypeError: If the object does not resolve tools per message
+    """
+    worker = getattr(agent, "agent_worker", agent)
+    if not callable(getattr(worker, "_get_tools", None)):
+        raise TypeError(
+            f"{type(agent).__name__} does not expose a tool resolver; "
+            "expected an AgentRunner built from a function calling worker."
+        )
+    return worker
+
+
+def get_tool_name(tool: Any) -> str:
+    """
+    Get the name of a tool from its metadata.
+
+    Args:
+        tool: A LlamaIndex tool
+
+    Returns:
+        str: Tool name (empty string if the tool has no name)
+    """
+    metadata = getattr(tool, "metadata", None)
+    name = getattr(metadata, "name", None)
+    if name is None and isinstance(metadata, dict):
+        name = metadata.get("name")
+    return name or ""
+
+
+def transform_agent_tools(agent: Any, transform: Callable[[List[Any], str], List[Any]]) -> Any:
+    """
+    Replace the tool list an agent resolves on every step.
+
+    Transforms stack: each call wraps the resolver installed by the previous
+    one, so ``transform`` receives the already transformed tools.
+
+    Args:
+        agent: An ``AgentRunner`` or an agent worker
+        transform: Function mapping the resolved tool list and the current
+            message to a new tool list
+
+    Returns:
+        The same agent, for chaining
+    """
+    worker = get_agent_worker(agent)
+    resolve_tools = worker._get_tools
+
+    def _get_transformed_tools(message: str) -> List[Any]:
+        return transform(list(resolve_tools(message)), message)
+
+    worker._get_tools = _get_transformed_tools
+    return agent
+
+
+def map_agent_tools(agent: Any, wrap: Callable[[Any], Any]) -> Any:
+    """
+    Wrap every tool an agent resolves with ``wrap``.
+
+    Each underlying tool is wrapped once and the wrapper is reused on later
+    steps, so wrappers can keep per-tool state between turns.
+
+    Args:
+        agent: An ``AgentRunner`` or an agent worker
+        wrap: Function mapping a tool to its replacement
+
+    Returns:
+        The same agent, for chaining
+    """
+    # Keyed by id(); the original tool is kept alive so ids are never reused
+    wrapped: Dict[int, Tuple[Any, Any]] = {}
+
+    def _wrap_all(tools: List[Any], message: str) -> List[Any]:
+        for tool in tools:
+            if id(tool) not in wrapped:
+                wrapped[id(tool)] = (tool, wrap(tool))
+        return [wrapped[id(tool)][1] for tool in tools]
+
+    return transform_agent_tools(agent, _wrap_all)
@@ -0,0 +1,576 @@
+"""
+Step-level traces of function-calling agent runs.
+
+An ``agent.query`` on a complex question can take tens of seconds without
+showing how many reasoning steps and tool calls it made. ``TraceEventHandler``
+listens on the LlamaIndex instrumentation dispatcher and records, for every
+run of an agent built by ``create_function_calling_agent`` or
+``create_multi_document_agent``:
+
+- each reasoning step
+- each LLM call, with its latency and tokens
+- each tool call, with its arguments and latency (tools wrapped by
+  ``trace_agent_tools``); LLM calls made inside a tool (e.g. a query
+  engine's synthesis) are recorded with that tool as their parent
+
+Runs are stored in an ``AgentTraceRecorder`` and saved as JSON Lines (one run
+per line, empty fields omitted). ``analyze_traces`` reports step counts and
+where the time went across a set of runs, which tells us where to cap steps
+or add caching::
+
+    python -m src.agent_trace agent_traces.jsonl
+"""
+
+import argparse
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.agent import (
+    AgentChatWithStepEndEvent,
+    AgentChatWithStepStartEvent,
+    AgentRunStepStartEvent,
+)
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.span import SpanDropEvent
+from llama_index.core.tools import ToolOutput
+from llama_index.core.tools.types import AsyncBaseTool, ToolMetadata, adapt_to_async_tool
+
+from src.agent_tools import get_tool_name, map_agent_tools
+from src.cost import current_case_id, llm_event_usage
+from src.stats import percentile
+
+
+TRACE_FORMAT_VERSION = 1
+
+# Tool arguments are kept for spotting repeated calls, not for replay
+MAX_ARGS_CHARS = 200
+
+_active_trace: contextvars.ContextVar[Optional["AgentTrace"]] = contextvars.ContextVar(
+    "agent_trace", default=None
+)
+# Name of the traced tool whose call is running in the current context
+_active_tool: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("agent_trace_tool", default=None)
+
+
+@dataclass
+class TraceSpan:
+    """One LLM or tool call within an agent run."""
+
+    kind: str
+    name: str
+    step: int
+    start: float
+    duration: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    args: Optional[str] = None
+    error: Optional[str] = None
+    parent: Optional[str] = None
+
+
+@dataclass
+class AgentTrace:
+    """One agent run: a question, its steps and the calls made in each."""
+
+    run_id: str
+    question: str
+    case_id: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    duration: float = 0.0
+    steps: int = 0
+    status: str = "running"
+    spans: List[TraceSpan] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._clock = time.perf_counter() - (time.time() - self.started_at)
+        self._parent: Optional["AgentTrace"] = None
+        self._span_id: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Seconds since the run started."""
+        return time.perf_counter() - self._clock
+
+    def add_span(self, span: TraceSpan) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self, status: str = "ok") -> None:
+        self.duration = self.elapsed()
+        self.status = status
+
+    def time_by_kind(self) -> Dict[str, float]:
+        """
+        Split the run's wall time into LLM, tool and other (agent overhead).
+
+        LLM calls made inside a tool count as LLM time, not tool time.
+
+        Returns:
+            dict: Seconds per ``llm``, ``tool`` and ``other``
+        """
+        totals = {"llm": 0.0, "tool": 0.0}
+        for span in self.spans:
+            totals[span.kind] = totals.get(span.kind, 0.0) + span.duration
+            if span.kind == "llm" and span.parent is not None:
+                totals["tool"] -= span.duration
+        totals["tool"] = max(0.0, totals["tool"])
+        totals["other"] = max(0.0, self.duration - totals["llm"] - totals["tool"])
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Compact serializable form (empty span fields are omitted).
+
+        Returns:
+            dict: The trace
+        """
+        spans = []
+        for span in self.spans:
+            values = {k: round(v, 4) if isinstance(v, float) else v for k, v in asdict(span).items()}
+            spans.append({k: v for k, v in values.items() if k in ("kind", "name", "step") or v})
+        data = {k: v for k, v in asdict(self).items() if k != "spans"}
+        data["duration"] = round(self.duration, 4)
+        data["spans"] = spans
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentTrace":
+        """
+        Rebuild a trace from ``to_dict`` output.
+
+        Args:
+            data: Serialized trace
+
+        Returns:
+            AgentTrace: The trace
+        """
+        spans = [TraceSpan(**{"start": 0.0, "duration": 0.0, **span}) for span in data.get("spans", [])]
+        return cls(**{**data, "spans": spans})
+
+
+class AgentTraceRecorder:
+    """Thread-safe store of agent traces."""
+
+    def __init__(self, max_traces: Optional[int] = None):
+        """
+        Initialize the recorder.
+
+        Args:
+            max_traces: Most finished traces kept (oldest dropped first);
+                unbounded if None
+        """
+        self.max_traces = max_traces
+        self._traces: List[AgentTrace] = []
+        self._lock = threading.Lock()
+
+    def start(self, question: str) -> AgentTrace:
+        """
+        Start a run in the current context; calls made in it are added to it.
+
+        Args:
+            question: The user message
+
+        Returns:
+            AgentTrace: The running trace
+        """
+        trace = AgentTrace(run_id=uuid.uuid4().hex[:12], question=question, case_id=current_case_id())
+        trace._parent = _active_trace.get()
+        _active_trace.set(trace)
+        return trace
+
+    def finish(self, trace: AgentTrace, status: str = "ok") -> None:
+        """
+        Finish a run and store it.
+
+        Args:
+            trace: Trace returned by ``start``
+            status: ``ok`` or ``error``
+        """
+        trace.finish(status)
+        if _active_trace.get() is trace:
+            _active_trace.set(trace._parent)
+        with self._lock:
+            self._traces.append(trace)
+            if self.max_traces is not None and len(self._traces) > self.max_traces:
+                del self._traces[: len(self._traces) - self.max_traces]
+
+    @property
+    def traces(self) -> List[AgentTrace]:
+        with self._lock:
+            return list(self._traces)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+    def save(self, path: str) -> None:
+        """
+        Write the traces as JSON Lines, after a version header line.
+
+        Args:
+            path: Output file path
+        """
+        with open(path, "w") as f:
+            f.write(json.dumps({"version": TRACE_FORMAT_VERSION}) + "\n")
+            for trace in self.traces:
+                f.write(json.dumps(trace.to_dict(), separators=(",", ":")) + "\n")
+
+
+def load_traces(path: str) -> List[AgentTrace]:
+    """
+    Load traces written by ``AgentTraceRecorder.save``.
+
+    Args:
+        path: JSON Lines file
+
+    Returns:
+        List of traces
+
+    Raises:
+        ValueError: If the file was written by another format version
+    """
+    traces = []
+    with open(path) as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("version") != TRACE_FORMAT_VERSION:
+            raise ValueError(f"{path} is not an agent trace file (version {TRACE_FORMAT_VERSION})")
+        for line in f:
+            if line.strip():
+                traces.append(AgentTrace.from_dict(json.loads(line)))
+    return traces
+
+
+def current_trace() -> Optional[AgentTrace]:
+    """
+    Get the agent run active in the current context.
+
+    Returns:
+        The running trace, or None outside a traced run
+    """
+    return _active_trace.get()
+
+
+class TraceEventHandler(BaseEventHandler):
+    """LlamaIndex instrumentation handler that records agent runs, steps and LLM calls."""
+
+    _recorder: AgentTraceRecorder = PrivateAttr()
+    _llm_starts: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, recorder: AgentTraceRecorder, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._recorder = recorder
+        self._llm_starts = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TraceEventHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        trace = _active_trace.get()
+        if isinstance(event, AgentChatWithStepStartEvent):
+            trace = self._recorder.start(event.user_msg)
+            trace._span_id = event.span_id
+        elif trace is None:
+            return
+        elif isinstance(event, AgentRunStepStartEvent):
+            trace.steps += 1
+        elif isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            model = (event.model_dict or {}).get("model") or (event.model_dict or {}).get("model_name")
+            self._llm_starts[event.span_id or ""] = (trace.elapsed(), model or "unknown")
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            start = self._llm_starts.pop(event.span_id or "", None)
+            if start is None:
+                return
+            offset, model = start
+            prompt_tokens, completion_tokens = llm_event_usage(event, model)
+            trace.add_span(TraceSpan(
+                kind="llm",
+                name=model,
+                step=trace.steps,
+                start=offset,
+                duration=trace.elapsed() - offset,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                parent=_active_tool.get(),
+            ))
+        elif isinstance(event, AgentChatWithStepEndEvent):
+            self._recorder.finish(trace)
+        elif isinstance(event, SpanDropEvent) and event.span_id == trace._span_id:
+            self._recorder.finish(trace, status="error")
+
+
+def install_tracer(recorder: AgentTraceRecorder) -> TraceEventHandler:
+    """
+    Start recording every agent run in a recorder.
+
+    Args:
+        recorder: Recorder to store runs in
+
+    Returns:
+        TraceEventHandler: The registered handler
+    """
+    handler = TraceEventHandler(recorder)
+    get_dispatcher().add_event_handler(handler)
+    return handler
+
+
+def _format_args(args: Sequence[Any], kwargs: Dict[str, Any]) -> Optional[str]:
+    payload = dict(kwargs)
+    if args:
+        payload["_args"] = list(args)
+    if not payload:
+        return None
+    text = json.dumps(payload, sort_keys=True, default=str)
+    return text if len(text) <= MAX_ARGS_CHARS else text[: MAX_ARGS_CHARS - 3] + "..."
+
+
+class TracedTool(AsyncBaseTool):
+    """LlamaIndex tool that records its calls in the active agent trace."""
+
+    def __init__(self, tool: Any):
+        """
+        Wrap a tool.
+
+        Args:
+            tool: Tool to trace (e.g. a ``CachedTool``)
+        """
+        self._tool = adapt_to_async_tool(tool)
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self._tool.metadata
+
+    @property
+    def wrapped_tool(self) -> AsyncBaseTool:
+        """The tool being traced."""
+        return self._tool
+
+    def _record(self, trace: AgentTrace, offset: float, args: Any, kwargs: Any, error: Optional[str]) -> None:
+        trace.add_span(TraceSpan(
+            kind="tool",
+            name=get_tool_name(self._tool),
+            step=trace.steps,
+            start=offset,
+            duration=trace.elapsed() - offset,
+            args=_format_args(args, kwargs),
+            error=error,
+        ))
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        trace = _active_trace.get()
+        if trace is None:
+            return self._tool.call(*args, **kwargs)
+        offset = trace.elapsed()
+        token = _active_tool.set(get_tool_name(self._tool))
+        try:
+            output = self._tool.call(*args, **kwargs)
+        except Exception as e:
+            self._record(trace, offset, args, kwargs, type(e).__name__)
+            raise
+        finally:
+            _active_tool.reset(token)
+        self._record(trace, offset, args, kwargs, "error" if getattr(output, "is_error", False) else None)
+        return output
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        trace = _active_trace.get()
+        if trace is None:
+            return await self._tool.acall(*args, **kwargs)
+        offset = trace.elapsed()
+        token = _active_tool.set(get_tool_name(self._tool))
+        try:
+            output = await self._tool.acall(*args, **kwargs)
+        except Exception as e:
+            self._record(trace, offset, args, kwargs, type(e).__name__)
+            raise
+        finally:
+            _active_tool.reset(token)
+        self._record(trace, offset, args, kwargs, "error" if getattr(output, "is_error", False) else None)
+        return output
+
+
+def trace_tools(tools: Sequence[Any]) -> List[TracedTool]:
+    """
+    Wrap tools so their calls are recorded in agent traces.
+
+    Args:
+        tools: Tools to wrap
+
+    Returns:
+        List of ``TracedTool`` in the same order
+    """
+    return [tool if isinstance(tool, TracedTool) else TracedTool(tool) for tool in tools]
+
+
+def trace_agent_tools(agent: Any) -> Any:
+    """
+    Record the tool calls of an already built agent in its traces.
+
+    Apply after other tool wrappers (e.g. ``memoize_agent_tools``) so cache
+    hits show up as near-zero latency calls.
+
+    Args:
+        agent: Agent returned by ``create_function_calling_agent`` or
+            ``create_multi_document_agent``
+
+    Returns:
+        The same agent, for chaining
+    """
+    return map_agent_tools(agent, lambda tool: tool if isinstance(tool, TracedTool) else TracedTool(tool))
+
+
+def _distribution(values: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def analyze_traces(traces: Iterable[AgentTrace], slowest: int = 5) -> Dict[str, Any]:
+    """
+    Summarize step counts and time distribution across agent runs.
+
+    Args:
+        traces: Finished agent traces
+        slowest: Number of slowest runs listed
+
+    Returns:
+        dict: ``runs``, ``errors``, ``steps`` (distribution and histogram),
+        ``duration``, ``llm_calls`` and ``tool_calls`` per run, ``time``
+        (seconds and share per kind), ``by_step`` (mean seconds per step
+        index), ``by_tool`` (calls, latency, repeated calls), ``tokens`` and
+        the ``slowest`` runs
+    """
+    traces = [t for t in traces if t.status != "running"]
+    time_totals: Dict[str, float] = defaultdict(float)
+    step_time: Dict[int, List[float]] = defaultdict(list)
+    tool_latency: Dict[str, List[float]] = defaultdict(list)
+    tool_repeats: Counter = Counter()
+    prompt_tokens = completion_tokens = 0
+    for trace in traces:
+        for kind, seconds in trace.time_by_kind().items():
+            time_totals[kind] += seconds
+        per_step: Dict[int, float] = defaultdict(float)
+        seen = set()
+        for span in trace.spans:
+            if span.parent is None:
+                # Nested LLM calls are already inside their tool's duration
+                per_step[span.step] += span.duration
+            prompt_tokens += span.prompt_tokens
+            completion_tokens += span.completion_tokens
+            if span.kind == "tool":
+                tool_latency[span.name].append(span.duration)
+                if (span.name, span.args) in seen:
+                    tool_repeats[span.name] += 1
+                seen.add((span.name, span.args))
+        for step, seconds in per_step.items():
+            step_time[step].append(seconds)
+
+    wall = sum(time_totals.values())
+    runs = len(traces)
+    return {
+        "runs": runs,
+        "errors": sum(1 for t in traces if t.status != "ok"),
+        "steps": {
+            **_distribution([t.steps for t in traces]),
+            "histogram": dict(sorted(Counter(t.steps for t in traces).items())),
+        },
+        "duration": _distribution([t.duration for t in traces]),
+        "llm_calls": _distribution([sum(1 for s in t.spans if s.kind == "llm") for t in traces]),
+        "tool_calls": _distribution([sum(1 for s in t.spans if s.kind == "tool") for t in traces]),
+        "time": {
+            kind: {"seconds": seconds, "share": seconds / wall if wall else 0.0}
+            for kind, seconds in sorted(time_totals.items())
+        },
+        "by_step": {step: sum(v) / len(v) for step, v in sorted(step_time.items())},
+        "by_tool": {
+            name: {**_distribution(latencies), "calls": len(latencies), "repeated": tool_repeats[name]}
+            for name, latencies in sorted(tool_latency.items())
+        },
+        "tokens": {
+            "prompt": prompt_tokens,
+            "completion": completion_tokens,
+            "per_run": (prompt_tokens + completion_tokens) / runs if runs else 0.0,
+        },
+        "slowest": [
+            {"run_id": t.run_id, "question": t.question, "case_id": t.case_id,
+             "duration": t.duration, "steps": t.steps}
+            for t in sorted(traces, key=lambda t: -t.duration)[:slowest]
+        ],
+    }
+
+
+def format_trace_report(summary: Dict[str, Any]) -> str:
+    """
+    Render an ``analyze_traces`` summary as a text report.
+
+    Args:
+        summary: Output of ``analyze_traces``
+
+    Returns:
+        str: Report
+    """
+    steps, duration = summary["steps"], summary["duration"]
+    lines = [
+        f"Agent runs: {summary['runs']} ({summary['errors']} errors)",
+        f"Steps/run: mean {steps['mean']:.1f}  p50 {steps['p50']:.0f}  p95 {steps['p95']:.0f}  max {steps['max']:.0f}",
+        f"Duration:  mean {duration['mean']:.2f}s  p50 {duration['p50']:.2f}s  p95 {duration['p95']:.2f}s",
+        f"Calls/run: {summary['llm_calls']['mean']:.1f} LLM, {summary['tool_calls']['mean']:.1f} tool",
+        f"Tokens/run: {summary['tokens']['per_run']:.0f}",
+        "",
+        "Time by kind:",
+    ]
+    for kind, usage in summary["time"].items():
+        lines.append(f"  {kind:<8} {usage['seconds']:>9.2f}s {usage['share']:>6.1%}")
+    lines += ["", "Steps per run:"]
+    peak = max(summary["steps"]["histogram"].values(), default=0) or 1
+    for count, runs in summary["steps"]["histogram"].items():
+        lines.append(f"  {count:>3} steps {runs:>5} {'#' * max(1, round(40 * runs / peak))}")
+    lines += ["", "Mean seconds by step:"]
+    for step, seconds in summary["by_step"].items():
+        lines.append(f"  step {step:<3} {seconds:>8.2f}s")
+    lines += ["", f"{'Tool':<40} {'Calls':>6} {'Repeat':>6} {'p50':>8} {'p95':>8}"]
+    for name, usage in summary["by_tool"].items():
+        lines.append(
+            f"{name[-40:]:<40} {usage['calls']:>6} {usage['repeated']:>6} {usage['p50']:>7.2f}s {usage['p95']:>7.2f}s"
+        )
+    lines += ["", "Slowest runs:"]
+    for run in summary["slowest"]:
+        lines.append(f"  {run['duration']:>7.2f}s {run['steps']:>3} steps  {run['question'][:70]}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Analyze agent traces")
+    parser.add_argument("path", help="JSON Lines file written by AgentTraceRecorder.save")
+    parser.add_argument("--slowest", type=int, default=5, help="Slowest runs listed")
+    parser.add_argument("--json", help="Write the summary to this file")
+    args = parser.parse_args(argv)
+    summary = analyze_traces(load_traces(args.path), slowest=args.slowest)
+    print(format_trace_report(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+"""
+Vectorized analytics over metric score matrices.
+
+Evaluation tests average their scores in Python loops and hard-code pass
+thresholds per test (0.5-0.7 for relevancy and faithfulness, 0.3-0.4 for
+hallucination). ``analyze`` takes a cases × metrics score matrix (NaN where
+a metric did not score a case) and computes, with array operations only:
+
+- per-metric distributions: count, mean, standard deviation, min/max,
+  percentiles and a histogram over [0, 1]
+- the correlation between every pair of metrics (Pearson or Spearman) over
+  the cases both metrics scored
+- pass-rate curves: the share of cases passing at each candidate threshold,
+  ``score >= t`` or ``score <= t`` for metrics where lower is better
+  (``Hallucination``, ``Bias``, ``Toxicity``)
+- bootstrap confidence intervals of every metric's mean and of its pass
+  rate at a given threshold, resampled in bounded-memory blocks
+
+Results stored by ``ResultStore`` are pivoted into a matrix with
+``matrix_from_columns``::
+
+    python -m src.analytics .eval_results --run 20260101-020000-ab12cd
+    python -m src.analytics .eval_results --threshold Faithfulness=0.6 --json
+"""
+
+import argparse
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.results import ResultStore
+from src.sampling import LOWER_IS_BETTER
+
+
+DEFAULT_THRESHOLDS = np.round(np.linspace(0.0, 1.0, 21), 2)
+
+# Case weights (resamples × cases) held in memory at once while bootstrapping
+_BOOTSTRAP_BLOCK = 1 << 22
+
+
+@dataclass
+class ScoreMatrix:
+    """Scores of many cases on several metrics."""
+
+    scores: np.ndarray
+    metrics: List[str]
+    cases: Optional[List[str]] = None
+
+    def __post_init__(self):
+        self.scores = np.asarray(self.scores, dtype=np.float64)
+        if self.scores.ndim != 2 or self.scores.shape[1] != len(self.metrics):
+            raise ValueError(f"scores must be (cases, {len(self.metrics)}), got {self.scores.shape}")
+        if self.cases is not None and len(self.cases) != self.scores.shape[0]:
+            raise ValueError(f"{len(self.cases)} case ids for {self.scores.shape[0]} rows")
+
+    def column(self, metric: str) -> np.ndarray:
+        """Scores of one metric (NaN where missing)."""
+        return self.scores[:, self.metrics.index(metric)]
+
+
+def matrix_from_columns(columns: Mapping[str, np.ndarray], case_key: str = "case_id") -> ScoreMatrix:
+    """
+    Pivot result rows into a cases × metrics matrix.
+
+    Args:
+        columns: ``metric``, ``score`` and ``case_key`` arrays, e.g. from
+            ``ResultStore.columns``
+        case_key: Column identifying a case (``case_id`` or ``question``)
+
+    Returns:
+        ScoreMatrix: One row per case; repeated scores of a case are averaged
+    """
+    metrics, metric_index = np.unique(np.asarray(columns["metric"]).astype(str), return_inverse=True)
+    cases, case_index = np.unique(np.asarray(columns[case_key]).astype(str), return_inverse=True)
+    values = np.asarray(columns["score"], dtype=np.float64)
+    valid = ~np.isnan(values)
+    cell = case_index[valid] * len(metrics) + metric_index[valid]
+    size = len(cases) * len(metrics)
+    totals = np.bincount(cell, weights=values[valid], minlength=size)
+    counts = np.bincount(cell, minlength=size)
+    with np.errstate(invalid="ignore"):
+        scores = np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+    return ScoreMatrix(scores.reshape(len(cases), len(metrics)), [str(m) for m in metrics], [str(c) for c in cases])
+
+
+def distributions(
+    scores: np.ndarray,
+    pcts: Sequence[float] = (10, 25, 50, 75, 90),
+    bins: int = 10,
+) -> Dict[str, np.ndarray]:
+    """
+    Per-metric score distributions.
+
+    Args:
+        scores: Cases × metrics matrix (NaN where missing)
+        pcts: Percentiles to report
+        bins: Histogram bins over [0, 1]
+
+    Returns:
+        dict: ``count``, ``mean``, ``std``, ``min``, ``max`` and ``p<pct>``
+        arrays (one value per metric), and ``histogram`` (metrics × bins)
+    """
+    valid = ~np.isnan(scores)
+    counts = valid.sum(axis=0)
+    filled = np.where(valid, scores, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = filled.sum(axis=0) / counts
+        variance = np.where(valid, (scores - means) ** 2, 0.0).sum(axis=0) / (counts - 1)
+    stats: Dict[str, np.ndarray] = {
+        "count": counts,
+        "mean": np.where(counts > 0, means, np.nan),
+        "std": np.where(counts > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan),
+        "min": np.where(counts > 0, np.where(valid, scores, np.inf).min(axis=0, initial=np.inf), np.nan),
+        "max": np.where(counts > 0, np.where(valid, scores, -np.inf).max(axis=0, initial=-np.inf), np.nan),
+    }
+    if pcts:
+        # NaNs sort last, so each metric's valid scores are a sorted prefix
+        ordered = np.sort(scores, axis=0)
+        last = np.maximum(counts - 1, 0)
+        columns = np.arange(scores.shape[1])
+        for pct in pcts:
+            if not len(scores):
+                stats[f"p{pct:g}"] = np.full(len(counts), np.nan)
+                continue
+            position = pct / 100 * last
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(low + 1, last)
+            below, above = ordered[low, columns], ordered[high, columns]
+            stats[f"p{pct:g}"] = np.where(counts > 0, below + (position - low) * (above - below), np.nan)
+    # One bincount over (metric, bin) cells for every metric at once
+    metric_index = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)[valid]
+    bin_index = np.clip((scores[valid] * bins).astype(np.int64), 0, bins - 1)
+    stats["histogram"] = np.bincount(
+        metric_index * bins + bin_index, minlength=scores.shape[1] * bins
+    ).reshape(scores.shape[1], bins)
+    return stats
+
+
+def rank_columns(scores: np.ndarray) -> np.ndarray:
+    """
+    Rank each column's values (1 = lowest), averaging ties and keeping NaNs.
+
+    Args:
+        scores: Cases × metrics matrix
+
+    Returns:
+        np.ndarray: Ranks with the same shape (NaN where missing)
+    """
+    n_rows, n_cols = scores.shape
+    order = np.argsort(scores, axis=0, kind="stable")
+    ordered = np.take_along_axis(scores, order, axis=0)
+    # Start a new tie group where the sorted value changes (or a column starts)
+    new_group = np.ones_like(ordered, dtype=bool)
+    new_group[1:] = ordered[1:] != ordered[:-1]
+    flat_new = new_group.T.ravel()
+    group = np.cumsum(flat_new) - 1
+    positions = np.tile(np.arange(1, n_rows + 1, dtype=np.float64), n_cols)
+    average = np.bincount(group, weights=positions) / np.bincount(group)
+    ranks = np.empty_like(scores)
+    np.put_along_axis(ranks, order, average[group].reshape(n_cols, n_rows).T, axis=0)
+    return np.where(np.isnan(scores), np.nan, ranks)
+
+
+def correlation(scores: np.ndarray, method: str = "pearson") -> np.ndarray:
+    """
+    Correlation between every pair of metrics.
+
+    Each pair uses the cases scored by both metrics. Spearman correlation is
+    the Pearson correlation of each metric's ranks.
+
+    Args:
+        scores: Cases × metrics matrix (NaN where missing)
+        method: ``pearson`` or ``spearman``
+
+    Returns:
+        np.ndarray: Metrics × metrics correlations (NaN where a pair has
+        fewer than two common cases or no variance)
+
+    Raises:
+        ValueError: If ``method`` is unknown
+    """
+    if method == "spearman":
+        scores = rank_columns(scores)
+    elif method != "pearson":
+        raise ValueError(f"Unknown correlation method: {method}")
+    valid = (~np.isnan(scores)).astype(np.float64)
+    x = np.where(valid > 0, scores, 0.0)
+    # Sums over the cases both metrics of a pair scored, as matrix products
+    n = valid.T @ valid
+    sum_x = x.T @ valid
+    sum_xx = (x * x).T @ valid
+    sum_xy = x.T @ x
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x ** 2 / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    return np.where((n >= 2) & (var_x > 1e-12) & (var_x.T > 1e-12), np.clip(corr, -1.0, 1.0), np.nan)
+
+
+def _lower_is_better(metrics: Sequence[str], lower_is_better: Optional[Sequence[str]]) -> np.ndarray:
+    lower = LOWER_IS_BETTER if lower_is_better is None else frozenset(lower_is_better)
+    return np.array([metric in lower for metric in metrics], dtype=bool)
+
+
+def passing(scores: np.ndarray, thresholds: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """
+    Whether each score passes its metric's threshold.
+
+    Args:
+        scores: Cases × metrics matrix
+        thresholds: One threshold per metric
+        lower: Per metric, whether lower scores are better
+
+    Returns:
+        np.ndarray: Float matrix of 1 (pass), 0 (fail) and NaN (missing)
+    """
+    with np.errstate(invalid="ignore"):
+        passed = np.where(lower, scores <= thresholds, scores >= thresholds)
+    return np.where(np.isnan(scores), np.nan, passed.astype(np.float64))
+
+
+def pass_rate_curves(
+    scores: np.ndarray,
+    metrics: Sequence[str],
+    thresholds: Optional[Sequence[float]] = None,
+    lower_is_better: Optional[Sequence[str]] = None,
+) -> np.ndarray:
+    """
+    Share of cases passing each metric at each threshold.
+
+    Args:
+        scores: Cases × metrics matrix (NaN where missing)
+        metrics: Metric names (for their direction)
+        thresholds: Candidate thresholds (``DEFAULT_THRESHOLDS`` if None)
+        lower_is_better: Metrics passing at or below the threshold
+            (``LOWER_IS_BETTER`` if None)
+
+    Returns:
+        np.ndarray: Metrics × thresholds pass rates (NaN for metrics without scores)
+    """
+    thresholds = DEFAULT_THRESHOLDS if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+    lower = _lower_is_better(metrics, lower_is_better)
+    counts = (~np.isnan(scores)).sum(axis=0)
+    # Scores sorted once per metric; each threshold is then a binary search
+    ordered = np.sort(scores, axis=0)
+    rates = np.empty((scores.shape[1], len(thresholds)))
+    for j in range(scores.shape[1]):
+        column = ordered[:counts[j], j]
+        if lower[j]:
+            passed = np.searchsorted(column, thresholds, side="right")
+        else:
+            passed = counts[j] - np.searchsorted(column, thresholds, side="left")
+        rates[j] = passed / counts[j] if counts[j] else np.nan
+    return rates
+
+
+def bootstrap_means(
+    values: np.ndarray,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile bootstrap confidence interval of each column's mean.
+
+    Cases are resampled with replacement; missing values (NaN) are left out
+    of each resample's mean. Resamples are drawn in blocks of case weights,
+    so memory stays bounded for tens of thousands of cases.
+
+    Args:
+        values: Cases × columns matrix (NaN where missing)
+        n_resamples: Bootstrap resamples
+        confidence: Confidence level of the interval
+        seed: Random seed
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Lower and upper bounds per column
+
+    Raises:
+        ValueError: If ``confidence`` is not in (0, 1) or ``n_resamples`` < 1
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence must be in (0, 1), got {confidence}")
+    if n_resamples < 1:
+        raise ValueError(f"n_resamples must be at least 1, got {n_resamples}")
+    n_cases, n_cols = values.shape
+    if n_cases == 0 or n_cols == 0:
+        return np.full(n_cols, np.nan), np.full(n_cols, np.nan)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    valid = valid.astype(np.float64)
+    rng = np.random.default_rng(seed)
+    means = np.empty((n_resamples, n_cols))
+    block = max(1, _BOOTSTRAP_BLOCK // n_cases)
+    for start in range(0, n_resamples, block):
+        size = min(block, n_resamples - start)
+        # Times each case is drawn in each resample; the resampled sums are
+        # then one matrix product per block
+        draws = rng.integers(0, n_cases, size=(size, n_cases)) + np.arange(size)[:, None] * n_cases
+        weights = np.bincount(draws.ravel(), minlength=size * n_cases).reshape(size, n_cases).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[start:start + size] = (weights @ filled) / (weights @ valid)
+    alpha = (1 - confidence) / 2
+    with np.errstate(invalid="ignore"):
+        low, high = np.nanquantile(means, [alpha, 1 - alpha], axis=0)
+    return low, high
+
+
+@dataclass
+class ScoreReport:
+    """Distributions, correlations, pass-rate curves and intervals of a score matrix."""
+
+    metrics: List[str]
+    distributions: Dict[str, np.ndarray]
+    correlation: np.ndarray
+    thresholds: np.ndarray
+    pass_rates: np.ndarray
+    mean_ci: Tuple[np.ndarray, np.ndarray]
+    lower_is_better: List[str] = field(default_factory=list)
+    pass_thresholds: Dict[str, float] = field(default_factory=dict)
+    pass_rate: Dict[str, float] = field(default_factory=dict)
+    pass_rate_ci: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+    def summary(self, metric: str) -> Dict[str, Any]:
+        """
+        Everything known about one metric.
+
+        Args:
+            metric: Metric name
+
+        Returns:
+            dict: Distribution statistics, ``mean_ci`` and, when a pass
+            threshold was given, ``threshold``, ``pass_rate`` and ``pass_rate_ci``
+        """
+        j = self.metrics.index(metric)
+        summary: Dict[str, Any] = {
+            key: (values[j].tolist() if key == "histogram" else float(values[j]))
+            for key, values in self.distributions.items()
+        }
+        summary["count"] = int(summary["count"])
+        summary["mean_ci"] = [float(self.mean_ci[0][j]), float(self.mean_ci[1][j])]
+        if metric in self.pass_thresholds:
+            summary["threshold"] = self.pass_thresholds[metric]
+            summary["pass_rate"] = self.pass_rate[metric]
+            summary["pass_rate_ci"] = list(self.pass_rate_ci[metric])
+        return summary
+
+    def threshold_for(self, metric: str, pass_rate: float) -> float:
+        """
+        Strictest threshold at which a metric still reaches a pass rate.
+
+        Args:
+            metric: Metric name
+            pass_rate: Required share of passing cases
+
+        Returns:
+            float: The threshold (NaN if no candidate threshold reaches it)
+        """
+        rates = self.pass_rates[self.metrics.index(metric)]
+        reached = self.thresholds[rates >= pass_rate]
+        if not len(reached):
+            return float("nan")
+        return float(reached.min() if metric in self.lower_is_better else reached.max())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form of the report."""
+        return {
+            "metrics": {metric: self.summary(metric) for metric in self.metrics},
+            "correlation": {
+                a: {b: float(self.correlation[i, j]) for j, b in enumerate(self.metrics)}
+                for i, a in enumerate(self.metrics)
+            },
+            "pass_rate_curves": {
+                "thresholds": self.thresholds.tolist(),
+                **{metric: self.pass_rates[j].tolist() for j, metric in enumerate(self.metrics)},
+            },
+        }
+
+    def format_report(self) -> str:
+        """
+        Human-readable report.
+
+        Returns:
+            str: Per-metric summary table and correlation matrix
+        """
+        width = max([len(m) for m in self.metrics] + [6])
+        lines = [
+            f"{'metric':<{width}}  {'count':>6}  {'mean':>6}  {'95% CI':>13}  {'p10':>5}  {'p50':>5}  {'pass':>6}"
+        ]
+        for metric in self.metrics:
+            s = self.summary(metric)
+            ci = f"[{s['mean_ci'][0]:.3f},{s['mean_ci'][1]:.3f}]"
+            passed = f"{s['pass_rate']:.1%}" if "pass_rate" in s else "-"
+            lines.append(
+                f"{metric:<{width}}  {s['count']:>6}  {s['mean']:>6.3f}  {ci:>13}  "
+                f"{s.get('p10', float('nan')):>5.2f}  {s.get('p50', float('nan')):>5.2f}  {passed:>6}"
+            )
+        lines.append("")
+        lines.append("correlation:")
+        lines.append(" " * width + "  " + "  ".join(f"{m[:8]:>8}" for m in self.metrics))
+        for i, metric in enumerate(self.metrics):
+            lines.append(f"{metric:<{width}}  " + "  ".join(f"{v:>8.2f}" for v in self.correlation[i]))
+        return "\n".join(lines)
+
+
+def analyze(
+    matrix: ScoreMatrix,
+    pass_thresholds: Optional[Mapping[str, float]] = None,
+    thresholds: Optional[Sequence[float]] = None,
+    lower_is_better: Optional[Sequence[str]] = None,
+    method: str = "pearson",
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = 0,
+) -> ScoreReport:
+    """
+    Analyze a score matrix.
+
+    Args:
+        matrix: Scores to analyze
+        pass_thresholds: Metric to the threshold its pass rate (and interval)
+            is reported at
+        thresholds: Thresholds of the pass-rate curves (``DEFAULT_THRESHOLDS`` if None)
+        lower_is_better: Metrics passing at or below the threshold
+            (``LOWER_IS_BETTER`` if None)
+        method: Correlation method, ``pearson`` or ``spearman``
+        n_resamples: Bootstrap resamples
+        confidence: Confidence level of the intervals
+        seed: Random seed of the bootstrap
+
+    Returns:
+        ScoreReport: The analysis
+
+    Raises:
+        ValueError: If a pass threshold names an unknown metric
+    """
+    scores, metrics = matrix.scores, matrix.metrics
+    pass_thresholds = dict(pass_thresholds or {})
+    unknown = set(pass_thresholds) - set(metrics)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+    lower = _lower_is_better(metrics, lower_is_better)
+    grid = DEFAULT_THRESHOLDS if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+
+    # Means and pass indicators are bootstrapped together, on the same resamples
+    gated = [metrics.index(m) for m in pass_thresholds]
+    limits = np.array([pass_thresholds[metrics[j]] for j in gated])
+    passed = passing(scores[:, gated], limits, lower[gated])
+    low, high = bootstrap_means(np.hstack([scores, passed]), n_resamples, confidence, seed)
+    with np.errstate(invalid="ignore"):
+        rates = np.nanmean(passed, axis=0) if len(passed) else np.full(len(gated), np.nan)
+
+    n = len(metrics)
+    return ScoreReport(
+        metrics=list(metrics),
+        distributions=distributions(scores),
+        correlation=correlation(scores, method),
+        thresholds=grid,
+        pass_rates=pass_rate_curves(scores, metrics, grid, lower_is_better),
+        mean_ci=(low[:n], high[:n]),
+        lower_is_better=[m for m, is_lower in zip(metrics, lower) if is_lower],
+        pass_thresholds={metrics[j]: float(pass_thresholds[metrics[j]]) for j in gated},
+        pass_rate={metrics[j]: float(rates[k]) for k, j in enumerate(gated)},
+        pass_rate_ci={metrics[j]: (float(low[n + k]), float(high[n + k])) for k, j in enumerate(gated)},
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Score analytics of stored evaluation results")
+    parser.add_argument("path", help="Result store directory (EVAL_RESULTS_DIR)")
+    parser.add_argument("--backend", choices=["arrow", "sqlite"])
+    parser.add_argument("--run", help="Only this run (all runs if omitted)")
+    parser.add_argument("--by", default="case_id", choices=["case_id", "question"], help="What a matrix row is")
+    parser.add_argument("--threshold", action="append", default=[], metavar="METRIC=VALUE",
+                        help="Report the pass rate of METRIC at VALUE (repeatable)")
+    parser.add_argument("--method", default="pearson", choices=["pearson", "spearman"])
+    parser.add_argument("--resamples", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    pass_thresholds = {}
+    for spec in args.threshold:
+        metric, _, value = spec.partition("=")
+        try:
+            pass_thresholds[metric] = float(value)
+        except ValueError:
+            parser.error(f"--threshold expects METRIC=VALUE, got {spec!r}")
+    store = ResultStore(args.path, backend=args.backend)
+    columns = store.columns([args.by, "metric", "score"], run_ids=[args.run] if args.run else None)
+    report = analyze(
+        matrix_from_columns(columns, case_key=args.by),
+        pass_thresholds=pass_thresholds,
+        method=args.method,
+        n_resamples=args.resamples,
+    )
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(report.format_report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,569 @@
+"""
+Chunking strategies with precomputed, versioned chunk artifacts.
+
+Each strategy turns loaded documents into nodes:
+
+- ``fixed``: fixed-size token windows
+- ``sentence``: token-bounded chunks that end on sentence boundaries (the
+  previous default)
+- ``window``: one node per sentence, carrying its neighbours as a window
+  that replaces it before synthesis
+- ``semantic``: chunks split where adjacent sentences' embeddings diverge
+- ``page``: one chunk per PDF page, split only when a page exceeds the
+  token limit
+
+``ChunkStore`` caches the resulting nodes on disk keyed by the document's
+content hash and the strategy's parameters, so rebuilding an index or
+sweeping chunk sizes re-parses a document only once per configuration.
+Artifacts are JSON Lines (a header, then one node per line), so they can be
+written and read back a batch at a time.
+"""
+
+import abc
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Type
+
+import pypdf
+from llama_index.core import Settings, SimpleDirectoryReader
+from llama_index.core.node_parser import (
+    NodeParser,
+    SemanticSplitterNodeParser,
+    SentenceSplitter,
+    SentenceWindowNodeParser,
+    TokenTextSplitter,
+)
+from llama_index.core.postprocessor import MetadataReplacementPostProcessor
+from llama_index.core.readers.file.base import default_file_metadata_func
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import BaseNode, Document
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+from src.config import get_chunk_overlap, get_chunk_size, get_chunking_strategy
+
+
+CHUNK_ARTIFACT_VERSION = 2
+
+# File metadata SimpleDirectoryReader keeps out of embedding and LLM text
+EXCLUDED_FILE_METADATA = (
+    "file_name",
+    "file_type",
+    "file_size",
+    "creation_date",
+    "last_modified_date",
+    "last_accessed_date",
+)
+
+
+class ChunkingStrategy(abc.ABC):
+    """Base class for a named, parameterized way of splitting documents."""
+
+    name = ""
+
+    def params(self) -> Dict[str, Any]:
+        """
+        Parameters that determine the output (part of the cache key).
+
+        Returns:
+            dict: JSON-serializable parameters
+        """
+        return {}
+
+    @abc.abstractmethod
+    def parser(self) -> NodeParser:
+        """
+        Build the LlamaIndex node parser for this strategy.
+
+        Returns:
+            NodeParser: Parser applied to the loaded documents
+        """
+
+    def split(self, documents: Sequence[Document]) -> List[BaseNode]:
+        """
+        Split documents into nodes.
+
+        Args:
+            documents: Loaded documents (one per PDF page)
+
+        Returns:
+            List of nodes
+        """
+        return self.parser().get_nodes_from_documents(list(documents))
+
+    def postprocessors(self) -> List[BaseNodePostprocessor]:
+        """
+        Postprocessors retrieval needs for nodes from this strategy.
+
+        Returns:
+            List of postprocessors to run before any others
+        """
+        return []
+
+    def cache_key(self) -> str:
+        """
+        Stable identifier of the strategy and its parameters.
+
+        Returns:
+            str: Short hash
+        """
+        payload = json.dumps({"strategy": self.name, "params": self.params()}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def __repr__(self) -> str:
+        params = ", ".join(f"{k}={v!r}" for k, v in self.params().items())
+        return f"{type(self).__name__}({params})"
+
+
+class FixedTokenChunker(ChunkingStrategy):
+    """Fixed-size token windows, ignoring sentence boundaries."""
+
+    name = "fixed"
+
+    def __init__(self, chunk_size: int = 1024, chunk_overlap: int = 20):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def params(self) -> Dict[str, Any]:
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+
+    def parser(self) -> NodeParser:
+        return TokenTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+
+
+class SentenceChunker(FixedTokenChunker):
+    """Token-bounded chunks that end on sentence boundaries."""
+
+    name = "sentence"
+
+    def __init__(self, chunk_size: int = 1024, chunk_overlap: int = 200):
+        super().__init__(chunk_size, chunk_overlap)
+
+    def parser(self) -> NodeParser:
+        return SentenceSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+
+
+class SentenceWindowChunker(ChunkingStrategy):
+    """Single-sentence nodes that expand to a surrounding window at query time."""
+
+    name = "window"
+
+    def __init__(self, window_size: int = 3):
+        if window_size < 0:
+            raise ValueError("window_size must be non-negative")
+        self.window_size = window_size
+
+    def params(self) -> Dict[str, Any]:
+        return {"window_size": self.window_size}
+
+    def parser(self) -> NodeParser:
+        return SentenceWindowNodeParser.from_defaults(
+            window_size=self.window_size,
+            window_metadata_key="window",
+            original_text_metadata_key="original_text",
+        )
+
+    def postprocessors(self) -> List[BaseNodePostprocessor]:
+        return [MetadataReplacementPostProcessor(target_metadata_key="window")]
+
+
+class SemanticChunker(ChunkingStrategy):
+    """Chunks split where the embedding distance between sentences spikes."""
+
+    name = "semantic"
+
+    def __init__(self, embed_model: Any = None, buffer_size: int = 1, breakpoint_percentile: int = 95):
+        """
+        Initialize the strategy.
+
+        Args:
+            embed_model: Embedding model for sentence similarity
+                (``Settings.embed_model`` if None)
+            buffer_size: Neighbouring sentences grouped when embedding
+            breakpoint_percentile: Distance percentile that starts a new chunk
+        """
+        self.embed_model = embed_model or Settings.embed_model
+        self.buffer_size = buffer_size
+        self.breakpoint_percentile = breakpoint_percentile
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "embed_model": getattr(self.embed_model, "model_name", type(self.embed_model).__name__),
+            "buffer_size": self.buffer_size,
+            "breakpoint_percentile": self.breakpoint_percentile,
+        }
+
+    def parser(self) -> NodeParser:
+        return SemanticSplitterNodeParser.from_defaults(
+            embed_model=self.embed_model,
+            buffer_size=self.buffer_size,
+            breakpoint_percentile_threshold=self.breakpoint_percentile,
+        )
+
+
+class PageChunker(ChunkingStrategy):
+    """One chunk per page; oversized pages are split on sentence boundaries."""
+
+    name = "page"
+
+    def __init__(self, max_tokens: int = 2048):
+        self.max_tokens = max_tokens
+
+    def params(self) -> Dict[str, Any]:
+        return {"max_tokens": self.max_tokens}
+
+    def parser(self) -> NodeParser:
+        # PDF readers emit one document per page and the splitter never merges
+        # across documents, so chunks stay within a page
+        return SentenceSplitter(chunk_size=self.max_tokens, chunk_overlap=0)
+
+
+CHUNKING_STRATEGIES: Dict[str, Type[ChunkingStrategy]] = {
+    strategy.name: strategy
+    for strategy in (FixedTokenChunker, SentenceChunker, SentenceWindowChunker, SemanticChunker, PageChunker)
+}
+
+
+def get_chunker(name: str, **params: Any) -> ChunkingStrategy:
+    """
+    Create a chunking strategy by name.
+
+    Args:
+        name: One of ``CHUNKING_STRATEGIES``
+        **params: Strategy parameters
+
+    Returns:
+        ChunkingStrategy: Configured strategy
+
+    Raises:
+        ValueError: If the strategy name is unknown
+    """
+    if name not in CHUNKING_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy {name!r}; choose from {sorted(CHUNKING_STRATEGIES)}")
+    return CHUNKING_STRATEGIES[name](**params)
+
+
+def chunker_from_config(embed_model: Any = None) -> ChunkingStrategy:
+    """
+    Create the strategy selected by ``CHUNKING_STRATEGY`` and ``CHUNK_SIZE``.
+
+    Args:
+        embed_model: Embedding model for the ``semantic`` strategy
+
+    Returns:
+        ChunkingStrategy: Configured strategy
+    """
+    name = get_chunking_strategy()
+    if name in ("fixed", "sentence"):
+        chunk_size = get_chunk_size()
+        overlap = get_chunk_overlap()
+        if overlap is None:
+            # Keep the strategy's default overlap below a small CHUNK_SIZE
+            overlap = min(CHUNKING_STRATEGIES[name]().chunk_overlap, chunk_size // 5)
+        return get_chunker(name, chunk_size=chunk_size, chunk_overlap=overlap)
+    if name == "page":
+        return get_chunker(name, max_tokens=get_chunk_size())
+    if name == "semantic":
+        return get_chunker(name, embed_model=embed_model)
+    return get_chunker(name)
+
+
+def iter_pages(document_path: str) -> Iterator[Document]:
+    """
+    Read a document one page at a time.
+
+    PDFs are parsed lazily with pypdf, so only the current page's text is in
+    memory; other formats are read whole by ``SimpleDirectoryReader``. Pages
+    carry the same metadata ``SimpleDirectoryReader`` would attach.
+
+    Args:
+        document_path: Path to the document
+
+    Yields:
+        Document: One document per page
+    """
+    if Path(document_path).suffix.lower() != ".pdf":
+        yield from SimpleDirectoryReader(input_files=[document_path]).load_data()
+        return
+
+    file_metadata = default_file_metadata_func(document_path)
+    reader = pypdf.PdfReader(document_path)
+    for i, page in enumerate(reader.pages):
+        try:
+            page_label = reader.page_labels[i]
+        except (IndexError, KeyError, ValueError):
+            page_label = str(i + 1)
+        yield Document(
+            text=page.extract_text(),
+            metadata={"page_label": page_label, **file_metadata},
+            excluded_embed_metadata_keys=list(EXCLUDED_FILE_METADATA),
+            excluded_llm_metadata_keys=list(EXCLUDED_FILE_METADATA),
+        )
+
+
+def iter_chunks(pages: Iterable[Document], strategy: ChunkingStrategy) -> Iterator[BaseNode]:
+    """
+    Chunk pages as they arrive.
+
+    Every strategy splits each document independently, so splitting page by
+    page gives the same chunks as splitting the whole document at once.
+
+    Args:
+        pages: Page documents, e.g. from ``iter_pages``
+        strategy: Chunking strategy
+
+    Yields:
+        BaseNode: Chunks in document order
+    """
+    for page in pages:
+        yield from strategy.split([page])
+
+
+def document_hash(path: str) -> str:
+    """
+    Content hash of a file.
+
+    Args:
+        path: File path
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChunkStore:
+    """On-disk cache of chunked documents keyed by content hash and strategy."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            cache_dir: Directory for chunk artifacts (in-memory only if None)
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._memory: Dict[str, List[BaseNode]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def artifact_path(self, doc_hash: str, strategy: ChunkingStrategy) -> Optional[Path]:
+        """
+        Path of the artifact for a document and strategy.
+
+        Args:
+            doc_hash: Document content hash
+            strategy: Chunking strategy
+
+        Returns:
+            Artifact path, or None for an in-memory store
+        """
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{doc_hash[:16]}-{strategy.name}-{strategy.cache_key()}.jsonl"
+
+    def _open(self, path: Optional[Path], doc_hash: str, strategy: ChunkingStrategy) -> Optional[Iterator[BaseNode]]:
+        """Check an artifact's header and iterate its nodes lazily, or None if it does not match."""
+        if path is None or not path.exists():
+            return None
+        f = path.open()
+        header = json.loads(f.readline() or "{}")
+        if (
+            header.get("version") != CHUNK_ARTIFACT_VERSION
+            or header.get("document_hash") != doc_hash
+            or header.get("params") != strategy.params()
+        ):
+            f.close()
+            return None
+
+        def nodes() -> Iterator[BaseNode]:
+            with f:
+                for line in f:
+                    if line.strip():
+                        yield json_to_doc(json.loads(line))
+
+        return nodes()
+
+    def _read(self, path: Optional[Path], doc_hash: str, strategy: ChunkingStrategy) -> Optional[List[BaseNode]]:
+        nodes = self._open(path, doc_hash, strategy)
+        return None if nodes is None else list(nodes)
+
+    def _memory_key(self, doc_hash: str, strategy: ChunkingStrategy) -> str:
+        return f"{doc_hash}:{strategy.name}:{strategy.cache_key()}"
+
+    def lookup(self, document_path: str, strategy: ChunkingStrategy) -> Optional[List[BaseNode]]:
+        """
+        Get a document's cached chunks without parsing it.
+
+        Args:
+            document_path: Path to the document
+            strategy: Chunking strategy
+
+        Returns:
+            List of nodes, or None on a miss
+        """
+        doc_hash = document_hash(document_path)
+        memory_key = self._memory_key(doc_hash, strategy)
+        path = self.artifact_path(doc_hash, strategy)
+        with self._lock:
+            nodes = self._memory.get(memory_key) or self._read(path, doc_hash, strategy)
+            if nodes is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory[memory_key] = nodes
+            return nodes
+
+    def stream(self, document_path: str, strategy: ChunkingStrategy) -> Optional[Iterator[BaseNode]]:
+        """
+        Iterate a document's cached chunks from disk without keeping them in memory.
+
+        Args:
+            document_path: Path to the document
+            strategy: Chunking strategy
+
+        Returns:
+            Iterator of nodes, or None on a miss
+        """
+        doc_hash = document_hash(document_path)
+        with self._lock:
+            memory = self._memory.get(self._memory_key(doc_hash, strategy))
+            nodes = iter(memory) if memory is not None else self._open(
+                self.artifact_path(doc_hash, strategy), doc_hash, strategy
+            )
+            if nodes is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return nodes
+
+    def writer(self, document_path: str, strategy: ChunkingStrategy) -> "ChunkArtifactWriter":
+        """
+        Start writing a document's artifact a batch at a time.
+
+        Nothing is kept in memory; the artifact replaces any previous one on
+        ``commit``. For an in-memory store the writer discards the nodes.
+
+        Args:
+            document_path: Path to the document
+            strategy: Chunking strategy the nodes are produced with
+
+        Returns:
+            ChunkArtifactWriter: Writer to ``append`` batches to
+        """
+        doc_hash = document_hash(document_path)
+        return ChunkArtifactWriter(self.artifact_path(doc_hash, strategy), doc_hash, strategy)
+
+    def save(self, document_path: str, strategy: ChunkingStrategy, nodes: List[BaseNode]) -> None:
+        """
+        Cache a document's chunks.
+
+        Args:
+            document_path: Path to the document
+            strategy: Chunking strategy the nodes were produced with
+            nodes: The document's nodes
+        """
+        doc_hash = document_hash(document_path)
+        with self._lock:
+            self._memory[self._memory_key(doc_hash, strategy)] = nodes
+        with self.writer(document_path, strategy) as writer:
+            writer.append(nodes)
+
+    def get_nodes(self, document_path: str, strategy: ChunkingStrategy) -> List[BaseNode]:
+        """
+        Load a document's chunks, parsing and caching them on a miss.
+
+        Args:
+            document_path: Path to the document
+            strategy: Chunking strategy
+
+        Returns:
+            List of nodes
+        """
+        nodes = self.lookup(document_path, strategy)
+        if nodes is None:
+            nodes = list(iter_chunks(iter_pages(document_path), strategy))
+            self.save(document_path, strategy, nodes)
+        return nodes
+
+
+class ChunkArtifactWriter:
+    """Append nodes to a chunk artifact, made visible atomically on commit."""
+
+    def __init__(self, path: Optional[Path], doc_hash: str, strategy: ChunkingStrategy):
+        """
+        Args:
+            path: Artifact path (nothing is written if None)
+            doc_hash: Document content hash
+            strategy: Chunking strategy the nodes are produced with
+        """
+        self.path = path
+        self._file = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.{threading.get_ident()}.tmp")
+            self._file = self._tmp_path.open("w")
+            header = {
+                "version": CHUNK_ARTIFACT_VERSION,
+                "document_hash": doc_hash,
+                "strategy": strategy.name,
+                "params": strategy.params(),
+            }
+            self._file.write(json.dumps(header) + "\n")
+
+    def __enter__(self) -> "ChunkArtifactWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def append(self, nodes: Iterable[BaseNode]) -> None:
+        """Write a batch of nodes."""
+        if self._file is not None:
+            self._file.writelines(json.dumps(doc_to_json(node)) + "\n" for node in nodes)
+            self._file.flush()
+
+    def commit(self) -> None:
+        """Close the artifact and replace any previous one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.replace(self._tmp_path, self.path)
+
+    def discard(self) -> None:
+        """Close and delete a partly written artifact."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._tmp_path.unlink(missing_ok=True)
+
+
+def load_chunks(
+    document_path: str,
+    strategy: Optional[ChunkingStrategy] = None,
+    store: Optional[ChunkStore] = None,
+) -> List[BaseNode]:
+    """
+    Chunk a document, reusing a cached artifact when one exists.
+
+    Args:
+        document_path: Path to the document
+        strategy: Chunking strategy (``SentenceChunker()`` if None)
+        store: Artifact store (a fresh in-memory store if None)
+
+    Returns:
+        List of nodes
+    """
+    return (store or ChunkStore()).get_nodes(document_path, strategy or SentenceChunker())
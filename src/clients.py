@@ -0,0 +1,399 @@
+"""
+Shared, pooled HTTP clients for every OpenAI caller.
+
+By default the LlamaIndex LLM, the embedding model and each DeepEval judge
+build their own HTTP client, so concurrent evaluation opens (and TLS
+handshakes) a fresh set of connections per object. ``ClientFactory`` owns
+one keep-alive ``httpx.Client`` and one ``httpx.AsyncClient`` with tunable
+pool limits and timeouts, and builds LlamaIndex models, raw OpenAI clients
+and DeepEval judges on top of them.
+
+Async connections cannot move between event loops (pytest-asyncio and
+DeepEval each run their own), so the shared async client keeps one pool per
+running loop behind a single client object, and closes each pool when its
+loop shuts down.
+
+Pool settings come from the environment:
+
+    HTTP_MAX_CONNECTIONS      total connections (default 100)
+    HTTP_MAX_KEEPALIVE        idle connections kept open (default 20)
+    HTTP_KEEPALIVE_EXPIRY     seconds an idle connection is kept (default 30)
+    HTTP_TIMEOUT              read/write/pool timeout in seconds (default 60)
+    HTTP_CONNECT_TIMEOUT      connect timeout in seconds (default 10)
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Type
+
+import httpx
+import openai
+from deepeval.models import DeepEvalBaseLLM
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.llms.openai import OpenAI
+from pydantic import BaseModel
+
+from src.prompts import PrefixTracker, assemble_judge_messages, provider_cached_tokens
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Connection pool limits and timeouts."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        """
+        Read pool settings from ``HTTP_*`` environment variables.
+
+        Returns:
+            PoolConfig: Settings, with defaults for unset variables
+        """
+        return cls(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", cls.max_keepalive_connections)),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            timeout=float(os.getenv("HTTP_TIMEOUT", cls.timeout)),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", cls.connect_timeout)),
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    # Suspended for the loop's lifetime; the loop closes it (and so the
+    # client) in ``shutdown_asyncgens``, which ``asyncio.run`` and
+    # pytest-asyncio call before closing the loop
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+class LoopLocalAsyncClient(httpx.AsyncClient):
+    """
+    ``httpx.AsyncClient`` that sends through one pooled client per event loop.
+
+    Requests are built by this client and sent by the pool belonging to the
+    running loop; each pool is closed when its loop shuts down its async
+    generators, or by ``aclose`` on that loop.
+    """
+
+    def __init__(self, config: PoolConfig, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(limits=config.limits(), timeout=config.timeouts())
+        self._config = config
+        self._pool_transport = transport
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._pools_lock = threading.Lock()
+
+    def pool(self) -> httpx.AsyncClient:
+        """
+        The pooled client for the running event loop.
+
+        Returns:
+            httpx.AsyncClient: Client whose connections belong to this loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            entry = self._pools.get(loop)
+            if entry is None:
+                client = httpx.AsyncClient(
+                    limits=self._config.limits(),
+                    timeout=self._config.timeouts(),
+                    transport=self._pool_transport,
+                )
+                # Starting the generator registers it with the running loop
+                closer = _close_with_loop(client)
+                loop.create_task(closer.__anext__())
+                entry = self._pools[loop] = (client, closer)
+            return entry[0]
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await self.pool().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            entry = self._pools.pop(loop, None)
+        if entry is not None:
+            # Closing twice is a no-op, so the loop's closer may still run
+            await entry[0].aclose()
+        await super().aclose()
+
+
+class ClientFactory:
+    """Builds OpenAI-backed clients that share pooled HTTP connections."""
+
+    def __init__(
+        self,
+        config: Optional[PoolConfig] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Initialize the factory. HTTP clients are created on first use.
+
+        Args:
+            config: Pool limits and timeouts (``PoolConfig.from_env()`` if None)
+            transport: Custom sync transport (e.g. ``httpx.MockTransport``)
+            async_transport: Custom async transport
+        """
+        self.config = config or PoolConfig.from_env()
+        self._transport = transport
+        self._async_transport = async_transport
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[LoopLocalAsyncClient] = None
+        self._openai_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Shared keep-alive sync client."""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=self.config.limits(),
+                    timeout=self.config.timeouts(),
+                    transport=self._transport,
+                )
+            return self._http_client
+
+    @property
+    def async_http_client(self) -> LoopLocalAsyncClient:
+        """Shared keep-alive async client (one pool per event loop)."""
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = LoopLocalAsyncClient(self.config, self._async_transport)
+            return self._async_http_client
+
+    def openai_client(self, api_key: Optional[str] = None) -> openai.OpenAI:
+        """
+        OpenAI SDK client on the shared sync pool.
+
+        Args:
+            api_key: API key (``OPENAI_API_KEY`` if None)
+
+        Returns:
+            openai.OpenAI: Cached client for this key
+        """
+        return self._cached_openai(
+            "sync", api_key, lambda: openai.OpenAI(api_key=api_key, http_client=self.http_client)
+        )
+
+    def async_openai_client(self, api_key: Optional[str] = None) -> openai.AsyncOpenAI:
+        """
+        OpenAI SDK async client on the shared async pool.
+
+        Args:
+            api_key: API key (``OPENAI_API_KEY`` if None)
+
+        Returns:
+            openai.AsyncOpenAI: Cached client for this key
+        """
+        return self._cached_openai(
+            "async", api_key, lambda: openai.AsyncOpenAI(api_key=api_key, http_client=self.async_http_client)
+        )
+
+    def _cached_openai(self, kind: str, api_key: Optional[str], build: Any) -> Any:
+        key = (kind, api_key)
+        client = self._openai_clients.get(key)
+        if client is None:
+            client = build()
+            with self._lock:
+                client = self._openai_clients.setdefault(key, client)
+        return client
+
+    def llm(self, model: str = "gpt-3.5-turbo", **kwargs: Any) -> OpenAI:
+        """
+        LlamaIndex OpenAI LLM on the shared pools.
+
+        Args:
+            model: OpenAI model
+            **kwargs: Other ``OpenAI`` arguments (temperature, api_key, ...)
+
+        Returns:
+            OpenAI: LLM
+        """
+        return OpenAI(
+            model=model,
+            http_client=self.http_client,
+            async_http_client=self.async_http_client,
+            timeout=self.config.timeout,
+            **kwargs,
+        )
+
+    def embed_model(self, model: str = "text-embedding-ada-002", **kwargs: Any) -> OpenAIEmbedding:
+        """
+        LlamaIndex OpenAI embedding model on the shared pools.
+
+        Args:
+            model: OpenAI embedding model
+            **kwargs: Other ``OpenAIEmbedding`` arguments (api_key, ...)
+
+        Returns:
+            OpenAIEmbedding: Embedding model
+        """
+        return OpenAIEmbedding(
+            model=model,
+            http_client=self.http_client,
+            async_http_client=self.async_http_client,
+            timeout=self.config.timeout,
+            **kwargs,
+        )
+
+    def judge(
+        self,
+        model: str = "gpt-4o",
+        api_key: Optional[str] = None,
+        assemble: bool = False,
+        tracker: Optional[PrefixTracker] = None,
+    ) -> "PooledOpenAIJudge":
+        """
+        DeepEval judge model on the shared pools.
+
+        Args:
+            model: OpenAI model
+            api_key: API key (``OPENAI_API_KEY`` if None)
+            assemble: Reorder judge prompts for prefix caching
+            tracker: Records the prefix reuse of every call
+
+        Returns:
+            PooledOpenAIJudge: Judge to pass as ``model=`` to metrics
+        """
+        return PooledOpenAIJudge(
+            self.openai_client(api_key), self.async_openai_client(api_key), model, assemble=assemble, tracker=tracker
+        )
+
+    def close(self) -> None:
+        """Close the sync pool. Async pools close when their event loops shut down."""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+            self._openai_clients.clear()
+
+
+class PooledOpenAIJudge(DeepEvalBaseLLM):
+    """DeepEval judge that calls OpenAI chat completions through shared clients."""
+
+    def __init__(
+        self,
+        client: openai.OpenAI,
+        async_client: openai.AsyncOpenAI,
+        model: str = "gpt-4o",
+        assemble: bool = False,
+        tracker: Optional[PrefixTracker] = None,
+    ):
+        """
+        Initialize the judge.
+
+        Args:
+            client: Sync OpenAI client
+            async_client: Async OpenAI client
+            model: OpenAI model
+            assemble: Put the case's shared texts in a common prefix (see
+                ``src.prompts.assemble_judge_messages``)
+            tracker: Records the prefix reuse of every call
+        """
+        self.client = client
+        self.async_client = async_client
+        self.assemble = assemble
+        self.tracker = tracker
+        super().__init__(model_name=model)
+
+    def load_model(self) -> openai.OpenAI:
+        return self.client
+
+    def _messages(self, prompt: str) -> list:
+        if self.assemble:
+            return assemble_judge_messages(prompt)
+        return [{"role": "user", "content": prompt}]
+
+    def _output(self, messages: list, response: Any, schema: Optional[Type[BaseModel]]) -> Tuple[Any, Any]:
+        if self.tracker is not None:
+            self.tracker.observe(
+                self.model_name, messages, provider_cached_tokens(response.usage), default_stage="judge"
+            )
+        message = response.choices[0].message
+        if schema is not None:
+            return message.parsed, response.usage
+        return message.content or "", response.usage
+
+    def generate_with_usage(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Tuple[Any, Any]:
+        """
+        Generate a judge response along with the provider's token usage.
+
+        Args:
+            prompt: DeepEval judge prompt
+            schema: Pydantic model to parse the output into (structured outputs)
+
+        Returns:
+            tuple: (output text or ``schema`` instance, ``CompletionUsage`` of
+            the request actually sent)
+        """
+        messages = self._messages(prompt)
+        if schema is None:
+            response = self.client.chat.completions.create(model=self.model_name, messages=messages, temperature=0)
+        else:
+            response = self.client.beta.chat.completions.parse(
+                model=self.model_name, messages=messages, response_format=schema, temperature=0
+            )
+        return self._output(messages, response, schema)
+
+    async def a_generate_with_usage(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Tuple[Any, Any]:
+        """Async version of ``generate_with_usage``."""
+        messages = self._messages(prompt)
+        if schema is None:
+            response = await self.async_client.chat.completions.create(
+                model=self.model_name, messages=messages, temperature=0
+            )
+        else:
+            response = await self.async_client.beta.chat.completions.parse(
+                model=self.model_name, messages=messages, response_format=schema, temperature=0
+            )
+        return self._output(messages, response, schema)
+
+    def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Any:
+        return self.generate_with_usage(prompt, schema)[0]
+
+    async def a_generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Any:
+        return (await self.a_generate_with_usage(prompt, schema))[0]
+
+    def get_model_name(self) -> str:
+        return self.model_name
+
+
+_factory: Optional[ClientFactory] = None
+_factory_lock = threading.Lock()
+
+
+def get_client_factory() -> ClientFactory:
+    """
+    Process-wide client factory, configured from the environment.
+
+    Returns:
+        ClientFactory: The shared factory
+    """
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            _factory = ClientFactory()
+        return _factory
@@ -0,0 +1,333 @@
+"""
+Side-by-side comparison of synthesis models on shared retrieval.
+
+Comparing models by rerunning the whole pipeline per model repeats every
+retrieval and confounds model differences with retrieval differences.
+``ModelComparison`` retrieves once per question (one batched embedding
+call), fans the same contexts out to every model/temperature variant
+concurrently, and scores all answers with the same metric batch. The result
+is a matrix with one row per variant: synthesis latency, tokens and cost
+(from the cost ledger), mean metric scores and pass rate, so the cheapest
+variant that meets the thresholds can be picked::
+
+    python -m src.compare --document paper.pdf \\
+        --variants gpt-4o-mini,gpt-3.5-turbo,gpt-4o@0.7 --questions golden.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from deepeval.test_case import LLMTestCase
+from llama_index.core.response_synthesizers import get_response_synthesizer
+from llama_index.core.schema import NodeWithScore
+
+from src.clients import ClientFactory, get_client_factory
+from src.cost import CostLedger, CountingJudge, attribute, install_ledger, measure_metric
+from src.prompts import shared_context
+from src.questions import TEST_QUESTIONS
+from src.results import metric_name
+from src.stats import percentile
+
+
+DEFAULT_QUESTIONS = [question for question, _ in TEST_QUESTIONS]
+
+
+@dataclass(frozen=True)
+class Variant:
+    """A synthesis model at a temperature."""
+
+    model: str
+    temperature: float = 0.0
+
+    @property
+    def label(self) -> str:
+        return f"{self.model}@{self.temperature:g}"
+
+    @classmethod
+    def parse(cls, spec: str) -> "Variant":
+        """
+        Parse ``model`` or ``model@temperature``.
+
+        Args:
+            spec: Variant spec, e.g. ``gpt-4o-mini@0.7``
+
+        Returns:
+            Variant: The variant (temperature 0 if not given)
+        """
+        model, _, temperature = spec.strip().partition("@")
+        return cls(model, float(temperature) if temperature else 0.0)
+
+
+@dataclass
+class Answer:
+    """One variant's answer to one question, with its scores."""
+
+    variant: Variant
+    question: str
+    output: str
+    latency_ms: float
+    scores: Dict[str, Optional[float]] = field(default_factory=dict)
+    successes: Dict[str, bool] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def passed(self) -> bool:
+        return bool(self.successes) and all(self.successes.values())
+
+
+class ModelComparison:
+    """Compare synthesis variants on the same retrieved contexts."""
+
+    def __init__(
+        self,
+        rag_app: Any,
+        variants: Sequence[Variant],
+        metrics: Sequence[Callable[[], Any]],
+        ledger: Optional[CostLedger] = None,
+        synthesizer_factory: Optional[Callable[[Variant], Any]] = None,
+        client_factory: Optional[ClientFactory] = None,
+        max_workers: int = 8,
+    ):
+        """
+        Initialize the comparison.
+
+        Args:
+            rag_app: ``RAGApplication`` whose retrieval is shared
+            variants: Synthesis variants to compare
+            metrics: Factories of fresh DeepEval metrics, called once per answer
+            ledger: Installed cost ledger to read synthesis usage from
+                (no token or cost columns if None)
+            synthesizer_factory: Builds a response synthesizer for a variant
+                (a LlamaIndex synthesizer on a pooled OpenAI LLM if None)
+            client_factory: Source of pooled OpenAI clients
+                (``get_client_factory()`` if None)
+            max_workers: Concurrent synthesis and metric calls
+
+        Raises:
+            ValueError: If no variants are given or labels repeat
+        """
+        labels = [variant.label for variant in variants]
+        if not labels or len(set(labels)) != len(labels):
+            raise ValueError("variants must be non-empty and distinct")
+        self.rag_app = rag_app
+        self.variants = list(variants)
+        self.metrics = list(metrics)
+        self.ledger = ledger
+        self.max_workers = max_workers
+        if synthesizer_factory is None:
+            clients = client_factory or get_client_factory()
+
+            def synthesizer_factory(variant: Variant) -> Any:
+                return get_response_synthesizer(llm=clients.llm(variant.model, temperature=variant.temperature))
+
+        self._synthesizers = {variant.label: synthesizer_factory(variant) for variant in self.variants}
+        self.answers: List[Answer] = []
+        self.retrieval_ms = 0.0
+
+    def _synthesize(self, variant: Variant, question: str, nodes: List[NodeWithScore]) -> Answer:
+        start = time.perf_counter()
+        with attribute(case_id=f"compare:{variant.label}", stage="synthesis"):
+            response = self._synthesizers[variant.label].synthesize(question, nodes=nodes)
+        latency_ms = (time.perf_counter() - start) * 1000
+        return Answer(variant, question, str(response), latency_ms)
+
+    def _score(self, answer: Answer, make_metric: Callable[[], Any], context: List[str]) -> Optional[Exception]:
+        metric = make_metric()
+        name = metric_name(metric)
+        test_case = LLMTestCase(input=answer.question, actual_output=answer.output, retrieval_context=context)
+        error = None
+        # Judge prompts of every variant share the question's context as a prefix
+        with shared_context(texts=context):
+            try:
+                score = measure_metric(metric, test_case, case_id=f"compare:{answer.variant.label}")
+            except Exception as exc:
+                score, error = None, exc
+                answer.errors[name] = f"{type(exc).__name__}: {exc}"
+        # A metric that errors counts as failing
+        answer.scores[name] = score
+        answer.successes[name] = score is not None and bool(getattr(metric, "success", False))
+        return error
+
+    def run(self, questions: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Answer every question with every variant and score the answers.
+
+        Args:
+            questions: Questions to compare on
+
+        Returns:
+            The comparison matrix (see ``matrix``)
+
+        Raises:
+            Exception: The first error of a metric that failed on every
+                answer (e.g. a misconfigured judge); answers are kept
+        """
+        start = time.perf_counter()
+        retrieved = self.rag_app.retrieve_batch(list(questions))
+        self.retrieval_ms = (time.perf_counter() - start) * 1000
+        contexts = [[node.node.get_content() for node in nodes] for nodes in retrieved]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compare") as pool:
+            answers = list(pool.map(
+                lambda job: self._synthesize(*job),
+                [(v, q, nodes) for q, nodes in zip(questions, retrieved) for v in self.variants],
+            ))
+            jobs = [
+                (answer, make_metric, context)
+                for answer, context in zip(answers, [c for c in contexts for _ in self.variants])
+                for make_metric in self.metrics
+            ]
+            errors = list(pool.map(lambda job: self._score(*job), jobs))
+        self.answers.extend(answers)
+        # Jobs cycle through the metrics, so metric i's errors are every n-th
+        for i in range(len(self.metrics)):
+            failures = errors[i::len(self.metrics)]
+            if failures and all(error is not None for error in failures):
+                raise failures[0]
+        return self.matrix()
+
+    def matrix(self) -> List[Dict[str, Any]]:
+        """
+        Summarize the answers so far, one row per variant.
+
+        Returns:
+            Rows with latency percentiles, tokens, cost, mean score per
+            metric, pass rate and metric errors (count and first message),
+            cheapest first
+        """
+        rows = []
+        for variant in self.variants:
+            answers = [a for a in self.answers if a.variant == variant]
+            latencies = sorted(a.latency_ms for a in answers)
+            row: Dict[str, Any] = {
+                "variant": variant.label,
+                "model": variant.model,
+                "temperature": variant.temperature,
+                "questions": len(answers),
+                "latency_p50_ms": percentile(latencies, 50),
+                "latency_p95_ms": percentile(latencies, 95),
+            }
+            if self.ledger is not None:
+                usage = self.ledger.usage(case_id=f"compare:{variant.label}", stage="synthesis")
+                row.update(
+                    prompt_tokens=usage["prompt_tokens"],
+                    completion_tokens=usage["completion_tokens"],
+                    cost=usage["cost"],
+                    cost_per_question=usage["cost"] / len(answers) if answers else float("nan"),
+                )
+            for name in sorted({name for a in answers for name in a.scores}):
+                scores = [a.scores.get(name) for a in answers]
+                scores = [s for s in scores if s is not None]
+                row[name] = float(np.mean(scores)) if scores else float("nan")
+            row["pass_rate"] = sum(a.passed for a in answers) / len(answers) if answers else 0.0
+            errors = [f"{name}: {error}" for a in answers for name, error in sorted(a.errors.items())]
+            row["errors"] = len(errors)
+            row["first_error"] = errors[0] if errors else None
+            rows.append(row)
+        return sorted(rows, key=lambda r: (r.get("cost", 0.0), r["latency_p50_ms"]))
+
+
+def cheapest_passing(matrix: Sequence[Dict[str, Any]], min_pass_rate: float = 1.0) -> Optional[Dict[str, Any]]:
+    """
+    Pick the cheapest variant whose pass rate meets a minimum.
+
+    Args:
+        matrix: Rows from ``ModelComparison.matrix``
+        min_pass_rate: Required share of questions passing every metric
+
+    Returns:
+        The row, or None if no variant qualifies
+    """
+    passing = [row for row in matrix if row["pass_rate"] >= min_pass_rate]
+    return min(passing, key=lambda r: (r.get("cost", 0.0), r["latency_p50_ms"]), default=None)
+
+
+def format_matrix(matrix: Sequence[Dict[str, Any]]) -> str:
+    """
+    Format the comparison matrix as a text table.
+
+    Args:
+        matrix: Rows from ``ModelComparison.matrix``
+
+    Returns:
+        str: One line per variant, then the first metric error of each
+        variant that had any
+    """
+    fixed = {"variant", "model", "temperature", "questions", "latency_p50_ms", "latency_p95_ms",
+             "prompt_tokens", "completion_tokens", "cost", "cost_per_question", "pass_rate",
+             "errors", "first_error"}
+    metrics = sorted({key for row in matrix for key in row} - fixed)
+    header = f"{'Variant':<24} {'p50 ms':>8} {'p95 ms':>8} {'Tokens':>8} {'$/q':>9}"
+    header += "".join(f" {name[:12]:>12}" for name in metrics) + f" {'Pass':>6} {'Errors':>6}"
+    lines = [header]
+    for row in matrix:
+        tokens = row.get("prompt_tokens", 0) + row.get("completion_tokens", 0)
+        line = (
+            f"{row['variant']:<24} {row['latency_p50_ms']:>8.0f} {row['latency_p95_ms']:>8.0f} "
+            f"{tokens:>8} {row.get('cost_per_question', float('nan')):>9.5f}"
+        )
+        line += "".join(f" {row.get(name, float('nan')):>12.3f}" for name in metrics)
+        lines.append(line + f" {row['pass_rate']:>6.0%} {row.get('errors', 0):>6}")
+    for row in matrix:
+        if row.get("errors"):
+            lines.append(f"{row['variant']}: {row['errors']} metric errors, first: {row['first_error']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    from deepeval.metrics import AnswerRelevancyMetric, FaithfulnessMetric
+
+    from src.config import load_env
+    from src.golden import GoldenDataset
+    from src.rag_app import RAGApplication
+
+    parser = argparse.ArgumentParser(description="Compare synthesis models on shared retrieval")
+    parser.add_argument("--document", help="Document to index (default TEST_DOCUMENT_PATH)")
+    parser.add_argument("--variants", required=True, help="Comma-separated model[@temperature] list")
+    parser.add_argument("--questions", help="Golden dataset (JSONL) to take questions from")
+    parser.add_argument("--limit", type=int, help="Use only the first N questions")
+    parser.add_argument("--judge", default=os.getenv("DEEPEVAL_JUDGE_MODEL", "gpt-4o"))
+    parser.add_argument("--threshold", type=float, default=0.7, help="Metric threshold")
+    parser.add_argument("--min-pass-rate", type=float, default=0.9)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", help="Write the matrix to this file")
+    args = parser.parse_args(argv)
+    load_env()
+    document = args.document or os.getenv("TEST_DOCUMENT_PATH")
+    if not document:
+        parser.error("--document or TEST_DOCUMENT_PATH is required")
+
+    questions = (
+        [case.question for case in GoldenDataset.load(args.questions).cases] if args.questions else DEFAULT_QUESTIONS
+    )[:args.limit]
+    ledger = CostLedger()
+    install_ledger(ledger)
+    judge = CountingJudge(ledger, model=args.judge)
+    comparison = ModelComparison(
+        RAGApplication(document),
+        [Variant.parse(spec) for spec in args.variants.split(",")],
+        [
+            lambda: AnswerRelevancyMetric(threshold=args.threshold, model=judge, async_mode=False),
+            lambda: FaithfulnessMetric(threshold=args.threshold, model=judge, async_mode=False),
+        ],
+        ledger=ledger,
+        max_workers=args.workers,
+    )
+    matrix = comparison.run(questions)
+    print(format_matrix(matrix))
+    best = cheapest_passing(matrix, args.min_pass_rate)
+    print(f"\nCheapest meeting {args.min_pass_rate:.0%} pass rate: {best['variant'] if best else 'none'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"retrieval_ms": comparison.retrieval_ms, "matrix": matrix}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Post-retrieval context compression.
+
+Retrieved chunks are passed in full to synthesis and to every DeepEval judge
+through ``retrieval_context``. ``ContextCompressor`` runs a pipeline of
+sentence-level stages over the chunks before either sees them:
+
+- ``DuplicateSentenceFilter``: drop sentences already seen in a higher-ranked chunk
+- ``RelevanceFilter``: drop sentences whose embedding is far from the query
+- ``TokenBudget``: keep chunks in rank order until a tiktoken budget is spent
+
+Stages are plain objects with a ``compress(chunks, query)`` method, so custom
+stages can be added to the pipeline.
+"""
+
+import hashlib
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from src.tokens import count_tokens, truncate_to_tokens
+
+
+# A chunk is the list of its sentences, in document order
+Chunks = List[List[str]]
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split a chunk into sentences.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        List of non-empty sentences
+    """
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+
+def _normalize_sentence(sentence: str) -> str:
+    return re.sub(r"\W+", " ", sentence).strip().lower()
+
+
+class DuplicateSentenceFilter:
+    """Remove sentences repeated across (or within) retrieved chunks."""
+
+    def compress(self, chunks: Chunks, query: str) -> Chunks:
+        seen = set()
+        result = []
+        for sentences in chunks:
+            kept = []
+            for sentence in sentences:
+                key = _normalize_sentence(sentence)
+                if key and key not in seen:
+                    seen.add(key)
+                    kept.append(sentence)
+            result.append(kept)
+        return result
+
+
+class RelevanceFilter:
+    """Keep only the sentences most similar to the query by embedding."""
+
+    def __init__(
+        self,
+        embed_model: Any,
+        keep_ratio: float = 0.5,
+        similarity_cutoff: Optional[float] = None,
+        min_sentences_per_chunk: int = 1,
+        cache_size: int = 10000,
+    ):
+        """
+        Initialize the filter.
+
+        Args:
+            embed_model: LlamaIndex embedding model
+            keep_ratio: Fraction of sentences kept, by similarity rank
+            similarity_cutoff: Also keep any sentence at least this similar
+            min_sentences_per_chunk: Best sentences always kept per chunk
+            cache_size: Number of sentence embeddings kept between queries
+
+        Raises:
+            ValueError: If ``keep_ratio`` is not in (0, 1]
+        """
+        if not 0 < keep_ratio <= 1:
+            raise ValueError("keep_ratio must be in (0, 1]")
+        self.embed_model = embed_model
+        self.keep_ratio = keep_ratio
+        self.similarity_cutoff = similarity_cutoff
+        self.min_sentences_per_chunk = min_sentences_per_chunk
+        self.cache_size = cache_size
+        self._cache: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        keys = [hashlib.sha1(s.encode("utf-8")).hexdigest() for s in sentences]
+        with self._lock:
+            vectors = {k: self._cache[k] for k in keys if k in self._cache}
+        missing = {k: s for k, s in zip(keys, sentences) if k not in vectors}
+        if missing:
+            fresh = dict(zip(missing, self.embed_model.get_text_embedding_batch(list(missing.values()))))
+            vectors.update(fresh)
+            with self._lock:
+                if len(self._cache) + len(fresh) > self.cache_size:
+                    self._cache.clear()
+                self._cache.update(fresh)
+        return np.asarray([vectors[k] for k in keys], dtype=np.float32)
+
+    def compress(self, chunks: Chunks, query: str) -> Chunks:
+        sentences = [s for chunk in chunks for s in chunk]
+        if not sentences:
+            return chunks
+        matrix = self._embed_sentences(sentences)
+        query_vector = np.asarray(self.embed_model.get_query_embedding(query), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        scores = (matrix @ query_vector) / np.where(norms == 0, 1.0, norms)
+
+        keep = np.zeros(len(sentences), dtype=bool)
+        n_keep = max(1, int(np.ceil(len(sentences) * self.keep_ratio)))
+        keep[np.argsort(-scores)[:n_keep]] = True
+        if self.similarity_cutoff is not None:
+            keep |= scores >= self.similarity_cutoff
+
+        result, start = [], 0
+        for chunk in chunks:
+            end = start + len(chunk)
+            chunk_keep = keep[start:end].copy()
+            if len(chunk) and self.min_sentences_per_chunk > 0:
+                chunk_keep[np.argsort(-scores[start:end])[:self.min_sentences_per_chunk]] = True
+            result.append([s for s, k in zip(chunk, chunk_keep) if k])
+            start = end
+        return result
+
+
+class TokenBudget:
+    """Cap the total context size, filling from the highest-ranked chunk."""
+
+    def __init__(self, max_tokens: int, model: str = "gpt-3.5-turbo"):
+        """
+        Initialize the budget.
+
+        Args:
+            max_tokens: Maximum tokens across all chunks
+            model: OpenAI model whose tokenizer is used
+
+        Raises:
+            ValueError: If ``max_tokens`` is not positive
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        self.max_tokens = max_tokens
+        self.model = model
+
+    def compress(self, chunks: Chunks, query: str) -> Chunks:
+        remaining = self.max_tokens
+        result = []
+        for sentences in chunks:
+            kept = []
+            for sentence in sentences:
+                if remaining <= 0:
+                    break
+                tokens = count_tokens(sentence, self.model)
+                if tokens > remaining:
+                    sentence = truncate_to_tokens(sentence, remaining, self.model)
+                    tokens = remaining
+                kept.append(sentence)
+                remaining -= tokens
+            result.append(kept)
+        return result
+
+
+class ContextCompressor(BaseNodePostprocessor):
+    """
+    Node postprocessor that compresses retrieved chunks sentence by sentence.
+
+    Chunks left without any sentence are dropped; the rest keep their
+    metadata and score so downstream consumers see the same nodes, only
+    shorter.
+    """
+
+    stages: List[Any] = Field(
+        default_factory=list,
+        description="Objects with a compress(chunks, query) method, applied in order.",
+    )
+    token_model: str = Field(
+        default="gpt-3.5-turbo",
+        description="Model whose tokenizer is used for compression stats.",
+    )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextCompressor"
+
+    def compress_texts(self, texts: Sequence[str], query: str) -> List[str]:
+        """
+        Compress chunk texts for a query.
+
+        Args:
+            texts: Retrieved chunk texts, highest-ranked first
+            query: The user question
+
+        Returns:
+            List of compressed texts, one per input (possibly empty)
+        """
+        chunks: Chunks = [split_sentences(text) for text in texts]
+        for stage in self.stages:
+            chunks = stage.compress(chunks, query)
+        return [" ".join(sentences) for sentences in chunks]
+
+    def compression_stats(self, texts: Sequence[str], query: str) -> Dict[str, Any]:
+        """
+        Measure how much the pipeline shrinks a context.
+
+        Args:
+            texts: Retrieved chunk texts
+            query: The user question
+
+        Returns:
+            dict: ``tokens_before``, ``tokens_after`` and ``ratio``
+        """
+        before = sum(count_tokens(t, self.token_model) for t in texts)
+        after = sum(count_tokens(t, self.token_model) for t in self.compress_texts(texts, query))
+        return {
+            "tokens_before": before,
+            "tokens_after": after,
+            "ratio": after / before if before else 1.0,
+        }
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if not nodes or query_bundle is None:
+            return nodes
+        texts = [n.node.get_content() for n in nodes]
+        compressed = self.compress_texts(texts, query_bundle.query_str)
+        result = []
+        for node, text in zip(nodes, compressed):
+            if not text:
+                continue
+            new_node = TextNode(
+                id_=node.node.node_id,
+                text=text,
+                metadata=dict(node.node.metadata),
+                excluded_embed_metadata_keys=list(node.node.excluded_embed_metadata_keys),
+                excluded_llm_metadata_keys=list(node.node.excluded_llm_metadata_keys),
+            )
+            result.append(NodeWithScore(node=new_node, score=node.score))
+        return result
+
+
+def build_context_compressor(
+    embed_model: Any = None,
+    max_tokens: Optional[int] = None,
+    keep_ratio: float = 0.5,
+    model: str = "gpt-3.5-turbo",
+) -> ContextCompressor:
+    """
+    Build the default dedupe → relevance → budget pipeline.
+
+    Args:
+        embed_model: Embedding model for relevance filtering (skipped if None)
+        max_tokens: Token budget for the whole context (unbounded if None)
+        keep_ratio: Fraction of sentences kept by the relevance filter
+        model: OpenAI model whose tokenizer is used
+
+    Returns:
+        ContextCompressor: Configured compressor
+    """
+    stages: List[Any] = [DuplicateSentenceFilter()]
+    if embed_model is not None:
+        stages.append(RelevanceFilter(embed_model, keep_ratio=keep_ratio))
+    if max_tokens is not None:
+        stages.append(TokenBudget(max_tokens, model=model))
+    return ContextCompressor(stages=stages, token_model=model)
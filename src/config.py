@@ -29,3 +29,47 @@ def get_openai_api_key():
         )
     return openai_api_key
 
+
+def get_chunking_strategy():
+    """
+    Get the chunking strategy used to split documents.
+    
+    Returns:
+        str: Strategy name (``CHUNKING_STRATEGY``, default "sentence")
+    """
+    load_env()
+    return os.getenv("CHUNKING_STRATEGY", "sentence")
+
+
+def get_chunk_size():
+    """
+    Get the chunk size in tokens.
+    
+    Returns:
+        int: ``CHUNK_SIZE`` (default 1024)
+    """
+    load_env()
+    return int(os.getenv("CHUNK_SIZE", "1024"))
+
+
+def get_chunk_overlap():
+    """
+    Get the overlap between consecutive chunks in tokens.
+    
+    Returns:
+        int: ``CHUNK_OVERLAP``, or None for the strategy's default
+    """
+    load_env()
+    overlap = os.getenv("CHUNK_OVERLAP")
+    return int(overlap) if overlap else None
+
+
+def get_chunk_cache_dir():
+    """
+    Get the directory chunk artifacts are cached in.
+    
+    Returns:
+        str: ``CHUNK_CACHE_DIR``, or None to keep chunks in memory only
+    """
+    load_env()
+    return os.getenv("CHUNK_CACHE_DIR") or None
@@ -0,0 +1,500 @@
+"""
+Token and cost accounting for RAG, agent and DeepEval LLM calls.
+
+Every LLM and embedding call is recorded in a ``CostLedger`` with the test
+case and pipeline stage it belongs to:
+
+- LlamaIndex calls (``RAGApplication``, router engines, agents) are captured
+  by ``LedgerEventHandler`` on the instrumentation dispatcher, using the
+  provider's reported usage when present and tiktoken otherwise.
+- DeepEval judge calls go through ``CountingJudge``, a DeepEval model that
+  wraps the judge model and records the usage the provider reports for it
+  (counting prompts and completions if the judge reports none).
+
+Attribution comes from the ``attribute`` context manager, so nested stages
+(e.g. ``synthesis`` inside a test case) are recorded without threading ids
+through the code under test.
+"""
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from deepeval.models import DeepEvalBaseLLM
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.embedding import EmbeddingEndEvent, EmbeddingStartEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from pydantic import BaseModel
+
+from src.clients import get_client_factory
+from src.tokens import count_tokens
+
+
+# USD per 1K tokens: (prompt, completion). Longest matching prefix wins, so
+# dated snapshots such as "gpt-4o-2024-08-06" use their family's price.
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4": (0.03, 0.06),
+    "text-embedding-ada-002": (0.0001, 0.0),
+    "text-embedding-3-small": (0.00002, 0.0),
+    "text-embedding-3-large": (0.00013, 0.0),
+}
+
+UNATTRIBUTED = "unattributed"
+
+_case_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("cost_case_id", default=None)
+_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("cost_stage", default=None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the USD cost of a call.
+
+    Args:
+        model: Model name
+        prompt_tokens: Prompt (input) tokens
+        completion_tokens: Completion (output) tokens
+
+    Returns:
+        float: Cost in USD (0.0 for unknown models)
+    """
+    matches = [name for name in MODEL_PRICING if model.startswith(name)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = MODEL_PRICING[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+@contextmanager
+def attribute(case_id: Optional[str] = None, stage: Optional[str] = None) -> Iterator[None]:
+    """
+    Attribute LLM calls made inside the block to a test case and/or stage.
+
+    Unset arguments inherit the enclosing attribution.
+
+    Args:
+        case_id: Test case the calls belong to
+        stage: Pipeline stage (e.g. ``retrieval``, ``synthesis``, ``metric:Faithfulness``)
+    """
+    tokens = []
+    if case_id is not None:
+        tokens.append((_case_id, _case_id.set(case_id)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_case_id() -> Optional[str]:
+    """
+    Get the test case calls are currently attributed to.
+
+    Returns:
+        The case id, or None outside ``attribute(case_id=...)``
+    """
+    return _case_id.get()
+
+
+def current_stage() -> Optional[str]:
+    """
+    Get the pipeline stage calls are currently attributed to.
+
+    Returns:
+        The stage, or None outside ``attribute(stage=...)``
+    """
+    return _stage.get()
+
+
+@dataclass
+class UsageRecord:
+    """Token usage of one LLM or embedding call."""
+
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    case_id: str = UNATTRIBUTED
+    stage: str = UNATTRIBUTED
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class CostLedger:
+    """Thread-safe record of token usage, with per-case and per-stage profiles."""
+
+    def __init__(self):
+        self._records: List[UsageRecord] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int = 0,
+        case_id: Optional[str] = None,
+        stage: Optional[str] = None,
+    ) -> UsageRecord:
+        """
+        Record one call, attributed to the current case and stage by default.
+
+        Args:
+            model: Model name
+            prompt_tokens: Prompt (input) tokens
+            completion_tokens: Completion (output) tokens
+            case_id: Test case (current attribution if None)
+            stage: Pipeline stage (current attribution if None)
+
+        Returns:
+            UsageRecord: The stored record
+        """
+        record = UsageRecord(
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=estimate_cost(model, prompt_tokens, completion_tokens),
+            case_id=case_id or _case_id.get() or UNATTRIBUTED,
+            stage=stage or _stage.get() or UNATTRIBUTED,
+        )
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    @property
+    def records(self) -> List[UsageRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def take(self, case_id: str) -> List[UsageRecord]:
+        """
+        Remove and return the records of one case.
+
+        Args:
+            case_id: Test case whose records to take
+
+        Returns:
+            List[UsageRecord]: The removed records, oldest first
+        """
+        with self._lock:
+            taken = [r for r in self._records if r.case_id == case_id]
+            self._records = [r for r in self._records if r.case_id != case_id]
+        return taken
+
+    def usage(self, case_id: Optional[str] = None, stage: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Sum usage, optionally filtered by case and/or stage.
+
+        Args:
+            case_id: Only count this test case
+            stage: Only count this stage
+
+        Returns:
+            dict: ``calls``, ``prompt_tokens``, ``completion_tokens``,
+            ``total_tokens`` and ``cost``
+        """
+        totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0.0}
+        for record in self.records:
+            if case_id is not None and record.case_id != case_id:
+                continue
+            if stage is not None and record.stage != stage:
+                continue
+            totals["calls"] += 1
+            totals["prompt_tokens"] += record.prompt_tokens
+            totals["completion_tokens"] += record.completion_tokens
+            totals["total_tokens"] += record.total_tokens
+            totals["cost"] += record.cost
+        return totals
+
+    def profile(self) -> Dict[str, Any]:
+        """
+        Build the per-run cost profile.
+
+        Returns:
+            dict: ``total`` usage plus usage ``by_case``, ``by_stage`` and
+            ``by_model``
+        """
+        records = self.records
+        return {
+            "total": self.usage(),
+            "by_case": {c: self.usage(case_id=c) for c in sorted({r.case_id for r in records})},
+            "by_stage": {s: self.usage(stage=s) for s in sorted({r.stage for r in records})},
+            "by_model": {
+                m: {
+                    "calls": sum(1 for r in records if r.model == m),
+                    "total_tokens": sum(r.total_tokens for r in records if r.model == m),
+                    "cost": sum(r.cost for r in records if r.model == m),
+                }
+                for m in sorted({r.model for r in records})
+            },
+        }
+
+    def format_profile(self, top_cases: int = 10) -> str:
+        """
+        Render the profile as a text report.
+
+        Args:
+            top_cases: Number of most expensive cases listed
+
+        Returns:
+            str: Report with stage, model and case breakdowns
+        """
+        profile = self.profile()
+        total = profile["total"]
+        lines = [
+            f"Total: {total['calls']} calls, {total['prompt_tokens']} prompt + "
+            f"{total['completion_tokens']} completion tokens, ${total['cost']:.4f}",
+            "",
+            f"{'Stage':<40} {'Calls':>6} {'Tokens':>10} {'Cost':>10}",
+        ]
+        for stage, usage in sorted(profile["by_stage"].items(), key=lambda i: -i[1]["cost"]):
+            lines.append(f"{stage:<40} {usage['calls']:>6} {usage['total_tokens']:>10} ${usage['cost']:>9.4f}")
+        lines += ["", f"{'Model':<40} {'Calls':>6} {'Tokens':>10} {'Cost':>10}"]
+        for model, usage in sorted(profile["by_model"].items(), key=lambda i: -i[1]["cost"]):
+            lines.append(f"{model:<40} {usage['calls']:>6} {usage['total_tokens']:>10} ${usage['cost']:>9.4f}")
+        lines += ["", f"{'Case':<60} {'Tokens':>10} {'Cost':>10}"]
+        cases = sorted(profile["by_case"].items(), key=lambda i: -i[1]["cost"])[:top_cases]
+        for case_id, usage in cases:
+            lines.append(f"{case_id[-60:]:<60} {usage['total_tokens']:>10} ${usage['cost']:>9.4f}")
+        return "\n".join(lines)
+
+    def save(self, path: str) -> None:
+        """
+        Write the profile and raw records as JSON.
+
+        Args:
+            path: Output file path
+        """
+        data = {"profile": self.profile(), "records": [asdict(r) for r in self.records]}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def assert_within_budget(
+        self,
+        case_id: str,
+        max_tokens: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+    ) -> None:
+        """
+        Assert that a test case stayed within its token and cost budget.
+
+        Args:
+            case_id: Test case to check
+            max_tokens: Maximum total tokens
+            max_prompt_tokens: Maximum prompt tokens
+            max_cost: Maximum cost in USD
+
+        Raises:
+            AssertionError: If any budget is exceeded
+        """
+        usage = self.usage(case_id=case_id)
+        if max_tokens is not None:
+            assert usage["total_tokens"] <= max_tokens, \
+                f"{case_id} used {usage['total_tokens']} tokens (budget {max_tokens})"
+        if max_prompt_tokens is not None:
+            assert usage["prompt_tokens"] <= max_prompt_tokens, \
+                f"{case_id} used {usage['prompt_tokens']} prompt tokens (budget {max_prompt_tokens})"
+        if max_cost is not None:
+            assert usage["cost"] <= max_cost, \
+                f"{case_id} cost ${usage['cost']:.4f} (budget ${max_cost:.4f})"
+
+
+def _count_message_tokens(messages: Any, model: str) -> int:
+    # ~4 tokens of chat framing per message, as in OpenAI's cookbook
+    return sum(count_tokens(str(m.content or ""), model) + 4 for m in messages)
+
+
+def _usage_tokens(usage: Any) -> Optional[Tuple[int, int]]:
+    """Get (prompt, completion) tokens from an OpenAI usage object or dict."""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+
+
+def _reported_usage(response: Any) -> Optional[Tuple[int, int]]:
+    """Get (prompt, completion) tokens reported by the provider, if any."""
+    counts = getattr(response, "additional_kwargs", None) or {}
+    if "prompt_tokens" in counts:
+        return counts["prompt_tokens"], counts.get("completion_tokens", 0)
+    raw = getattr(response, "raw", None)
+    return _usage_tokens(raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None))
+
+
+def llm_event_usage(event: Any, model: str) -> Tuple[int, int]:
+    """
+    Get the (prompt, completion) tokens of an LLM end event.
+
+    Uses the provider's reported usage when present and tiktoken otherwise.
+
+    Args:
+        event: ``LLMChatEndEvent`` or ``LLMCompletionEndEvent``
+        model: Model name used for tiktoken counts
+
+    Returns:
+        tuple: (prompt_tokens, completion_tokens)
+    """
+    usage = _reported_usage(event.response)
+    if usage is not None:
+        return usage
+    if isinstance(event, LLMChatEndEvent):
+        completion = event.response.message.content if event.response else ""
+        return _count_message_tokens(event.messages, model), count_tokens(str(completion or ""), model)
+    completion = event.response.text if event.response else ""
+    return count_tokens(event.prompt, model), count_tokens(completion or "", model)
+
+
+class LedgerEventHandler(BaseEventHandler):
+    """LlamaIndex instrumentation handler that records usage in a ledger."""
+
+    _ledger: CostLedger = PrivateAttr()
+    _models: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, ledger: CostLedger, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._ledger = ledger
+        self._models = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LedgerEventHandler"
+
+    def _model_for(self, event: BaseEvent, default: str) -> str:
+        return self._models.pop(event.span_id or "", default)
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent, EmbeddingStartEvent)):
+            model = (event.model_dict or {}).get("model") or (event.model_dict or {}).get("model_name")
+            self._models[event.span_id or ""] = model or "unknown"
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            model = self._model_for(event, "unknown")
+            self._ledger.record(model, *llm_event_usage(event, model), stage=_stage.get() or "llm")
+        elif isinstance(event, EmbeddingEndEvent):
+            model = self._model_for(event, "unknown")
+            tokens = sum(count_tokens(chunk, model) for chunk in event.chunks)
+            self._ledger.record(model, tokens, 0, stage=_stage.get() or "embedding")
+
+
+def install_ledger(ledger: CostLedger) -> LedgerEventHandler:
+    """
+    Start recording every LlamaIndex LLM and embedding call in a ledger.
+
+    Args:
+        ledger: Ledger to record into
+
+    Returns:
+        LedgerEventHandler: The registered handler
+    """
+    handler = LedgerEventHandler(ledger)
+    get_dispatcher().add_event_handler(handler)
+    return handler
+
+
+class CountingJudge(DeepEvalBaseLLM):
+    """
+    DeepEval judge model that records its token usage in a ledger.
+
+    Pass as ``model=`` to any DeepEval metric. Calls are attributed to the
+    current stage, or ``judge`` if none is set. The provider's reported usage
+    is recorded when the wrapped judge returns it (``generate_with_usage``);
+    otherwise prompt and output are counted with ``tokenizer``.
+    """
+
+    def __init__(
+        self,
+        ledger: CostLedger,
+        model: str = "gpt-4o",
+        inner: Optional[DeepEvalBaseLLM] = None,
+        tokenizer: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Wrap a judge model.
+
+        Args:
+            ledger: Ledger to record into
+            model: OpenAI model used when ``inner`` is not given
+            inner: Judge model to wrap (a pooled OpenAI judge from
+                ``get_client_factory()`` by default)
+            tokenizer: Token counter for judges that report no usage
+                (tiktoken for the judge's model by default)
+        """
+        self.ledger = ledger
+        self.inner = inner or get_client_factory().judge(model)
+        self.tokenizer = tokenizer
+        super().__init__(model_name=self.inner.get_model_name())
+
+    def _count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return self.tokenizer(text)
+        return count_tokens(text, self.get_model_name())
+
+    def load_model(self) -> DeepEvalBaseLLM:
+        return self.inner
+
+    def _record(self, prompt: str, output: Any, usage: Any = None) -> Any:
+        # Native DeepEval models return (output, cost)
+        if isinstance(output, tuple):
+            output = output[0]
+        # Structured outputs come back parsed into the metric's schema
+        text = output.model_dump_json() if isinstance(output, BaseModel) else str(output)
+        # The request actually sent may differ from ``prompt`` (assembled
+        # judge messages), so the provider's count wins when reported
+        tokens = _usage_tokens(usage) or (self._count(prompt), self._count(text))
+        self.ledger.record(self.get_model_name(), *tokens, stage=_stage.get() or "judge")
+        return output if isinstance(output, BaseModel) else text
+
+    # ``schema`` is forwarded; a wrapped model without structured outputs
+    # raises TypeError, on which DeepEval falls back to plain-text JSON.
+    def generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Any:
+        kwargs = {} if schema is None else {"schema": schema}
+        if hasattr(self.inner, "generate_with_usage"):
+            return self._record(prompt, *self.inner.generate_with_usage(prompt, **kwargs))
+        return self._record(prompt, self.inner.generate(prompt, **kwargs))
+
+    async def a_generate(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Any:
+        kwargs = {} if schema is None else {"schema": schema}
+        if hasattr(self.inner, "a_generate_with_usage"):
+            return self._record(prompt, *(await self.inner.a_generate_with_usage(prompt, **kwargs)))
+        return self._record(prompt, await self.inner.a_generate(prompt, **kwargs))
+
+    def get_model_name(self) -> str:
+        return self.inner.get_model_name()
+
+
+def measure_metric(metric: Any, test_case: Any, case_id: Optional[str] = None) -> float:
+    """
+    Run a DeepEval metric with its calls attributed to ``metric:<Name>``.
+
+    Args:
+        metric: DeepEval metric instance
+        test_case: ``LLMTestCase`` to score
+        case_id: Test case id (current attribution if None)
+
+    Returns:
+        float: The metric score
+    """
+    stage = f"metric:{type(metric).__name__.replace('Metric', '')}"
+    with attribute(case_id=case_id, stage=stage):
+        metric.measure(test_case)
+    return metric.score
@@ -0,0 +1,103 @@
+"""
+Document tools built from precomputed chunks.
+
+Same tools as Agentic-RAG's ``get_doc_tools`` (a page-filterable vector
+query tool and a summary tool), but the document is streamed into the index
+with a configurable chunking strategy, and chunks are reused from a
+``ChunkStore`` when tools for the same document are rebuilt.
+"""
+
+from typing import Any, List, Optional, Tuple
+
+from llama_index.core import SummaryIndex
+from llama_index.core.tools import FunctionTool, QueryEngineTool
+from llama_index.core.vector_stores import FilterCondition, MetadataFilters
+
+from src.chunking import ChunkingStrategy, ChunkStore, document_hash
+from src.ingest import StreamingIngestor
+from src.rerank import AdaptiveReranker
+from src.summary_tree import SummaryTreeBuilder, build_summary_tool
+
+
+def build_doc_tools(
+    file_path: str,
+    name: str,
+    strategy: Optional[ChunkingStrategy] = None,
+    store: Optional[ChunkStore] = None,
+    similarity_top_k: int = 2,
+    embed_model: Any = None,
+    batch_size: int = 64,
+    summary_tree: bool = False,
+    llm: Any = None,
+    reranker: Optional[AdaptiveReranker] = None,
+) -> Tuple[FunctionTool, QueryEngineTool]:
+    """
+    Create vector and summary tools for a document.
+
+    Args:
+        file_path: Path to the document
+        name: Tool name suffix
+        strategy: Chunking strategy (``SentenceChunker()`` if None)
+        store: Chunk artifact store
+        similarity_top_k: Chunks retrieved per vector query
+        embed_model: Embedding model for the vector index (``Settings`` if None)
+        batch_size: Chunks embedded per request while indexing
+        summary_tree: Answer summary questions from a precomputed summary
+            tree (persisted next to the chunk artifacts) instead of
+            summarizing every chunk per query
+        llm: LLM for the summary tree and its answers (``Settings`` if None)
+        reranker: Reranks ``reranker.candidate_k`` chunks per vector query and
+            keeps an adaptive number (replaces ``similarity_top_k``)
+
+    Returns:
+        tuple: (vector_tool, summary_tool)
+    """
+    ingestor = StreamingIngestor(embed_model=embed_model, strategy=strategy, batch_size=batch_size, store=store)
+    vector_index = ingestor.ingest(file_path)
+    nodes = list(vector_index.docstore.docs.values())
+    postprocessors = ingestor.strategy.postprocessors()
+    if reranker is not None:
+        reranker.vector_store = vector_index.vector_store
+        postprocessors.append(reranker)
+        similarity_top_k = reranker.candidate_k
+
+    def vector_query(query: str, page_numbers: Optional[List[str]] = None) -> str:
+        """Use to answer questions over the paper.
+
+        Useful if you have specific questions over the paper.
+        Always leave page_numbers as None UNLESS there is a specific page you want to search for.
+
+        Args:
+            query (str): the string query to be embedded.
+            page_numbers (Optional[List[str]]): Filter by set of pages. Leave as NONE
+                if we want to perform a vector search
+                over all pages. Otherwise, filter by the set of specified pages.
+        """
+        metadata_dicts = [{"key": "page_label", "value": p} for p in page_numbers or []]
+        query_engine = vector_index.as_query_engine(
+            similarity_top_k=similarity_top_k,
+            node_postprocessors=postprocessors,
+            filters=MetadataFilters.from_dicts(metadata_dicts, condition=FilterCondition.OR),
+        )
+        return str(query_engine.query(query))
+
+    vector_query_tool = FunctionTool.from_defaults(name=f"vector_tool_{name}", fn=vector_query)
+
+    if summary_tree:
+        tree_path = None
+        if store is not None and store.cache_dir is not None:
+            artifact = store.artifact_path(document_hash(file_path), ingestor.strategy)
+            tree_path = str(artifact.with_name(artifact.stem + "-summary.json"))
+        tree = SummaryTreeBuilder(llm=llm).load_or_build(nodes, tree_path)
+        return vector_query_tool, build_summary_tool(tree, name, llm=llm)
+
+    summary_query_engine = SummaryIndex(nodes).as_query_engine(
+        response_mode="tree_summarize",
+        use_async=True,
+    )
+    summary_tool = QueryEngineTool.from_defaults(
+        name=f"summary_tool_{name}",
+        query_engine=summary_query_engine,
+        description=f"Useful for summarization questions related to {name}",
+    )
+    return vector_query_tool, summary_tool
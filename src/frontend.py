@@ -0,0 +1,303 @@
+"""
+Query front end: normalization, cheap rejection and single-flight execution.
+
+Queries reach ``RAGApplication`` and the router engine exactly as sent, so a
+query padded with repeated phrases (``"What is " * 50``) pays for every
+token, an empty query still costs an LLM call, and a burst of identical
+requests runs the full pipeline once per request. ``QueryFrontend`` sits in
+front of either backend:
+
+- ``QueryNormalizer`` applies Unicode NFKC, collapses whitespace and
+  consecutive repeated phrases, and caps the query at a token budget
+- queries with nothing left to ask are rejected before any retrieval
+  (``EmptyQueryError``, or a fixed ``empty_response``)
+- ``SingleFlight`` lets concurrent identical (normalized, ignoring case)
+  requests share one execution: the first caller runs the pipeline, the
+  others wait for and return its result; nothing is cached once the call
+  completes
+"""
+
+import threading
+import unicodedata
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence
+
+
+DEFAULT_MAX_QUERY_TOKENS = 256
+
+
+class EmptyQueryError(ValueError):
+    """The query has nothing to ask once normalized."""
+
+
+def collapse_repetitions(text: str, max_ngram: int = 8) -> str:
+    """
+    Collapse consecutive repeats of a phrase into one occurrence.
+
+    Phrases of up to ``max_ngram`` words are compared case-insensitively,
+    shortest first, until no consecutive repeat is left
+    (``"What is What is the topic?"`` becomes ``"What is the topic?"``).
+
+    Args:
+        text: Whitespace-normalized text
+        max_ngram: Longest repeated phrase looked for, in words
+
+    Returns:
+        str: Text without consecutive repeated phrases
+    """
+    words = text.split()
+    while True:
+        keys = [word.lower() for word in words]
+        collapsed: List[str] = []
+        i = 0
+        while i < len(words):
+            for n in range(1, max_ngram + 1):
+                end = i + n
+                if end + n > len(words) or keys[end:end + n] != keys[i:end]:
+                    continue
+                while end + n <= len(words) and keys[end:end + n] == keys[i:i + n]:
+                    end += n
+                collapsed.extend(words[i:i + n])
+                i = end
+                break
+            else:
+                collapsed.append(words[i])
+                i += 1
+        if len(collapsed) == len(words):
+            return " ".join(collapsed)
+        words = collapsed
+
+
+class QueryNormalizer:
+    """Canonical form of a query: normalized text, no repeats, capped length."""
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = DEFAULT_MAX_QUERY_TOKENS,
+        max_ngram: int = 8,
+        truncate: Optional[Callable[[str, int], str]] = None,
+    ):
+        """
+        Args:
+            max_tokens: Token cap (None for no cap)
+            max_ngram: Longest repeated phrase collapsed, in words
+            truncate: Function cutting text to a number of tokens
+                (``truncate_to_tokens`` if None)
+        """
+        self.max_tokens = max_tokens
+        self.max_ngram = max_ngram
+        self._truncate = truncate
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self._truncate is None:
+            from src.tokens import truncate_to_tokens
+
+            self._truncate = truncate_to_tokens
+        return self._truncate(text, max_tokens)
+
+    def normalize(self, query: str) -> str:
+        """
+        Normalize a query.
+
+        Args:
+            query: Query as sent
+
+        Returns:
+            str: Normalized query
+
+        Raises:
+            EmptyQueryError: If the query has no letters or digits
+        """
+        text = " ".join(unicodedata.normalize("NFKC", query or "").split())
+        if not any(ch.isalnum() for ch in text):
+            raise EmptyQueryError("query is empty")
+        text = collapse_repetitions(text, self.max_ngram)
+        if self.max_tokens is not None:
+            text = self.truncate(text, self.max_tokens)
+        return text
+
+
+class SingleFlight:
+    """Share one execution among concurrent calls with the same key."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn``, or wait for the identical call already in flight.
+
+        Args:
+            key: Identity of the call
+            fn: The call
+
+        Returns:
+            The result of the one execution (the same object for every caller)
+
+        Raises:
+            Exception: Whatever the execution raised, for every caller
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class QueryFrontend:
+    """Normalizing, single-flight front end for a ``RAGApplication`` or query engine."""
+
+    def __init__(
+        self,
+        backend: Any,
+        normalizer: Optional[QueryNormalizer] = None,
+        single_flight: bool = True,
+        empty_response: Optional[str] = None,
+    ):
+        """
+        Args:
+            backend: Object with ``query(question)`` and, for a
+                ``RAGApplication``, the retrieval context methods
+            normalizer: Query normalizer (``QueryNormalizer()`` if None)
+            single_flight: Coalesce concurrent identical requests
+            empty_response: Returned for empty queries instead of raising
+                ``EmptyQueryError``
+        """
+        self.backend = backend
+        self.normalizer = normalizer or QueryNormalizer()
+        self.flights = SingleFlight() if single_flight else None
+        self.empty_response = empty_response
+        self._lock = threading.Lock()
+        self.rewritten = 0
+        self.rejected = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything not fronted (e.g. retrieve_batch, index) goes to the backend
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def normalize(self, question: str) -> str:
+        """
+        Normalize a question, counting rewrites and rejections.
+
+        Raises:
+            EmptyQueryError: If the question is empty once normalized
+        """
+        try:
+            normalized = self.normalizer.normalize(question)
+        except EmptyQueryError:
+            with self._lock:
+                self.rejected += 1
+            raise
+        if normalized != question:
+            with self._lock:
+                self.rewritten += 1
+        return normalized
+
+    def _run(self, kind: str, question: str, fn: Callable[[str], Any]) -> Any:
+        if self.flights is None:
+            return fn(question)
+        # Questions differing only in case share an execution
+        return self.flights.do((kind, question.casefold()), lambda: fn(question))
+
+    def query(self, question: str) -> Any:
+        """
+        Answer a question once per burst of identical questions.
+
+        Args:
+            question: The user question
+
+        Returns:
+            The backend's answer (``empty_response`` for an empty question when set)
+
+        Raises:
+            EmptyQueryError: If the question is empty and no ``empty_response`` is set
+        """
+        try:
+            question = self.normalize(question)
+        except EmptyQueryError:
+            if self.empty_response is None:
+                raise
+            return self.empty_response
+        return self._run("query", question, self.backend.query)
+
+    def get_retrieval_context(self, question: str) -> List[str]:
+        """
+        Retrieval context of the normalized question.
+
+        Raises:
+            EmptyQueryError: If the question is empty
+        """
+        return self._run("context", self.normalize(question), self.backend.get_retrieval_context)
+
+    def get_retrieval_contexts(self, questions: Sequence[str]) -> List[List[str]]:
+        """
+        Retrieval contexts of several questions, retrieving each distinct
+        normalized question once.
+
+        A question that is empty once normalized gets an empty context and
+        is left out of the retrieval, so it cannot fail the other questions
+        of a batch (asking it still raises ``EmptyQueryError``).
+        """
+        normalized: List[Optional[str]] = []
+        for question in questions:
+            try:
+                normalized.append(self.normalize(question))
+            except EmptyQueryError:
+                normalized.append(None)
+        valid = [q for q in normalized if q is not None]
+        distinct = {q.casefold(): q for q in reversed(valid)}
+        keys = list(dict.fromkeys(q.casefold() for q in valid))
+        contexts = dict(zip(keys, self.backend.get_retrieval_contexts([distinct[k] for k in keys]))) if keys else {}
+        return [contexts[q.casefold()] if q is not None else [] for q in normalized]
+
+    def stream_query(self, question: str) -> Iterator[str]:
+        """
+        Stream the answer to the normalized question (not coalesced).
+
+        Raises:
+            EmptyQueryError: If the question is empty and no ``empty_response`` is set
+        """
+        try:
+            question = self.normalize(question)
+        except EmptyQueryError:
+            if self.empty_response is None:
+                raise
+            yield self.empty_response
+            return
+        yield from self.backend.stream_query(question)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Front-end counters.
+
+        Returns:
+            Dict[str, int]: rewritten and rejected queries, executions and
+            coalesced (deduplicated) requests
+        """
+        with self._lock:
+            stats = {"rewritten": self.rewritten, "rejected": self.rejected}
+        flights = self.flights
+        stats["executions"] = flights.executions if flights else 0
+        stats["coalesced"] = flights.coalesced if flights else 0
+        return stats
@@ -0,0 +1,365 @@
+"""
+Synthetic golden datasets built from a document's cached chunks.
+
+Evaluation questions are otherwise a handful of hand-written strings per
+test file. ``GoldenDatasetBuilder`` samples chunks from the chunk store,
+asks an LLM for question / expected answer pairs grounded in each chunk
+(several chunks per call, calls in parallel), drops near-duplicate
+questions by embedding similarity and writes a versioned JSON Lines file:
+a header line with the format version and build metadata, then one case
+per line with the chunk it came from as its expected context.
+
+Tests parametrize over a dataset lazily: ``index_dataset`` reads only case
+ids and byte offsets at collection time, and ``read_case`` loads a single
+case when its test runs::
+
+    python -m src.golden --document paper.pdf --chunks 200 --out golden.jsonl
+    GOLDEN_DATASET=golden.jsonl pytest tests/evaluation/test_golden_dataset.py
+"""
+
+import argparse
+import contextvars
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.schema import BaseNode
+
+from src.chunking import ChunkStore, chunker_from_config, document_hash
+from src.clients import get_client_factory
+from src.config import get_chunk_cache_dir, get_openai_api_key, load_env
+from src.cost import attribute
+
+
+GOLDEN_FORMAT_VERSION = 1
+
+QUESTION_PROMPT = (
+    "Below are numbered passages from a paper. For each passage, write "
+    "{per_passage} question(s) a reader could ask that the passage alone fully "
+    "answers, with a concise correct answer taken from the passage. Do not "
+    "refer to \"the passage\" in the question.\n\n"
+    "{passages}\n\n"
+    "Reply with only a JSON list of objects with the keys \"passage\" (its "
+    "number), \"question\" and \"answer\"."
+)
+
+
+@dataclass
+class GoldenCase:
+    """One question with its expected answer and context."""
+
+    id: str
+    question: str
+    expected_answer: str
+    expected_context: List[str]
+    source: Dict[str, Any] = field(default_factory=dict)
+
+    @staticmethod
+    def make_id(question: str) -> str:
+        return hashlib.sha256(question.strip().lower().encode()).hexdigest()[:12]
+
+
+@dataclass
+class GoldenDataset:
+    """Golden cases with the metadata of the build that produced them."""
+
+    cases: List[GoldenCase]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def save(self, path: str) -> None:
+        """
+        Write the dataset as JSON Lines (header line first), atomically.
+
+        Args:
+            path: Destination file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"version": GOLDEN_FORMAT_VERSION, "metadata": self.metadata}) + "\n")
+            for case in self.cases:
+                f.write(json.dumps(asdict(case)) + "\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "GoldenDataset":
+        """
+        Read a whole dataset.
+
+        Args:
+            path: File written by ``save``
+
+        Returns:
+            GoldenDataset: The dataset
+
+        Raises:
+            ValueError: If the file was written by another format version
+        """
+        with open(path) as f:
+            metadata = _read_header(f.readline(), path)
+            cases = [GoldenCase(**json.loads(line)) for line in f if line.strip()]
+        return cls(cases, metadata)
+
+
+def _read_header(line: str, path: str) -> Dict[str, Any]:
+    header = json.loads(line) if line.strip() else {}
+    if header.get("version") != GOLDEN_FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {GOLDEN_FORMAT_VERSION} golden dataset")
+    return header.get("metadata", {})
+
+
+def index_dataset(path: str, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    List a dataset's case ids and byte offsets without keeping the cases.
+
+    Args:
+        path: Dataset file
+        limit: Index only the first ``limit`` cases
+
+    Returns:
+        ``(case_id, offset)`` pairs in file order
+
+    Raises:
+        ValueError: If the file was written by another format version
+    """
+    index = []
+    with open(path, "rb") as f:
+        _read_header(f.readline().decode(), path)
+        while limit is None or len(index) < limit:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                index.append((json.loads(line)["id"], offset))
+    return index
+
+
+def read_case(path: str, offset: int) -> GoldenCase:
+    """
+    Load one case by its byte offset.
+
+    Args:
+        path: Dataset file
+        offset: Offset from ``index_dataset``
+
+    Returns:
+        GoldenCase: The case
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return GoldenCase(**json.loads(f.readline()))
+
+
+def sample_chunks(nodes: Sequence[BaseNode], n: int, seed: int = 0, min_chars: int = 200) -> List[BaseNode]:
+    """
+    Sample chunks to generate questions from, spread across the document.
+
+    Each of ``n`` equal slices of the document contributes one chunk, so the
+    sample covers the whole document rather than clustering.
+
+    Args:
+        nodes: The document's chunks, in document order
+        n: Number of chunks to sample
+        seed: Random seed
+        min_chars: Chunks shorter than this (headers, references) are skipped
+
+    Returns:
+        Sampled chunks, in document order
+    """
+    candidates = [node for node in nodes if len(node.get_content().strip()) >= min_chars]
+    if n >= len(candidates):
+        return candidates
+    rng = random.Random(seed)
+    bounds = np.linspace(0, len(candidates), n + 1).astype(int)
+    return [candidates[rng.randrange(start, end)] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _parse_pairs(text: str) -> List[Dict[str, Any]]:
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        return []
+    try:
+        pairs = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+    return [p for p in pairs if isinstance(p, dict) and p.get("question") and p.get("answer")]
+
+
+def dedupe_questions(embeddings: np.ndarray, threshold: float = 0.9) -> List[int]:
+    """
+    Keep questions that are not near-duplicates of an earlier kept one.
+
+    Args:
+        embeddings: One embedding per question, in priority order
+        threshold: Cosine similarity at or above which a question is a duplicate
+
+    Returns:
+        Indices of the questions to keep
+    """
+    if len(embeddings) == 0:
+        return []
+    vectors = np.array(embeddings, dtype=np.float64)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    keep: List[int] = []
+    for i in range(len(vectors)):
+        if not keep or similarity[i, keep].max() < threshold:
+            keep.append(i)
+    return keep
+
+
+class GoldenDatasetBuilder:
+    """Generate golden cases from chunks with an LLM."""
+
+    def __init__(
+        self,
+        llm: Any = None,
+        embed_model: Any = None,
+        questions_per_chunk: int = 1,
+        chunks_per_call: int = 4,
+        max_workers: int = 4,
+        dedupe_threshold: float = 0.9,
+        seed: int = 0,
+    ):
+        """
+        Initialize the builder.
+
+        Args:
+            llm: LLM that writes the questions (``Settings.llm`` if None)
+            embed_model: Embedding model for de-duplication
+                (``Settings.embed_model`` if None)
+            questions_per_chunk: Questions asked per chunk
+            chunks_per_call: Chunks sent in one generation call
+            max_workers: Concurrent generation calls
+            dedupe_threshold: Cosine similarity above which questions are
+                near-duplicates
+            seed: Chunk sampling seed
+
+        Raises:
+            ValueError: If a count is less than 1
+        """
+        if min(questions_per_chunk, chunks_per_call, max_workers) < 1:
+            raise ValueError("questions_per_chunk, chunks_per_call and max_workers must be at least 1")
+        self.llm = llm or Settings.llm
+        self.embed_model = embed_model or Settings.embed_model
+        self.questions_per_chunk = questions_per_chunk
+        self.chunks_per_call = chunks_per_call
+        self.max_workers = max_workers
+        self.dedupe_threshold = dedupe_threshold
+        self.seed = seed
+
+    def _generate(self, batch: List[BaseNode]) -> List[GoldenCase]:
+        passages = "\n\n".join(f"[{i + 1}]\n{node.get_content()}" for i, node in enumerate(batch))
+        prompt = QUESTION_PROMPT.format(per_passage=self.questions_per_chunk, passages=passages)
+        cases = []
+        for pair in _parse_pairs(str(self.llm.complete(prompt))):
+            try:
+                number = int(pair.get("passage", 1))
+            except (TypeError, ValueError):
+                continue
+            if not 1 <= number <= len(batch):
+                continue
+            node = batch[number - 1]
+            question = str(pair["question"]).strip()
+            cases.append(GoldenCase(
+                id=GoldenCase.make_id(question),
+                question=question,
+                expected_answer=str(pair["answer"]).strip(),
+                expected_context=[node.get_content()],
+                source={"node_id": node.node_id, "page": node.metadata.get("page_label")},
+            ))
+        return cases
+
+    def build(self, nodes: Sequence[BaseNode], n_chunks: int, metadata: Optional[Dict[str, Any]] = None) -> GoldenDataset:
+        """
+        Sample chunks, generate cases in parallel batches and de-duplicate them.
+
+        Args:
+            nodes: The document's chunks, in document order
+            n_chunks: Chunks to sample
+            metadata: Extra metadata recorded in the dataset header
+
+        Returns:
+            GoldenDataset: The de-duplicated cases, in document order
+        """
+        sampled = sample_chunks(nodes, n_chunks, seed=self.seed)
+        batches = [sampled[i:i + self.chunks_per_call] for i in range(0, len(sampled), self.chunks_per_call)]
+        with attribute(stage="golden"):
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                # Each batch runs in a copy of this context, so its cost lands in the "golden" stage
+                futures = [pool.submit(contextvars.copy_context().run, self._generate, batch) for batch in batches]
+                cases = [case for future in futures for case in future.result()]
+            unique: Dict[str, GoldenCase] = {}
+            for case in cases:
+                unique.setdefault(case.id, case)
+            unique = list(unique.values())
+            embeddings = np.asarray(self.embed_model.get_text_embedding_batch([c.question for c in unique]))
+        kept = [unique[i] for i in dedupe_questions(embeddings, self.dedupe_threshold)]
+        return GoldenDataset(kept, {
+            **(metadata or {}),
+            "created": time.time(),
+            "seed": self.seed,
+            "chunks": len(sampled),
+            "generated": len(cases),
+            "cases": len(kept),
+            "questions_per_chunk": self.questions_per_chunk,
+            "dedupe_threshold": self.dedupe_threshold,
+            "model": getattr(getattr(self.llm, "metadata", None), "model_name", None),
+        })
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Build a golden dataset from a document")
+    parser.add_argument("--document", help="Document to sample (default TEST_DOCUMENT_PATH)")
+    parser.add_argument("--out", required=True, help="JSON Lines file to write")
+    parser.add_argument("--chunks", type=int, default=50, help="Chunks to sample")
+    parser.add_argument("--questions-per-chunk", type=int, default=1)
+    parser.add_argument("--chunks-per-call", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dedupe-threshold", type=float, default=0.9)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    load_env()
+    args.document = args.document or os.getenv("TEST_DOCUMENT_PATH")
+    if not args.document:
+        parser.error("--document or TEST_DOCUMENT_PATH is required")
+
+    api_key = get_openai_api_key()
+    clients = get_client_factory()
+    embed_model = clients.embed_model(api_key=api_key)
+    strategy = chunker_from_config(embed_model)
+    nodes = ChunkStore(get_chunk_cache_dir()).get_nodes(args.document, strategy)
+    builder = GoldenDatasetBuilder(
+        llm=clients.llm(args.model, temperature=0.7, api_key=api_key),
+        embed_model=embed_model,
+        questions_per_chunk=args.questions_per_chunk,
+        chunks_per_call=args.chunks_per_call,
+        max_workers=args.workers,
+        dedupe_threshold=args.dedupe_threshold,
+        seed=args.seed,
+    )
+    dataset = builder.build(nodes, args.chunks, metadata={
+        "document": os.path.basename(args.document),
+        "document_hash": document_hash(args.document),
+        "chunking": strategy.name,
+        "chunking_params": strategy.params(),
+    })
+    dataset.save(args.out)
+    meta = dataset.metadata
+    print(f"{meta['cases']} cases from {meta['chunks']} chunks ({meta['generated']} generated) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
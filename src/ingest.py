@@ -0,0 +1,206 @@
+"""
+Streaming document ingestion with bounded memory.
+
+Loading a 500-page PDF whole before chunking and embedding keeps every
+page's text, every chunk and every pending embedding in memory at once.
+``StreamingIngestor`` instead runs a generator pipeline:
+
+    pages (pypdf, one at a time) -> chunks -> batches -> embeddings -> index
+
+so at most one page and one embedding batch are in flight besides what the
+index itself stores. With a chunk store, each embedded batch is appended to
+the document's chunk artifact, and cached chunks are read back lazily.
+Progress and throughput are reported after each batch.
+"""
+
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from src.chunking import ChunkArtifactWriter, ChunkingStrategy, ChunkStore, SentenceChunker, iter_chunks, iter_pages
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class IngestProgress:
+    """Counters for one ingestion run."""
+
+    document_path: str
+    pages: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    batches: int = 0
+    from_cache: bool = False
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def format(self) -> str:
+        """
+        One-line progress report.
+
+        Returns:
+            str: Human-readable progress
+        """
+        source = "cached chunks" if self.from_cache else f"{self.pages} pages ({self.pages_per_s:.1f}/s)"
+        return (
+            f"{self.document_path}: {source}, {self.chunks} chunks ({self.chunks_per_s:.1f}/s), "
+            f"{self.embedded} embedded in {self.batches} batches, {self.elapsed_s:.1f}s"
+        )
+
+
+def print_progress(progress: IngestProgress) -> None:
+    """Progress callback that reports to stderr."""
+    print(progress.format(), file=sys.stderr)
+
+
+def iter_batches(items: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """
+    Group an iterable into lists of at most ``batch_size`` items.
+
+    Args:
+        items: Items to group
+        batch_size: Maximum batch length
+
+    Yields:
+        list: Consecutive batches
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StreamingIngestor:
+    """Parse, chunk, embed and index documents one page and one batch at a time."""
+
+    def __init__(
+        self,
+        embed_model: Any = None,
+        strategy: Optional[ChunkingStrategy] = None,
+        batch_size: int = 64,
+        store: Optional[ChunkStore] = None,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None,
+    ):
+        """
+        Initialize the ingestor.
+
+        Args:
+            embed_model: Embedding model (``Settings.embed_model`` if None)
+            strategy: Chunking strategy (``SentenceChunker()`` if None)
+            batch_size: Chunks per embedding request
+            store: Chunk artifact store; cached chunks skip parsing, and
+                freshly parsed chunks are saved to it
+            on_progress: Called with the running progress after each batch
+        """
+        self.embed_model = embed_model or Settings.embed_model
+        self.strategy = strategy or SentenceChunker()
+        self.batch_size = batch_size
+        self.store = store
+        self.on_progress = on_progress
+        self.history: List[IngestProgress] = []
+
+    def _chunks(
+        self, document_path: str, progress: IngestProgress
+    ) -> Tuple[Iterator[BaseNode], Optional[ChunkArtifactWriter]]:
+        """Cached chunks, or freshly parsed ones plus the writer caching them."""
+        if self.store is not None:
+            cached = self.store.stream(document_path, self.strategy)
+            if cached is not None:
+                progress.from_cache = True
+                return cached, None
+
+        def counted_pages() -> Iterator[Any]:
+            for page in iter_pages(document_path):
+                progress.pages += 1
+                yield page
+
+        writer = self.store.writer(document_path, self.strategy) if self.store is not None else None
+        return iter_chunks(counted_pages(), self.strategy), writer
+
+    def _embed(self, batch: List[BaseNode]) -> List[BaseNode]:
+        # Embed copies, as VectorStoreIndex does, so cached chunks stay
+        # independent of the embedding model
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        embedded = []
+        for node, embedding in zip(batch, self.embed_model.get_text_embedding_batch(texts)):
+            copy = node.model_copy()
+            copy.embedding = embedding
+            embedded.append(copy)
+        return embedded
+
+    def ingest(self, document_path: str, index: Optional[VectorStoreIndex] = None) -> VectorStoreIndex:
+        """
+        Stream a document into a vector index.
+
+        Args:
+            document_path: Path to the document
+            index: Index to add the chunks to (a new in-memory index if None)
+
+        Returns:
+            VectorStoreIndex: The index containing the document's chunks
+        """
+        if index is None:
+            index = VectorStoreIndex(nodes=[], embed_model=self.embed_model)
+        progress = IngestProgress(document_path=document_path)
+        self.history.append(progress)
+
+        chunks, writer = self._chunks(document_path, progress)
+        try:
+            for batch in iter_batches(chunks, self.batch_size):
+                progress.chunks += len(batch)
+                embedded = self._embed(batch)
+                progress.embedded += len(embedded)
+                progress.batches += 1
+                index.insert_nodes(embedded)
+                if writer is not None:
+                    writer.append(batch)
+                if self.on_progress is not None:
+                    self.on_progress(progress)
+        except BaseException:
+            if writer is not None:
+                writer.discard()
+            raise
+        if writer is not None:
+            writer.commit()
+
+        progress.finished = time.perf_counter()
+        return index
+
+    def ingest_many(self, document_paths: Iterable[str], index: Optional[VectorStoreIndex] = None) -> VectorStoreIndex:
+        """
+        Stream several documents into one vector index.
+
+        Args:
+            document_paths: Paths to the documents
+            index: Index to add the chunks to (a new in-memory index if None)
+
+        Returns:
+            VectorStoreIndex: The index containing every document's chunks
+        """
+        for document_path in document_paths:
+            index = self.ingest(document_path, index)
+        return index
@@ -0,0 +1,389 @@
+"""
+Open-loop load generator for RAGApplication, router engines and agents.
+
+Requests are issued on a fixed schedule at the target QPS whether or not
+earlier requests have finished, so a saturated backend shows up as growing
+latency and errors rather than as a silently lower request rate. Latency is
+measured from each request's scheduled send time, which includes any time it
+spent queued behind busy workers.
+
+The ``router`` and ``agent`` targets are built by the Agentic-RAG checkout
+the test fixtures use (``--agentic-rag``, ``AGENTIC_RAG_PATH`` by default).
+Each agent request runs on a fresh agent over shared document tools, since
+an agent's chat memory is not safe to share between concurrent requests.
+
+Usage:
+    python -m src.loadtest --qps 20 --duration 30 --latency-ms 150
+    python -m src.loadtest --qps 1,2,5,10,20 --duration 20 --max-concurrency 8
+    python -m src.loadtest --target rag --document /path/to/doc.pdf --qps 2
+    python -m src.loadtest --target agent --document /path/to/doc.pdf --qps 0.5
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.questions import COMPLEX_QUESTIONS, TEST_QUESTIONS
+from src.stats import percentile
+
+
+# Relative weight of the fixtures' questions by expected type; multi-step
+# questions are rarer
+QUESTION_TYPE_WEIGHTS = {"general": 3.0, "findings": 3.0, "summary": 2.0, "specific": 1.5}
+COMPLEX_QUESTION_WEIGHT = 0.5
+
+# The ``test_questions`` and ``complex_questions`` fixtures' questions:
+# (question, relative weight)
+DEFAULT_QUESTION_MIX: List[Tuple[str, float]] = (
+    [(question, QUESTION_TYPE_WEIGHTS[kind]) for question, kind in TEST_QUESTIONS]
+    + [(question, COMPLEX_QUESTION_WEIGHT) for question in COMPLEX_QUESTIONS]
+)
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, math.inf]
+
+
+def load_question_mix(path: Optional[str] = None) -> List[Tuple[str, float]]:
+    """
+    Load a weighted question mix.
+
+    Args:
+        path: JSONL file with a ``question`` (or ``input``) field and an
+            optional ``weight`` per line (the default mix if None)
+
+    Returns:
+        List of (question, weight) pairs
+    """
+    if path is None:
+        return list(DEFAULT_QUESTION_MIX)
+    mix = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                mix.append((row.get("question") or row["input"], float(row.get("weight", 1.0))))
+    if not mix:
+        raise ValueError(f"No questions found in {path}")
+    return mix
+
+
+@dataclass
+class RequestRecord:
+    """Outcome of one request."""
+
+    question: str
+    scheduled: float
+    started: float
+    finished: float
+    error: Optional[str] = None
+
+    @property
+    def latency_ms(self) -> float:
+        """Time from scheduled send to completion."""
+        return (self.finished - self.scheduled) * 1000
+
+    @property
+    def queue_ms(self) -> float:
+        """Time spent waiting for a free worker."""
+        return (self.started - self.scheduled) * 1000
+
+
+@dataclass
+class LoadTestResult:
+    """Records and summary statistics of one load test run."""
+
+    target_qps: float
+    duration_s: float
+    records: List[RequestRecord] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize throughput, latency and errors.
+
+        Returns:
+            dict: Request counts, achieved throughput, error rate, latency and
+            queueing percentiles, and the latency histogram
+        """
+        records = self.records
+        ok = sorted(r.latency_ms for r in records if r.error is None)
+        queue = sorted(r.queue_ms for r in records)
+        errors: Dict[str, int] = {}
+        for r in records:
+            if r.error is not None:
+                errors[r.error] = errors.get(r.error, 0) + 1
+        span = (max(r.finished for r in records) - min(r.scheduled for r in records)) if records else 0.0
+        histogram = {}
+        lower = 0.0
+        for upper in HISTOGRAM_BUCKETS_MS:
+            label = f"<{upper:g}ms" if upper != math.inf else f">={lower:g}ms"
+            histogram[label] = sum(1 for v in ok if lower <= v < upper)
+            lower = upper
+        return {
+            "target_qps": self.target_qps,
+            "requests": len(records),
+            "succeeded": len(ok),
+            "throughput_qps": len(ok) / span if span > 0 else 0.0,
+            "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+            "errors": errors,
+            "latency_ms": {
+                "p50": percentile(ok, 50),
+                "p90": percentile(ok, 90),
+                "p95": percentile(ok, 95),
+                "p99": percentile(ok, 99),
+                "max": ok[-1] if ok else 0.0,
+            },
+            "queue_ms": {"p50": percentile(queue, 50), "p99": percentile(queue, 99)},
+            "histogram": histogram,
+        }
+
+
+def arrival_times(qps: float, duration_s: float, poisson: bool = True, seed: Optional[int] = None) -> List[float]:
+    """
+    Compute request send offsets for an open-loop run.
+
+    Args:
+        qps: Target requests per second
+        duration_s: Length of the run in seconds
+        poisson: Exponential inter-arrival times (bursty, like real traffic)
+            instead of a constant interval
+        seed: Random seed for reproducible schedules
+
+    Returns:
+        List of offsets in seconds from the start of the run
+    """
+    if qps <= 0:
+        raise ValueError("qps must be positive")
+    if not poisson:
+        return [i / qps for i in range(math.ceil(duration_s * qps))]
+    rng = random.Random(seed)
+    times, t = [], rng.expovariate(qps)
+    while t < duration_s:
+        times.append(t)
+        t += rng.expovariate(qps)
+    return times
+
+
+def run_load_test(
+    target: Callable[[str], Any],
+    qps: float,
+    duration_s: float,
+    question_mix: Optional[Sequence[Tuple[str, float]]] = None,
+    max_workers: int = 64,
+    poisson: bool = True,
+    seed: Optional[int] = None,
+) -> LoadTestResult:
+    """
+    Drive a target at a fixed request rate.
+
+    Args:
+        target: Callable taking a question (e.g. ``app.query``,
+            ``router_engine.query`` or ``agent.query``)
+        qps: Target requests per second
+        duration_s: Length of the run in seconds
+        question_mix: Weighted questions (``DEFAULT_QUESTION_MIX`` if None)
+        max_workers: Client-side concurrency; requests beyond it queue and
+            the wait counts towards their latency
+        poisson: Use Poisson arrivals instead of a constant interval
+        seed: Random seed for the schedule and question choice
+
+    Returns:
+        LoadTestResult: Per-request records
+    """
+    mix = list(question_mix or DEFAULT_QUESTION_MIX)
+    offsets = arrival_times(qps, duration_s, poisson, seed)
+    rng = random.Random(seed)
+    questions = rng.choices([q for q, _ in mix], weights=[w for _, w in mix], k=len(offsets))
+    result = LoadTestResult(target_qps=qps, duration_s=duration_s)
+    lock = threading.Lock()
+
+    def _send(question: str, scheduled: float) -> None:
+        started = time.perf_counter()
+        error = None
+        try:
+            target(question)
+        except Exception as e:
+            error = type(e).__name__
+        record = RequestRecord(question, scheduled, started, time.perf_counter(), error)
+        with lock:
+            result.records.append(record)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="load") as pool:
+        start = time.perf_counter()
+        for offset, question in zip(offsets, questions):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_send, question, start + offset)
+    return result
+
+
+def find_saturation(
+    target: Callable[[str], Any],
+    qps_levels: Sequence[float],
+    duration_s: float,
+    p95_limit_ms: Optional[float] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Step through request rates and report where the target saturates.
+
+    A level is saturated when achieved throughput falls below 90% of the
+    offered rate, the error rate exceeds 1%, or p95 latency exceeds
+    ``p95_limit_ms``.
+
+    Args:
+        target: Callable taking a question
+        qps_levels: Request rates to try, in increasing order
+        duration_s: Length of each level in seconds
+        p95_limit_ms: Latency objective for p95 (ignored if None)
+        **kwargs: Passed to ``run_load_test``
+
+    Returns:
+        dict: ``levels`` (one summary per rate) and ``saturation_qps`` (first
+        saturated rate, or None)
+    """
+    levels = []
+    saturation = None
+    for qps in qps_levels:
+        summary = run_load_test(target, qps, duration_s, **kwargs).summary()
+        saturated = (
+            summary["throughput_qps"] < 0.9 * qps
+            or summary["error_rate"] > 0.01
+            or (p95_limit_ms is not None and summary["latency_ms"]["p95"] > p95_limit_ms)
+        )
+        summary["saturated"] = saturated
+        levels.append(summary)
+        if saturated and saturation is None:
+            saturation = qps
+    return {"levels": levels, "saturation_qps": saturation}
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """
+    Render a run summary as text.
+
+    Args:
+        summary: Output of ``LoadTestResult.summary``
+
+    Returns:
+        str: Multi-line report
+    """
+    latency = summary["latency_ms"]
+    lines = [
+        f"Target {summary['target_qps']:g} qps: {summary['requests']} requests, "
+        f"{summary['throughput_qps']:.2f} qps achieved, {summary['error_rate']:.1%} errors",
+        f"Latency ms: p50={latency['p50']:.0f} p90={latency['p90']:.0f} "
+        f"p95={latency['p95']:.0f} p99={latency['p99']:.0f} max={latency['max']:.0f}",
+        f"Queue ms: p50={summary['queue_ms']['p50']:.0f} p99={summary['queue_ms']['p99']:.0f}",
+    ]
+    peak = max(summary["histogram"].values()) or 1
+    for label, count in summary["histogram"].items():
+        if count:
+            lines.append(f"  {label:>10} {count:>6} {'#' * max(1, round(40 * count / peak))}")
+    for error, count in summary["errors"].items():
+        lines.append(f"  error {error}: {count}")
+    return "\n".join(lines)
+
+
+def _import_agentic_rag(path: Optional[str]) -> None:
+    # Same checkout location as tests/conftest.py
+    root = Path(path) if path else Path(__file__).parent.parent.parent.parent / "Agentic-RAG-with-LlamaIndex"
+    if not (root / "src").is_dir():
+        raise SystemExit(f"Agentic-RAG not found at {root}; set --agentic-rag or AGENTIC_RAG_PATH")
+    if str(root / "src") not in sys.path:
+        sys.path.insert(0, str(root / "src"))
+
+
+def _build_target(args: argparse.Namespace) -> Callable[[str], Any]:
+    if args.target != "stand-in" and not args.document:
+        raise SystemExit(f"--document (or TEST_DOCUMENT_PATH) is required for --target {args.target}")
+    if args.target == "rag":
+        from src.rag_app import RAGApplication
+
+        return RAGApplication(document_path=args.document).query
+    if args.target == "router":
+        _import_agentic_rag(args.agentic_rag)
+        from router_engine import get_router_query_engine
+
+        engine = get_router_query_engine(args.document)
+        return lambda question: str(engine.query(question))
+    if args.target == "agent":
+        _import_agentic_rag(args.agentic_rag)
+        from agents import create_function_calling_agent
+        from document_tools import get_doc_tools
+
+        tools = list(get_doc_tools(args.document, Path(args.document).stem))
+        return lambda question: str(create_function_calling_agent(tools, verbose=False).query(question))
+
+    from src.stand_in import LatencyModel, StandInRAGApplication
+
+    app = StandInRAGApplication(
+        retrieval_latency=LatencyModel(args.latency_ms * 0.2, args.jitter_ms * 0.2, seed=args.seed),
+        synthesis_latency=LatencyModel(
+            args.latency_ms * 0.8,
+            args.jitter_ms * 0.8,
+            error_rate=args.error_rate,
+            max_concurrency=args.max_concurrency,
+            seed=args.seed,
+        ),
+    )
+    return app.query
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Open-loop load test for the RAG app")
+    parser.add_argument("--target", choices=["stand-in", "rag", "router", "agent"], default="stand-in")
+    parser.add_argument("--document", help="Document for the real targets (default TEST_DOCUMENT_PATH)")
+    parser.add_argument("--agentic-rag",
+                        help="Agentic-RAG checkout for --target router/agent (default AGENTIC_RAG_PATH)")
+    parser.add_argument("--qps", default="5", help="Rate, or comma-separated rates to sweep")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per rate")
+    parser.add_argument("--questions", help="JSONL question mix")
+    parser.add_argument("--workers", type=int, default=64, help="Client-side concurrency")
+    parser.add_argument("--constant", action="store_true", help="Constant instead of Poisson arrivals")
+    parser.add_argument("--p95-limit-ms", type=float, help="Latency objective used in sweeps")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Stand-in mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Stand-in latency std dev")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stand-in failure rate")
+    parser.add_argument("--max-concurrency", type=int, help="Stand-in capacity")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="Write the summaries to this file")
+    args = parser.parse_args(argv)
+    if args.target != "stand-in":
+        from src.config import load_env
+
+        load_env()
+        args.document = args.document or os.getenv("TEST_DOCUMENT_PATH")
+        args.agentic_rag = args.agentic_rag or os.getenv("AGENTIC_RAG_PATH")
+
+    target = _build_target(args)
+    levels = [float(q) for q in args.qps.split(",")]
+    options = dict(
+        question_mix=load_question_mix(args.questions),
+        max_workers=args.workers,
+        poisson=not args.constant,
+        seed=args.seed,
+    )
+    report = find_saturation(target, levels, args.duration, p95_limit_ms=args.p95_limit_ms, **options)
+    for summary in report["levels"]:
+        print(format_summary(summary))
+        print()
+    if len(levels) > 1:
+        print(f"Saturation: {report['saturation_qps'] or 'not reached'} qps")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Memory profiling of session fixtures, indexes and queries.
+
+Session fixtures keep router engines, tool sets and agents for several
+papers resident for the whole run. ``MemoryProfiler`` measures what each
+one costs:
+
+- ``measure`` wraps a fixture build or a query in tracemalloc snapshots,
+  recording the net and peak traced allocation, the RSS before and after
+  and the source lines that allocated the most
+- ``footprint`` walks the object graph reachable from a fixture value and
+  breaks its size down by object type and by category (nodes, embeddings,
+  doc store, other), counting objects already attributed to an earlier
+  fixture only once
+
+The report (text or JSON) and ``check`` against a peak RSS limit are used to
+size worker containers from measurements instead of guesses.
+"""
+
+import gc
+import json
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+# Shared code, not owned by any fixture
+_SKIPPED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    types.CodeType,
+    types.FrameType,
+)
+
+# Float lists at least this long are counted as embeddings
+EMBEDDING_MIN_DIMENSIONS = 8
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Current resident set size of this process.
+
+    Returns:
+        Optional[int]: RSS in bytes (the peak RSS where the current value is
+        not available, None if neither is)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of this process so far.
+
+    Returns:
+        Optional[int]: Peak RSS in bytes (None without the ``resource`` module)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class MemorySample:
+    """Memory used by one fixture build or query."""
+
+    label: str
+    kind: str
+    allocated: int = 0
+    peak: int = 0
+    rss_before: Optional[int] = None
+    rss_after: Optional[int] = None
+    top: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def rss_delta(self) -> Optional[int]:
+        if self.rss_before is None or self.rss_after is None:
+            return None
+        return self.rss_after - self.rss_before
+
+
+@dataclass
+class Footprint:
+    """Size of the objects reachable from one value, by category and type."""
+
+    label: str
+    objects: int = 0
+    bytes: int = 0
+    by_category: Dict[str, int] = field(default_factory=dict)
+    by_type: Dict[str, List[int]] = field(default_factory=dict)
+    truncated: bool = False
+
+    def top_types(self, n: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        Largest object types.
+
+        Args:
+            n: Number of types
+
+        Returns:
+            List[Tuple[str, int, int]]: (type name, count, bytes), largest first
+        """
+        ranked = sorted(self.by_type.items(), key=lambda i: -i[1][1])[:n]
+        return [(name, count, size) for name, (count, size) in ranked]
+
+
+def _owner_categories() -> List[Tuple[type, str]]:
+    """LlamaIndex classes whose reachable objects form a category."""
+    from llama_index.core.schema import BaseNode
+    from llama_index.core.storage.docstore.types import BaseDocumentStore
+    from llama_index.core.storage.index_store.types import BaseIndexStore
+    from llama_index.core.storage.kvstore.types import BaseKVStore
+    from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStore
+
+    return [
+        (BaseNode, "nodes"),
+        (BaseDocumentStore, "docstore"),
+        (BaseIndexStore, "docstore"),
+        (BaseKVStore, "docstore"),
+        (BasePydanticVectorStore, "embeddings"),
+        (VectorStore, "embeddings"),
+    ]
+
+
+def _is_embedding(obj: Any) -> bool:
+    return (
+        type(obj) is list
+        and len(obj) >= EMBEDDING_MIN_DIMENSIONS
+        and type(obj[0]) is float
+    )
+
+
+def footprint(
+    obj: Any,
+    label: str = "",
+    seen: Optional[Set[int]] = None,
+    max_objects: int = 2_000_000,
+) -> Footprint:
+    """
+    Measure the objects reachable from ``obj``.
+
+    Objects are attributed to the category of the nearest enclosing node,
+    doc store or vector store (``other`` outside them); float lists at
+    least ``EMBEDDING_MIN_DIMENSIONS`` long count as embeddings wherever
+    they are. Classes, modules and functions are shared code and skipped.
+
+    Args:
+        obj: Root object (e.g. a fixture value)
+        label: Name of the footprint
+        seen: Ids of objects already counted, updated in place so
+            footprints taken in turn do not double count shared objects
+        max_objects: Stop after this many objects (``truncated`` is set)
+
+    Returns:
+        Footprint: Total and per-category/per-type sizes
+    """
+    seen = set() if seen is None else seen
+    owners = _owner_categories()
+    result = Footprint(label=label)
+    stack = [(obj, "other")]
+    while stack:
+        current, category = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED_TYPES):
+            continue
+        if result.objects >= max_objects:
+            result.truncated = True
+            break
+        seen.add(id(current))
+        for cls, name in owners:
+            if isinstance(current, cls):
+                category = name
+                break
+        else:
+            if _is_embedding(current):
+                category = "embeddings"
+        size = sys.getsizeof(current, 0)
+        result.objects += 1
+        result.bytes += size
+        result.by_category[category] = result.by_category.get(category, 0) + size
+        counts = result.by_type.setdefault(type(current).__name__, [0, 0])
+        counts[0] += 1
+        counts[1] += size
+        stack.extend((child, category) for child in gc.get_referents(current))
+    return result
+
+
+class MemoryProfiler:
+    """Thread-safe record of memory samples and fixture footprints."""
+
+    def __init__(self, frames: int = 1, top: int = 5):
+        """
+        Args:
+            frames: Traceback frames stored per allocation by tracemalloc
+            top: Allocation sites kept per sample
+        """
+        self.frames = frames
+        self.top = top
+        self._samples: List[MemorySample] = []
+        self._footprints: Dict[str, Footprint] = {}
+        self._seen: Set[int] = set()
+        # Footprinted values are kept alive so the ids in _seen stay theirs
+        self._roots: List[Any] = []
+        # Running peak of every open measurement, since tracemalloc has one peak
+        self._open: List[List[int]] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self) -> None:
+        """Start tracemalloc unless it is already tracing."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+
+    def stop(self) -> None:
+        """Stop tracemalloc if this profiler started it."""
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @property
+    def samples(self) -> List[MemorySample]:
+        with self._lock:
+            return list(self._samples)
+
+    @property
+    def footprints(self) -> Dict[str, Footprint]:
+        with self._lock:
+            return dict(self._footprints)
+
+    def _fold_peak(self) -> int:
+        """Carry the traced peak into every open measurement and reset it."""
+        current, peak = tracemalloc.get_traced_memory()
+        for running in self._open:
+            running[0] = max(running[0], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _top_sites(self, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> List[Tuple[str, int]]:
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        growth = [s for s in stats if s.size_diff > 0][:self.top]
+        return [(f"{s.traceback[0].filename}:{s.traceback[0].lineno}", s.size_diff) for s in growth]
+
+    @contextmanager
+    def measure(self, label: str, kind: str = "fixture") -> Iterator[MemorySample]:
+        """
+        Measure the memory allocated inside the block.
+
+        Measurements may nest (a fixture built while building another); the
+        outer one includes the inner one.
+
+        Args:
+            label: Fixture name, test id or query
+            kind: Type of measurement (``fixture``, ``test``, ``query``)
+
+        Yields:
+            MemorySample: The sample, filled in when the block exits
+        """
+        self.start()
+        sample = MemorySample(label=label, kind=kind, rss_before=rss_bytes())
+        before = tracemalloc.take_snapshot() if self.top else None
+        with self._lock:
+            start = self._fold_peak()
+            running = [start]
+            self._open.append(running)
+        try:
+            yield sample
+        finally:
+            after = tracemalloc.take_snapshot() if self.top else None
+            with self._lock:
+                end = self._fold_peak()
+                self._open.remove(running)
+                sample.allocated = end - start
+                sample.peak = running[0] - start
+                sample.rss_after = rss_bytes()
+                if before is not None:
+                    sample.top = self._top_sites(before, after)
+                self._samples.append(sample)
+
+    def add_footprint(self, label: str, obj: Any) -> Footprint:
+        """
+        Record the footprint of a long-lived value, such as a session fixture.
+
+        Objects already counted for an earlier footprint are not counted again,
+        so each fixture is charged only for what it adds.
+
+        Args:
+            label: Fixture name
+            obj: Fixture value
+
+        Returns:
+            Footprint: The recorded footprint
+        """
+        with self._lock:
+            result = footprint(obj, label=label, seen=self._seen)
+            self._roots.append(obj)
+            self._footprints[label] = result
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize samples and footprints.
+
+        Returns:
+            Dict[str, Any]: Peak RSS, samples and footprints (sizes in bytes)
+        """
+        return {
+            "peak_rss": peak_rss_bytes(),
+            "traced_peak": max((s.peak for s in self.samples), default=0),
+            "samples": [asdict(s) for s in self.samples],
+            "footprints": [asdict(f) for f in self.footprints.values()],
+        }
+
+    def format_report(self, top_types: int = 5) -> str:
+        """
+        Render the report as text.
+
+        Args:
+            top_types: Largest object types listed per footprint
+
+        Returns:
+            str: Report with fixture/query samples and footprints in MB
+        """
+        peak_rss = peak_rss_bytes()
+        lines = [
+            f"Peak RSS: {peak_rss / MB:.1f} MB" if peak_rss is not None else "Peak RSS: unavailable",
+            "",
+            f"{'Kind':<8} {'Label':<50} {'Net MB':>8} {'Peak MB':>8} {'RSS +MB':>8}",
+        ]
+        for sample in sorted(self.samples, key=lambda s: -s.peak):
+            delta = sample.rss_delta
+            rss = f"{delta / MB:>8.1f}" if delta is not None else f"{'-':>8}"
+            lines.append(
+                f"{sample.kind:<8} {sample.label[-50:]:<50} "
+                f"{sample.allocated / MB:>8.1f} {sample.peak / MB:>8.1f} {rss}"
+            )
+        footprints = sorted(self.footprints.values(), key=lambda f: -f.bytes)
+        if footprints:
+            lines += ["", f"{'Fixture':<30} {'MB':>8} {'Objects':>10}  Categories (MB)"]
+        for fp in footprints:
+            categories = ", ".join(
+                f"{name} {size / MB:.1f}" for name, size in sorted(fp.by_category.items(), key=lambda i: -i[1])
+            )
+            marker = "+" if fp.truncated else ""
+            lines.append(f"{fp.label:<30} {fp.bytes / MB:>8.1f} {fp.objects:>10}{marker}  {categories}")
+            for name, count, size in fp.top_types(top_types):
+                lines.append(f"    {name:<26} {size / MB:>8.1f} {count:>10}")
+        return "\n".join(lines)
+
+    def save(self, path: str) -> None:
+        """
+        Write the report as JSON.
+
+        Args:
+            path: Output file path
+        """
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def check(self, max_rss_mb: Optional[float] = None, max_peak_mb: Optional[float] = None) -> List[str]:
+        """
+        Compare the run against memory limits.
+
+        Args:
+            max_rss_mb: Maximum peak RSS of the process
+            max_peak_mb: Maximum traced peak of any single sample
+
+        Returns:
+            List[str]: One message per exceeded limit (empty if within limits)
+        """
+        failures = []
+        peak_rss = peak_rss_bytes()
+        if max_rss_mb is not None and peak_rss is not None and peak_rss > max_rss_mb * MB:
+            failures.append(f"peak RSS {peak_rss / MB:.1f} MB (limit {max_rss_mb:g} MB)")
+        if max_peak_mb is not None:
+            for sample in self.samples:
+                if sample.peak > max_peak_mb * MB:
+                    failures.append(
+                        f"{sample.kind} {sample.label} peaked at {sample.peak / MB:.1f} MB "
+                        f"(limit {max_peak_mb:g} MB)"
+                    )
+        return failures
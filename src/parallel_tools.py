@@ -0,0 +1,228 @@
+"""
+Concurrent execution of independent tool calls for multi-document agents.
+
+A comparison question over N papers otherwise costs N sequential tool calls.
+``ParallelToolExecutor`` runs a batch of independent calls with a concurrency
+cap, and ``create_fan_out_tool`` exposes that to the agent as a single tool
+that queries many per-paper tools at once and merges their answers.
+"""
+
+import asyncio
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.tools import FunctionTool, ToolOutput
+from llama_index.core.tools.types import adapt_to_async_tool
+
+from src.agent_tools import get_tool_name, transform_agent_tools
+
+
+ToolCall = Tuple[Any, Dict[str, Any]]
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_FAN_OUT_TOOL_NAME = "query_all_papers"
+DEFAULT_FAN_OUT_CACHE_SIZE = 32
+
+
+def _error_output(tool: Any, kwargs: Dict[str, Any], error: Exception) -> ToolOutput:
+    return ToolOutput(
+        content=f"Error: {error}",
+        tool_name=get_tool_name(tool),
+        raw_input={"kwargs": kwargs},
+        raw_output=error,
+        is_error=True,
+    )
+
+
+class ParallelToolExecutor:
+    """Run independent tool calls concurrently with a concurrency cap."""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        Initialize the executor.
+
+        Args:
+            max_concurrency: Maximum number of tool calls in flight at once
+
+        Raises:
+            ValueError: If ``max_concurrency`` is less than 1
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+
+    def run(self, calls: Sequence[ToolCall]) -> List[ToolOutput]:
+        """
+        Execute tool calls on a thread pool.
+
+        A failing call does not cancel the others; it is returned as an
+        error ``ToolOutput`` in its position.
+
+        Args:
+            calls: ``(tool, kwargs)`` pairs
+
+        Returns:
+            Tool outputs in the same order as ``calls``
+        """
+        if not calls:
+            return []
+
+        def _call(call: ToolCall) -> ToolOutput:
+            tool, kwargs = call
+            try:
+                return adapt_to_async_tool(tool).call(**kwargs)
+            except Exception as e:
+                return _error_output(tool, kwargs, e)
+
+        workers = min(self.max_concurrency, len(calls))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool") as pool:
+            # Each call runs in a copy of the caller's context, keeping its cost attribution
+            futures = [pool.submit(contextvars.copy_context().run, _call, call) for call in calls]
+            return [future.result() for future in futures]
+
+    async def arun(self, calls: Sequence[ToolCall]) -> List[ToolOutput]:
+        """
+        Execute tool calls on the running event loop.
+
+        Args:
+            calls: ``(tool, kwargs)`` pairs
+
+        Returns:
+            Tool outputs in the same order as ``calls``
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _call(call: ToolCall) -> ToolOutput:
+            tool, kwargs = call
+            async with semaphore:
+                try:
+                    return await adapt_to_async_tool(tool).acall(**kwargs)
+                except Exception as e:
+                    return _error_output(tool, kwargs, e)
+
+        return list(await asyncio.gather(*(_call(call) for call in calls)))
+
+
+def query_kwargs(tool: Any, query: str) -> Dict[str, Any]:
+    """
+    Build the keyword arguments that pass ``query`` to a tool.
+
+    ``QueryEngineTool`` takes ``input`` while function tools such as
+    ``vector_query`` take ``query``; the first required parameter wins.
+
+    Args:
+        tool: Tool to call
+        query: Question to ask
+
+    Returns:
+        dict: Keyword arguments for the tool call
+    """
+    parameters = tool.metadata.get_parameters_dict()
+    names = parameters.get("required") or list(parameters.get("properties", {}))
+    return {names[0] if names else "input": query}
+
+
+def merge_tool_outputs(outputs: Sequence[ToolOutput]) -> str:
+    """
+    Merge tool outputs into one labelled answer for the agent.
+
+    Args:
+        outputs: Outputs from ``ParallelToolExecutor``
+
+    Returns:
+        str: One section per tool, headed by the tool name
+    """
+    sections = [f"[{output.tool_name}]\n{output.content}" for output in outputs]
+    return "\n\n".join(sections)
+
+
+def create_fan_out_tool(
+    tools: Sequence[Any],
+    name: str = DEFAULT_FAN_OUT_TOOL_NAME,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> FunctionTool:
+    """
+    Create a tool that sends one query to many tools concurrently.
+
+    Args:
+        tools: Per-paper tools to fan out to (e.g. from ``get_doc_tools``)
+        name: Name of the fan-out tool
+        max_concurrency: Maximum number of tool calls in flight at once
+
+    Returns:
+        FunctionTool: Tool taking ``query`` and optional ``tool_names``
+    """
+    executor = ParallelToolExecutor(max_concurrency=max_concurrency)
+    by_name = {get_tool_name(tool): tool for tool in tools}
+
+    def _select(tool_names: Optional[List[str]]) -> List[Any]:
+        if not tool_names:
+            return list(by_name.values())
+        return [by_name[n] for n in tool_names if n in by_name]
+
+    def query_all_papers(query: str, tool_names: Optional[List[str]] = None) -> str:
+        calls = [(tool, query_kwargs(tool, query)) for tool in _select(tool_names)]
+        return merge_tool_outputs(executor.run(calls))
+
+    async def aquery_all_papers(query: str, tool_names: Optional[List[str]] = None) -> str:
+        calls = [(tool, query_kwargs(tool, query)) for tool in _select(tool_names)]
+        return merge_tool_outputs(await executor.arun(calls))
+
+    description = (
+        "Ask the same question of several papers at once and get every "
+        "answer back, labelled by tool. Use this for comparisons or themes "
+        "across papers instead of calling each paper's tool in turn. "
+        "Optionally restrict to tool_names from: " + ", ".join(by_name)
+    )
+    return FunctionTool.from_defaults(
+        fn=query_all_papers,
+        async_fn=aquery_all_papers,
+        name=name,
+        description=description,
+    )
+
+
+def add_fan_out_tool(
+    agent: Any,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    tool_filter: Optional[Callable[[Any], bool]] = None,
+    name: str = DEFAULT_FAN_OUT_TOOL_NAME,
+    cache_size: int = DEFAULT_FAN_OUT_CACHE_SIZE,
+) -> Any:
+    """
+    Give an agent a fan-out tool over the tools it resolves for each step.
+
+    Works with tool retrievers: the fan-out covers whichever per-paper tools
+    were retrieved for the current message.
+
+    Args:
+        agent: Agent returned by ``create_multi_document_agent``
+        max_concurrency: Maximum number of tool calls in flight at once
+        tool_filter: Only fan out to tools for which this returns True
+        name: Name of the fan-out tool
+        cache_size: Fan-out tools kept for recently retrieved tool sets
+
+    Returns:
+        The same agent, for chaining
+    """
+    fan_out_tools: "OrderedDict[Tuple[str, ...], FunctionTool]" = OrderedDict()
+
+    def _with_fan_out(tools: List[Any], message: str) -> List[Any]:
+        targets = [
+            tool for tool in tools
+            if get_tool_name(tool) != name and (tool_filter is None or tool_filter(tool))
+        ]
+        if len(targets) < 2:
+            return tools
+        key = tuple(sorted(get_tool_name(tool) for tool in targets))
+        if key in fan_out_tools:
+            fan_out_tools.move_to_end(key)
+        else:
+            fan_out_tools[key] = create_fan_out_tool(targets, name, max_concurrency)
+            if len(fan_out_tools) > cache_size:
+                fan_out_tools.popitem(last=False)
+        return tools + [fan_out_tools[key]]
+
+    return transform_agent_tools(agent, _with_fan_out)
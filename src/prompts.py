@@ -0,0 +1,343 @@
+"""
+Prompt assembly for provider-side prefix caching.
+
+OpenAI caches the longest prompt prefix it has seen recently (from 1024
+tokens, in 128-token steps) and bills cached tokens at a discount. DeepEval
+judge prompts put the metric's instructions first and the case's retrieval
+context and answer after them, so four metrics on one test case send the
+same context four times behind four different prefixes.
+
+``assemble_judge_messages`` reorders a judge prompt into:
+
+1. a stable system message, identical for every judge call
+2. the case's shared reference texts (retrieval context, context and
+   answer, each once), identical for every metric of the case
+3. the metric's prompt, with those texts replaced by ``[ref N]`` labels
+
+Shared texts are declared per case with ``shared_context(test_case)``.
+``PrefixTracker`` measures what each call could reuse: the longest prefix
+shared with an earlier prompt to the same model, the part of it the
+provider caches, and the cached tokens the provider reports.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import LLMChatEndEvent, LLMChatStartEvent
+
+from src.tokens import get_encoding
+
+
+JUDGE_SYSTEM_PROMPT = (
+    "You are an impartial evaluation judge. Reference texts for the case come "
+    "first; the instructions in the last message refer to them by their [ref N] "
+    "labels. Treat a label exactly as if its text appeared in its place, and "
+    "answer in the format the instructions ask for."
+)
+
+# Shorter texts are left inline: moving them saves less than their label costs
+MIN_SHARED_CHARS = 64
+
+# OpenAI prompt caching: prefixes from 1024 tokens, in 128-token increments
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+
+_shared_blocks: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar("shared_blocks", default=())
+
+
+def shared_texts(test_case: Any) -> List[str]:
+    """
+    Texts of a test case that every metric's judge prompt may repeat.
+
+    Args:
+        test_case: ``LLMTestCase``
+
+    Returns:
+        Retrieval context chunks, context chunks and the actual output, in
+        that order, without duplicates or short texts
+    """
+    texts = [
+        *(getattr(test_case, "retrieval_context", None) or []),
+        *(getattr(test_case, "context", None) or []),
+        getattr(test_case, "actual_output", None) or "",
+    ]
+    return list(dict.fromkeys(t for t in texts if len(t) >= MIN_SHARED_CHARS))
+
+
+@contextmanager
+def shared_context(test_case: Any = None, texts: Sequence[str] = ()) -> Iterator[Tuple[str, ...]]:
+    """
+    Declare the texts judge calls inside the block share.
+
+    Args:
+        test_case: ``LLMTestCase`` whose ``shared_texts`` are shared
+        texts: Additional texts to share
+
+    Yields:
+        tuple: The shared texts
+    """
+    blocks = tuple(dict.fromkeys([*(shared_texts(test_case) if test_case is not None else []), *texts]))
+    token = _shared_blocks.set(blocks)
+    try:
+        yield blocks
+    finally:
+        _shared_blocks.reset(token)
+
+
+def _forms(text: str) -> List[str]:
+    # As-is, and escaped as inside the repr of a list of strings
+    escaped = repr(text)[1:-1]
+    return [text] if escaped == text else [text, escaped]
+
+
+def assemble_judge_messages(prompt: str, blocks: Optional[Sequence[str]] = None) -> List[Dict[str, str]]:
+    """
+    Build chat messages for a judge prompt with its shared texts up front.
+
+    Args:
+        prompt: Prompt built by a DeepEval metric template
+        blocks: Shared texts (the current ``shared_context`` if None)
+
+    Returns:
+        Chat messages; a single user message if the prompt contains none of
+        the shared texts
+    """
+    blocks = tuple(_shared_blocks.get() if blocks is None else blocks)
+    labels = {}
+    # Longest first, so a chunk that contains another is replaced whole
+    for i, block in sorted(enumerate(blocks), key=lambda item: -len(item[1])):
+        for form in _forms(block):
+            if form in prompt:
+                prompt = prompt.replace(form, f"[ref {i + 1}]")
+                labels[i] = True
+    if not labels:
+        return [{"role": "user", "content": prompt}]
+    references = "\n\n".join(f"[ref {i + 1}]\n{block}" for i, block in enumerate(blocks))
+    return [
+        {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Reference texts:\n\n{references}"},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def cacheable_tokens(prefix_tokens: int) -> int:
+    """
+    Tokens of a shared prefix that OpenAI prompt caching can serve.
+
+    Args:
+        prefix_tokens: Length of the prefix shared with an earlier prompt
+
+    Returns:
+        int: 0 below ``CACHE_MIN_TOKENS``, else the prefix rounded down to
+        a multiple of ``CACHE_INCREMENT_TOKENS`` past the minimum
+    """
+    if prefix_tokens < CACHE_MIN_TOKENS:
+        return 0
+    return CACHE_MIN_TOKENS + (prefix_tokens - CACHE_MIN_TOKENS) // CACHE_INCREMENT_TOKENS * CACHE_INCREMENT_TOKENS
+
+
+def provider_cached_tokens(usage: Any) -> Optional[int]:
+    """
+    Get the cached prompt tokens an OpenAI usage object reports.
+
+    Args:
+        usage: ``CompletionUsage`` or its dict form
+
+    Returns:
+        The cached tokens, or None if not reported
+    """
+    if usage is None:
+        return None
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return None
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    return None if cached is None else int(cached)
+
+
+@dataclass
+class PromptStats:
+    """Prefix reuse of one LLM call."""
+
+    model: str
+    stage: str
+    prompt_tokens: int
+    prefix_tokens: int
+    cacheable_tokens: int
+    cached_tokens: Optional[int] = None
+
+    @property
+    def prefix_ratio(self) -> float:
+        return self.prefix_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+class PrefixTracker:
+    """Thread-safe record of how much of each prompt repeats an earlier one."""
+
+    def __init__(
+        self,
+        tokenize: Optional[Callable[[str, str], Sequence[int]]] = None,
+        history: int = 64,
+        stage: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        """
+        Initialize the tracker.
+
+        Args:
+            tokenize: ``(text, model) -> token ids`` (tiktoken if None)
+            history: Recent prompts kept per model to compare against
+            stage: Returns the current pipeline stage (e.g.
+                ``src.cost.current_stage``)
+        """
+        self._tokenize = tokenize or (lambda text, model: get_encoding(model).encode(text, disallowed_special=()))
+        self.history = history
+        self._stage = stage or (lambda: None)
+        self._recent: Dict[str, List[np.ndarray]] = {}
+        self._records: List[PromptStats] = []
+        self._lock = threading.Lock()
+
+    def _tokens(self, messages: Sequence[Dict[str, str]], model: str) -> np.ndarray:
+        text = "".join(f"<|{m['role']}|>{m['content']}\n" for m in messages)
+        return np.asarray(self._tokenize(text, model), dtype=np.int64)
+
+    def observe(
+        self,
+        model: str,
+        messages: Sequence[Dict[str, str]],
+        cached_tokens: Optional[int] = None,
+        default_stage: str = "unattributed",
+    ) -> PromptStats:
+        """
+        Record one call.
+
+        Args:
+            model: Model the prompt was sent to (prefixes are per model)
+            messages: Chat messages as ``{"role", "content"}`` dicts
+            cached_tokens: Cached tokens reported by the provider
+            default_stage: Stage when the ``stage`` callable returns None
+
+        Returns:
+            PromptStats: The call's prefix reuse
+        """
+        tokens = self._tokens(messages, model)
+        stage = self._stage() or default_stage
+        with self._lock:
+            recent = self._recent.setdefault(model, [])
+            prefix = 0
+            for earlier in recent:
+                n = min(len(earlier), len(tokens))
+                mismatch = np.flatnonzero(earlier[:n] != tokens[:n])
+                prefix = max(prefix, int(mismatch[0]) if mismatch.size else n)
+            recent.append(tokens)
+            del recent[:-self.history]
+            stats = PromptStats(model, stage, len(tokens), prefix, cacheable_tokens(prefix), cached_tokens)
+            self._records.append(stats)
+        return stats
+
+    @property
+    def records(self) -> List[PromptStats]:
+        with self._lock:
+            return list(self._records)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._records.clear()
+
+    @staticmethod
+    def _totals(records: Sequence[PromptStats]) -> Dict[str, Any]:
+        prompt = sum(r.prompt_tokens for r in records)
+        reported = [r.cached_tokens for r in records if r.cached_tokens is not None]
+        return {
+            "calls": len(records),
+            "prompt_tokens": prompt,
+            "prefix_tokens": sum(r.prefix_tokens for r in records),
+            "cacheable_tokens": sum(r.cacheable_tokens for r in records),
+            "cached_tokens": sum(reported) if reported else None,
+            "prefix_ratio": sum(r.prefix_tokens for r in records) / prompt if prompt else 0.0,
+            "cacheable_ratio": sum(r.cacheable_tokens for r in records) / prompt if prompt else 0.0,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize prefix reuse.
+
+        Returns:
+            dict: ``total`` plus the same figures ``by_stage``
+        """
+        records = self.records
+        stages = sorted({r.stage for r in records})
+        return {
+            "total": self._totals(records),
+            "by_stage": {s: self._totals([r for r in records if r.stage == s]) for s in stages},
+        }
+
+    def format_summary(self) -> str:
+        """
+        Format the summary as a text table.
+
+        Returns:
+            str: One row per stage and a total row
+        """
+        summary = self.summary()
+        lines = [
+            f"{'Stage':<30} {'Calls':>6} {'Prompt':>10} {'Prefix':>7} {'Cacheable':>10} {'Cached':>10}",
+        ]
+        rows = list(summary["by_stage"].items()) + [("total", summary["total"])]
+        for stage, totals in rows:
+            cached = "-" if totals["cached_tokens"] is None else str(totals["cached_tokens"])
+            lines.append(
+                f"{stage:<30} {totals['calls']:>6} {totals['prompt_tokens']:>10} "
+                f"{totals['prefix_ratio']:>7.1%} {totals['cacheable_ratio']:>10.1%} {cached:>10}"
+            )
+        return "\n".join(lines)
+
+
+class PrefixEventHandler(BaseEventHandler):
+    """LlamaIndex instrumentation handler that records chat prompts in a tracker."""
+
+    _tracker: PrefixTracker = PrivateAttr()
+    _models: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, tracker: PrefixTracker, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._tracker = tracker
+        self._models = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PrefixEventHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        if isinstance(event, LLMChatStartEvent):
+            model = (event.model_dict or {}).get("model") or (event.model_dict or {}).get("model_name")
+            self._models[event.span_id or ""] = model or "unknown"
+        elif isinstance(event, LLMChatEndEvent):
+            model = self._models.pop(event.span_id or "", "unknown")
+            messages = [{"role": str(m.role.value), "content": str(m.content or "")} for m in event.messages]
+            raw = getattr(event.response, "raw", None)
+            usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+            self._tracker.observe(model, messages, provider_cached_tokens(usage), default_stage="llm")
+
+
+def install_prefix_tracker(tracker: PrefixTracker) -> PrefixEventHandler:
+    """
+    Start recording every LlamaIndex chat prompt in a tracker.
+
+    Args:
+        tracker: Tracker to record into
+
+    Returns:
+        PrefixEventHandler: The registered handler
+    """
+    handler = PrefixEventHandler(tracker)
+    get_dispatcher().add_event_handler(handler)
+    return handler
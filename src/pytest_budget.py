@@ -0,0 +1,421 @@
+"""
+Cost- and latency-aware test selection and ordering for pytest.
+
+The markers only separate unit, integration, evaluation and slow tests, so
+a run is either everything or almost nothing. This plugin keeps a history
+of every test's duration (setup, call and teardown) and API cost and uses
+it to:
+
+- order the run: tests that failed last time first (fail fast), then
+  cheapest and fastest first (``--budget-order``); modules and classes are
+  ordered as a whole, so their scoped fixtures are still built once
+- select the subset fitting ``--budget-seconds`` and/or ``--budget-cost``
+  that covers the most components (router, agents, tools, multi-doc,
+  metrics, RAG app, known from the fixtures each test requests), then fill the rest of the budget cheapest first;
+  the other tests are deselected and listed in the terminal summary
+
+Tests without history are estimated at the median of the recorded ones.
+Session fixtures are built by the first test that needs them, so their
+cost is part of that test's duration. Usage::
+
+    pytest --budget-seconds 120
+    pytest tests/evaluation --budget-cost 0.50 --budget-seconds 300
+    pytest --budget-order -x
+
+The history is kept in ``--budget-history`` (``TEST_HISTORY_PATH``,
+``.cache/test_history.json`` by default) and updated after every run.
+Costs are per test case; set ``BudgetPlugin.cost_of`` (the conftest reads
+them from the cost ledger) to record them.
+"""
+
+import json
+import os
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import pytest
+
+
+TEST_HISTORY_FORMAT_VERSION = 1
+
+DEFAULT_HISTORY_PATH = ".cache/test_history.json"
+
+# Fixture -> components exercised by the tests that request it
+COMPONENT_FIXTURES: Dict[str, Tuple[str, ...]] = {
+    "router_engine": ("router",),
+    "agent": ("agents",),
+    "multi_document_agent": ("agents", "multi_doc"),
+    "document_tools": ("tools",),
+    "judge_model": ("metrics",),
+    "rag_app": ("rag",),
+}
+
+# Estimate for tests when nothing has been recorded yet
+DEFAULT_DURATION = 1.0
+
+
+def components_of(
+    fixturenames: Iterable[str],
+    component_fixtures: Optional[Dict[str, Tuple[str, ...]]] = None,
+) -> FrozenSet[str]:
+    """
+    Components a test exercises.
+
+    Args:
+        fixturenames: Fixtures the test requests, directly or through other
+            fixtures (pytest's ``item.fixturenames``)
+        component_fixtures: Components per fixture (``COMPONENT_FIXTURES`` if None)
+
+    Returns:
+        FrozenSet[str]: Components of the requested fixtures
+    """
+    mapping = component_fixtures or COMPONENT_FIXTURES
+    return frozenset(component for name in fixturenames for component in mapping.get(name, ()))
+
+
+@dataclass
+class CaseEstimate:
+    """Expected duration and cost of one test."""
+
+    nodeid: str
+    duration: float
+    cost: float = 0.0
+    components: FrozenSet[str] = frozenset()
+    failed: bool = False
+    measured: bool = True
+
+
+class RunHistory:
+    """Durations, costs and last outcomes of tests across runs."""
+
+    def __init__(self, path: Optional[str] = None, smoothing: float = 0.5):
+        """
+        Args:
+            path: JSON file to persist to (in memory only if None)
+            smoothing: Weight of the newest run in the moving averages
+        """
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"smoothing must be in (0, 1], got {smoothing}")
+        self.path = Path(path) if path else None
+        self.smoothing = smoothing
+        self.tests: Dict[str, Dict[str, Any]] = {}
+        if self.path is not None and self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get("version") == TEST_HISTORY_FORMAT_VERSION:
+                self.tests = data.get("tests", {})
+
+    def record(self, nodeid: str, duration: float, cost: float = 0.0, failed: bool = False) -> None:
+        """
+        Record one run of a test.
+
+        Args:
+            nodeid: Test node id
+            duration: Seconds spent in setup, call and teardown
+            cost: API cost in USD
+            failed: Whether the test failed or errored
+        """
+        entry = self.tests.get(nodeid)
+        if entry is None:
+            self.tests[nodeid] = {"duration": duration, "cost": cost, "runs": 1, "failed": failed}
+            return
+        alpha = self.smoothing
+        entry["duration"] = alpha * duration + (1 - alpha) * entry["duration"]
+        entry["cost"] = alpha * cost + (1 - alpha) * entry["cost"]
+        entry["runs"] += 1
+        entry["failed"] = failed
+
+    def estimate(self, nodeid: str, components: FrozenSet[str] = frozenset()) -> CaseEstimate:
+        """
+        Expected duration and cost of a test.
+
+        Args:
+            nodeid: Test node id
+            components: Components the test exercises
+
+        Returns:
+            CaseEstimate: Recorded averages, or the median of all recorded
+            tests (``measured=False``) for a test never run
+        """
+        entry = self.tests.get(nodeid)
+        if entry is not None:
+            return CaseEstimate(nodeid, entry["duration"], entry["cost"], components, entry["failed"])
+        if not self.tests:
+            return CaseEstimate(nodeid, DEFAULT_DURATION, 0.0, components, measured=False)
+        return CaseEstimate(
+            nodeid,
+            statistics.median(e["duration"] for e in self.tests.values()),
+            statistics.median(e["cost"] for e in self.tests.values()),
+            components,
+            measured=False,
+        )
+
+    def save(self) -> None:
+        """Write the history (atomically) to ``path``."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": TEST_HISTORY_FORMAT_VERSION, "tests": self.tests}
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+
+def order_key(estimate: CaseEstimate) -> Tuple[bool, float, float, str]:
+    """Sort key: last failures first, then cheapest, then fastest."""
+    return (not estimate.failed, estimate.cost, estimate.duration, estimate.nodeid)
+
+
+def _group_key(group: Sequence[CaseEstimate]) -> Tuple[bool, float, float, str]:
+    return (
+        not any(e.failed for e in group),
+        sum(e.cost for e in group),
+        sum(e.duration for e in group),
+        group[0].nodeid,
+    )
+
+
+def scope_order(estimates: Sequence[CaseEstimate], depth: int = 0) -> List[CaseEstimate]:
+    """
+    Order tests by ``order_key`` without splitting modules or classes.
+
+    Module- and class-scoped fixtures are torn down when the run leaves
+    their scope, so each module (and each class within it) stays contiguous
+    and is ordered as a whole: groups containing a last failure first, then
+    by their total estimated cost and duration.
+
+    Args:
+        estimates: Tests to order
+        depth: Node id level grouped on (0 for modules)
+
+    Returns:
+        List of the estimates in run order
+    """
+    groups: Dict[str, List[CaseEstimate]] = {}
+    for estimate in estimates:
+        groups.setdefault("::".join(estimate.nodeid.split("::")[:depth + 1]), []).append(estimate)
+    ordered: List[CaseEstimate] = []
+    for group in sorted(groups.values(), key=_group_key):
+        if len(group) > 1 and any(e.nodeid.count("::") > depth for e in group):
+            group = scope_order(group, depth + 1)
+        ordered.extend(group)
+    return ordered
+
+
+@dataclass
+class Selection:
+    """Tests chosen to fit a budget, and what was left out."""
+
+    selected: List[CaseEstimate]
+    skipped: List[CaseEstimate]
+    covered: FrozenSet[str] = frozenset()
+    uncovered: FrozenSet[str] = frozenset()
+    duration: float = 0.0
+    cost: float = 0.0
+
+    def format_summary(self, max_skipped: int = 20) -> str:
+        """
+        Human-readable summary of the selection.
+
+        Args:
+            max_skipped: Skipped tests listed by name
+
+        Returns:
+            str: Multi-line report
+        """
+        lines = [
+            f"selected {len(self.selected)} of {len(self.selected) + len(self.skipped)} tests "
+            f"(estimated {self.duration:.1f}s, ${self.cost:.4f})",
+            f"covered: {', '.join(sorted(self.covered)) or '-'}",
+        ]
+        if self.uncovered:
+            lines.append(f"not covered: {', '.join(sorted(self.uncovered))}")
+        if self.skipped:
+            skipped_duration = sum(e.duration for e in self.skipped)
+            skipped_cost = sum(e.cost for e in self.skipped)
+            lines.append(
+                f"skipped {len(self.skipped)} tests (estimated {skipped_duration:.1f}s, ${skipped_cost:.4f}):"
+            )
+            for estimate in sorted(self.skipped, key=lambda e: (-e.cost, -e.duration))[:max_skipped]:
+                components = ",".join(sorted(estimate.components)) or "-"
+                lines.append(f"  {estimate.nodeid}  {estimate.duration:.1f}s ${estimate.cost:.4f} [{components}]")
+            if len(self.skipped) > max_skipped:
+                lines.append(f"  ... and {len(self.skipped) - max_skipped} more")
+        return "\n".join(lines)
+
+
+def select_within_budget(
+    estimates: Sequence[CaseEstimate],
+    max_seconds: Optional[float] = None,
+    max_cost: Optional[float] = None,
+) -> Selection:
+    """
+    Pick the tests that fit a time and/or cost budget.
+
+    Tests are chosen greedily: first by components newly covered per unit of
+    (normalized) budget, until every reachable component is covered, then
+    cheapest and fastest first (last failures before anything else) until
+    nothing else fits. Tests keep their relative order.
+
+    Args:
+        estimates: Candidate tests
+        max_seconds: Time budget (unlimited if None)
+        max_cost: Cost budget in USD (unlimited if None)
+
+    Returns:
+        Selection: Selected and skipped tests with their estimated totals
+
+    Raises:
+        ValueError: If a budget is negative
+    """
+    for name, value in (("max_seconds", max_seconds), ("max_cost", max_cost)):
+        if value is not None and value < 0:
+            raise ValueError(f"{name} must be non-negative, got {value}")
+
+    def weight(estimate: CaseEstimate) -> float:
+        total = 0.0
+        if max_seconds:
+            total += estimate.duration / max_seconds
+        if max_cost:
+            total += estimate.cost / max_cost
+        return total or 1e-9
+
+    chosen: List[int] = []
+    duration = cost = 0.0
+    covered: FrozenSet[str] = frozenset()
+
+    def fits(estimate: CaseEstimate) -> bool:
+        return ((max_seconds is None or duration + estimate.duration <= max_seconds)
+                and (max_cost is None or cost + estimate.cost <= max_cost))
+
+    remaining = set(range(len(estimates)))
+    while True:
+        best, best_gain = None, 0.0
+        for i in remaining:
+            new = len(estimates[i].components - covered)
+            if new and fits(estimates[i]):
+                gain = new / weight(estimates[i])
+                if gain > best_gain or (gain == best_gain and order_key(estimates[i]) < order_key(estimates[best])):
+                    best, best_gain = i, gain
+        if best is None:
+            break
+        chosen.append(best)
+        remaining.discard(best)
+        duration += estimates[best].duration
+        cost += estimates[best].cost
+        covered |= estimates[best].components
+
+    for i in sorted(remaining, key=lambda i: order_key(estimates[i])):
+        if fits(estimates[i]):
+            chosen.append(i)
+            remaining.discard(i)
+            duration += estimates[i].duration
+            cost += estimates[i].cost
+
+    selected = set(chosen)
+    every = frozenset().union(*(e.components for e in estimates)) if estimates else frozenset()
+    return Selection(
+        selected=[e for i, e in enumerate(estimates) if i in selected],
+        skipped=[e for i, e in enumerate(estimates) if i not in selected],
+        covered=covered,
+        uncovered=every - covered,
+        duration=duration,
+        cost=cost,
+    )
+
+
+class BudgetPlugin:
+    """Pytest plugin ordering and selecting tests from their run history."""
+
+    def __init__(
+        self,
+        history: RunHistory,
+        max_seconds: Optional[float] = None,
+        max_cost: Optional[float] = None,
+        order: bool = False,
+    ):
+        """
+        Args:
+            history: Run history to plan from and record into
+            max_seconds: Time budget (no selection if both budgets are None)
+            max_cost: Cost budget in USD
+            order: Reorder tests even without a budget
+        """
+        self.history = history
+        self.max_seconds = max_seconds
+        self.max_cost = max_cost
+        self.order = order or max_seconds is not None or max_cost is not None
+        self.cost_of: Optional[Callable[[str], float]] = None
+        self.selection: Optional[Selection] = None
+        self._durations: Dict[str, float] = {}
+        self._failed: Dict[str, bool] = {}
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, session: Any, config: Any, items: List[Any]) -> None:
+        if not self.order:
+            return
+        estimates = {
+            item.nodeid: self.history.estimate(item.nodeid, components_of(getattr(item, "fixturenames", ())))
+            for item in items
+        }
+        if self.max_seconds is not None or self.max_cost is not None:
+            self.selection = select_within_budget(
+                [estimates[item.nodeid] for item in items], self.max_seconds, self.max_cost
+            )
+            keep = {e.nodeid for e in self.selection.selected}
+            deselected = [item for item in items if item.nodeid not in keep]
+            if deselected:
+                config.hook.pytest_deselected(items=deselected)
+            items[:] = [item for item in items if item.nodeid in keep]
+        position = {e.nodeid: i for i, e in enumerate(scope_order([estimates[item.nodeid] for item in items]))}
+        items.sort(key=lambda item: position[item.nodeid])
+
+    def pytest_runtest_logreport(self, report: Any) -> None:
+        self._durations[report.nodeid] = self._durations.get(report.nodeid, 0.0) + report.duration
+        if report.failed:
+            self._failed[report.nodeid] = True
+        if report.when == "teardown":
+            cost = self.cost_of(report.nodeid) if self.cost_of is not None else 0.0
+            self.history.record(
+                report.nodeid,
+                self._durations.pop(report.nodeid),
+                cost,
+                self._failed.pop(report.nodeid, False),
+            )
+
+    def pytest_sessionfinish(self, session: Any, exitstatus: Any) -> None:
+        self.history.save()
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        if self.selection is None:
+            return
+        terminalreporter.write_sep("=", "test budget")
+        terminalreporter.write_line(self.selection.format_summary())
+
+
+def pytest_addoption(parser: Any) -> None:
+    group = parser.getgroup("budget", "cost- and latency-aware test selection")
+    group.addoption("--budget-seconds", type=float, default=None,
+                    help="Run the tests fitting this many seconds, covering the most components")
+    group.addoption("--budget-cost", type=float, default=None,
+                    help="Run the tests fitting this API cost (USD), covering the most components")
+    group.addoption("--budget-order", action="store_true", default=False,
+                    help="Run last failures first, then cheapest and fastest first")
+    group.addoption("--budget-history", default=None,
+                    help=f"Test history file (TEST_HISTORY_PATH, default {DEFAULT_HISTORY_PATH})")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: Any) -> None:
+    """Register the plugin as ``budget``."""
+    path = config.getoption("budget_history") or os.getenv("TEST_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+    if not os.path.isabs(path):
+        path = os.path.join(str(config.rootpath), path)
+    plugin = BudgetPlugin(
+        RunHistory(path),
+        max_seconds=config.getoption("budget_seconds"),
+        max_cost=config.getoption("budget_cost"),
+        order=config.getoption("budget_order"),
+    )
+    config.pluginmanager.register(plugin, "budget")
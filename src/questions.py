@@ -0,0 +1,23 @@
+"""
+Sample questions shared by the test fixtures, the load generator and the
+model comparison.
+"""
+
+from typing import List, Tuple
+
+
+# (question, expected_type) of the ``test_questions`` fixture
+TEST_QUESTIONS: List[Tuple[str, str]] = [
+    ("What is the main topic of this document?", "general"),
+    ("Can you summarize the key points?", "summary"),
+    ("What are the main findings?", "findings"),
+    ("What methodology was used?", "specific"),
+    ("Who are the authors?", "specific"),
+]
+
+# Questions that require multi-step reasoning (``complex_questions`` fixture)
+COMPLEX_QUESTIONS: List[str] = [
+    "Compare the methodology used in this paper with standard approaches",
+    "What are the key contributions and how do they relate to each other?",
+    "Explain the evaluation results and their significance",
+]
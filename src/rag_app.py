@@ -0,0 +1,238 @@
+"""
+Single-document RAG application used by the evaluation tests.
+
+Streams one PDF into a LlamaIndex vector index and exposes the two calls the
+DeepEval tests need: ``query`` for the answer and ``get_retrieval_context``
+for the chunks the answer was synthesized from.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.response_synthesizers import get_response_synthesizer
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from src.chunking import ChunkingStrategy, ChunkStore, SentenceChunker
+from src.clients import ClientFactory, get_client_factory
+from src.compression import ContextCompressor
+from src.config import get_openai_api_key
+from src.cost import attribute
+from src.ingest import IngestProgress, StreamingIngestor
+from src.rerank import AdaptiveReranker
+
+
+def embed_queries(embed_model: Any, queries: Sequence[str]) -> List[List[float]]:
+    """
+    Query embeddings of several queries.
+
+    LlamaIndex has no batched query embedding, so the queries are sent as
+    one text batch only when the model embeds queries and texts the same
+    way (OpenAI models using one engine for both); otherwise each query
+    goes through ``get_query_embedding``, so models with asymmetric query
+    embeddings match ``retrieve``.
+
+    Args:
+        embed_model: LlamaIndex embedding model
+        queries: Queries to embed
+
+    Returns:
+        One embedding per query
+    """
+    query_engine = getattr(embed_model, "_query_engine", None)
+    if query_engine is not None and query_engine == getattr(embed_model, "_text_engine", None):
+        return embed_model.get_text_embedding_batch(list(queries))
+    return [embed_model.get_query_embedding(query) for query in queries]
+
+
+class RAGApplication:
+    """Vector-retrieval RAG over a single document."""
+
+    def __init__(
+        self,
+        document_path: str,
+        llm_model: str = "gpt-3.5-turbo",
+        temperature: float = 0.0,
+        embed_model: str = "text-embedding-ada-002",
+        chunk_size: int = 1024,
+        similarity_top_k: int = 3,
+        node_postprocessors: Optional[List[BaseNodePostprocessor]] = None,
+        compressor: Optional[ContextCompressor] = None,
+        retrieval_cache_size: int = 128,
+        chunking: Optional[ChunkingStrategy] = None,
+        chunk_store: Optional[ChunkStore] = None,
+        ingest_batch_size: int = 64,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None,
+        reranker: Optional[AdaptiveReranker] = None,
+        client_factory: Optional[ClientFactory] = None,
+    ):
+        """
+        Load a document and build its index.
+
+        Args:
+            document_path: Path to the document (PDF or text)
+            llm_model: OpenAI model used for synthesis
+            temperature: Sampling temperature for synthesis
+            embed_model: OpenAI embedding model
+            chunk_size: Chunk size in tokens (when ``chunking`` is None)
+            similarity_top_k: Number of chunks retrieved per question
+            node_postprocessors: Postprocessors applied to retrieved chunks
+            compressor: Compression stage applied last; its output is used
+                for both synthesis and ``get_retrieval_context``
+            retrieval_cache_size: Questions whose processed retrieval is kept,
+                so ``query`` and ``get_retrieval_context`` retrieve once
+            chunking: Chunking strategy (``SentenceChunker(chunk_size)`` if None)
+            chunk_store: Cache of chunk artifacts shared across builds
+            ingest_batch_size: Chunks embedded per request while indexing
+            on_progress: Called with ingestion progress after each batch
+            reranker: Reranks ``reranker.candidate_k`` retrieved chunks and
+                keeps an adaptive number (replaces ``similarity_top_k``)
+            client_factory: Source of pooled OpenAI clients
+                (``get_client_factory()`` if None)
+        """
+        api_key = get_openai_api_key()
+        self.document_path = document_path
+        clients = client_factory or get_client_factory()
+        self.llm = clients.llm(llm_model, temperature=temperature, api_key=api_key)
+        self.embed_model = clients.embed_model(embed_model, api_key=api_key)
+
+        self.chunking = chunking or SentenceChunker(chunk_size=chunk_size)
+        self.ingestor = StreamingIngestor(
+            embed_model=self.embed_model,
+            strategy=self.chunking,
+            batch_size=ingest_batch_size,
+            store=chunk_store,
+            on_progress=on_progress,
+        )
+        self.index = self.ingestor.ingest(document_path)
+        self.reranker = reranker
+        self.retriever = self.index.as_retriever(
+            similarity_top_k=reranker.candidate_k if reranker is not None else similarity_top_k
+        )
+        self.synthesizer = get_response_synthesizer(llm=self.llm)
+        self.streaming_synthesizer = get_response_synthesizer(llm=self.llm, streaming=True)
+
+        self.node_postprocessors = self.chunking.postprocessors()
+        if reranker is not None:
+            reranker.vector_store = self.index.vector_store
+            self.node_postprocessors.append(reranker)
+        self.node_postprocessors.extend(node_postprocessors or [])
+        if compressor is not None:
+            self.node_postprocessors.append(compressor)
+
+        self._retrieval_cache_size = retrieval_cache_size
+        self._retrieval_cache: "OrderedDict[str, List[NodeWithScore]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, question: str) -> Optional[List[NodeWithScore]]:
+        with self._lock:
+            if question in self._retrieval_cache:
+                self._retrieval_cache.move_to_end(question)
+                return self._retrieval_cache[question]
+        return None
+
+    def _postprocess_and_cache(self, query_bundle: QueryBundle, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        with attribute(stage="postprocessing"):
+            for postprocessor in self.node_postprocessors:
+                nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        with self._lock:
+            self._retrieval_cache[query_bundle.query_str] = nodes
+            while len(self._retrieval_cache) > self._retrieval_cache_size:
+                self._retrieval_cache.popitem(last=False)
+        return nodes
+
+    def retrieve(self, question: str) -> List[NodeWithScore]:
+        """
+        Retrieve and post-process the chunks for a question.
+
+        Args:
+            question: The user question
+
+        Returns:
+            List of chunks after every postprocessor (including compression)
+        """
+        cached = self._cached(question)
+        if cached is not None:
+            return cached
+        query_bundle = QueryBundle(question)
+        with attribute(stage="retrieval"):
+            nodes = self.retriever.retrieve(query_bundle)
+        return self._postprocess_and_cache(query_bundle, nodes)
+
+    def retrieve_batch(self, questions: Sequence[str]) -> List[List[NodeWithScore]]:
+        """
+        Retrieve the chunks for several questions with one embedding call
+        (see ``embed_queries``).
+
+        Args:
+            questions: The user questions
+
+        Returns:
+            One list of post-processed chunks per question
+        """
+        results: List[Optional[List[NodeWithScore]]] = [self._cached(q) for q in questions]
+        pending = sorted({q for q, r in zip(questions, results) if r is None})
+        if pending:
+            with attribute(stage="retrieval"):
+                embeddings = embed_queries(self.embed_model, pending)
+                bundles = {q: QueryBundle(query_str=q, embedding=e) for q, e in zip(pending, embeddings)}
+                retrieved = {q: self.retriever.retrieve(bundle) for q, bundle in bundles.items()}
+            for q in pending:
+                retrieved[q] = self._postprocess_and_cache(bundles[q], retrieved[q])
+            results = [r if r is not None else retrieved[q] for q, r in zip(questions, results)]
+        return results
+
+    def query(self, question: str) -> str:
+        """
+        Answer a question from the document.
+
+        Args:
+            question: The user question
+
+        Returns:
+            str: Synthesized answer
+        """
+        nodes = self.retrieve(question)
+        with attribute(stage="synthesis"):
+            response = self.synthesizer.synthesize(question, nodes=nodes)
+        return str(response)
+
+    def get_retrieval_context(self, question: str) -> List[str]:
+        """
+        Get the context the answer to a question is synthesized from.
+
+        Args:
+            question: The user question
+
+        Returns:
+            List of chunk texts, as passed to synthesis
+        """
+        return [node.node.get_content() for node in self.retrieve(question)]
+
+    def get_retrieval_contexts(self, questions: Sequence[str]) -> List[List[str]]:
+        """
+        Get the retrieval context for several questions at once.
+
+        Args:
+            questions: The user questions
+
+        Returns:
+            One list of chunk texts per question
+        """
+        return [[n.node.get_content() for n in nodes] for nodes in self.retrieve_batch(questions)]
+
+    def stream_query(self, question: str) -> Iterator[str]:
+        """
+        Answer a question, yielding the answer as it is generated.
+
+        Args:
+            question: The user question
+
+        Yields:
+            str: Answer text deltas
+        """
+        nodes = self.retrieve(question)
+        with attribute(stage="synthesis"):
+            response = self.streaming_synthesizer.synthesize(question, nodes=nodes)
+            yield from response.response_gen
@@ -0,0 +1,232 @@
+"""
+Local reranking with adaptive top-k.
+
+Vector retrieval hands synthesis a fixed top-k, even when only the first
+chunk or two are relevant. ``AdaptiveReranker`` rescores a larger candidate
+set without a cross-encoder or LLM call:
+
+- relevance: cosine similarity to the query blended with a lexical
+  (BM25-style) match over the query terms
+- diversity: maximal marginal relevance (MMR) penalizes candidates similar
+  to ones already selected
+
+and then cuts the list where relevance drops off, so synthesis and the
+DeepEval judges see fewer, better chunks. All scoring is vectorized with
+numpy; candidate embeddings are read from the index's vector store (whose
+retrieved nodes carry none) or embedded once and cached by node id.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it of on or the this to was what when where "
+    "which who why with you your".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def lexical_scores(query: str, texts: List[str], k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """
+    BM25 scores of texts for a query, with IDF taken over the texts themselves.
+
+    Args:
+        query: The user question
+        texts: Candidate chunk texts
+        k1: Term frequency saturation
+        b: Length normalization
+
+    Returns:
+        Scores scaled to [0, 1] (all zero if no query term matches)
+    """
+    query_terms = list(dict.fromkeys(_terms(query)))
+    if not texts or not query_terms:
+        return np.zeros(len(texts), dtype=np.float32)
+    column = {term: j for j, term in enumerate(query_terms)}
+    tf = np.zeros((len(texts), len(query_terms)), dtype=np.float32)
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for i, text in enumerate(texts):
+        terms = _terms(text)
+        lengths[i] = len(terms)
+        for term in terms:
+            j = column.get(term)
+            if j is not None:
+                tf[i, j] += 1
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / (lengths.mean() or 1.0))
+    scores = (tf * (k1 + 1) / (tf + norm[:, None]) * idf).sum(axis=1)
+    top = scores.max()
+    return scores / top if top > 0 else scores
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_order(relevance: np.ndarray, similarity: np.ndarray, mmr_lambda: float, limit: int) -> List[int]:
+    """
+    Greedy maximal marginal relevance selection.
+
+    Args:
+        relevance: Relevance of each candidate to the query
+        similarity: Pairwise candidate similarity matrix
+        mmr_lambda: Weight of relevance versus novelty (1.0 ignores diversity)
+        limit: Maximum number of candidates selected
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    n = len(relevance)
+    selected: List[int] = []
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(min(limit, n)):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+def adaptive_cut(scores: List[float], min_k: int = 1, relative_cutoff: float = 0.75, max_drop: float = 0.2) -> int:
+    """
+    Number of leading results to keep before relevance drops off.
+
+    Stops at the first result scoring below ``relative_cutoff`` times the best
+    score, or falling more than ``max_drop`` below the previous result.
+
+    Args:
+        scores: Relevance of results in ranked order
+        min_k: Results always kept
+        relative_cutoff: Minimum score as a fraction of the best
+        max_drop: Largest allowed drop between consecutive results
+
+    Returns:
+        int: Number of results to keep
+    """
+    if not scores:
+        return 0
+    best = scores[0]
+    keep = 1
+    for previous, score in zip(scores, scores[1:]):
+        if score < best * relative_cutoff or previous - score > max_drop:
+            break
+        keep += 1
+    return max(min(min_k, len(scores)), keep)
+
+
+class AdaptiveReranker(BaseNodePostprocessor):
+    """Rerank candidates by relevance and diversity, keeping an adaptive number."""
+
+    embed_model: Any = Field(description="Embedding model for candidates and the query.")
+    top_n: int = Field(default=3, description="Most chunks kept.")
+    min_k: int = Field(default=1, description="Fewest chunks kept.")
+    candidate_k: int = Field(default=10, description="Chunks to retrieve for reranking.")
+    lexical_weight: float = Field(default=0.3, description="Weight of BM25 versus cosine relevance.")
+    mmr_lambda: float = Field(default=0.7, description="Relevance versus novelty in MMR.")
+    relative_cutoff: float = Field(default=0.75, description="Minimum relevance as a fraction of the best.")
+    max_drop: float = Field(default=0.2, description="Largest relevance drop between consecutive chunks.")
+    cache_size: int = Field(default=10000, description="Candidate embeddings kept between queries.")
+    vector_store: Any = Field(default=None, description="Vector store to read candidate embeddings from by node id.")
+
+    _cache: Dict[str, List[float]] = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "AdaptiveReranker"
+
+    def _embed_nodes(self, nodes: List[NodeWithScore]) -> np.ndarray:
+        ids = [n.node.node_id for n in nodes]
+        with self._lock:
+            vectors = {i: self._cache[i] for i in ids if i in self._cache}
+        for n in nodes:
+            if n.node.node_id not in vectors and n.node.embedding is not None:
+                vectors[n.node.node_id] = n.node.embedding
+        lookup = getattr(self.vector_store, "get", None)
+        if lookup is not None:
+            for i in ids:
+                if i not in vectors:
+                    try:
+                        vectors[i] = lookup(i)
+                    except KeyError:
+                        pass
+        missing = [n for n in nodes if n.node.node_id not in vectors]
+        if missing:
+            texts = [n.node.get_content(metadata_mode=MetadataMode.EMBED) for n in missing]
+            fresh = dict(zip([n.node.node_id for n in missing], self.embed_model.get_text_embedding_batch(texts)))
+            vectors.update(fresh)
+            with self._lock:
+                if len(self._cache) + len(fresh) > self.cache_size:
+                    self._cache.clear()
+                self._cache.update(fresh)
+        return np.asarray([vectors[i] for i in ids], dtype=np.float32)
+
+    def score(self, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> np.ndarray:
+        """
+        Relevance of each candidate to the query.
+
+        Args:
+            nodes: Retrieved candidates
+            query_bundle: The query (its embedding is reused if present)
+
+        Returns:
+            Blended cosine and lexical relevance per candidate
+        """
+        return self._relevance(_normalize_rows(self._embed_nodes(nodes)), nodes, query_bundle)
+
+    def _relevance(self, matrix: np.ndarray, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> np.ndarray:
+        query_embedding = query_bundle.embedding or self.embed_model.get_query_embedding(query_bundle.query_str)
+        query_vector = _normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        cosine = matrix @ query_vector
+        lexical = lexical_scores(query_bundle.query_str, [n.node.get_content() for n in nodes])
+        return (1 - self.lexical_weight) * cosine + self.lexical_weight * lexical
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if len(nodes) <= 1 or query_bundle is None:
+            return nodes
+        matrix = _normalize_rows(self._embed_nodes(nodes))
+        relevance = self._relevance(matrix, nodes, query_bundle)
+        order = mmr_order(relevance, matrix @ matrix.T, self.mmr_lambda, self.top_n)
+        ranked = [float(relevance[i]) for i in order]
+        keep = adaptive_cut(ranked, self.min_k, self.relative_cutoff, self.max_drop)
+        return [NodeWithScore(node=nodes[i].node, score=ranked[rank]) for rank, i in enumerate(order[:keep])]
+
+
+def build_reranker(embed_model: Any, top_n: int = 3, candidate_k: Optional[int] = None) -> AdaptiveReranker:
+    """
+    Build a reranker that keeps at most ``top_n`` chunks.
+
+    Args:
+        embed_model: Embedding model used by the retriever
+        top_n: Most chunks passed to synthesis
+        candidate_k: Chunks retrieved for reranking (``max(10, 3 * top_n)`` if None)
+
+    Returns:
+        AdaptiveReranker: Configured reranker
+    """
+    return AdaptiveReranker(
+        embed_model=embed_model,
+        top_n=top_n,
+        candidate_k=candidate_k or max(10, 3 * top_n),
+    )
@@ -0,0 +1,624 @@
+"""
+Persistent store of evaluation results with trend queries.
+
+Evaluation tests print their DeepEval scores and discard them, so nightly
+runs cannot be compared. ``ResultStore`` keeps one row per metric per test
+case per run (score, threshold, pass/fail, reason, latency, tokens and cost)
+in an append-only columnar store:
+
+- Arrow IPC (when ``pyarrow`` is installed): one file per run under the
+  store directory, readable as-is by pandas, polars or DuckDB
+- SQLite otherwise: a single ``results.sqlite`` table in the same directory
+
+Queries load the needed columns as numpy arrays and aggregate them
+vectorized, so thousands of results are compared without re-running
+anything::
+
+    python -m src.results .eval_results trend --metric Faithfulness
+    python -m src.results .eval_results regressions --metric Faithfulness
+    python -m src.results .eval_results percentiles --column latency_ms
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.cost import measure_metric
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+
+RESULTS_FORMAT_VERSION = 1
+
+# Column name -> (numpy dtype, SQLite type)
+COLUMN_TYPES: Dict[str, tuple] = {
+    "run_id": (object, "TEXT"),
+    "run_started": (np.float64, "REAL"),
+    "case_id": (object, "TEXT"),
+    "question": (object, "TEXT"),
+    "metric": (object, "TEXT"),
+    "score": (np.float64, "REAL"),
+    "threshold": (np.float64, "REAL"),
+    "passed": (np.bool_, "INTEGER"),
+    "reason": (object, "TEXT"),
+    "latency_ms": (np.float64, "REAL"),
+    "prompt_tokens": (np.int64, "INTEGER"),
+    "completion_tokens": (np.int64, "INTEGER"),
+    "cost": (np.float64, "REAL"),
+    "model": (object, "TEXT"),
+}
+
+
+@dataclass
+class EvalResult:
+    """One metric score for one test case in one run."""
+
+    case_id: str
+    question: str
+    metric: str
+    score: float
+    threshold: float = float("nan")
+    passed: bool = False
+    reason: str = ""
+    latency_ms: float = float("nan")
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    model: str = ""
+    run_id: str = ""
+    run_started: float = 0.0
+
+
+def new_run_id() -> str:
+    """
+    Create a sortable run id.
+
+    Returns:
+        str: ``YYYYmmdd-HHMMSS-<random>``
+    """
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def metric_name(metric: Any) -> str:
+    """
+    Short name of a DeepEval metric, as used in cost stages.
+
+    Args:
+        metric: DeepEval metric instance
+
+    Returns:
+        str: e.g. ``Faithfulness`` for ``FaithfulnessMetric``
+    """
+    return type(metric).__name__.replace("Metric", "")
+
+
+def result_from_metric(case_id: str, test_case: Any, metric: Any, **values: Any) -> EvalResult:
+    """
+    Build a result row from a measured DeepEval metric.
+
+    Args:
+        case_id: Test case id (pytest node id)
+        test_case: The ``LLMTestCase`` the metric scored
+        metric: The measured metric
+        **values: Other ``EvalResult`` fields (latency, tokens, cost)
+
+    Returns:
+        EvalResult: The row (score NaN if the metric did not finish)
+    """
+    score = metric.score
+    threshold = getattr(metric, "threshold", None)
+    success = getattr(metric, "success", None)
+    model = getattr(metric, "evaluation_model", None) or ""
+    return EvalResult(
+        case_id=case_id,
+        question=str(test_case.input),
+        metric=metric_name(metric),
+        score=float("nan") if score is None else float(score),
+        threshold=float("nan") if threshold is None else float(threshold),
+        passed=bool(success) if success is not None else False,
+        reason=str(getattr(metric, "reason", "") or ""),
+        model=str(model),
+        **values,
+    )
+
+
+def _group_stats(keys: np.ndarray, values: np.ndarray, pcts: Sequence[float]) -> Dict[str, Any]:
+    """Count, mean and percentiles of ``values`` per distinct key (NaNs ignored)."""
+    valid = ~np.isnan(values)
+    keys, values = keys[valid], values[valid]
+    groups, inverse = np.unique(keys.astype(str), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(groups))
+    means = np.bincount(inverse, weights=values, minlength=len(groups)) / np.maximum(counts, 1)
+    # Sort by (group, value); each group's values are then one contiguous slice
+    order = np.lexsort((values, inverse))
+    ordered = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    stats = {"keys": groups, "count": counts, "mean": means}
+    for pct in pcts:
+        # Nearest-rank percentile within each group
+        rank = np.maximum(1, np.ceil(pct / 100 * counts)).astype(np.int64)
+        stats[f"p{pct:g}"] = ordered[starts + rank - 1] if len(ordered) else np.zeros(0)
+    return stats
+
+
+class ResultStore:
+    """Append-only store of ``EvalResult`` rows with vectorized queries."""
+
+    def __init__(self, path: str, backend: Optional[str] = None):
+        """
+        Open (or create) a store.
+
+        Args:
+            path: Store directory
+            backend: ``arrow`` or ``sqlite`` (``arrow`` when pyarrow is
+                installed, else ``sqlite``)
+
+        Raises:
+            ValueError: If ``arrow`` is requested without pyarrow, or the
+                backend is unknown
+        """
+        backend = backend or ("arrow" if pa is not None else "sqlite")
+        if backend not in ("arrow", "sqlite"):
+            raise ValueError(f"Unknown result store backend: {backend}")
+        if backend == "arrow" and pa is None:
+            raise ValueError("The arrow backend needs pyarrow (pip install pyarrow)")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self._lock = threading.Lock()
+        if backend == "sqlite":
+            with self._connect() as db:
+                columns = ", ".join(f"{name} {sql_type}" for name, (_, sql_type) in COLUMN_TYPES.items())
+                db.execute(f"CREATE TABLE IF NOT EXISTS results ({columns})")
+                db.execute("CREATE INDEX IF NOT EXISTS results_run ON results (run_id)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path / "results.sqlite")
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def append(self, results: Sequence[EvalResult], run_id: Optional[str] = None) -> str:
+        """
+        Append one run's results.
+
+        Args:
+            results: Rows to store
+            run_id: Run the rows belong to (a new id if None; rows that
+                already carry a run id keep it)
+
+        Returns:
+            str: The run id
+        """
+        run_id = run_id or new_run_id()
+        started = time.time()
+        rows = [
+            {**asdict(r), "run_id": r.run_id or run_id, "run_started": r.run_started or started}
+            for r in results
+        ]
+        if not rows:
+            return run_id
+        with self._lock:
+            if self.backend == "arrow":
+                self._append_arrow(rows, run_id)
+            else:
+                self._append_sqlite(rows)
+        return run_id
+
+    def _append_arrow(self, rows: List[Dict[str, Any]], run_id: str) -> None:
+        table = pa.table({name: [row[name] for row in rows] for name in COLUMN_TYPES})
+        table = table.replace_schema_metadata({"version": str(RESULTS_FORMAT_VERSION)})
+        # A run may append several times; every segment is a new file
+        segment = self.path / f"{run_id}-{uuid.uuid4().hex[:6]}.arrow"
+        tmp_path = segment.with_suffix(".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, segment)
+
+    def _append_sqlite(self, rows: List[Dict[str, Any]]) -> None:
+        names = list(COLUMN_TYPES)
+        with self._connect() as db:
+            db.executemany(
+                f"INSERT INTO results ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                [tuple(row[name] for name in names) for row in rows],
+            )
+
+    def columns(self, names: Optional[Sequence[str]] = None, run_ids: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Load columns as numpy arrays.
+
+        Args:
+            names: Columns to load (all if None)
+            run_ids: Only rows from these runs (all if None)
+
+        Returns:
+            dict: Column name to array, rows in append order
+        """
+        names = list(names or COLUMN_TYPES)
+        wanted = list(dict.fromkeys(names + (["run_id"] if run_ids is not None else [])))
+        if self.backend == "arrow":
+            data = self._read_arrow(wanted)
+        else:
+            data = self._read_sqlite(wanted)
+        if run_ids is not None:
+            keep = np.isin(data["run_id"].astype(str), list(run_ids))
+            data = {name: values[keep] for name, values in data.items()}
+        return {name: data[name] for name in names}
+
+    def _read_arrow(self, names: List[str]) -> Dict[str, np.ndarray]:
+        tables = []
+        for segment in sorted(self.path.glob("*.arrow")):
+            with pa.memory_map(str(segment)) as source:
+                tables.append(pa.ipc.open_file(source).read_all().select(names))
+        if not tables:
+            return {name: np.array([], dtype=COLUMN_TYPES[name][0]) for name in names}
+        table = pa.concat_tables(tables)
+        return {
+            name: np.asarray(table.column(name).to_numpy(zero_copy_only=False), dtype=COLUMN_TYPES[name][0])
+            for name in names
+        }
+
+    def _read_sqlite(self, names: List[str]) -> Dict[str, np.ndarray]:
+        with self._connect() as db:
+            rows = db.execute(f"SELECT {', '.join(names)} FROM results ORDER BY rowid").fetchall()
+        columns = list(zip(*rows)) if rows else [[] for _ in names]
+        data = {}
+        for name, values in zip(names, columns):
+            dtype = COLUMN_TYPES[name][0]
+            if dtype is np.float64:
+                values = [np.nan if v is None else v for v in values]
+            data[name] = np.array(values, dtype=dtype)
+        return data
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """
+        List stored runs, oldest first.
+
+        Returns:
+            List of ``run_id``, ``run_started`` and ``rows`` per run
+        """
+        data = self.columns(["run_id", "run_started"])
+        run_ids, first, counts = np.unique(data["run_id"].astype(str), return_index=True, return_counts=True)
+        started = data["run_started"][first]
+        order = np.argsort(started, kind="stable")
+        return [
+            {"run_id": str(run_ids[i]), "run_started": float(started[i]), "rows": int(counts[i])}
+            for i in order
+        ]
+
+    def trend(self, metric: str, question: Optional[str] = None, pcts: Sequence[float] = (10, 50)) -> List[Dict[str, Any]]:
+        """
+        Score of a metric per run, oldest run first.
+
+        Args:
+            metric: Metric name (e.g. ``Faithfulness``)
+            question: Only this question (all if None)
+            pcts: Score percentiles reported per run
+
+        Returns:
+            One dict per run with ``run_id``, ``run_started``, ``count``,
+            ``mean``, ``pass_rate`` and the requested percentiles
+        """
+        data = self.columns(["run_id", "run_started", "metric", "question", "score", "passed"])
+        keep = data["metric"] == metric
+        if question is not None:
+            keep &= data["question"] == question
+        data = {name: values[keep] for name, values in data.items()}
+        stats = _group_stats(data["run_id"], data["score"], pcts)
+        groups, inverse = np.unique(data["run_id"].astype(str), return_inverse=True)
+        passed = np.bincount(inverse, weights=data["passed"].astype(np.float64), minlength=len(groups))
+        totals = np.bincount(inverse, minlength=len(groups))
+        started = np.zeros(len(groups))
+        started[inverse] = data["run_started"]
+        pass_rate = dict(zip(groups, passed / np.maximum(totals, 1)))
+        started_at = dict(zip(groups, started))
+        rows = [
+            {
+                "run_id": str(run_id),
+                "run_started": float(started_at[run_id]),
+                "count": int(stats["count"][i]),
+                "mean": float(stats["mean"][i]),
+                "pass_rate": float(pass_rate[run_id]),
+                **{f"p{p:g}": float(stats[f"p{p:g}"][i]) for p in pcts},
+            }
+            for i, run_id in enumerate(stats["keys"])
+        ]
+        return sorted(rows, key=lambda row: row["run_started"])
+
+    def regressions(
+        self,
+        metric: str,
+        baseline: Optional[str] = None,
+        current: Optional[str] = None,
+        min_drop: float = 0.1,
+    ) -> List[Dict[str, Any]]:
+        """
+        Questions whose mean score dropped between two runs.
+
+        Args:
+            metric: Metric name
+            baseline: Baseline run (the second most recent if None)
+            current: Run compared against the baseline (the most recent if None)
+            min_drop: Smallest score drop reported
+
+        Returns:
+            One dict per regressed question with ``question``,
+            ``baseline``, ``current`` and ``delta``, largest drop first
+
+        Raises:
+            ValueError: If fewer than two runs are stored and none are given
+        """
+        if baseline is None or current is None:
+            run_ids = [run["run_id"] for run in self.runs()]
+            if len(run_ids) < 2:
+                raise ValueError("Need two runs to compare")
+            baseline = baseline or run_ids[-2]
+            current = current or run_ids[-1]
+        data = self.columns(["run_id", "metric", "question", "score"], run_ids=[baseline, current])
+        keep = data["metric"] == metric
+        data = {name: values[keep] for name, values in data.items()}
+        means = {}
+        for run_id in (baseline, current):
+            in_run = data["run_id"] == run_id
+            stats = _group_stats(data["question"][in_run], data["score"][in_run], ())
+            means[run_id] = dict(zip(stats["keys"], stats["mean"]))
+        common = sorted(set(means[baseline]) & set(means[current]))
+        before = np.array([means[baseline][q] for q in common])
+        after = np.array([means[current][q] for q in common])
+        delta = after - before
+        order = np.argsort(delta, kind="stable")
+        return [
+            {"question": common[i], "baseline": float(before[i]), "current": float(after[i]), "delta": float(delta[i])}
+            for i in order
+            if delta[i] <= -min_drop
+        ]
+
+    def percentiles(
+        self,
+        column: str = "score",
+        by: str = "metric",
+        run_id: Optional[str] = None,
+        pcts: Sequence[float] = (50, 90, 95, 99),
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Percentile summary of a numeric column per group.
+
+        Args:
+            column: ``score``, ``latency_ms``, ``cost`` or a token column
+            by: Column to group by (e.g. ``metric`` or ``question``)
+            run_id: Only this run (all runs if None)
+            pcts: Percentiles to report
+
+        Returns:
+            dict: Group to ``count``, ``mean`` and percentiles
+
+        Raises:
+            ValueError: If ``column`` is not numeric
+        """
+        if COLUMN_TYPES.get(column, (object,))[0] not in (np.float64, np.int64):
+            raise ValueError(f"{column} is not a numeric column")
+        data = self.columns([by, column], run_ids=[run_id] if run_id else None)
+        stats = _group_stats(data[by], data[column].astype(np.float64), pcts)
+        keys = ["count", "mean"] + [f"p{p:g}" for p in pcts]
+        return {
+            str(group): {key: float(stats[key][i]) for key in keys}
+            for i, group in enumerate(stats["keys"])
+        }
+
+
+class ResultRecorder:
+    """Collects results during a run and appends them to a store at the end."""
+
+    def __init__(self, store: Optional[ResultStore] = None, run_id: Optional[str] = None):
+        """
+        Initialize the recorder.
+
+        Args:
+            store: Store to append to (results are only kept in memory if None)
+            run_id: Id of this run (a new id if None)
+        """
+        self.store = store
+        self.run_id = run_id or new_run_id()
+        self.run_started = time.time()
+        self._results: List[EvalResult] = []
+        self._lock = threading.Lock()
+
+    def add(self, result: EvalResult) -> None:
+        result.run_id, result.run_started = self.run_id, self.run_started
+        with self._lock:
+            self._results.append(result)
+
+    @property
+    def results(self) -> List[EvalResult]:
+        with self._lock:
+            return list(self._results)
+
+    def flush(self) -> int:
+        """
+        Append the collected results to the store.
+
+        Returns:
+            int: Number of rows written
+        """
+        with self._lock:
+            results, self._results = self._results, []
+        if self.store is not None and results:
+            self.store.append(results, run_id=self.run_id)
+        return len(results)
+
+
+class CaseResults:
+    """
+    Metrics of one test case, recorded when the case ends.
+
+    Register metrics with ``add`` before asserting on them, so failing cases
+    are recorded too. Token usage and cost come from the cost ledger: each
+    metric gets the judge usage attributed to its own ``metric:<Name>`` stage
+    plus an even share of the rest of the case's usage (retrieval, synthesis
+    and judge calls made by ``assert_test``), so rows add up to the case total.
+    """
+
+    def __init__(self, recorder: ResultRecorder, case_id: str, ledger: Any = None):
+        """
+        Initialize the case.
+
+        Args:
+            recorder: Recorder of the run
+            case_id: Test case id (pytest node id)
+            ledger: ``CostLedger`` to read usage from (no usage if None)
+        """
+        self.recorder = recorder
+        self.case_id = case_id
+        self.ledger = ledger
+        self.latency_ms = float("nan")
+        self._metrics: List[Tuple[Any, Any]] = []
+
+    @contextmanager
+    def timer(self) -> Iterator[None]:
+        """Add the block's wall time to the case latency (e.g. around ``rag_app.query``)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.latency_ms = elapsed if np.isnan(self.latency_ms) else self.latency_ms + elapsed
+
+    def add(self, test_case: Any, *metrics: Any) -> None:
+        """
+        Register metrics that score a test case.
+
+        Args:
+            test_case: The ``LLMTestCase``
+            *metrics: DeepEval metrics (measured now or later in the test)
+        """
+        self._metrics.extend((test_case, metric) for metric in metrics)
+
+    def _usage(self) -> List[Dict[str, Any]]:
+        names = [metric_name(metric) for _, metric in self._metrics]
+        if self.ledger is None or not names:
+            return [{} for _ in names]
+        own = {name: self.ledger.usage(case_id=self.case_id, stage=f"metric:{name}") for name in set(names)}
+        total = self.ledger.usage(case_id=self.case_id)
+        shares = []
+        for name in names:
+            share = {}
+            for key in ("prompt_tokens", "completion_tokens", "cost"):
+                rest = total[key] - sum(usage[key] for usage in own.values())
+                share[key] = own[name][key] / names.count(name) + rest / len(names)
+            share["prompt_tokens"] = round(share["prompt_tokens"])
+            share["completion_tokens"] = round(share["completion_tokens"])
+            shares.append(share)
+        return shares
+
+    def finish(self) -> List[EvalResult]:
+        """
+        Record the registered metrics in the run.
+
+        Returns:
+            The recorded rows
+        """
+        results = [
+            result_from_metric(self.case_id, test_case, metric, latency_ms=self.latency_ms, **usage)
+            for (test_case, metric), usage in zip(self._metrics, self._usage())
+        ]
+        for result in results:
+            self.recorder.add(result)
+        self._metrics = []
+        return results
+
+
+def assert_measured(test_case: Any, metrics: Sequence[Any]) -> None:
+    """
+    Like DeepEval's ``assert_test``, but scoring the metrics passed in.
+
+    DeepEval's ``assert_test`` measures copies, so metrics registered with
+    ``CaseResults.add`` would stay unscored. Each metric is measured in place,
+    with its judge calls attributed to its ``metric:<Name>`` stage.
+
+    Args:
+        test_case: ``LLMTestCase`` to score
+        metrics: DeepEval metrics
+
+    Raises:
+        AssertionError: If any metric fails, listing each failure
+    """
+    failures = []
+    for metric in metrics:
+        measure_metric(metric, test_case)
+        if not metric.is_successful():
+            failures.append(
+                f"{metric_name(metric)} (score: {metric.score}, threshold: {metric.threshold}, "
+                f"reason: {getattr(metric, 'reason', None)})"
+            )
+    assert not failures, f"Metrics: {', '.join(failures)} failed."
+
+
+def _format_rows(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return "(no results)"
+    headers = list(rows[0])
+    lines = ["  ".join(f"{h:>12}" for h in headers)]
+    for row in rows:
+        cells = [f"{v:>12.3f}" if isinstance(v, float) else f"{str(v)[-40:]:>12}" for v in row.values()]
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Query stored evaluation results")
+    parser.add_argument("path", help="Result store directory (EVAL_RESULTS_DIR)")
+    parser.add_argument("--backend", choices=["arrow", "sqlite"])
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="List stored runs")
+    trend = commands.add_parser("trend", help="Metric score per run")
+    trend.add_argument("--metric", required=True)
+    trend.add_argument("--question")
+    regressions = commands.add_parser("regressions", help="Questions whose score dropped")
+    regressions.add_argument("--metric", required=True)
+    regressions.add_argument("--baseline")
+    regressions.add_argument("--current")
+    regressions.add_argument("--min-drop", type=float, default=0.1)
+    percentiles = commands.add_parser("percentiles", help="Percentiles of a column per group")
+    percentiles.add_argument("--column", default="score")
+    percentiles.add_argument("--by", default="metric")
+    percentiles.add_argument("--run")
+    args = parser.parse_args(argv)
+
+    store = ResultStore(args.path, backend=args.backend)
+    if args.command == "runs":
+        output: Any = store.runs()
+    elif args.command == "trend":
+        output = store.trend(args.metric, question=args.question)
+    elif args.command == "regressions":
+        output = store.regressions(args.metric, args.baseline, args.current, min_drop=args.min_drop)
+    else:
+        output = store.percentiles(args.column, by=args.by, run_id=args.run)
+    if args.json:
+        print(json.dumps(output, indent=2))
+    elif isinstance(output, dict):
+        print(_format_rows([{args.by: group, **stats} for group, stats in output.items()]))
+    else:
+        print(_format_rows(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Resampling of borderline metric scores with confidence intervals.
+
+LLM judges are noisy: a faithfulness score of 0.62 against a 0.6 threshold
+passes one run and fails the next, so failing suites get rerun as a whole.
+``MetricSampler`` measures each metric once and only resamples scores that
+land within a band around their threshold. The extra samples run
+concurrently, and pass/fail is decided from a Student-t confidence interval
+of the mean score:
+
+- pass when the whole interval is on the passing side of the threshold
+- fail when the whole interval is on the failing side
+- otherwise take another round of samples, up to ``max_samples``, then
+  decide on the mean
+
+Scores far from the threshold cost one judge call as before.
+"""
+
+import contextvars
+import copy
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.cost import attribute
+from src.results import metric_name
+
+
+# Metrics where a lower score is better (success means score <= threshold)
+LOWER_IS_BETTER = frozenset({"Hallucination", "Bias", "Toxicity"})
+
+
+def t_critical(confidence: float, df: int) -> float:
+    """
+    Two-sided critical value of Student's t distribution.
+
+    Exact for 1 and 2 degrees of freedom and a Cornish-Fisher expansion
+    around the normal quantile otherwise (within 0.005 of the exact value
+    for df >= 3 at 95% confidence).
+
+    Args:
+        confidence: Confidence level, e.g. 0.95
+        df: Degrees of freedom
+
+    Returns:
+        float: ``t`` such that ``P(|T| <= t) = confidence``
+
+    Raises:
+        ValueError: If ``confidence`` is not in (0, 1) or ``df`` < 1
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    if df < 1:
+        raise ValueError("df must be at least 1")
+    if df == 1:
+        return math.tan(math.pi * confidence / 2)
+    if df == 2:
+        return confidence * math.sqrt(2 / (1 - confidence ** 2))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return (
+        z
+        + (z ** 3 + z) / (4 * df)
+        + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+        + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+        + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4)
+    )
+
+
+def confidence_interval(scores: Sequence[float], confidence: float = 0.95) -> Tuple[float, float, float]:
+    """
+    Mean of scores with a Student-t confidence interval, clipped to [0, 1].
+
+    Args:
+        scores: Metric scores
+        confidence: Confidence level
+
+    Returns:
+        tuple: ``(mean, low, high)``; a single score is its own interval
+    """
+    values = np.asarray(scores, dtype=np.float64)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, mean, mean
+    half = t_critical(confidence, len(values) - 1) * float(values.std(ddof=1)) / math.sqrt(len(values))
+    return mean, max(0.0, mean - half), min(1.0, mean + half)
+
+
+@dataclass(frozen=True)
+class SamplingPolicy:
+    """When and how much to resample a metric."""
+
+    samples: int = 5
+    max_samples: int = 10
+    band: float = 0.1
+    confidence: float = 0.95
+    max_workers: int = 4
+    bands: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.samples < 1 or self.max_samples < self.samples:
+            raise ValueError("need 1 <= samples <= max_samples")
+        if self.band < 0 or any(band < 0 for band in self.bands.values()):
+            raise ValueError("band must be non-negative")
+        if not 0 < self.confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        if self.max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+    @classmethod
+    def from_env(cls) -> Optional["SamplingPolicy"]:
+        """
+        Policy from ``EVAL_RESAMPLE`` (samples per round),
+        ``EVAL_RESAMPLE_MAX``, ``EVAL_RESAMPLE_BAND``, ``EVAL_CONFIDENCE`` and
+        ``EVAL_RESAMPLE_WORKERS``.
+
+        Returns:
+            SamplingPolicy or None if ``EVAL_RESAMPLE`` is unset
+        """
+        samples = os.getenv("EVAL_RESAMPLE")
+        if not samples:
+            return None
+        samples = int(samples)
+        return cls(
+            samples=samples,
+            max_samples=int(os.getenv("EVAL_RESAMPLE_MAX", 2 * samples)),
+            band=float(os.getenv("EVAL_RESAMPLE_BAND", cls.band)),
+            confidence=float(os.getenv("EVAL_CONFIDENCE", cls.confidence)),
+            max_workers=int(os.getenv("EVAL_RESAMPLE_WORKERS", cls.max_workers)),
+        )
+
+    def band_for(self, metric: str) -> float:
+        return self.bands.get(metric, self.band)
+
+
+@dataclass
+class SampledScore:
+    """Outcome of one metric, from one or more samples."""
+
+    metric: str
+    threshold: float
+    scores: List[float]
+    mean: float
+    low: float
+    high: float
+    verdict: str
+    passed: bool
+
+    @property
+    def resampled(self) -> bool:
+        return len(self.scores) > 1
+
+    def describe(self) -> str:
+        if not self.resampled:
+            return f"{self.metric} (score: {self.mean:.3f}, threshold: {self.threshold})"
+        return (
+            f"{self.metric} (mean: {self.mean:.3f} of {len(self.scores)} samples, "
+            f"CI: [{self.low:.3f}, {self.high:.3f}], threshold: {self.threshold}, {self.verdict})"
+        )
+
+
+def decide(metric: str, threshold: float, scores: Sequence[float], confidence: float = 0.95) -> SampledScore:
+    """
+    Decide pass/fail from samples of a metric.
+
+    Args:
+        metric: Metric name (``Hallucination`` etc. pass at or below the threshold)
+        threshold: Metric threshold
+        scores: Samples of the score
+        confidence: Confidence level of the interval
+
+    Returns:
+        SampledScore: ``verdict`` is ``pass`` or ``fail`` when the interval
+        is on one side of the threshold and ``inconclusive`` otherwise, in
+        which case ``passed`` follows the mean
+    """
+    mean, low, high = confidence_interval(scores, confidence)
+    if metric in LOWER_IS_BETTER:
+        passes, verdict = mean <= threshold, "pass" if high <= threshold else "fail" if low > threshold else None
+    else:
+        passes, verdict = mean >= threshold, "pass" if low >= threshold else "fail" if high < threshold else None
+    return SampledScore(
+        metric=metric,
+        threshold=threshold,
+        scores=list(scores),
+        mean=mean,
+        low=low,
+        high=high,
+        verdict=verdict or "inconclusive",
+        passed=verdict == "pass" if verdict else passes,
+    )
+
+
+class MetricSampler:
+    """Measure DeepEval metrics, resampling scores near their thresholds."""
+
+    def __init__(self, policy: Optional[SamplingPolicy] = None):
+        """
+        Initialize the sampler.
+
+        Args:
+            policy: Resampling policy (``SamplingPolicy()`` if None)
+        """
+        self.policy = policy or SamplingPolicy()
+
+    def is_borderline(self, metric: Any) -> bool:
+        """
+        Whether a measured metric's score is within its band of the threshold.
+
+        Args:
+            metric: Measured DeepEval metric
+
+        Returns:
+            bool: True if the score should be resampled
+        """
+        if metric.score is None or self.policy.samples < 2:
+            return False
+        return abs(metric.score - metric.threshold) <= self.policy.band_for(metric_name(metric))
+
+    def _measure_all(self, pool: ThreadPoolExecutor, jobs: List[Tuple[Any, Any]]) -> List[float]:
+        def _measure(metric: Any, test_case: Any) -> float:
+            with attribute(stage=f"metric:{metric_name(metric)}"):
+                metric.measure(test_case)
+            return metric.score
+
+        futures = [
+            pool.submit(contextvars.copy_context().run, _measure, metric, test_case)
+            for metric, test_case in jobs
+        ]
+        return [future.result() for future in futures]
+
+    def measure(self, test_case: Any, metrics: Sequence[Any]) -> List[SampledScore]:
+        """
+        Measure metrics concurrently and resample the borderline ones.
+
+        Resamples run on copies of the metric; the original metric is then
+        updated with the mean score, the decision and the interval (in its
+        reason), so it reads like a single measurement afterwards.
+
+        Args:
+            test_case: ``LLMTestCase`` to score
+            metrics: DeepEval metrics
+
+        Returns:
+            One ``SampledScore`` per metric, in order
+        """
+        policy = self.policy
+        metrics = list(metrics)
+        names = [metric_name(metric) for metric in metrics]
+        with ThreadPoolExecutor(max_workers=policy.max_workers, thread_name_prefix="metric") as pool:
+            first = self._measure_all(pool, [(metric, test_case) for metric in metrics])
+            samples = [[score] if score is not None else [] for score in first]
+            taken = [1] * len(metrics)
+            pending = [i for i, metric in enumerate(metrics) if self.is_borderline(metric)]
+            while pending:
+                jobs, owners = [], []
+                for i in pending:
+                    # The first round tops up to ``samples``, later rounds add ``samples`` more
+                    target = policy.samples if taken[i] == 1 else taken[i] + policy.samples
+                    extra = min(target, policy.max_samples) - taken[i]
+                    jobs.extend((copy.copy(metrics[i]), test_case) for _ in range(extra))
+                    owners.extend([i] * extra)
+                    taken[i] += extra
+                for i, score in zip(owners, self._measure_all(pool, jobs)):
+                    if score is not None:
+                        samples[i].append(score)
+                pending = [
+                    i for i in pending
+                    if taken[i] < policy.max_samples
+                    and decide(names[i], metrics[i].threshold, samples[i], policy.confidence).verdict == "inconclusive"
+                ]
+
+        outcomes = []
+        for metric, name, scores in zip(metrics, names, samples):
+            if not scores:
+                outcomes.append(SampledScore(
+                    metric=name, threshold=metric.threshold, scores=[], mean=math.nan,
+                    low=math.nan, high=math.nan, verdict="fail", passed=False
+                ))
+                continue
+            outcome = decide(name, metric.threshold, scores, policy.confidence)
+            if outcome.resampled:
+                metric.score = outcome.mean
+                metric.success = outcome.passed
+                metric.reason = f"{metric.reason or ''} [{outcome.describe()}]".strip()
+            outcomes.append(outcome)
+        return outcomes
+
+    def assert_test(self, test_case: Any, metrics: Sequence[Any]) -> List[SampledScore]:
+        """
+        Like DeepEval's ``assert_test``, deciding borderline scores by resampling.
+
+        Args:
+            test_case: ``LLMTestCase`` to score
+            metrics: DeepEval metrics
+
+        Returns:
+            One ``SampledScore`` per metric
+
+        Raises:
+            AssertionError: If any metric fails
+        """
+        outcomes = self.measure(test_case, metrics)
+        failed = [outcome.describe() for outcome in outcomes if not outcome.passed]
+        if failed:
+            raise AssertionError(f"Metrics: {', '.join(failed)} failed.")
+        return outcomes
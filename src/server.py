@@ -0,0 +1,436 @@
+"""
+Lightweight async HTTP server for RAGApplication.
+
+The backend (index, clients) is built once at startup and shared by all
+requests. Concurrent requests' retrievals are micro-batched: requests that
+arrive within ``max_wait_ms`` of each other share one
+``get_retrieval_contexts`` call, which embeds all of their questions in a
+single embedding request. Synthesis then runs per request on a thread pool.
+
+Endpoints:
+    POST /query               {"question": ...} -> {"answer": ...}
+    POST /query_with_context  {"question": ...} -> {"answer": ..., "retrieval_context": [...]}
+    POST /stream              {"question": ...} -> chunked text/plain answer
+    GET  /health              -> {"status": "ok", ...}
+    GET  /metrics             -> Prometheus text format
+
+Usage:
+    python -m src.server --document /path/to/doc.pdf --port 8000
+    python -m src.server --stand-in --latency-ms 200
+    python -m src.server --document /path/to/doc.pdf --frontend
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.frontend import EmptyQueryError, QueryFrontend, QueryNormalizer
+
+
+# Upper bounds (seconds) of the request latency histogram
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+MAX_BODY_BYTES = 1 << 20
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """Error returned to the client with an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class StreamAborted(ConnectionError):
+    """A streamed response failed after its headers were sent; the connection is dropped."""
+
+
+class ServerMetrics:
+    """Request counters, latency histogram and batch sizes."""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.batches = 0
+        self.batched_requests = 0
+        self.in_flight = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, path: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.requests[(path, status)] = self.requests.get((path, status), 0) + 1
+            index = next((i for i, b in enumerate(LATENCY_BUCKETS) if seconds <= b), len(LATENCY_BUCKETS))
+            self.latency_counts[index] += 1
+            self.latency_sum += seconds
+
+    def observe_batch(self, size: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def render(self) -> str:
+        """
+        Render the metrics in Prometheus text exposition format.
+
+        Returns:
+            str: Metrics text
+        """
+        with self._lock:
+            lines = ["# TYPE rag_requests_total counter"]
+            for (path, status), count in sorted(self.requests.items()):
+                lines.append(f'rag_requests_total{{path="{path}",status="{status}"}} {count}')
+            lines.append("# TYPE rag_request_duration_seconds histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ["+Inf"], self.latency_counts):
+                cumulative += count
+                lines.append(f'rag_request_duration_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"rag_request_duration_seconds_sum {self.latency_sum:.6f}")
+            lines.append(f"rag_request_duration_seconds_count {cumulative}")
+            lines.append("# TYPE rag_retrieval_batches_total counter")
+            lines.append(f"rag_retrieval_batches_total {self.batches}")
+            lines.append("# TYPE rag_retrieval_batched_requests_total counter")
+            lines.append(f"rag_retrieval_batched_requests_total {self.batched_requests}")
+            lines.append("# TYPE rag_requests_in_flight gauge")
+            lines.append(f"rag_requests_in_flight {self.in_flight}")
+            return "\n".join(lines) + "\n"
+
+
+class MicroBatcher:
+    """Coalesce concurrent retrievals into batched backend calls."""
+
+    def __init__(
+        self,
+        backend: Any,
+        executor: ThreadPoolExecutor,
+        metrics: ServerMetrics,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            backend: Object with ``get_retrieval_contexts(questions)``
+            executor: Thread pool the blocking backend call runs on
+            metrics: Metrics to record batch sizes in
+            max_batch_size: Flush as soon as this many requests are waiting
+            max_wait_ms: Flush at most this long after the first request
+        """
+        self.backend = backend
+        self.executor = executor
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def retrieve(self, question: str) -> List[str]:
+        """
+        Get the retrieval context for a question, batched with its neighbours.
+
+        Args:
+            question: The user question
+
+        Returns:
+            List of chunk texts
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((question, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.metrics.observe_batch(len(batch))
+        questions = [question for question, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            contexts = await loop.run_in_executor(self.executor, self.backend.get_retrieval_contexts, questions)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), context in zip(batch, contexts):
+            if not future.done():
+                future.set_result(context)
+
+
+def _parse_question(body: bytes) -> str:
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Body must be JSON")
+    question = payload.get("question") if isinstance(payload, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise HTTPError(400, "Field 'question' must be a non-empty string")
+    return question
+
+
+class RAGServer:
+    """Asyncio HTTP/1.1 server in front of one shared RAG backend."""
+
+    def __init__(
+        self,
+        backend: Any,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        workers: int = 16,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            backend: ``RAGApplication`` or ``StandInRAGApplication``
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            max_batch_size: Largest retrieval micro-batch
+            max_wait_ms: Longest a request waits for its batch to fill
+            workers: Threads for blocking backend calls
+        """
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.metrics = ServerMetrics()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag")
+        self.batcher = MicroBatcher(backend, self.executor, self.metrics, max_batch_size, max_wait_ms)
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """Bind the socket and start accepting connections."""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Start (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def run_in_thread(self) -> Tuple[str, int]:
+        """
+        Serve on a background thread (for tests and notebooks).
+
+        Returns:
+            (host, port) the server is listening on
+        """
+        ready = threading.Event()
+
+        def _run() -> None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=_run, name="rag-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.host, self.port
+
+    def stop(self) -> None:
+        """Stop accepting connections and shut down the worker threads."""
+        if self._server is not None and self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._server.close)
+            if self._thread is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._dispatch(writer, method, path, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) < 2:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ConnectionError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return parts[0].upper(), parts[1].split("?")[0], headers, body
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, method: str, path: str,
+                        body: bytes, keep_alive: bool) -> None:
+        started = time.perf_counter()
+        self.metrics.in_flight += 1
+        status = 200
+        try:
+            if path == "/health":
+                await self._send_json(writer, 200, {"status": "ok", "uptime_s": time.time() - self.metrics.started},
+                                      keep_alive)
+            elif path == "/metrics":
+                await self._send(writer, 200, self.metrics.render().encode(), "text/plain; version=0.0.4",
+                                 keep_alive)
+            elif path in ("/query", "/query_with_context", "/stream"):
+                if method != "POST":
+                    raise HTTPError(405, "Use POST")
+                question = _parse_question(body)
+                context = await self.batcher.retrieve(question)
+                if path == "/stream":
+                    await self._stream(writer, question, keep_alive)
+                else:
+                    answer = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self.backend.query, question
+                    )
+                    payload: Dict[str, Any] = {"answer": answer}
+                    if path == "/query_with_context":
+                        payload["retrieval_context"] = context
+                    await self._send_json(writer, 200, payload, keep_alive)
+            else:
+                raise HTTPError(404, f"No route for {path}")
+        except StreamAborted:
+            # Too late for an error response: the client sees a truncated stream
+            status = 500
+            raise
+        except HTTPError as e:
+            status = e.status
+            await self._send_json(writer, e.status, {"error": str(e)}, keep_alive)
+        except EmptyQueryError as e:
+            status = 400
+            await self._send_json(writer, 400, {"error": str(e)}, keep_alive)
+        except Exception as e:
+            status = 500
+            await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe(path, status, time.perf_counter() - started)
+
+    async def _stream(self, writer: asyncio.StreamWriter, question: str, keep_alive: bool) -> None:
+        loop = asyncio.get_running_loop()
+        # Every step of the generator runs in one context, whichever pool
+        # thread it lands on, so context managers held across its yields
+        # (e.g. cost attribution) enter and exit in the same context
+        context = contextvars.copy_context()
+        chunks: Iterator[str] = context.run(iter, self.backend.stream_query(question))
+        done = object()
+        first = await loop.run_in_executor(self.executor, context.run, next, chunks, done)
+        writer.write(self._head(200, "text/plain; charset=utf-8", keep_alive, chunked=True))
+        chunk = first
+        try:
+            while chunk is not done:
+                data = chunk.encode("utf-8")
+                if data:
+                    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    await writer.drain()
+                chunk = await loop.run_in_executor(self.executor, context.run, next, chunks, done)
+        except Exception as e:
+            writer.transport.abort()
+            raise StreamAborted(f"{type(e).__name__}: {e}") from e
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _head(self, status: int, content_type: str, keep_alive: bool,
+              length: Optional[int] = None, chunked: bool = False) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}"]
+        lines.append("Transfer-Encoding: chunked" if chunked else f"Content-Length: {length or 0}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, data: bytes,
+                    content_type: str, keep_alive: bool) -> None:
+        writer.write(self._head(status, content_type, keep_alive, length=len(data)) + data)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        await self._send(writer, status, json.dumps(payload).encode(), "application/json", keep_alive)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Serve RAGApplication over HTTP")
+    parser.add_argument("--document", help="Document to index (default TEST_DOCUMENT_PATH)")
+    parser.add_argument("--stand-in", action="store_true", help="Serve the offline stand-in backend")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Stand-in synthesis latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--frontend", action="store_true",
+                        help="Normalize queries and coalesce identical in-flight requests")
+    parser.add_argument("--max-query-tokens", type=int, default=256, help="Query token cap with --frontend")
+    args = parser.parse_args(argv)
+
+    if args.stand_in:
+        from src.stand_in import LatencyModel, StandInRAGApplication
+
+        backend = StandInRAGApplication(synthesis_latency=LatencyModel(mean_ms=args.latency_ms))
+    else:
+        from src.config import load_env
+        from src.rag_app import RAGApplication
+
+        load_env()
+        document = args.document or os.getenv("TEST_DOCUMENT_PATH")
+        if not document:
+            raise SystemExit("--document (or TEST_DOCUMENT_PATH) is required unless --stand-in is set")
+        backend = RAGApplication(document_path=document)
+
+    if args.frontend:
+        backend = QueryFrontend(backend, QueryNormalizer(max_tokens=args.max_query_tokens))
+    server = RAGServer(backend, args.host, args.port, args.max_batch_size, args.max_wait_ms, args.workers)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
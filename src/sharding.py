@@ -0,0 +1,425 @@
+"""
+Document-level sharding of per-paper tools across worker processes.
+
+``create_multi_document_agent`` keeps every paper's index in one process, so
+a large corpus is limited to one core and one heap. ``ShardCoordinator``
+partitions the documents across local worker processes:
+
+- each worker builds and owns the tools (and indexes) of its documents
+- the coordinator exposes a proxy tool per remote tool, so agents, the
+  tool index and the fan-out tool use them like local tools
+- tool calls travel over a ``multiprocessing`` pipe per worker, and
+  ``scatter`` sends a query to every document at once and gathers the
+  answers
+
+Workers answer calls on a small thread pool, so calls to documents on the
+same shard do not queue behind each other while waiting on the LLM. The
+LLM and embedding usage of each call is sent back with its answer and
+recorded in the coordinator's ``CostLedger`` under the caller's attribution.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import create_model
+from llama_index.core.tools import FunctionTool, ToolOutput
+
+from src.agent_tools import get_tool_name
+from src.cost import CostLedger, attribute, current_case_id, current_stage, install_ledger
+
+
+DEFAULT_WORKER_THREADS = 4
+DEFAULT_TIMEOUT = 300.0
+
+# JSON schema types of tool parameters, for the proxy tools' schemas
+_SCHEMA_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "array": List[str]}
+
+
+def build_document_tools(path: str) -> List[Any]:
+    """
+    Default worker tool builder: ``build_doc_tools`` for one document.
+
+    Chunking and the chunk cache come from the environment
+    (``CHUNKING_STRATEGY``, ``CHUNK_CACHE_DIR``), which workers inherit.
+
+    Args:
+        path: Document path; the tool name suffix is the file stem
+
+    Returns:
+        List[Any]: The document's vector and summary tools
+    """
+    from src.chunking import ChunkStore, chunker_from_config
+    from src.config import get_chunk_cache_dir
+    from src.doc_tools import build_doc_tools
+
+    vector_tool, summary_tool = build_doc_tools(
+        path,
+        Path(path).stem,
+        chunker_from_config(),
+        ChunkStore(get_chunk_cache_dir()),
+        batch_size=int(os.getenv("INGEST_BATCH_SIZE", "64")),
+    )
+    return [vector_tool, summary_tool]
+
+
+def partition_documents(paths: Sequence[str], n_shards: int) -> List[List[str]]:
+    """
+    Split documents into shards of similar total size.
+
+    Largest documents are placed first, each on the currently smallest
+    shard, so the result is deterministic for the same files.
+
+    Args:
+        paths: Document paths
+        n_shards: Number of shards
+
+    Returns:
+        List[List[str]]: Documents per shard (empty shards dropped)
+
+    Raises:
+        ValueError: If ``n_shards`` is less than 1
+    """
+    if n_shards < 1:
+        raise ValueError("n_shards must be at least 1")
+    shards: List[List[str]] = [[] for _ in range(n_shards)]
+    loads = [0] * n_shards
+    sizes = {path: os.path.getsize(path) if os.path.exists(path) else 0 for path in paths}
+    for path in sorted(paths, key=lambda p: (-sizes[p], p)):
+        smallest = loads.index(min(loads))
+        shards[smallest].append(path)
+        loads[smallest] += sizes[path]
+    return [shard for shard in shards if shard]
+
+
+def _tool_spec(tool: Any) -> Dict[str, Any]:
+    """Picklable description of a tool, for its proxy in the coordinator."""
+    return {
+        "name": get_tool_name(tool),
+        "description": tool.metadata.description,
+        "parameters": tool.metadata.get_parameters_dict(),
+    }
+
+
+def _serve_shard(conn: Any, paths: List[str], builder: Callable[[str], List[Any]], threads: int) -> None:
+    """
+    Worker process: build the shard's tools and answer calls until told to stop.
+
+    Messages received are ``(request_id, tool_name, kwargs)`` or None to stop;
+    each is answered with ``(request_id, is_error, content, usage)``, where
+    ``usage`` lists ``(model, prompt_tokens, completion_tokens, stage)`` of
+    the LLM and embedding calls the tool made.
+    """
+    try:
+        tools = {get_tool_name(tool): tool for path in paths for tool in builder(path)}
+    except Exception:
+        conn.send(("failed", traceback.format_exc()))
+        conn.close()
+        return
+    conn.send(("ready", [_tool_spec(tool) for tool in tools.values()]))
+
+    # Calls are attributed to their request id, so each reply carries only its own usage
+    ledger = CostLedger()
+    install_ledger(ledger)
+    send_lock = threading.Lock()
+
+    def _answer(request_id: int, tool_name: str, kwargs: Dict[str, Any]) -> None:
+        key = f"shard-request-{request_id}"
+        try:
+            with attribute(case_id=key):
+                output = tools[tool_name].call(**kwargs)
+            is_error, content = bool(getattr(output, "is_error", False)), str(output.content)
+        except Exception as e:
+            is_error, content = True, f"{type(e).__name__}: {e}"
+        usage = [(r.model, r.prompt_tokens, r.completion_tokens, r.stage) for r in ledger.take(key)]
+        with send_lock:
+            conn.send((request_id, is_error, content, usage))
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            pool.submit(_answer, *request)
+    conn.close()
+
+
+class ShardError(RuntimeError):
+    """A shard failed to start, crashed or returned an error."""
+
+
+class ShardCoordinator:
+    """Scatter tool calls to document shards in worker processes and gather the results."""
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        n_shards: Optional[int] = None,
+        builder: Callable[[str], List[Any]] = build_document_tools,
+        worker_threads: int = DEFAULT_WORKER_THREADS,
+        start_method: str = "spawn",
+        timeout: float = DEFAULT_TIMEOUT,
+        ledger: Optional[CostLedger] = None,
+    ):
+        """
+        Args:
+            paths: Documents to shard
+            n_shards: Worker processes (one per CPU, at most one per document, if None)
+            builder: Picklable module-level function building a document's tools
+                in the worker
+            worker_threads: Concurrent calls per worker
+            start_method: ``multiprocessing`` start method; ``spawn`` avoids
+                forking a process that already holds HTTP client threads
+            timeout: Seconds to wait for a worker to start or answer
+            ledger: Ledger recording the workers' LLM and embedding usage,
+                attributed to the case and stage that made each call
+
+        Raises:
+            ValueError: If no documents are given
+        """
+        if not paths:
+            raise ValueError("at least one document is required")
+        n_shards = n_shards or min(len(paths), os.cpu_count() or 1)
+        self.shards = partition_documents(paths, n_shards)
+        self.builder = builder
+        self.worker_threads = worker_threads
+        self.timeout = timeout
+        self.ledger = ledger
+        self._context = multiprocessing.get_context(start_method)
+        self._processes: List[Any] = []
+        self._conns: List[Any] = []
+        self._send_locks: List[threading.Lock] = []
+        self._receivers: List[threading.Thread] = []
+        # request id -> (shard, future, caller's case id, caller's stage)
+        self._pending: Dict[int, Tuple[int, Future, Optional[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._tools: Optional[List[FunctionTool]] = None
+
+    def __enter__(self) -> "ShardCoordinator":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def start(self) -> "ShardCoordinator":
+        """
+        Start one worker per shard and wait until every shard has built its tools.
+
+        Returns:
+            ShardCoordinator: self, for chaining
+
+        Raises:
+            ShardError: If a worker fails to build its tools or does not start in time
+            ValueError: If two documents produce tools with the same name
+        """
+        for paths in self.shards:
+            parent, child = self._context.Pipe()
+            process = self._context.Process(
+                target=_serve_shard,
+                args=(child, paths, self.builder, self.worker_threads),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._conns.append(parent)
+            self._send_locks.append(threading.Lock())
+        try:
+            for shard, conn in enumerate(self._conns):
+                if not conn.poll(self.timeout):
+                    raise ShardError(f"shard {shard} did not start within {self.timeout:g}s")
+                status, payload = conn.recv()
+                if status != "ready":
+                    raise ShardError(f"shard {shard} failed to build its tools:\n{payload}")
+                for spec in payload:
+                    if spec["name"] in self._specs:
+                        raise ValueError(f"duplicate tool name across shards: {spec['name']}")
+                    self._specs[spec["name"]] = dict(spec, shard=shard)
+        except BaseException:
+            self.close()
+            raise
+        for shard, conn in enumerate(self._conns):
+            receiver = threading.Thread(target=self._receive, args=(shard, conn), daemon=True)
+            receiver.start()
+            self._receivers.append(receiver)
+        return self
+
+    def _receive(self, shard: int, conn: Any) -> None:
+        """Resolve the futures of one shard's answers until its pipe closes."""
+        while True:
+            try:
+                request_id, is_error, content, usage = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                _, future, case_id, stage = self._pending.pop(request_id, (None, None, None, None))
+            if self.ledger is not None:
+                for model, prompt_tokens, completion_tokens, remote_stage in usage:
+                    self.ledger.record(model, prompt_tokens, completion_tokens, case_id=case_id, stage=stage or remote_stage)
+            if future is not None:
+                if is_error:
+                    future.set_exception(ShardError(content))
+                else:
+                    future.set_result(content)
+        # The worker exited: fail whatever it still owed
+        with self._lock:
+            lost = [rid for rid, (owner, *_) in self._pending.items() if owner == shard]
+            futures = [self._pending.pop(rid)[1] for rid in lost]
+        for future in futures:
+            future.set_exception(ShardError(f"shard {shard} exited"))
+
+    @property
+    def tool_names(self) -> List[str]:
+        return list(self._specs)
+
+    def shard_of(self, tool_name: str) -> int:
+        """
+        Shard that owns a tool.
+
+        Raises:
+            KeyError: If no shard has the tool
+        """
+        return self._specs[tool_name]["shard"]
+
+    def submit(self, tool_name: str, kwargs: Dict[str, Any]) -> Future:
+        """
+        Send a tool call to the shard that owns the tool.
+
+        Args:
+            tool_name: Name of the remote tool
+            kwargs: Tool arguments (must be picklable)
+
+        Returns:
+            Future: Resolves to the tool output text, or raises ``ShardError``
+
+        Raises:
+            KeyError: If no shard has the tool
+        """
+        shard = self.shard_of(tool_name)
+        request_id = next(self._ids)
+        future: Future = Future()
+        with self._lock:
+            self._pending[request_id] = (shard, future, current_case_id(), current_stage())
+        try:
+            with self._send_locks[shard]:
+                self._conns[shard].send((request_id, tool_name, kwargs))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            future.set_exception(ShardError(f"shard {shard} is not reachable: {e}"))
+        return future
+
+    def call(self, tool_name: str, **kwargs: Any) -> str:
+        """
+        Call a remote tool and wait for its output.
+
+        Raises:
+            ShardError: If the tool failed, its shard exited or the call timed out
+        """
+        try:
+            return self.submit(tool_name, kwargs).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise ShardError(f"{tool_name} did not answer within {self.timeout:g}s")
+
+    def scatter(self, query: str, tool_names: Optional[Sequence[str]] = None) -> List[ToolOutput]:
+        """
+        Send one query to many tools across all shards and gather the outputs.
+
+        Calls run concurrently on every shard; a failing or late call is
+        returned as an error ``ToolOutput`` in its position.
+
+        Args:
+            query: Question for every tool
+            tool_names: Tools to query (all tools if None)
+
+        Returns:
+            List[ToolOutput]: One output per tool, in ``tool_names`` order
+        """
+        names = list(tool_names) if tool_names is not None else self.tool_names
+        calls = []
+        for name in names:
+            parameters = self._specs[name]["parameters"]
+            required = parameters.get("required") or list(parameters.get("properties", {}))
+            kwargs = {required[0] if required else "input": query}
+            calls.append((name, kwargs, self.submit(name, kwargs)))
+        wait([future for _, _, future in calls], timeout=self.timeout)
+        outputs = []
+        for name, kwargs, future in calls:
+            if not future.done():
+                error: Optional[Exception] = ShardError(f"{name} did not answer within {self.timeout:g}s")
+            else:
+                error = future.exception()
+            outputs.append(ToolOutput(
+                content=f"Error: {error}" if error else future.result(),
+                tool_name=name,
+                raw_input={"kwargs": kwargs},
+                raw_output=error or future.result(),
+                is_error=error is not None,
+            ))
+        return outputs
+
+    def _proxy(self, spec: Dict[str, Any]) -> FunctionTool:
+        name = spec["name"]
+        properties = spec["parameters"].get("properties", {})
+        required = set(spec["parameters"].get("required", []))
+        fields = {
+            field: (_SCHEMA_TYPES.get(schema.get("type"), Any), ... if field in required else None)
+            for field, schema in properties.items()
+        }
+        fn_schema = create_model(f"{name}_args", **fields)
+
+        def _call(**kwargs: Any) -> str:
+            return self.call(name, **kwargs)
+
+        async def _acall(**kwargs: Any) -> str:
+            future = asyncio.wrap_future(self.submit(name, kwargs))
+            return await asyncio.wait_for(future, self.timeout)
+
+        return FunctionTool.from_defaults(
+            fn=_call,
+            async_fn=_acall,
+            name=name,
+            description=spec["description"],
+            fn_schema=fn_schema,
+        )
+
+    def tools(self) -> List[FunctionTool]:
+        """
+        Local proxies of every remote tool, with the remote names, descriptions and schemas.
+
+        Returns:
+            List[FunctionTool]: Proxy tools (the same objects on every call)
+        """
+        if self._tools is None:
+            self._tools = [self._proxy(spec) for spec in self._specs.values()]
+        return self._tools
+
+    def close(self) -> None:
+        """Stop the workers and fail any calls still waiting."""
+        for conn, lock in zip(self._conns, self._send_locks):
+            try:
+                with lock:
+                    conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for conn in self._conns:
+            conn.close()
+        for receiver in self._receivers:
+            receiver.join(timeout=5)
+        self._processes, self._conns, self._send_locks, self._receivers = [], [], [], []
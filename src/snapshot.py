@@ -0,0 +1,399 @@
+"""
+Warm-start snapshots of fully built engines, tool sets and agents.
+
+Even with cached chunks and embeddings, building a router query engine,
+per-paper tools or a multi-document agent re-creates docstores, summary
+indexes and tool metadata every session. ``SnapshotStore`` pickles the
+built object graph once and restores it in milliseconds:
+
+- live objects are not pickled: LLMs and embedding models are stored as
+  their class and settings and rebuilt on the process's pooled clients,
+  HTTP/OpenAI clients are re-fetched from the ``ClientFactory`` and
+  callback managers are replaced by the current ``Settings`` one
+- closures (e.g. the ``vector_query`` function behind a document's vector
+  tool) are stored by their code and argument schemas created at runtime
+  by their fields, so tools built inside functions survive
+- every snapshot starts with a JSON header recording the Python version,
+  the installed versions of the libraries pinned in ``requirements.txt``,
+  the content hashes of the source documents and the build configuration;
+  a snapshot whose header does not match the current process is rebuilt
+  instead of restored
+"""
+
+import importlib
+import inspect
+import io
+import json
+import marshal
+import os
+import pickle
+import platform
+import re
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import httpx
+import openai
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.base import BaseLLM
+from llama_index.core.bridge.pydantic import BaseModel, create_model
+from llama_index.core.callbacks import CallbackManager
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.llms.openai import OpenAI
+
+from src.chunking import document_hash
+from src.clients import ClientFactory, LoopLocalAsyncClient, get_client_factory
+
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+REQUIREMENTS_PATH = Path(__file__).resolve().parent.parent / "requirements.txt"
+
+# Model settings that belong to the restoring process, not the snapshot
+_LIVE_FIELDS = {"api_key", "callback_manager", "timeout"}
+
+_LOCK_TYPES = (type(threading.Lock()), type(threading.RLock()))
+
+_EMPTY_CELL = "__empty_cell__"
+
+
+class SnapshotMismatch(ValueError):
+    """A snapshot was taken by a different environment or from different inputs."""
+
+
+def pinned_versions(requirements: Path = REQUIREMENTS_PATH) -> Dict[str, str]:
+    """
+    Versions pinned with ``==`` in a requirements file.
+
+    Args:
+        requirements: Requirements file
+
+    Returns:
+        Dict[str, str]: Package name to pinned version (empty if the file is missing)
+    """
+    if not requirements.exists():
+        return {}
+    pins = {}
+    for line in requirements.read_text().splitlines():
+        match = re.match(r"^\s*([A-Za-z0-9_.\-]+)\s*==\s*([^\s;#]+)", line)
+        if match:
+            pins[match.group(1).lower()] = match.group(2)
+    return pins
+
+
+def installed_versions(packages: Sequence[str]) -> Dict[str, Optional[str]]:
+    """
+    Installed versions of packages.
+
+    Args:
+        packages: Distribution names
+
+    Returns:
+        Dict[str, Optional[str]]: Package name to version (None if not installed)
+    """
+    versions: Dict[str, Optional[str]] = {}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _importable(fn: Any) -> bool:
+    """Whether pickle can store a function by reference."""
+    target: Any = sys.modules.get(fn.__module__)
+    for part in fn.__qualname__.split("."):
+        target = getattr(target, part, None)
+    return target is fn
+
+
+def _make_function(code: bytes, module: str, name: str, qualname: str, n_cells: int) -> types.FunctionType:
+    """Rebuild a function from its code; defaults and closure are filled in by ``_fill_function``."""
+    closure = tuple(types.CellType() for _ in range(n_cells)) or None
+    fn = types.FunctionType(marshal.loads(code), importlib.import_module(module).__dict__, name, None, closure)
+    fn.__qualname__ = qualname
+    return fn
+
+
+def _fill_function(fn: types.FunctionType, state: tuple) -> types.FunctionType:
+    defaults, kwdefaults, cells, attributes = state
+    fn.__defaults__ = defaults
+    fn.__kwdefaults__ = kwdefaults
+    for cell, value in zip(fn.__closure__ or (), cells):
+        if not (isinstance(value, str) and value == _EMPTY_CELL):
+            cell.cell_contents = value
+    fn.__dict__.update(attributes)
+    return fn
+
+
+def _make_model_class(name: str, base: type, fields: Dict[str, Any]) -> type:
+    """Rebuild a pydantic model class created at runtime (e.g. a tool's argument schema)."""
+    return create_model(name, __base__=base, **fields)
+
+
+def _cell_value(cell: Any) -> Any:
+    try:
+        return cell.cell_contents
+    except ValueError:
+        return _EMPTY_CELL
+
+
+def _model_fields(model: Any) -> Dict[str, Any]:
+    return {name: getattr(model, name) for name in type(model).model_fields if name not in _LIVE_FIELDS}
+
+
+def _construct(cls: type, fields: Dict[str, Any]) -> Any:
+    """Instantiate a model from its saved fields, passing only those its constructor takes."""
+    parameters = inspect.signature(cls.__init__).parameters
+    if not any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        fields = {name: value for name, value in fields.items() if name in parameters}
+    return cls(**fields)
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """Pickler that leaves live clients out and stores closures by their code."""
+
+    def persistent_id(self, obj: Any) -> Any:
+        if isinstance(obj, BaseLLM):
+            return ("llm", type(obj), _model_fields(obj))
+        if isinstance(obj, BaseEmbedding):
+            return ("embed_model", type(obj), _model_fields(obj))
+        if isinstance(obj, CallbackManager):
+            return ("callback_manager",)
+        if isinstance(obj, (httpx.Client, httpx.AsyncClient, LoopLocalAsyncClient, openai.OpenAI, openai.AsyncOpenAI)):
+            return ("client", type(obj).__name__)
+        return None
+
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, types.FunctionType) and not _importable(obj):
+            state = (
+                obj.__defaults__,
+                obj.__kwdefaults__,
+                tuple(_cell_value(cell) for cell in obj.__closure__ or ()),
+                obj.__dict__,
+            )
+            args = (marshal.dumps(obj.__code__), obj.__module__, obj.__name__, obj.__qualname__,
+                    len(obj.__closure__ or ()))
+            return _make_function, args, state, None, None, _fill_function
+        if isinstance(obj, type) and issubclass(obj, BaseModel) and not _importable(obj):
+            fields = {name: (info.annotation, info) for name, info in obj.model_fields.items()}
+            return _make_model_class, (obj.__name__, obj.__bases__[0], fields)
+        if isinstance(obj, _LOCK_TYPES):
+            return (threading.RLock if isinstance(obj, _LOCK_TYPES[1]) else threading.Lock), ()
+        if isinstance(obj, ThreadPoolExecutor):
+            return ThreadPoolExecutor, (obj._max_workers,)
+        return NotImplemented
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler that rebinds live objects to the restoring process."""
+
+    def __init__(self, file: Any, client_factory: ClientFactory):
+        super().__init__(file)
+        self.client_factory = client_factory
+
+    def persistent_load(self, pid: Any) -> Any:
+        kind = pid[0]
+        if kind == "llm":
+            _, cls, fields = pid
+            if cls is OpenAI:
+                return self.client_factory.llm(**fields)
+            return _construct(cls, fields)
+        if kind == "embed_model":
+            _, cls, fields = pid
+            if cls is OpenAIEmbedding:
+                fields = dict(fields)
+                return self.client_factory.embed_model(model=fields.pop("model_name"), **fields)
+            return _construct(cls, fields)
+        if kind == "callback_manager":
+            return Settings.callback_manager
+        if kind == "client":
+            return {
+                "Client": lambda: self.client_factory.http_client,
+                "AsyncClient": lambda: self.client_factory.async_http_client,
+                "LoopLocalAsyncClient": lambda: self.client_factory.async_http_client,
+                "OpenAI": self.client_factory.openai_client,
+                "AsyncOpenAI": self.client_factory.async_openai_client,
+            }[pid[1]]()
+        raise pickle.UnpicklingError(f"unknown persistent object {kind!r}")
+
+
+class SnapshotStore:
+    """Directory of pickled object graphs with environment and input checks."""
+
+    def __init__(
+        self,
+        snapshot_dir: str,
+        client_factory: Optional[ClientFactory] = None,
+        requirements: Path = REQUIREMENTS_PATH,
+    ):
+        """
+        Args:
+            snapshot_dir: Directory holding one ``<key>.snapshot`` file per object
+            client_factory: Pooled clients restored objects are bound to
+                (``get_client_factory()`` if None)
+            requirements: Requirements file whose pinned packages are version-checked
+        """
+        self.snapshot_dir = Path(snapshot_dir)
+        self.client_factory = client_factory or get_client_factory()
+        self.packages = sorted(pinned_versions(requirements))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        """
+        File of a snapshot.
+
+        Args:
+            key: Snapshot name (e.g. ``router_engine-metagpt``)
+
+        Returns:
+            Path: Snapshot path
+        """
+        safe = re.sub(r"[^A-Za-z0-9_.\-]", "_", key)
+        return self.snapshot_dir / f"{safe}.snapshot"
+
+    def header(self, sources: Sequence[str] = (), config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Header a snapshot of these inputs would have in this process.
+
+        Args:
+            sources: Files the object was built from (content-hashed)
+            config: Build settings that change the object (e.g. chunking)
+
+        Returns:
+            Dict[str, Any]: Format version, Python and library versions,
+            source hashes and configuration
+        """
+        return {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "python": platform.python_version_tuple()[:2],
+            "libraries": installed_versions(self.packages),
+            "sources": {str(path): document_hash(path) for path in sources},
+            "config": config or {},
+        }
+
+    def _check(self, key: str, found: Dict[str, Any], expected: Dict[str, Any]) -> None:
+        for field in ("version", "python", "libraries", "sources", "config"):
+            if json.loads(json.dumps(found.get(field))) != json.loads(json.dumps(expected[field])):
+                raise SnapshotMismatch(f"snapshot {key} has a different {field}: {found.get(field)} != {expected[field]}")
+
+    def save(self, key: str, obj: Any, sources: Sequence[str] = (), config: Optional[Dict[str, Any]] = None) -> Path:
+        """
+        Snapshot an object graph.
+
+        Args:
+            key: Snapshot name
+            obj: Built engine, tool set or agent
+            sources: Files the object was built from
+            config: Build settings that change the object
+
+        Returns:
+            Path: Written snapshot file
+
+        Raises:
+            pickle.PicklingError: If part of the graph cannot be snapshotted
+        """
+        header = dict(self.header(sources, config), key=key, created=time.time())
+        buffer = io.BytesIO()
+        _SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, key: str, sources: Sequence[str] = (), config: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Restore a snapshot.
+
+        Args:
+            key: Snapshot name
+            sources: Files the object must have been built from, unchanged
+            config: Build settings the object must have been built with
+
+        Returns:
+            The restored object, bound to this process's clients
+
+        Raises:
+            FileNotFoundError: If there is no snapshot
+            SnapshotMismatch: If the snapshot's environment or inputs differ
+        """
+        with open(self.path(key), "rb") as f:
+            found = json.loads(f.readline())
+            self._check(key, found, self.header(sources, config))
+            return _SnapshotUnpickler(f, self.client_factory).load()
+
+    def load_or_build(
+        self,
+        key: str,
+        build: Callable[[], Any],
+        sources: Sequence[str] = (),
+        config: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Restore a snapshot, or build the object and snapshot it.
+
+        A missing, stale or unreadable snapshot is rebuilt; an object that
+        cannot be snapshotted is still returned, just not saved.
+
+        Args:
+            key: Snapshot name
+            build: Builds the object from scratch
+            sources: Files the object is built from
+            config: Build settings that change the object
+
+        Returns:
+            The restored or newly built object
+        """
+        try:
+            obj = self.load(key, sources, config)
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError):
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+            return obj
+        with self._lock:
+            self.misses += 1
+        obj = build()
+        try:
+            self.save(key, obj, sources, config)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f"Snapshot {key} not saved: {e}", file=sys.stderr)
+        return obj
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Restore counts.
+
+        Returns:
+            Dict[str, int]: hits (restored) and misses (built)
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+def config_fingerprint(names: Sequence[str]) -> Dict[str, Optional[str]]:
+    """
+    Environment settings that change what gets built.
+
+    Args:
+        names: Environment variable names
+
+    Returns:
+        Dict[str, Optional[str]]: Name to value (None when unset)
+    """
+    return {name: os.getenv(name) for name in names}
@@ -0,0 +1,212 @@
+"""
+Offline stand-in for the RAG backend.
+
+``StandInRAGApplication`` has the same interface as ``RAGApplication`` but
+retrieves by keyword overlap over an in-memory corpus and "synthesizes" by
+quoting the best chunk, with latency, errors and capacity injected through a
+``LatencyModel``. Load tests, the HTTP server and unit tests use it to
+exercise concurrency behaviour without API keys or API cost.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+
+DEFAULT_CORPUS = [
+    "MetaGPT encodes Standardized Operating Procedures into prompts to coordinate LLM agents.",
+    "Agents in MetaGPT take roles such as product manager, architect and engineer.",
+    "The methodology assigns each role structured outputs that the next role consumes.",
+    "Evaluation on HumanEval and MBPP shows MetaGPT improves pass@1 over prior multi-agent systems.",
+    "The main findings are that structured communication reduces hallucinated code.",
+    "The authors conclude that SOPs make multi-agent collaboration more reliable.",
+]
+
+
+class StandInError(RuntimeError):
+    """Injected backend failure."""
+
+
+class LatencyModel:
+    """Injectable latency, failure rate and capacity for a stand-in stage."""
+
+    def __init__(
+        self,
+        mean_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        max_concurrency: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the model.
+
+        Args:
+            mean_ms: Mean latency per call in milliseconds
+            jitter_ms: Standard deviation of latency in milliseconds
+            error_rate: Probability that a call raises ``StandInError``
+            max_concurrency: Calls served at once; others queue (unlimited if None)
+            seed: Random seed for reproducible runs
+        """
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> Any:
+        with self._lock:
+            delay = max(0.0, self._random.gauss(self.mean_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+        return delay, failed
+
+    def wait(self) -> None:
+        """
+        Spend one call's latency, honouring the capacity limit.
+
+        Raises:
+            StandInError: With probability ``error_rate``
+        """
+        delay, failed = self._draw()
+        if self._slots is not None:
+            with self._slots:
+                time.sleep(delay)
+        else:
+            time.sleep(delay)
+        if failed:
+            raise StandInError("injected stand-in failure")
+
+
+def _terms(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+class StandInRAGApplication:
+    """Offline drop-in for ``RAGApplication``."""
+
+    def __init__(
+        self,
+        corpus: Optional[Sequence[str]] = None,
+        similarity_top_k: int = 3,
+        retrieval_latency: Optional[LatencyModel] = None,
+        synthesis_latency: Optional[LatencyModel] = None,
+        retrieval_cache_size: int = 128,
+    ):
+        """
+        Initialize the stand-in.
+
+        Args:
+            corpus: Chunk texts to retrieve from (a MetaGPT-like sample if None)
+            similarity_top_k: Number of chunks retrieved per question
+            retrieval_latency: Latency of each retrieval call
+            synthesis_latency: Latency of each synthesis call
+            retrieval_cache_size: Questions whose retrieval is kept, as in
+                ``RAGApplication``
+        """
+        self.corpus = list(corpus or DEFAULT_CORPUS)
+        self.similarity_top_k = similarity_top_k
+        self.retrieval_latency = retrieval_latency or LatencyModel()
+        self.synthesis_latency = synthesis_latency or LatencyModel()
+        self._corpus_terms = [_terms(chunk) for chunk in self.corpus]
+        self.calls: Dict[str, int] = {"retrieve": 0, "retrieve_batch": 0, "synthesize": 0}
+        self._retrieval_cache_size = retrieval_cache_size
+        self._retrieval_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+
+    def _rank(self, question: str) -> List[str]:
+        terms = _terms(question)
+        scores = [len(terms & chunk_terms) for chunk_terms in self._corpus_terms]
+        order = sorted(range(len(self.corpus)), key=lambda i: -scores[i])
+        context = [self.corpus[i] for i in order[:self.similarity_top_k]]
+        with self._lock:
+            self._retrieval_cache[question] = context
+            while len(self._retrieval_cache) > self._retrieval_cache_size:
+                self._retrieval_cache.popitem(last=False)
+        return context
+
+    def _cached(self, question: str) -> Optional[List[str]]:
+        with self._lock:
+            return self._retrieval_cache.get(question)
+
+    def get_retrieval_context(self, question: str) -> List[str]:
+        """
+        Retrieve the chunks for a question.
+
+        Args:
+            question: The user question
+
+        Returns:
+            List of chunk texts
+        """
+        cached = self._cached(question)
+        if cached is not None:
+            return cached
+        self._count("retrieve")
+        self.retrieval_latency.wait()
+        return self._rank(question)
+
+    def get_retrieval_contexts(self, questions: Sequence[str]) -> List[List[str]]:
+        """
+        Retrieve the chunks for several questions in one backend call.
+
+        Args:
+            questions: The user questions
+
+        Returns:
+            One list of chunk texts per question
+        """
+        self._count("retrieve_batch")
+        self.retrieval_latency.wait()
+        return [self._rank(q) for q in questions]
+
+    def synthesize(self, question: str, context: Sequence[str]) -> str:
+        """
+        Produce an answer from retrieved context.
+
+        Args:
+            question: The user question
+            context: Retrieved chunk texts
+
+        Returns:
+            str: Answer quoting the best chunk
+        """
+        self._count("synthesize")
+        self.synthesis_latency.wait()
+        best = context[0] if context else "No relevant context was found."
+        return f"Based on the document: {best}"
+
+    def query(self, question: str) -> str:
+        """
+        Answer a question.
+
+        Args:
+            question: The user question
+
+        Returns:
+            str: Answer
+        """
+        return self.synthesize(question, self.get_retrieval_context(question))
+
+    def stream_query(self, question: str) -> Iterator[str]:
+        """
+        Answer a question word by word.
+
+        Args:
+            question: The user question
+
+        Yields:
+            str: Answer text deltas
+        """
+        answer = self.synthesize(question, self.get_retrieval_context(question))
+        for i, word in enumerate(answer.split(" ")):
+            yield word if i == 0 else " " + word
@@ -0,0 +1,23 @@
+"""
+Summary statistics shared by the load-test, comparison and trace reports.
+"""
+
+import math
+from typing import Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values: Values in ascending order
+        pct: Percentile in [0, 100]
+
+    Returns:
+        float: The percentile (0.0 for no values)
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return float(sorted_values[min(rank, len(sorted_values)) - 1])
@@ -0,0 +1,290 @@
+"""
+Precomputed hierarchical summaries for the summary tool.
+
+The summary tool's ``tree_summarize`` query engine reads every chunk of the
+document on every query, so holistic questions ("Can you summarize the key
+points?") cost calls proportional to document length. ``SummaryTree`` is
+built once at ingestion: chunks are summarized, groups of chunk summaries
+become section summaries, and sections are merged level by level into a
+single document summary. The tree is persisted next to the chunk artifacts,
+and ``SummaryTreeQueryEngine`` answers from the document summary and its
+top-level sections in a single LLM call.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core import Settings
+from llama_index.core.base.response.schema import Response
+from llama_index.core.query_engine import CustomQueryEngine
+from llama_index.core.schema import BaseNode, NodeWithScore, TextNode
+from llama_index.core.tools import QueryEngineTool
+from pydantic import Field
+
+from src.cost import attribute
+
+
+SUMMARY_TREE_VERSION = 1
+
+CHUNK_SUMMARY_PROMPT = (
+    "Summarize the following passage from a paper in 2-3 sentences. Keep the key "
+    "claims, methods and numbers.\n\n{text}\n\nSummary:"
+)
+
+SECTION_SUMMARY_PROMPT = (
+    "The following are summaries of consecutive parts of a paper. Write a single "
+    "summary of this part covering all of its key points.\n\n{text}\n\nSummary:"
+)
+
+ANSWER_PROMPT = (
+    "Answer the question using the summaries of a paper below.\n\n"
+    "Document summary:\n{document}\n\n"
+    "Section summaries:\n{sections}\n\n"
+    "Question: {query}\nAnswer:"
+)
+
+
+@dataclass
+class SummaryNode:
+    """One summary in the tree."""
+
+    node_id: str
+    level: int
+    text: str
+    children: List[str] = field(default_factory=list)
+    pages: List[str] = field(default_factory=list)
+
+
+class SummaryTree:
+    """Levels of summaries, from chunk summaries (level 0) up to one document summary."""
+
+    def __init__(self, levels: List[List[SummaryNode]], metadata: Optional[dict] = None):
+        if not levels or len(levels[-1]) != 1:
+            raise ValueError("A summary tree needs a single root summary")
+        self.levels = levels
+        self.metadata = dict(metadata or {})
+
+    @property
+    def root(self) -> SummaryNode:
+        return self.levels[-1][0]
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels)
+
+    def top_sections(self) -> List[SummaryNode]:
+        """
+        Summaries directly below the document summary.
+
+        Returns:
+            List of section summaries (empty for a single-chunk document)
+        """
+        if self.depth < 2:
+            return []
+        by_id = {node.node_id: node for node in self.levels[-2]}
+        return [by_id[child] for child in self.root.children]
+
+    def save(self, path: str) -> None:
+        """
+        Persist the tree as JSON.
+
+        Args:
+            path: Destination file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": SUMMARY_TREE_VERSION,
+            "metadata": self.metadata,
+            "levels": [[asdict(node) for node in level] for level in self.levels],
+        }
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SummaryTree"]:
+        """
+        Load a persisted tree.
+
+        Args:
+            path: File written by ``save``
+
+        Returns:
+            The tree, or None if missing or written by another format version
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        if data.get("version") != SUMMARY_TREE_VERSION:
+            return None
+        levels = [[SummaryNode(**node) for node in level] for level in data["levels"]]
+        return cls(levels, data.get("metadata"))
+
+
+class SummaryTreeBuilder:
+    """Build a ``SummaryTree`` from a document's chunks."""
+
+    def __init__(
+        self,
+        llm: Any = None,
+        group_size: int = 8,
+        summarize_chunks: bool = True,
+        max_workers: int = 4,
+    ):
+        """
+        Initialize the builder.
+
+        Args:
+            llm: LLM used for summaries (``Settings.llm`` if None)
+            group_size: Summaries merged into each parent summary
+            summarize_chunks: Summarize each chunk first; if False the chunk
+                text itself forms level 0
+            max_workers: Concurrent summary calls per level
+        """
+        if group_size < 2:
+            raise ValueError("group_size must be at least 2")
+        self.llm = llm or Settings.llm
+        self.group_size = group_size
+        self.summarize_chunks = summarize_chunks
+        self.max_workers = max_workers
+
+    def _complete(self, prompt: str, text: str) -> str:
+        return str(self.llm.complete(prompt.format(text=text))).strip()
+
+    def _map(self, prompt: str, texts: List[str]) -> List[str]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self._complete, prompt, text) for text in texts]
+            return [future.result() for future in futures]
+
+    def build(self, nodes: Sequence[BaseNode]) -> SummaryTree:
+        """
+        Summarize chunks and merge them level by level up to one summary.
+
+        Args:
+            nodes: The document's chunks, in document order
+
+        Returns:
+            SummaryTree: The built tree
+
+        Raises:
+            ValueError: If there are no chunks
+        """
+        if not nodes:
+            raise ValueError("Cannot build a summary tree without chunks")
+        with attribute(stage="summary_tree"):
+            chunk_texts = [node.get_content() for node in nodes]
+            if self.summarize_chunks:
+                chunk_texts = self._map(CHUNK_SUMMARY_PROMPT, chunk_texts)
+            level = [
+                SummaryNode(
+                    node_id=f"0-{i}",
+                    level=0,
+                    text=text,
+                    children=[node.node_id],
+                    pages=[str(node.metadata["page_label"])] if "page_label" in node.metadata else [],
+                )
+                for i, (node, text) in enumerate(zip(nodes, chunk_texts))
+            ]
+            levels = [level]
+            while len(level) > 1:
+                groups = [level[i:i + self.group_size] for i in range(0, len(level), self.group_size)]
+                texts = self._map(SECTION_SUMMARY_PROMPT, ["\n\n".join(n.text for n in g) for g in groups])
+                depth = len(levels)
+                level = [
+                    SummaryNode(
+                        node_id=f"{depth}-{i}",
+                        level=depth,
+                        text=text,
+                        children=[n.node_id for n in group],
+                        pages=list(dict.fromkeys(p for n in group for p in n.pages)),
+                    )
+                    for i, (group, text) in enumerate(zip(groups, texts))
+                ]
+                levels.append(level)
+        return SummaryTree(levels, {"group_size": self.group_size, "summarize_chunks": self.summarize_chunks})
+
+    def load_or_build(self, nodes: Sequence[BaseNode], path: Optional[str] = None) -> SummaryTree:
+        """
+        Load a persisted tree for these chunks, or build and persist one.
+
+        Args:
+            nodes: The document's chunks
+            path: Where the tree is persisted (built in memory only if None)
+
+        Returns:
+            SummaryTree: The tree
+        """
+        key = self.cache_key(nodes)
+        tree = SummaryTree.load(path) if path else None
+        if tree is not None and tree.metadata.get("key") == key:
+            return tree
+        tree = self.build(nodes)
+        tree.metadata["key"] = key
+        if path:
+            tree.save(path)
+        return tree
+
+    def cache_key(self, nodes: Sequence[BaseNode]) -> str:
+        """
+        Identify the chunks and build settings a tree was made from.
+
+        Args:
+            nodes: The document's chunks
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        digest = hashlib.sha256()
+        settings = [getattr(self.llm, "model", type(self.llm).__name__), self.group_size, self.summarize_chunks]
+        digest.update(json.dumps(settings).encode("utf-8"))
+        for node in nodes:
+            digest.update(node.get_content().encode("utf-8"))
+        return digest.hexdigest()
+
+
+class SummaryTreeQueryEngine(CustomQueryEngine):
+    """Answer holistic questions from the top of a ``SummaryTree``."""
+
+    tree: Any = Field(description="Precomputed SummaryTree")
+    llm: Any = Field(description="LLM that writes the answer")
+
+    def custom_query(self, query_str: str) -> Response:
+        sections = self.tree.top_sections()
+        prompt = ANSWER_PROMPT.format(
+            document=self.tree.root.text,
+            sections="\n\n".join(f"- {s.text}" for s in sections) or "(none)",
+            query=query_str,
+        )
+        answer = str(self.llm.complete(prompt)).strip()
+        source_nodes = [
+            NodeWithScore(node=TextNode(text=s.text, metadata={"summary_level": s.level, "pages": s.pages}))
+            for s in [self.tree.root] + sections
+        ]
+        return Response(response=answer, source_nodes=source_nodes)
+
+
+def build_summary_tool(tree: SummaryTree, name: str, llm: Any = None) -> QueryEngineTool:
+    """
+    Create a summary tool that answers from a precomputed tree.
+
+    Args:
+        tree: The document's summary tree
+        name: Tool name suffix, as in ``get_doc_tools``
+        llm: LLM that writes answers (``Settings.llm`` if None)
+
+    Returns:
+        QueryEngineTool: ``summary_tool_<name>``
+    """
+    return QueryEngineTool.from_defaults(
+        name=f"summary_tool_{name}",
+        query_engine=SummaryTreeQueryEngine(tree=tree, llm=llm or Settings.llm),
+        description=f"Useful for summarization questions related to {name}",
+    )
@@ -0,0 +1,62 @@
+"""
+Token counting helpers built on tiktoken.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-3.5-turbo") -> tiktoken.Encoding:
+    """
+    Get the tiktoken encoding for a model.
+
+    Args:
+        model: OpenAI model name
+
+    Returns:
+        tiktoken.Encoding: The model's encoding (``cl100k_base`` if unknown)
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Args:
+        text: Text to count
+        model: OpenAI model whose tokenizer is used
+
+    Returns:
+        int: Number of tokens
+    """
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> str:
+    """
+    Cut text down to at most ``max_tokens`` tokens.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens to keep
+        model: OpenAI model whose tokenizer is used
+
+    Returns:
+        str: The leading ``max_tokens`` tokens of ``text``
+    """
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max(max_tokens, 0)])
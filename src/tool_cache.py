@@ -0,0 +1,273 @@
+"""
+Session-scoped memoization for Agentic-RAG document tools.
+
+Agents frequently call the same vector/summary tool with identical or
+near-identical arguments, both within one turn and across follow-up turns.
+``CachedTool`` wraps a tool from ``get_doc_tools`` (or any LlamaIndex tool)
+and answers repeated calls from a ``ToolResultCache`` until the entry expires.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.tools import ToolOutput
+from llama_index.core.tools.types import AsyncBaseTool, ToolMetadata, adapt_to_async_tool
+
+from src.agent_tools import get_tool_name, map_agent_tools
+
+
+DEFAULT_SESSION = "default"
+
+
+def _normalize_value(value: Any) -> Any:
+    """Normalize an argument so near-identical calls share a cache key."""
+    if isinstance(value, str):
+        text = re.sub(r"\s+", " ", value).strip().lower()
+        return text.rstrip("?.! ")
+    if isinstance(value, dict):
+        return {str(k): _normalize_value(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize_value(v) for v in value]
+        if all(isinstance(v, (str, int, float)) for v in items):
+            items = sorted(items, key=str)
+        return items
+    return value
+
+
+def make_cache_key(tool_name: str, args: Sequence[Any], kwargs: Dict[str, Any]) -> str:
+    """
+    Build a cache key for a tool call.
+
+    Strings are lower-cased with whitespace and trailing punctuation removed,
+    and lists of scalars (e.g. page numbers) are sorted, so
+    ``"What is MetaGPT?"`` and ``"what is  metagpt"`` hit the same entry.
+
+    Args:
+        tool_name: Name of the tool being called
+        args: Positional call arguments
+        kwargs: Keyword call arguments
+
+    Returns:
+        str: Stable cache key
+    """
+    payload = {
+        "tool": tool_name,
+        "args": _normalize_value(list(args)),
+        "kwargs": _normalize_value(kwargs),
+    }
+    return json.dumps(payload, sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """
+    Thread-safe TTL cache of tool outputs, partitioned by session.
+
+    Entries are evicted when they are older than ``ttl_seconds`` or, once the
+    cache holds ``max_entries`` results, in least-recently-used order.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds: How long a cached tool output stays valid
+            max_entries: Maximum number of outputs kept across all sessions
+
+        Raises:
+            ValueError: If ``ttl_seconds`` or ``max_entries`` is not positive
+        """
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, ToolOutput]]" = OrderedDict()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, tool_name: str, field: str) -> None:
+        counts = self._counts.setdefault(tool_name, {"hits": 0, "misses": 0})
+        counts[field] += 1
+
+    def get(self, session_id: str, tool_name: str, key: str) -> Optional[ToolOutput]:
+        """
+        Look up a cached output and record a hit or a miss.
+
+        Args:
+            session_id: Session the call belongs to
+            tool_name: Name of the tool (used for per-tool stats)
+            key: Key from ``make_cache_key``
+
+        Returns:
+            The cached ``ToolOutput``, or None if absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get((session_id, key))
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[(session_id, key)]
+                entry = None
+            if entry is None:
+                self._count(tool_name, "misses")
+                return None
+            self._entries.move_to_end((session_id, key))
+            self._count(tool_name, "hits")
+            return entry[1]
+
+    def set(self, session_id: str, key: str, output: ToolOutput) -> None:
+        """
+        Store a tool output.
+
+        Args:
+            session_id: Session the call belongs to
+            key: Key from ``make_cache_key``
+            output: Output returned by the wrapped tool
+        """
+        with self._lock:
+            self._entries[(session_id, key)] = (time.monotonic(), output)
+            self._entries.move_to_end((session_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """
+        Drop cached outputs.
+
+        Args:
+            session_id: Only clear this session (all sessions if None)
+        """
+        with self._lock:
+            if session_id is None:
+                self._entries.clear()
+                return
+            for entry_key in [k for k in self._entries if k[0] == session_id]:
+                del self._entries[entry_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics.
+
+        Returns:
+            dict: Overall ``hits``, ``misses``, ``hit_rate`` and ``entries``,
+            plus the same counters per tool under ``tools``
+        """
+        with self._lock:
+            tools = {}
+            for name, counts in self._counts.items():
+                total = counts["hits"] + counts["misses"]
+                tools[name] = {**counts, "hit_rate": counts["hits"] / total if total else 0.0}
+            hits = sum(c["hits"] for c in self._counts.values())
+            misses = sum(c["misses"] for c in self._counts.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "entries": len(self._entries),
+                "tools": tools,
+            }
+
+
+class CachedTool(AsyncBaseTool):
+    """LlamaIndex tool that memoizes another tool's outputs."""
+
+    def __init__(
+        self,
+        tool: Any,
+        cache: ToolResultCache,
+        session_id: str = DEFAULT_SESSION,
+    ):
+        """
+        Wrap a tool.
+
+        Args:
+            tool: Tool to memoize (e.g. a tool from ``get_doc_tools``)
+            cache: Cache shared by the wrapped tools
+            session_id: Session whose entries this wrapper reads and writes
+        """
+        self._tool = adapt_to_async_tool(tool)
+        self._cache = cache
+        self.session_id = session_id
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self._tool.metadata
+
+    @property
+    def wrapped_tool(self) -> AsyncBaseTool:
+        """The tool being memoized."""
+        return self._tool
+
+    def _key(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+        return make_cache_key(get_tool_name(self._tool), args, kwargs)
+
+    def _store(self, key: str, output: ToolOutput) -> None:
+        if not getattr(output, "is_error", False):
+            self._cache.set(self.session_id, key, output)
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        key = self._key(args, kwargs)
+        cached = self._cache.get(self.session_id, get_tool_name(self._tool), key)
+        if cached is not None:
+            return cached
+        output = self._tool.call(*args, **kwargs)
+        self._store(key, output)
+        return output
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        key = self._key(args, kwargs)
+        cached = self._cache.get(self.session_id, get_tool_name(self._tool), key)
+        if cached is not None:
+            return cached
+        output = await self._tool.acall(*args, **kwargs)
+        self._store(key, output)
+        return output
+
+
+def memoize_tools(
+    tools: Sequence[Any],
+    cache: ToolResultCache,
+    session_id: str = DEFAULT_SESSION,
+) -> List[CachedTool]:
+    """
+    Wrap tools (e.g. the output of ``get_doc_tools``) with a shared cache.
+
+    Args:
+        tools: Tools to wrap
+        cache: Cache to store outputs in
+        session_id: Session the wrapped tools belong to
+
+    Returns:
+        List of ``CachedTool`` in the same order
+    """
+    return [CachedTool(tool, cache, session_id=session_id) for tool in tools]
+
+
+def memoize_agent_tools(
+    agent: Any,
+    cache: ToolResultCache,
+    session_id: str = DEFAULT_SESSION,
+) -> Any:
+    """
+    Memoize the tools of an already built agent.
+
+    Useful for ``create_multi_document_agent``, which builds its per-paper
+    tools internally.
+
+    Args:
+        agent: Agent returned by ``create_function_calling_agent`` or
+            ``create_multi_document_agent``
+        cache: Cache to store outputs in
+        session_id: Session the agent's tool calls belong to
+
+    Returns:
+        The same agent, for chaining
+    """
+    return map_agent_tools(
+        agent,
+        lambda tool: tool if isinstance(tool, CachedTool) else CachedTool(tool, cache, session_id),
+    )
@@ -0,0 +1,217 @@
+"""
+Embedding index over agent tool descriptions.
+
+Passing every per-paper tool to a multi-document agent makes the prompt grow
+with the corpus. ``ToolIndex`` embeds each tool's name and description once,
+persists the vectors to disk, and retrieves only the top-k tools relevant to
+the current message. Tools are registered incrementally: adding papers only
+embeds the new or changed descriptions.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core import Settings
+
+from src.agent_tools import get_tool_name, transform_agent_tools
+
+
+INDEX_FORMAT_VERSION = 1
+
+
+def _tool_text(tool: Any) -> str:
+    """Text embedded for a tool: its name followed by its description."""
+    description = getattr(tool.metadata, "description", "") or ""
+    return f"{get_tool_name(tool)}\n{description}"
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ToolIndex:
+    """Persisted embedding index that retrieves the tools relevant to a query."""
+
+    def __init__(self, embed_model: Any = None, persist_path: Optional[str] = None):
+        """
+        Initialize the index, loading persisted embeddings if present.
+
+        Args:
+            embed_model: LlamaIndex embedding model (``Settings.embed_model``
+                if None)
+            persist_path: JSON file the embeddings are stored in (in-memory
+                only if None)
+        """
+        self.embed_model = embed_model or Settings.embed_model
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._tools: Dict[str, Any] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._names: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _model_name(self) -> str:
+        return getattr(self.embed_model, "model_name", type(self.embed_model).__name__)
+
+    def _load(self) -> None:
+        if self.persist_path is None or not self.persist_path.exists():
+            return
+        data = json.loads(self.persist_path.read_text())
+        # Vectors from another embedding model are not comparable; start over
+        if data.get("version") == INDEX_FORMAT_VERSION and data.get("embed_model") == self._model_name:
+            self._entries = data.get("tools", {})
+
+    def _persist(self) -> None:
+        if self.persist_path is None:
+            return
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": INDEX_FORMAT_VERSION,
+            "embed_model": self._model_name,
+            "tools": self._entries,
+        }
+        tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, self.persist_path)
+
+    def _rebuild_matrix(self) -> None:
+        self._names = [name for name in self._tools if name in self._entries]
+        if not self._names:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        matrix = np.asarray([self._entries[n]["embedding"] for n in self._names], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1.0, norms)
+
+    def add_tools(self, tools: Sequence[Any]) -> int:
+        """
+        Register tools, embedding only new or changed descriptions.
+
+        Args:
+            tools: Tools to make retrievable
+
+        Returns:
+            int: Number of descriptions that had to be embedded
+        """
+        with self._lock:
+            pending = {}
+            for tool in tools:
+                name = get_tool_name(tool)
+                self._tools[name] = tool
+                text = _tool_text(tool)
+                entry = self._entries.get(name)
+                if entry is None or entry["hash"] != _text_hash(text):
+                    pending[name] = text
+            if pending:
+                embeddings = self.embed_model.get_text_embedding_batch(list(pending.values()))
+                for (name, text), embedding in zip(pending.items(), embeddings):
+                    self._entries[name] = {"hash": _text_hash(text), "embedding": list(embedding)}
+                self._persist()
+            if pending or len(self._names) != len(self._tools):
+                self._rebuild_matrix()
+            return len(pending)
+
+    def remove_tools(self, names: Sequence[str]) -> None:
+        """
+        Unregister tools and drop their persisted embeddings.
+
+        Args:
+            names: Names of the tools to remove
+        """
+        with self._lock:
+            for name in names:
+                self._tools.pop(name, None)
+                self._entries.pop(name, None)
+            self._persist()
+            self._rebuild_matrix()
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 4,
+        names: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Get the registered tools most relevant to a query.
+
+        Args:
+            query: User message or question
+            top_k: Maximum number of tools to return
+            names: Only consider tools with these names (all if None)
+
+        Returns:
+            Tools ordered by cosine similarity, most relevant first
+        """
+        if top_k < 1:
+            return []
+        with self._lock:
+            all_names, matrix = self._names, self._matrix
+        if names is not None:
+            allowed = set(names)
+            rows = [i for i, name in enumerate(all_names) if name in allowed]
+            all_names, matrix = [all_names[i] for i in rows], matrix[rows]
+        if not all_names:
+            return []
+        if len(all_names) <= top_k:
+            return [self._tools[name] for name in all_names]
+        query_vector = np.asarray(self.embed_model.get_query_embedding(query), dtype=np.float32)
+        scores = matrix @ (query_vector / (np.linalg.norm(query_vector) or 1.0))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [self._tools[all_names[i]] for i in best]
+
+    def as_retriever(self, top_k: int = 4) -> "ToolRetriever":
+        """
+        Get a retriever usable as an agent worker's ``tool_retriever``.
+
+        Args:
+            top_k: Number of tools returned per message
+
+        Returns:
+            ToolRetriever: Object with a ``retrieve(message)`` method
+        """
+        return ToolRetriever(self, top_k)
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+
+class ToolRetriever:
+    """Adapter exposing a ``ToolIndex`` through the object retriever interface."""
+
+    def __init__(self, tool_index: ToolIndex, top_k: int):
+        self.tool_index = tool_index
+        self.top_k = top_k
+
+    def retrieve(self, message: Any) -> List[Any]:
+        return self.tool_index.retrieve(str(message), self.top_k)
+
+
+def attach_tool_index(agent: Any, tool_index: ToolIndex, top_k: int = 4) -> Any:
+    """
+    Make an agent see only the top-k tools relevant to each message.
+
+    Tools the agent resolves are registered with ``tool_index`` as they
+    appear, so papers added later are picked up without a rebuild.
+
+    Args:
+        agent: Agent returned by ``create_multi_document_agent``
+        tool_index: Index to register and retrieve tools with
+        top_k: Number of tools exposed per step
+
+    Returns:
+        The same agent, for chaining
+    """
+
+    def _top_k(tools: List[Any], message: str) -> List[Any]:
+        tool_index.add_tools(tools)
+        return tool_index.retrieve(message, top_k, names=[get_tool_name(t) for t in tools])
+
+    return transform_agent_tools(agent, _top_k)
@@ -18,11 +18,39 @@ from llama_index.embeddings.openai import OpenAIEmbedding
 AGENTIC_RAG_PATH = Path(__file__).parent.parent.parent.parent / "Agentic-RAG-with-LlamaIndex"
 sys.path.insert(0, str(AGENTIC_RAG_PATH / "src"))
 
+# Cost- and latency-aware test selection (--budget-seconds, --budget-cost, --budget-order)
+pytest_plugins = ["src.pytest_budget"]
+
 # Import from Agentic-RAG (the actual system we're testing)
 from router_engine import get_router_query_engine
 from agents import create_function_calling_agent, create_multi_document_agent
 from document_tools import get_doc_tools
 from config import get_openai_api_key
+from src.config import get_chunk_cache_dir
+
+from src.agent_budget import AgentBudget, BudgetedAgent
+from src.agent_tools import get_tool_name
+from src.agent_trace import AgentTraceRecorder, analyze_traces, format_trace_report, install_tracer, trace_agent_tools
+from src.chunking import ChunkStore, chunker_from_config
+from src.clients import get_client_factory
+from src.compression import build_context_compressor
+from src.cost import CostLedger, CountingJudge, attribute, current_stage, install_ledger
+from src.doc_tools import build_doc_tools
+from src.frontend import QueryFrontend, QueryNormalizer
+from src.golden import index_dataset, read_case
+from src.ingest import print_progress
+from src.memory import MemoryProfiler
+from src.parallel_tools import add_fan_out_tool
+from src.prompts import PrefixTracker, install_prefix_tracker, shared_context
+from src.questions import COMPLEX_QUESTIONS, TEST_QUESTIONS
+from src.rag_app import RAGApplication
+from src.rerank import build_reranker
+from src.results import CaseResults, ResultRecorder, ResultStore, assert_measured
+from src.sampling import MetricSampler, SamplingPolicy
+from src.sharding import ShardCoordinator
+from src.snapshot import SnapshotStore, config_fingerprint
+from src.tool_cache import ToolResultCache, memoize_agent_tools, memoize_tools
+from src.tool_index import ToolIndex, attach_tool_index
 
 
 # ============================================================================
@@ -58,7 +86,8 @@ def multi_document_paths():
     if not papers_dir.exists():
         pytest.skip("Papers directory not found")
     
-    paper_files = list(papers_dir.glob("*.pdf"))[:3]  # Use first 3 papers
+    max_papers = int(os.getenv("MULTI_DOC_MAX_PAPERS", "3"))
+    paper_files = sorted(papers_dir.glob("*.pdf"))[:max_papers]
     if len(paper_files) < 2:
         pytest.skip("Need at least 2 papers for multi-document tests")
     
@@ -69,55 +98,411 @@ def multi_document_paths():
 # Agentic-RAG Component Fixtures
 # ============================================================================
 
+# Warm-start snapshots of built engines, tools and agents, kept under SNAPSHOT_DIR
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+SNAPSHOTS = SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+SNAPSHOT_CONFIG = (
+    "CHUNKING_STRATEGY", "CHUNK_SIZE", "CHUNK_OVERLAP", "SUMMARY_TREE", "RERANK", "DEEPEVAL_JUDGE_MODEL"
+)
+# Code the snapshotted objects are built by; closures in them are stored as bytecode
+BUILDER_SOURCES = [
+    str(path) for directory in (AGENTIC_RAG_PATH / "src", Path(__file__).parent.parent / "src")
+    for path in sorted(directory.glob("*.py"))
+]
+
+
+def warm_start(key, build, sources):
+    """
+    Restore ``key`` from ``SNAPSHOT_DIR``, or build it (and snapshot it).
+    
+    Snapshots are rebuilt when a source document, the Agentic-RAG or
+    ``src`` code that builds them (including the model names it sets), a
+    chunking/tool/model setting or a pinned library version changes. Just
+    builds when unset.
+    """
+    if SNAPSHOTS is None:
+        return build()
+    return SNAPSHOTS.load_or_build(
+        key, build, sources=list(sources) + BUILDER_SOURCES, config=config_fingerprint(SNAPSHOT_CONFIG)
+    )
+
+
+# Normalizing, single-flight front ends over the query backends (QUERY_FRONTEND=1)
+QUERY_FRONTENDS = []
+
+
+def fronted(backend, **kwargs):
+    """
+    Wrap ``backend`` in a ``QueryFrontend`` when ``QUERY_FRONTEND=1``.
+    
+    Queries are capped at ``QUERY_MAX_TOKENS`` tokens (256 by default).
+    """
+    if os.getenv("QUERY_FRONTEND") != "1":
+        return backend
+    normalizer = QueryNormalizer(max_tokens=int(os.getenv("QUERY_MAX_TOKENS", "256")))
+    frontend = QueryFrontend(backend, normalizer, **kwargs)
+    QUERY_FRONTENDS.append(frontend)
+    return frontend
+
+
 @pytest.fixture(scope="session")
 def router_engine(sample_document_path):
     """
     Create a router query engine from Agentic-RAG.
     
-    Tests the actual router engine implementation.
+    Tests the actual router engine implementation (restored from a snapshot
+    when ``SNAPSHOT_DIR`` is set, behind a query front end when
+    ``QUERY_FRONTEND=1``).
+    """
+    engine = warm_start(
+        f"router_engine-{Path(sample_document_path).stem}",
+        lambda: get_router_query_engine(sample_document_path),
+        [sample_document_path]
+    )
+    return fronted(engine, empty_response="Please ask a question about the document.")
+
+
+@pytest.fixture(scope="session")
+def client_factory():
+    """
+    Pooled HTTP clients shared by every OpenAI LLM, embedding and judge call.
+    
+    Pool limits and timeouts come from ``HTTP_*`` environment variables.
+    """
+    factory = get_client_factory()
+    yield factory
+    factory.close()
+
+
+@pytest.fixture(scope="session")
+def chunk_store():
+    """
+    Cache of chunked documents shared by every index built in the session.
+    
+    Artifacts persist under ``CHUNK_CACHE_DIR`` when set, so later runs skip
+    re-parsing unchanged documents.
     """
-    engine = get_router_query_engine(sample_document_path)
-    return engine
+    return ChunkStore(get_chunk_cache_dir())
 
 
 @pytest.fixture(scope="session")
-def document_tools(sample_document_path):
+def rag_app(sample_document_path, chunk_store, client_factory):
+    """
+    Create the single-document RAG application used by evaluation tests.
+    
+    Documents are streamed page by page into the index, split with the
+    strategy selected by ``CHUNKING_STRATEGY`` and ``CHUNK_SIZE`` and embedded
+    ``INGEST_BATCH_SIZE`` chunks at a time (``INGEST_PROGRESS=1`` reports
+    throughput). Set ``RERANK=1`` to rerank a larger candidate set locally and
+    keep an adaptive number of chunks, and ``CONTEXT_COMPRESSION=1`` to
+    compress the retrieved context (capped at ``CONTEXT_TOKEN_BUDGET`` tokens
+    when set) before both synthesis and evaluation. ``QUERY_FRONTEND=1``
+    normalizes questions and coalesces concurrent identical ones.
+    """
+    compressor = None
+    if os.getenv("CONTEXT_COMPRESSION") == "1":
+        budget = os.getenv("CONTEXT_TOKEN_BUDGET")
+        compressor = build_context_compressor(
+            embed_model=client_factory.embed_model(),
+            max_tokens=int(budget) if budget else None
+        )
+    return fronted(RAGApplication(
+        document_path=sample_document_path,
+        compressor=compressor,
+        chunking=chunker_from_config(),
+        chunk_store=chunk_store,
+        ingest_batch_size=int(os.getenv("INGEST_BATCH_SIZE", "64")),
+        on_progress=print_progress if os.getenv("INGEST_PROGRESS") == "1" else None,
+        reranker=build_reranker(client_factory.embed_model(), top_n=3) if os.getenv("RERANK") == "1" else None,
+        client_factory=client_factory
+    ))
+
+
+@pytest.fixture(scope="session")
+def document_tools(sample_document_path, chunk_store, client_factory):
     """
     Create document tools from Agentic-RAG.
     
+    When ``CHUNKING_STRATEGY`` is set, equivalent tools are built by streaming
+    the document with that strategy instead. ``SUMMARY_TREE=1`` and
+    ``RERANK=1`` also build them, with a summary tool that answers from
+    precomputed summaries and a reranked vector tool respectively. Either
+    way the tools are restored from a snapshot when ``SNAPSHOT_DIR`` is set.
+    
     Returns:
         tuple: (vector_tool, summary_tool)
     """
-    vector_tool, summary_tool = get_doc_tools(sample_document_path, "test_doc")
+    rerank = os.getenv("RERANK") == "1"
+    if os.getenv("CHUNKING_STRATEGY") or os.getenv("SUMMARY_TREE") == "1" or rerank:
+        def build():
+            return build_doc_tools(
+                sample_document_path,
+                "test_doc",
+                chunker_from_config(),
+                chunk_store,
+                batch_size=int(os.getenv("INGEST_BATCH_SIZE", "64")),
+                summary_tree=os.getenv("SUMMARY_TREE") == "1",
+                embed_model=client_factory.embed_model(),
+                llm=client_factory.llm(),
+                reranker=build_reranker(client_factory.embed_model(), top_n=2) if rerank else None
+            )
+    else:
+        def build():
+            return get_doc_tools(sample_document_path, "test_doc")
+    vector_tool, summary_tool = warm_start(
+        f"document_tools-{Path(sample_document_path).stem}", build, [sample_document_path]
+    )
     return vector_tool, summary_tool
 
 
+# Tool caches built this session, for the hit rates in the terminal summary
+TOOL_CACHES = []
+
+
+@pytest.fixture(scope="session")
+def tool_cache():
+    """
+    Session-wide cache of agent tool outputs.
+    
+    Repeated tool calls with identical or near-identical arguments are
+    answered from the cache for ``TOOL_CACHE_TTL`` seconds (default 600).
+    Its hit rate is printed at the end of the run.
+    """
+    cache = ToolResultCache(ttl_seconds=float(os.getenv("TOOL_CACHE_TTL", "600")))
+    TOOL_CACHES.append(cache)
+    return cache
+
+
 @pytest.fixture(scope="session")
-def agent(document_tools):
+def agent(document_tools, tool_cache):
     """
     Create a function calling agent from Agentic-RAG.
     
-    Tests the actual agent implementation.
+    Tests the actual agent implementation, with memoized document tools.
+    Runs are traced step by step when agent tracing is enabled, and budgeted
+    and prefetched when configured (see ``budget_agent``).
+    """
+    tools = memoize_tools(document_tools, tool_cache, session_id="agent")
+    agent = create_function_calling_agent(tools, verbose=False)
+    if AGENT_TRACING:
+        trace_agent_tools(agent)
+    return budget_agent(agent)
+
+
+@pytest.fixture(scope="session")
+def tool_index():
+    """
+    Embedding index over per-paper tool descriptions.
+    
+    Persisted to ``TOOL_INDEX_PATH`` when set, so tool descriptions are only
+    embedded once across sessions.
+    """
+    return ToolIndex(persist_path=os.getenv("TOOL_INDEX_PATH"))
+
+
+@pytest.fixture(scope="session")
+def shard_coordinator(multi_document_paths, cost_ledger):
+    """
+    Worker processes owning the per-paper tools when ``MULTI_DOC_SHARDS`` is set.
+    
+    Papers are partitioned across ``MULTI_DOC_SHARDS`` local processes, each
+    building the indexes of its papers; None when unset. The workers' LLM
+    and embedding usage is recorded in ``cost_ledger`` under the calling test.
     """
-    vector_tool, summary_tool = document_tools
-    agent = create_function_calling_agent([vector_tool, summary_tool], verbose=False)
-    return agent
+    shards = int(os.getenv("MULTI_DOC_SHARDS", "0"))
+    if not shards:
+        yield None
+        return
+    with ShardCoordinator(multi_document_paths, n_shards=shards, ledger=cost_ledger) as coordinator:
+        yield coordinator
 
 
 @pytest.fixture(scope="session")
-def multi_document_agent(multi_document_paths):
+def multi_document_agent(multi_document_paths, tool_cache, tool_index, shard_coordinator):
     """
     Create a multi-document agent from Agentic-RAG.
     
-    Tests the actual multi-document agent implementation.
+    Tests the actual multi-document agent implementation, with memoized
+    per-paper tools, only the ``MULTI_DOC_TOOL_TOP_K`` (default 6) tools most
+    relevant to each message, and a fan-out tool that queries those papers
+    concurrently (their vector tools, up to ``MULTI_DOC_MAX_CONCURRENCY`` at
+    once, default 4).
+    With ``MULTI_DOC_SHARDS`` set, Agentic-RAG's ``create_multi_document_agent``
+    is not used: the shard workers build each paper's tools with this repo's
+    ``build_doc_tools`` (see ``src.sharding.build_document_tools``) and the
+    agent is a ``create_function_calling_agent`` over their proxies, so
+    sharded runs test that agent rather than Agentic-RAG's. Otherwise the
+    agent is restored from a snapshot when ``SNAPSHOT_DIR`` is set.
+    Runs are traced step by step when agent tracing is enabled, and budgeted
+    and prefetched when configured (see ``budget_agent``).
+    """
+    if shard_coordinator is not None:
+        agent = create_function_calling_agent(shard_coordinator.tools(), verbose=False)
+    else:
+        paper_names = [Path(p).name for p in multi_document_paths]
+        agent = warm_start(
+            "multi_document_agent",
+            lambda: create_multi_document_agent(
+                paper_names,
+                data_dir=str(AGENTIC_RAG_PATH / "data" / "papers"),
+                verbose=False
+            ),
+            multi_document_paths
+        )
+    memoize_agent_tools(agent, tool_cache, session_id="multi_document_agent")
+    attach_tool_index(agent, tool_index, top_k=int(os.getenv("MULTI_DOC_TOOL_TOP_K", "6")))
+    add_fan_out_tool(
+        agent,
+        max_concurrency=int(os.getenv("MULTI_DOC_MAX_CONCURRENCY", "4")),
+        tool_filter=lambda tool: get_tool_name(tool).startswith("vector_tool_")
+    )
+    if AGENT_TRACING:
+        trace_agent_tools(agent)
+    return budget_agent(agent)
+
+
+def budget_agent(agent):
+    """
+    Run an agent under ``AGENT_MAX_STEPS`` / ``AGENT_MAX_SECONDS`` /
+    ``AGENT_MAX_TOKENS`` budgets, prefetching the predicted tool when
+    ``AGENT_PREFETCH=1``. Returns the agent unchanged when none is set.
+    """
+    budget = AgentBudget.from_env()
+    prefetch = os.getenv("AGENT_PREFETCH") == "1"
+    if budget.unlimited and not prefetch:
+        return agent
+    return BudgetedAgent(agent, budget, prefetch=prefetch)
+
+
+# ============================================================================
+# Agent Trace Fixtures
+# ============================================================================
+
+# Step-level agent traces, recorded when AGENT_TRACE=1 or AGENT_TRACE_PATH is set
+AGENT_TRACES = AgentTraceRecorder()
+AGENT_TRACING = os.getenv("AGENT_TRACE") == "1" or bool(os.getenv("AGENT_TRACE_PATH"))
+
+
+@pytest.fixture(scope="session")
+def agent_traces():
+    """
+    Step-level traces of every agent run in the session.
+    
+    Empty unless ``AGENT_TRACE=1`` or ``AGENT_TRACE_PATH`` is set.
+    """
+    return AGENT_TRACES
+
+
+# ============================================================================
+# Cost Accounting Fixtures
+# ============================================================================
+
+# One ledger per run, recording every LlamaIndex and DeepEval judge call
+COST_LEDGER = CostLedger()
+
+# Prefix reuse of every chat prompt, recorded when PROMPT_STATS=1
+PROMPT_PREFIXES = PrefixTracker(stage=current_stage)
+PROMPT_STATS = os.getenv("PROMPT_STATS") == "1"
+
+
+@pytest.fixture(scope="session")
+def cost_ledger():
+    """
+    Token and cost ledger for the whole run.
+    
+    Use ``cost_ledger.assert_within_budget(request.node.nodeid, ...)`` for
+    per-test budget assertions.
+    """
+    return COST_LEDGER
+
+
+@pytest.fixture(autouse=True)
+def cost_attribution(request, cost_ledger):
+    """
+    Attribute LLM calls made during a test to that test.
+    
+    Fails the test at teardown if it exceeds ``MAX_TOKENS_PER_TEST`` or
+    ``MAX_COST_PER_TEST`` (USD) when either is set.
+    """
+    with attribute(case_id=request.node.nodeid):
+        yield
+    max_tokens = os.getenv("MAX_TOKENS_PER_TEST")
+    max_cost = os.getenv("MAX_COST_PER_TEST")
+    cost_ledger.assert_within_budget(
+        request.node.nodeid,
+        max_tokens=int(max_tokens) if max_tokens else None,
+        max_cost=float(max_cost) if max_cost else None
+    )
+
+
+@pytest.fixture(scope="session")
+def judge_model(cost_ledger, client_factory):
+    """
+    DeepEval judge model that records its token usage.
+    
+    Uses ``DEEPEVAL_JUDGE_MODEL`` (default gpt-4o). Every metric shares the
+    judge, and so its pooled connections. With ``PROMPT_ASSEMBLY=1`` judge
+    prompts put the test case's shared texts in a common prefix.
     """
-    paper_names = [Path(p).name for p in multi_document_paths]
-    agent = create_multi_document_agent(
-        paper_names,
-        data_dir=str(AGENTIC_RAG_PATH / "data" / "papers"),
-        verbose=False
+    model = os.getenv("DEEPEVAL_JUDGE_MODEL", "gpt-4o")
+    inner = client_factory.judge(
+        model,
+        assemble=os.getenv("PROMPT_ASSEMBLY") == "1",
+        tracker=PROMPT_PREFIXES if PROMPT_STATS else None
     )
-    return agent
+    return CountingJudge(cost_ledger, model=model, inner=inner)
+
+
+# ============================================================================
+# Evaluation Result Fixtures
+# ============================================================================
+
+# Metric results of the run, persisted when EVAL_RESULTS_DIR is set
+EVAL_RESULTS = ResultRecorder(
+    ResultStore(os.getenv("EVAL_RESULTS_DIR")) if os.getenv("EVAL_RESULTS_DIR") else None,
+    run_id=os.getenv("EVAL_RUN_ID")
+)
+
+
+@pytest.fixture
+def eval_results(request, cost_ledger):
+    """
+    Record the metrics of a test in the run's result store.
+    
+    Register metrics with ``eval_results.add(test_case, metric, ...)`` before
+    asserting on them and time the system under test with
+    ``eval_results.timer()``. Rows are written at the end of the session.
+    """
+    case = CaseResults(EVAL_RESULTS, request.node.nodeid, cost_ledger)
+    yield case
+    case.finish()
+
+
+# Resampling of borderline scores, enabled by EVAL_RESAMPLE
+EVAL_SAMPLING = SamplingPolicy.from_env()
+
+
+@pytest.fixture(scope="session")
+def assert_metrics():
+    """
+    DeepEval's ``assert_test``, deciding borderline scores by resampling.
+    
+    With ``EVAL_RESAMPLE=N``, a score within ``EVAL_RESAMPLE_BAND`` of its
+    threshold is measured N times concurrently and passes or fails on the
+    confidence interval of its mean (see ``src.sampling``); otherwise each
+    metric is measured once. Either way the metrics passed in hold their
+    scores afterwards (DeepEval's ``assert_test`` scores copies), so
+    ``eval_results`` records them. Judge prompts of all metrics share the
+    test case's context and answer (see ``src.prompts``).
+    """
+    check = assert_measured if EVAL_SAMPLING is None else MetricSampler(EVAL_SAMPLING).assert_test
+
+    def _assert_metrics(test_case, metrics):
+        # Judge calls of all metrics share the case's context and answer as a prefix
+        with shared_context(test_case):
+            return check(test_case, metrics)
+
+    return _assert_metrics
 
 
 # ============================================================================
@@ -153,23 +538,79 @@ def test_questions():
     Returns:
         List of tuples: (question, expected_type)
     """
-    return [
-        ("What is the main topic of this document?", "general"),
-        ("Can you summarize the key points?", "summary"),
-        ("What are the main findings?", "findings"),
-        ("What methodology was used?", "specific"),
-        ("Who are the authors?", "specific"),
-    ]
+    return list(TEST_QUESTIONS)
 
 
 @pytest.fixture
 def complex_questions():
     """Complex questions that require multi-step reasoning."""
-    return [
-        "Compare the methodology used in this paper with standard approaches",
-        "What are the key contributions and how do they relate to each other?",
-        "Explain the evaluation results and their significance",
-    ]
+    return list(COMPLEX_QUESTIONS)
+
+
+# Golden dataset built by ``python -m src.golden`` (GOLDEN_LIMIT caps the cases)
+GOLDEN_DATASET = os.getenv("GOLDEN_DATASET")
+
+
+@pytest.fixture
+def golden_case(request):
+    """
+    One case of the golden dataset (``GOLDEN_DATASET``).
+    
+    Tests using this fixture are parametrized over the dataset's case ids at
+    collection; each case is read from the file only when its test runs.
+    
+    Returns:
+        GoldenCase: question, expected_answer and expected_context
+    """
+    return read_case(GOLDEN_DATASET, request.param)
+
+
+# ============================================================================
+# Memory Profiling Fixtures
+# ============================================================================
+
+# Memory of session fixture builds and tests, measured when MEMORY_PROFILE=1,
+# MEMORY_PROFILE_PATH or MEMORY_MAX_RSS_MB is set (tracemalloc slows the run)
+MEMORY_PROFILER = MemoryProfiler(top=int(os.getenv("MEMORY_PROFILE_TOP", "5")))
+MEMORY_PROFILING = (
+    os.getenv("MEMORY_PROFILE") == "1"
+    or bool(os.getenv("MEMORY_PROFILE_PATH"))
+    or bool(os.getenv("MEMORY_MAX_RSS_MB"))
+)
+MEMORY_FAILURES: List[str] = []
+
+
+@pytest.fixture(scope="session")
+def memory_profiler():
+    """
+    Memory profiler of the session.
+    
+    Use ``with memory_profiler.measure("query", kind="query"):`` to measure
+    a single query inside a test. Empty unless memory profiling is enabled.
+    """
+    return MEMORY_PROFILER
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    """Measure each session fixture build and the footprint of its value."""
+    if not MEMORY_PROFILING or fixturedef.scope != "session" or fixturedef.argname == "memory_profiler":
+        yield
+        return
+    with MEMORY_PROFILER.measure(fixturedef.argname, kind="fixture"):
+        outcome = yield
+    if outcome.excinfo is None:
+        MEMORY_PROFILER.add_footprint(fixturedef.argname, outcome.get_result())
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Measure each test body (its queries and metric calls)."""
+    if not MEMORY_PROFILING:
+        yield
+        return
+    with MEMORY_PROFILER.measure(item.nodeid, kind="test"):
+        yield
 
 
 # ============================================================================
@@ -177,9 +618,103 @@ def complex_questions():
 # ============================================================================
 
 def pytest_configure(config):
-    """Register custom markers."""
+    """Register custom markers and start cost accounting (and agent tracing)."""
+    install_ledger(COST_LEDGER)
+    # Per-test costs feed the budget plugin's history (unless run with -p no:budget)
+    budget = config.pluginmanager.getplugin("budget")
+    if budget is not None:
+        budget.cost_of = lambda nodeid: COST_LEDGER.usage(case_id=nodeid)["cost"]
+    if PROMPT_STATS:
+        install_prefix_tracker(PROMPT_PREFIXES)
+    if AGENT_TRACING:
+        install_tracer(AGENT_TRACES)
     config.addinivalue_line("markers", "unit: Fast unit tests with mocked dependencies")
     config.addinivalue_line("markers", "integration: Integration tests with real API calls (slow)")
     config.addinivalue_line("markers", "evaluation: DeepEval metric evaluation tests")
     config.addinivalue_line("markers", "slow: Tests that take more than 5 seconds")
 
+
+def pytest_sessionfinish(session, exitstatus):
+    """Fail the run when the peak RSS exceeds ``MEMORY_MAX_RSS_MB``."""
+    max_rss = os.getenv("MEMORY_MAX_RSS_MB")
+    if not max_rss:
+        return
+    MEMORY_FAILURES.extend(MEMORY_PROFILER.check(max_rss_mb=float(max_rss)))
+    if MEMORY_FAILURES and session.exitstatus == pytest.ExitCode.OK:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize tests using ``golden_case`` over the golden dataset."""
+    if "golden_case" not in metafunc.fixturenames:
+        return
+    if not GOLDEN_DATASET:
+        skip = pytest.mark.skip(reason="GOLDEN_DATASET not set")
+        metafunc.parametrize("golden_case", [pytest.param(None, marks=skip)], indirect=True)
+        return
+    limit = os.getenv("GOLDEN_LIMIT")
+    index = index_dataset(GOLDEN_DATASET, limit=int(limit) if limit else None)
+    metafunc.parametrize(
+        "golden_case",
+        [offset for _, offset in index],
+        ids=[case_id for case_id, _ in index],
+        indirect=True
+    )
+
+
+def pytest_terminal_summary(terminalreporter):
+    """
+    Print the cost profile (``COST_PROFILE=1``) and save it (``COST_PROFILE_PATH``).
+    
+    Likewise prints the query front end, tool cache and snapshot counters,
+    prints (``AGENT_TRACE=1``) and saves (``AGENT_TRACE_PATH``) the agent
+    traces, writes the metric results (``EVAL_RESULTS_DIR``),
+    prints prompt prefix reuse (``PROMPT_STATS=1``) and prints
+    (``MEMORY_PROFILE=1``) and saves (``MEMORY_PROFILE_PATH``) the memory
+    report.
+    """
+    for frontend in QUERY_FRONTENDS:
+        stats = frontend.stats()
+        terminalreporter.write_line(
+            f"query front end ({type(frontend.backend).__name__}): {stats['executions']} executed, "
+            f"{stats['coalesced']} coalesced, {stats['rewritten']} rewritten, {stats['rejected']} rejected"
+        )
+    for cache in TOOL_CACHES:
+        stats = cache.stats()
+        terminalreporter.write_line(
+            f"tool cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries"
+        )
+    if SNAPSHOTS is not None:
+        stats = SNAPSHOTS.stats()
+        terminalreporter.write_line(f"snapshots: {stats['hits']} restored, {stats['misses']} built")
+    if MEMORY_PROFILING:
+        if os.getenv("MEMORY_PROFILE") == "1":
+            terminalreporter.write_sep("=", "memory profile")
+            terminalreporter.write_line(MEMORY_PROFILER.format_report())
+        memory_path = os.getenv("MEMORY_PROFILE_PATH")
+        if memory_path:
+            MEMORY_PROFILER.save(memory_path)
+        for failure in MEMORY_FAILURES:
+            terminalreporter.write_line(f"Memory limit exceeded: {failure}", red=True)
+    if PROMPT_PREFIXES.records:
+        terminalreporter.write_sep("=", "prompt prefixes")
+        terminalreporter.write_line(PROMPT_PREFIXES.format_summary())
+    if EVAL_RESULTS.store is not None and EVAL_RESULTS.results:
+        count = EVAL_RESULTS.flush()
+        terminalreporter.write_line(f"{count} metric results saved as run {EVAL_RESULTS.run_id}")
+    if AGENT_TRACES.traces:
+        if os.getenv("AGENT_TRACE") == "1":
+            terminalreporter.write_sep("=", "agent traces")
+            terminalreporter.write_line(format_trace_report(analyze_traces(AGENT_TRACES.traces)))
+        trace_path = os.getenv("AGENT_TRACE_PATH")
+        if trace_path:
+            AGENT_TRACES.save(trace_path)
+    if not COST_LEDGER.records:
+        return
+    if os.getenv("COST_PROFILE") == "1":
+        terminalreporter.write_sep("=", "cost profile")
+        terminalreporter.write_line(COST_LEDGER.format_profile())
+    profile_path = os.getenv("COST_PROFILE_PATH")
+    if profile_path:
+        COST_LEDGER.save(profile_path)
@@ -0,0 +1,51 @@
+"""
+Golden Dataset Evaluation Tests
+
+Tests RAG responses against a synthetic golden dataset (``GOLDEN_DATASET``)
+built with ``python -m src.golden``.
+"""
+
+import pytest
+from deepeval.metrics import AnswerRelevancyMetric, ContextualRecallMetric
+from deepeval.test_case import LLMTestCase
+
+
+@pytest.mark.evaluation
+class TestGoldenDataset:
+    """Test the RAG app on every case of the golden dataset."""
+
+    def test_golden_case(self, rag_app, golden_case, judge_model, eval_results, assert_metrics):
+        """
+        Test that the answer is relevant and the retrieval finds the expected context.
+
+        Contextual recall checks that the retrieved chunks support the
+        expected answer, which was written from the chunk the question was
+        generated from.
+
+        Args:
+            rag_app: RAG application fixture
+            golden_case: One case of the golden dataset
+            judge_model: DeepEval judge that records token usage
+            eval_results: Result recorder for the run
+            assert_metrics: ``assert_test`` that resamples borderline scores
+        """
+        with eval_results.timer():
+            actual_output = rag_app.query(golden_case.question)
+
+        test_case = LLMTestCase(
+            input=golden_case.question,
+            actual_output=actual_output,
+            expected_output=golden_case.expected_answer,
+            retrieval_context=rag_app.get_retrieval_context(golden_case.question),
+            context=golden_case.expected_context
+        )
+
+        metrics = [
+            AnswerRelevancyMetric(threshold=0.6, model=judge_model),
+            ContextualRecallMetric(threshold=0.6, model=judge_model),
+        ]
+
+        # Record the scores, including failing ones
+        eval_results.add(test_case, *metrics)
+
+        assert_metrics(test_case, metrics)
@@ -5,7 +5,6 @@ Tests whether RAG responses contain hallucinations (unsupported claims) using De
 """
 
 import pytest
-from deepeval import assert_test
 from deepeval.metrics import HallucinationMetric
 from deepeval.test_case import LLMTestCase
 from src.rag_app import RAGApplication
@@ -21,7 +20,7 @@ class TestHallucination:
         ("What methodology was used?", 0.3),
         ("What are the conclusions?", 0.3),
     ])
-    def test_hallucination_metric(self, rag_app, input_question, expected_hallucination_threshold):
+    def test_hallucination_metric(self, rag_app, input_question, expected_hallucination_threshold, judge_model, eval_results, assert_metrics):
         """
         Test that RAG responses do not contain hallucinations.
         
@@ -32,9 +31,13 @@ class TestHallucination:
             rag_app: RAG application fixture
             input_question: The question to ask
             expected_hallucination_threshold: Maximum acceptable hallucination score
+            judge_model: DeepEval judge that records token usage
+            eval_results: Result recorder for the run
+            assert_metrics: ``assert_test`` that resamples borderline scores
         """
         # Get response from RAG app
-        actual_output = rag_app.query(input_question)
+        with eval_results.timer():
+            actual_output = rag_app.query(input_question)
         
         # Get retrieval context - critical for detecting hallucinations
         retrieval_context = rag_app.get_retrieval_context(input_question)
@@ -48,16 +51,19 @@ class TestHallucination:
         
         # Create metric with threshold (lower is better)
         # Note: HallucinationMetric uses threshold differently - it's a maximum acceptable score
-        hallucination_metric = HallucinationMetric(threshold=expected_hallucination_threshold)
+        hallucination_metric = HallucinationMetric(threshold=expected_hallucination_threshold, model=judge_model)
+        
+        # Record the scores, including failing ones
+        eval_results.add(test_case, hallucination_metric)
         
         # Assert test passes
-        assert_test(test_case, [hallucination_metric])
+        assert_metrics(test_case, [hallucination_metric])
         
         # Verify score is below threshold (lower hallucination is better)
         assert hallucination_metric.score <= expected_hallucination_threshold, \
             f"Hallucination score {hallucination_metric.score} above threshold {expected_hallucination_threshold}"
     
-    def test_hallucination_detailed(self, rag_app):
+    def test_hallucination_detailed(self, rag_app, judge_model):
         """Test hallucination detection with detailed output."""
         question = "What are the main findings in this document?"
         actual_output = rag_app.query(question)
@@ -69,7 +75,7 @@ class TestHallucination:
             retrieval_context=retrieval_context
         )
         
-        hallucination_metric = HallucinationMetric(threshold=0.5)
+        hallucination_metric = HallucinationMetric(threshold=0.5, model=judge_model)
         hallucination_metric.measure(test_case)
         
         # Print detailed results
@@ -82,7 +88,7 @@ class TestHallucination:
         # Lower score is better for hallucination
         assert hallucination_metric.score <= 0.5
     
-    def test_hallucination_with_complex_queries(self, rag_app):
+    def test_hallucination_with_complex_queries(self, rag_app, judge_model):
         """Test hallucination detection with complex, multi-part queries."""
         question = "What is this document about and what are its main contributions?"
         actual_output = rag_app.query(question)
@@ -94,7 +100,7 @@ class TestHallucination:
             retrieval_context=retrieval_context
         )
         
-        hallucination_metric = HallucinationMetric(threshold=0.4)
+        hallucination_metric = HallucinationMetric(threshold=0.4, model=judge_model)
         hallucination_metric.measure(test_case)
         
         # Lower score means less hallucination
@@ -0,0 +1,217 @@
+"""
+Unit Tests for Budgeted Agent Runs
+
+Tests step, time and token budgets and speculative tool prefetch.
+"""
+
+import threading
+import time
+from typing import Any, List
+
+import pytest
+from llama_index.core.agent import FunctionCallingAgentWorker
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_chat_callback
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.llms.llm import ToolSelection
+from llama_index.core.tools import FunctionTool
+
+import src.agent_budget
+from src.agent_budget import AgentBudget, BudgetedAgent, predict_tool
+from src.tool_cache import ToolResultCache, memoize_agent_tools
+
+
+class ScriptedLLM(FunctionCallingLLM):
+    """Function calling LLM that makes scripted tool calls, then answers."""
+
+    script: List[Any] = []
+    turn: int = 0
+    delay: float = 0.0
+    tools_seen: List[int] = []
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="scripted-test", is_function_calling_model=True)
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        self.tools_seen.append(len(tools))
+        return {"messages": list(chat_history or []), "tools": tools}
+
+    @llm_chat_callback()
+    def chat(self, messages, tools=(), **kwargs):
+        time.sleep(self.delay)
+        calls = self.script[self.turn] if tools and self.turn < len(self.script) else []
+        self.turn += 1
+        message = ChatMessage(role="assistant", content="" if calls else "Final answer.")
+        message.additional_kwargs["tool_calls"] = calls
+        return ChatResponse(message=message, raw={"usage": {"prompt_tokens": 100, "completion_tokens": 10}})
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True, **kwargs):
+        return [
+            ToolSelection(tool_id=f"call-{i}", tool_name=name, tool_kwargs=args)
+            for i, (name, args) in enumerate(response.message.additional_kwargs.get("tool_calls", []))
+        ]
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        return CompletionResponse(text="")
+
+    def stream_chat(self, messages, **kwargs):
+        raise NotImplementedError
+
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        raise NotImplementedError
+
+    async def achat(self, messages, **kwargs):
+        return self.chat(messages, **kwargs)
+
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        return self.complete(prompt)
+
+    async def astream_chat(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def astream_complete(self, prompt, formatted=False, **kwargs):
+        raise NotImplementedError
+
+
+class CountingTool:
+    """Slow document tool that counts its calls."""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str) -> str:
+        """Answer questions about the paper."""
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(query)
+        return f"context for {query}"
+
+
+def make_agent(script, llm_delay=0.0, tool_delay=0.0, cache=None):
+    """Agent with vector and summary tools over one paper."""
+    llm = ScriptedLLM(script=script, delay=llm_delay, tools_seen=[])
+    vector, summary = CountingTool(tool_delay), CountingTool(tool_delay)
+    tools = [
+        FunctionTool.from_defaults(fn=vector, name="vector_tool_paper"),
+        FunctionTool.from_defaults(fn=summary, name="summary_tool_paper"),
+    ]
+    agent = FunctionCallingAgentWorker.from_tools(tools, llm=llm).as_agent()
+    if cache is not None:
+        memoize_agent_tools(agent, cache)
+    return agent, llm, vector, summary
+
+
+def loop(n, query="roles"):
+    """Script of n consecutive vector tool calls."""
+    return [[("vector_tool_paper", {"query": f"{query} {i}"})] for i in range(n)]
+
+
+@pytest.mark.unit
+class TestAgentBudget:
+    """Test budgets on the agent loop."""
+
+    def test_step_budget_forces_final_answer(self):
+        """Test that an agent that would loop 10 times answers after the step budget."""
+        agent, llm, vector, _ = make_agent(loop(10))
+        budgeted = BudgetedAgent(agent, AgentBudget(max_steps=3), prefetch=False)
+
+        response = budgeted.query("What roles are defined?")
+
+        assert str(response) == "Final answer."
+        assert len(vector.calls) == 3
+        assert budgeted.last_run.stopped_by == "steps"
+        assert budgeted.last_run.steps == 4
+        assert llm.tools_seen[-1] == 0
+
+    def test_token_budget(self):
+        """Test that LLM tokens count toward the budget."""
+        agent, _, vector, _ = make_agent(loop(10))
+        budgeted = BudgetedAgent(agent, AgentBudget(max_tokens=200), prefetch=False)
+        budgeted.query("What roles are defined?")
+        assert budgeted.last_run.stopped_by == "tokens"
+        assert budgeted.last_run.tokens >= 200
+        assert len(vector.calls) == 2
+
+    def test_time_budget(self):
+        """Test that the run stops calling tools once its time is used up."""
+        agent, _, vector, _ = make_agent(loop(10), tool_delay=0.05)
+        budgeted = BudgetedAgent(agent, AgentBudget(max_seconds=0.12), prefetch=False)
+        budgeted.query("What roles are defined?")
+        assert budgeted.last_run.stopped_by == "time"
+        assert len(vector.calls) < 10
+
+    def test_within_budget_runs_to_completion(self):
+        """Test that a run within budget is not cut short."""
+        agent, _, vector, _ = make_agent(loop(2))
+        budgeted = BudgetedAgent(agent, AgentBudget(max_steps=5), prefetch=False)
+        budgeted.query("What roles are defined?")
+        assert budgeted.last_run.stopped_by is None
+        assert budgeted.last_run.steps == 3
+
+    def test_invalid_budget(self):
+        """Test that non-positive limits are rejected."""
+        with pytest.raises(ValueError):
+            AgentBudget(max_steps=0)
+
+
+@pytest.mark.unit
+class TestPrefetch:
+    """Test speculative tool prefetch."""
+
+    def test_predict_tool_follows_router_heuristic(self):
+        """Test that summary questions predict the summary tool and others the vector tool."""
+        agent, _, _, _ = make_agent([])
+        tools = agent.agent_worker._get_tools("")
+        assert predict_tool(tools, "Can you summarize the key points?").metadata.name == "summary_tool_paper"
+        assert predict_tool(tools, "What roles are defined?").metadata.name == "vector_tool_paper"
+        assert predict_tool([], "anything") is None
+
+    def test_prefetch_overlaps_planning_call(self):
+        """Test that a matching tool call is answered by the prefetch started alongside planning."""
+        question = "What roles are defined?"
+        agent, _, vector, _ = make_agent(
+            [[("vector_tool_paper", {"query": question})]], llm_delay=0.1, tool_delay=0.1
+        )
+        budgeted = BudgetedAgent(agent)
+
+        start = time.perf_counter()
+        budgeted.query(question)
+        elapsed = time.perf_counter() - start
+
+        assert vector.calls == [question]
+        assert budgeted.last_run.prefetch_tool == "vector_tool_paper"
+        assert budgeted.last_run.prefetch_hit
+        # Two LLM calls and one tool call, with the tool call hidden behind the first LLM call
+        assert elapsed < 0.28
+        assert budgeted.stats()["prefetch"]["hit_rate"] == 1.0
+
+    def test_call_before_prediction_still_hits(self, monkeypatch):
+        """Test that a tool call made while the prediction is still resolving waits for it."""
+        def slow_predict(tools, message):
+            time.sleep(0.1)
+            return predict_tool(tools, message)
+
+        monkeypatch.setattr(src.agent_budget, "predict_tool", slow_predict)
+        question = "What roles are defined?"
+        agent, _, vector, _ = make_agent([[("vector_tool_paper", {"query": question})]])
+        budgeted = BudgetedAgent(agent)
+        budgeted.query(question)
+
+        assert budgeted.last_run.prefetch_hit
+        assert vector.calls == [question]
+
+    def test_mismatched_prefetch_lands_in_tool_cache(self):
+        """Test that a prefetch the agent does not use is cached for later calls."""
+        cache = ToolResultCache()
+        question = "What roles are defined?"
+        agent, _, vector, _ = make_agent([[("vector_tool_paper", {"query": "roles"})]], cache=cache)
+        budgeted = BudgetedAgent(agent)
+        budgeted.query(question)
+        budgeted.close()
+
+        assert not budgeted.last_run.prefetch_hit
+        assert sorted(vector.calls) == sorted([question, "roles"])
+        assert cache.stats()["entries"] == 2
@@ -0,0 +1,205 @@
+"""
+Unit Tests for Agent Traces
+
+Tests recording agent runs step by step and analyzing the recorded traces.
+"""
+
+import time
+from typing import Any, List
+
+import pytest
+from llama_index.core.agent import FunctionCallingAgentWorker
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, CompletionResponse, LLMMetadata
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.llms.llm import ToolSelection
+from llama_index.core.tools import FunctionTool
+
+from src.agent_trace import (
+    AgentTraceRecorder,
+    TraceSpan,
+    analyze_traces,
+    format_trace_report,
+    install_tracer,
+    load_traces,
+    trace_agent_tools,
+)
+
+
+class ScriptedLLM(FunctionCallingLLM):
+    """Function calling LLM that calls scripted tools, then answers."""
+
+    script: List[Any] = []
+    turn: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="scripted-test", is_function_calling_model=True)
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        messages = list(chat_history or [])
+        if user_msg is not None:
+            messages.append(ChatMessage(role="user", content=str(user_msg)))
+        return {"messages": messages}
+
+    @llm_chat_callback()
+    def chat(self, messages, **kwargs):
+        calls = self.script[self.turn] if self.turn < len(self.script) else []
+        self.turn += 1
+        message = ChatMessage(role="assistant", content="" if calls else "Final answer.")
+        message.additional_kwargs["tool_calls"] = calls
+        return ChatResponse(message=message, raw={"usage": {"prompt_tokens": 10, "completion_tokens": 2}})
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True, **kwargs):
+        return [
+            ToolSelection(tool_id=f"call-{i}", tool_name=name, tool_kwargs=args)
+            for i, (name, args) in enumerate(response.message.additional_kwargs.get("tool_calls", []))
+        ]
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        return CompletionResponse(text="")
+
+    def stream_chat(self, messages, **kwargs):
+        raise NotImplementedError
+
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        raise NotImplementedError
+
+    async def achat(self, messages, **kwargs):
+        return self.chat(messages, **kwargs)
+
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        return self.complete(prompt)
+
+    async def astream_chat(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def astream_complete(self, prompt, formatted=False, **kwargs):
+        raise NotImplementedError
+
+
+def lookup(query: str) -> str:
+    """Look up a fact about the paper."""
+    time.sleep(0.02)
+    return f"fact about {query}"
+
+
+class SynthesisLLM(CustomLLM):
+    """Slow completion LLM standing in for a query engine's synthesis."""
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="synthesis-test")
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        time.sleep(0.05)
+        return CompletionResponse(text="An answer.", additional_kwargs={"prompt_tokens": 5, "completion_tokens": 1})
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        yield self.complete(prompt)
+
+
+def synthesize(query: str) -> str:
+    """Answer a question about the paper with an LLM call."""
+    return SynthesisLLM().complete(query).text
+
+
+def make_agent(script, fn=lookup):
+    """Agent over a single tool (``lookup`` by default), with traced tools."""
+    llm = ScriptedLLM(script=script)
+    tools = [FunctionTool.from_defaults(fn=fn, name="vector_tool_paper")]
+    agent = FunctionCallingAgentWorker.from_tools(tools, llm=llm).as_agent()
+    return trace_agent_tools(agent)
+
+
+@pytest.fixture
+def recorder():
+    """Recorder registered on the dispatcher for one test."""
+    recorder = AgentTraceRecorder()
+    handler = install_tracer(recorder)
+    yield recorder
+    get_dispatcher().event_handlers.remove(handler)
+
+
+@pytest.mark.unit
+class TestAgentTrace:
+    """Test trace recording and analysis."""
+
+    def test_records_steps_llm_and_tool_calls(self, recorder):
+        """Test that a two-tool-call run records each step, LLM call and tool call."""
+        agent = make_agent([
+            [("vector_tool_paper", {"query": "roles"})],
+            [("vector_tool_paper", {"query": "roles"})],
+        ])
+        agent.query("What roles does MetaGPT define?")
+
+        (trace,) = recorder.traces
+        assert trace.status == "ok"
+        assert trace.steps == 3
+        assert [s.kind for s in trace.spans] == ["llm", "tool", "llm", "tool", "llm"]
+        tool_span = trace.spans[1]
+        assert tool_span.name == "vector_tool_paper"
+        assert "roles" in tool_span.args
+        assert tool_span.duration >= 0.02
+        assert trace.spans[0].prompt_tokens == 10
+        assert trace.time_by_kind()["tool"] >= 0.04
+
+    def test_llm_calls_inside_tools_are_not_double_counted(self, recorder):
+        """Test that an LLM call made by a tool is its child and counts as LLM time only."""
+        make_agent([[("vector_tool_paper", {"query": "roles"})]], fn=synthesize).query("Roles?")
+
+        (trace,) = recorder.traces
+        assert [(s.kind, s.parent) for s in trace.spans] == [
+            ("llm", None), ("llm", "vector_tool_paper"), ("tool", None), ("llm", None)
+        ]
+        nested, tool_span = trace.spans[1], trace.spans[2]
+        times = trace.time_by_kind()
+        assert times["llm"] >= nested.duration >= 0.05
+        assert times["tool"] == pytest.approx(tool_span.duration - nested.duration)
+        assert sum(times.values()) == pytest.approx(trace.duration)
+        assert analyze_traces([trace])["by_step"][1] == pytest.approx(trace.spans[0].duration + tool_span.duration)
+
+    def test_untraced_calls_are_ignored(self, recorder):
+        """Test that tool calls outside an agent run are not recorded."""
+        agent = make_agent([])
+        agent.agent_worker._get_tools("")[0].call(query="x")
+        assert recorder.traces == []
+
+    def test_failed_run_is_recorded_as_error(self, recorder):
+        """Test that a run raising an exception is finished with error status."""
+        agent = make_agent([[("vector_tool_paper", {"query": "x"})]])
+        agent.agent_worker._get_tools = lambda message: (_ for _ in ()).throw(RuntimeError("boom"))
+        with pytest.raises(RuntimeError):
+            agent.query("Break")
+        (trace,) = recorder.traces
+        assert trace.status == "error"
+
+    def test_save_load_and_analyze(self, recorder, tmp_path):
+        """Test that saved traces load back and analyze into step and tool statistics."""
+        make_agent([[("vector_tool_paper", {"query": "a"})]]).query("One tool call")
+        make_agent([]).query("No tool calls")
+        path = str(tmp_path / "traces.jsonl")
+        recorder.save(path)
+
+        traces = load_traces(path)
+        assert [t.steps for t in traces] == [2, 1]
+        summary = analyze_traces(traces)
+        assert summary["runs"] == 2
+        assert summary["steps"]["histogram"] == {1: 1, 2: 1}
+        assert summary["by_tool"]["vector_tool_paper"]["calls"] == 1
+        assert summary["tool_calls"]["max"] == 1
+        assert abs(sum(t["share"] for t in summary["time"].values()) - 1.0) < 1e-6
+        assert "Agent runs: 2" in format_trace_report(summary)
+
+    def test_repeated_tool_calls_are_counted(self):
+        """Test that identical tool calls within a run are flagged as repeats."""
+        recorder = AgentTraceRecorder()
+        trace = recorder.start("q")
+        for _ in range(3):
+            trace.add_span(TraceSpan(kind="tool", name="t", step=1, start=0.0, duration=0.1, args='{"q": 1}'))
+        recorder.finish(trace)
+        assert analyze_traces(recorder.traces)["by_tool"]["t"]["repeated"] == 2
@@ -0,0 +1,107 @@
+"""
+Unit Tests for Score Analytics
+
+Tests distributions, correlations, pass-rate curves and bootstrap intervals
+over metric score matrices.
+"""
+
+import numpy as np
+import pytest
+
+from src.analytics import (
+    ScoreMatrix,
+    analyze,
+    bootstrap_means,
+    correlation,
+    distributions,
+    matrix_from_columns,
+    pass_rate_curves,
+    rank_columns,
+)
+
+
+nan = float("nan")
+
+
+@pytest.mark.unit
+class TestScoreStatistics:
+    """Test per-metric and pairwise statistics."""
+
+    def test_distributions(self):
+        """Test that missing scores are ignored per metric."""
+        scores = np.array([[0.2, 1.0], [0.4, nan], [0.6, 0.0], [1.0, nan]])
+        stats = distributions(scores, pcts=(50,), bins=5)
+
+        assert stats["count"].tolist() == [4, 2]
+        assert stats["mean"].tolist() == pytest.approx([0.55, 0.5])
+        assert stats["p50"].tolist() == pytest.approx([0.5, 0.5])
+        assert (stats["min"].tolist(), stats["max"].tolist()) == ([0.2, 0.0], [1.0, 1.0])
+        assert stats["histogram"].tolist() == [[0, 1, 1, 1, 1], [1, 0, 0, 0, 1]]
+        assert np.isnan(distributions(np.full((3, 1), nan))["mean"][0])
+
+    def test_correlation(self):
+        """Test pairwise Pearson and Spearman correlation over common cases."""
+        x = np.array([0.1, 0.2, 0.3, 0.4, 0.9])
+        scores = np.column_stack([x, x ** 3, 1 - x, np.full(5, 0.5)])
+        scores[0, 1] = nan
+
+        pearson = correlation(scores)
+        assert pearson[0, 2] == pytest.approx(-1.0)
+        assert 0.9 < pearson[0, 1] < 1.0
+        assert np.isnan(pearson[0, 3])
+        assert correlation(scores, "spearman")[0, 1] == pytest.approx(1.0)
+        assert rank_columns(np.array([[0.5], [0.1], [0.5], [nan]]))[:3, 0].tolist() == [2.5, 1.0, 2.5]
+        with pytest.raises(ValueError):
+            correlation(scores, "kendall")
+
+
+@pytest.mark.unit
+class TestPassRates:
+    """Test threshold analytics."""
+
+    def test_pass_rate_curves(self):
+        """Test both metric directions at every threshold."""
+        scores = np.array([[0.2, 0.2], [0.5, 0.5], [0.8, nan], [0.9, 0.9]])
+        rates = pass_rate_curves(scores, ["Faithfulness", "Hallucination"], thresholds=[0.0, 0.5, 1.0])
+
+        assert rates[0].tolist() == [1.0, 0.75, 0.0]
+        assert rates[1].tolist() == pytest.approx([0.0, 2 / 3, 1.0])
+
+    def test_bootstrap_interval(self):
+        """Test that the interval covers the mean and narrows with more cases."""
+        rng = np.random.default_rng(0)
+        small = rng.normal(0.6, 0.1, size=(50, 1))
+        large = rng.normal(0.6, 0.1, size=(5000, 1))
+
+        low, high = bootstrap_means(small, n_resamples=500, seed=1)
+        assert low[0] < small.mean() < high[0]
+        large_low, large_high = bootstrap_means(large, n_resamples=500, seed=1)
+        assert large_high[0] - large_low[0] < (high[0] - low[0]) / 5
+        assert bootstrap_means(small, 200, seed=2)[0] == pytest.approx(bootstrap_means(small, 200, seed=2)[0])
+        with pytest.raises(ValueError):
+            bootstrap_means(small, confidence=1.0)
+
+    def test_analyze_stored_results(self):
+        """Test the full report from result rows, including thresholds that reach a pass rate."""
+        rng = np.random.default_rng(3)
+        cases = np.repeat([f"case-{i}" for i in range(400)], 2)
+        metrics = np.tile(["Faithfulness", "Hallucination"], 400)
+        faithfulness = rng.uniform(0.4, 1.0, size=400)
+        score = np.column_stack([faithfulness, 1 - faithfulness]).ravel()
+        matrix = matrix_from_columns({"case_id": cases, "metric": metrics, "score": score})
+
+        report = analyze(matrix, pass_thresholds={"Faithfulness": 0.7, "Hallucination": 0.3}, n_resamples=200)
+
+        assert matrix.scores.shape == (400, 2)
+        assert report.correlation[0, 1] == pytest.approx(-1.0)
+        assert report.pass_rate["Faithfulness"] == pytest.approx(report.pass_rate["Hallucination"])
+        low, high = report.pass_rate_ci["Faithfulness"]
+        assert low < report.pass_rate["Faithfulness"] < high
+        assert report.threshold_for("Faithfulness", 0.75) == 0.55
+        assert report.threshold_for("Hallucination", 0.75) == 0.45
+        assert "Hallucination" in report.format_report()
+        assert report.to_dict()["metrics"]["Faithfulness"]["count"] == 400
+        with pytest.raises(ValueError):
+            analyze(matrix, pass_thresholds={"Bias": 0.5})
+        with pytest.raises(ValueError):
+            ScoreMatrix(np.zeros((3, 2)), ["Faithfulness"])
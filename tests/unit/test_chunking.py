@@ -0,0 +1,110 @@
+"""
+Unit Tests for Chunking Strategies
+
+Tests strategy selection, page-aware splitting and the chunk artifact cache.
+"""
+
+import pytest
+from llama_index.core.schema import Document
+
+from src.chunking import (
+    ChunkStore,
+    FixedTokenChunker,
+    PageChunker,
+    SentenceChunker,
+    SentenceWindowChunker,
+    chunker_from_config,
+    get_chunker,
+)
+
+
+SENTENCES = " ".join(f"Sentence number {i} describes the MetaGPT agents." for i in range(200))
+
+
+@pytest.fixture
+def document_file(tmp_path):
+    """A text document long enough to need several chunks."""
+    path = tmp_path / "paper.txt"
+    path.write_text(SENTENCES)
+    return str(path)
+
+
+@pytest.mark.unit
+class TestStrategies:
+    """Test chunking strategies."""
+
+    def test_get_chunker_by_name(self):
+        """Test that strategies are created by name with parameters."""
+        chunker = get_chunker("fixed", chunk_size=256, chunk_overlap=10)
+        assert isinstance(chunker, FixedTokenChunker)
+        assert chunker.params() == {"chunk_size": 256, "chunk_overlap": 10}
+        with pytest.raises(ValueError):
+            get_chunker("nonexistent")
+
+    def test_default_overlap_fits_small_chunk_size(self, monkeypatch):
+        """Test that the configured strategy's default overlap is clamped to a small CHUNK_SIZE."""
+        monkeypatch.setenv("CHUNKING_STRATEGY", "sentence")
+        monkeypatch.setenv("CHUNK_SIZE", "128")
+        monkeypatch.delenv("CHUNK_OVERLAP", raising=False)
+        assert chunker_from_config().params() == {"chunk_size": 128, "chunk_overlap": 25}
+
+        monkeypatch.setenv("CHUNK_SIZE", "1024")
+        assert chunker_from_config().params() == {"chunk_size": 1024, "chunk_overlap": 200}
+
+    def test_cache_key_depends_on_params(self):
+        """Test that different parameters give different cache keys."""
+        assert SentenceChunker(512).cache_key() != SentenceChunker(1024).cache_key()
+        assert SentenceChunker(512).cache_key() == SentenceChunker(512).cache_key()
+        assert SentenceChunker(512, 20).cache_key() != FixedTokenChunker(512, 20).cache_key()
+
+    def test_smaller_chunks_give_more_nodes(self):
+        """Test that chunk size controls the number of nodes."""
+        documents = [Document(text=SENTENCES)]
+        small = SentenceChunker(chunk_size=128, chunk_overlap=0).split(documents)
+        large = SentenceChunker(chunk_size=1024, chunk_overlap=0).split(documents)
+        assert len(small) > len(large)
+
+    def test_page_chunks_stay_within_pages(self):
+        """Test that page-aware chunks never span two pages."""
+        pages = [
+            Document(text="MetaGPT page one.", metadata={"page_label": "1"}),
+            Document(text="MetaGPT page two.", metadata={"page_label": "2"}),
+        ]
+        nodes = PageChunker().split(pages)
+        assert [n.metadata["page_label"] for n in nodes] == ["1", "2"]
+        assert nodes[0].get_content() == "MetaGPT page one."
+
+    def test_window_nodes_expand_before_synthesis(self):
+        """Test that sentence-window nodes carry their window."""
+        chunker = SentenceWindowChunker(window_size=1)
+        nodes = chunker.split([Document(text="First one. Second one. Third one.")])
+        assert len(nodes) == 3
+        assert "First one." in nodes[1].metadata["window"]
+        assert len(chunker.postprocessors()) == 1
+
+
+@pytest.mark.unit
+class TestChunkStore:
+    """Test the chunk artifact cache."""
+
+    def test_artifacts_are_reused(self, document_file, tmp_path):
+        """Test that a second store loads the artifact instead of re-parsing."""
+        strategy = SentenceChunker(chunk_size=128, chunk_overlap=0)
+        first = ChunkStore(str(tmp_path / "cache")).get_nodes(document_file, strategy)
+
+        store = ChunkStore(str(tmp_path / "cache"))
+        second = store.get_nodes(document_file, strategy)
+        assert (store.hits, store.misses) == (1, 0)
+        assert [n.get_content() for n in second] == [n.get_content() for n in first]
+        assert [n.node_id for n in second] == [n.node_id for n in first]
+
+    def test_params_and_content_change_invalidate(self, document_file, tmp_path):
+        """Test that new parameters or document content miss the cache."""
+        store = ChunkStore(str(tmp_path / "cache"))
+        store.get_nodes(document_file, SentenceChunker(chunk_size=128, chunk_overlap=0))
+        store.get_nodes(document_file, SentenceChunker(chunk_size=256, chunk_overlap=0))
+        with open(document_file, "a") as f:
+            f.write(" A new closing sentence.")
+        nodes = store.get_nodes(document_file, SentenceChunker(chunk_size=128, chunk_overlap=0))
+        assert store.misses == 3
+        assert "closing sentence" in nodes[-1].get_content()
@@ -0,0 +1,125 @@
+"""
+Unit Tests for Shared HTTP Clients
+
+Tests that LLM, embedding and judge clients share pooled connections.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from pydantic import BaseModel
+
+from src.clients import ClientFactory, PoolConfig
+from src.cost import CostLedger, CountingJudge, attribute
+
+
+def chat_completion(request):
+    """Mock OpenAI chat completion endpoint."""
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": '{"verdict": "yes"}'},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+    })
+
+
+class Verdict(BaseModel):
+    """DeepEval-style verdict schema."""
+
+    verdict: str
+
+
+@pytest.fixture
+def factory():
+    """Factory whose clients talk to a mock transport."""
+    factory = ClientFactory(
+        PoolConfig(max_connections=8, timeout=5.0),
+        transport=httpx.MockTransport(chat_completion),
+        async_transport=httpx.MockTransport(chat_completion),
+    )
+    yield factory
+    factory.close()
+
+
+@pytest.mark.unit
+class TestClientFactory:
+    """Test client sharing and configuration."""
+
+    def test_pool_config_from_env(self, monkeypatch):
+        """Test that pool limits are read from the environment."""
+        monkeypatch.setenv("HTTP_MAX_CONNECTIONS", "12")
+        monkeypatch.setenv("HTTP_TIMEOUT", "7.5")
+        config = PoolConfig.from_env()
+        assert config.max_connections == 12
+        assert config.timeouts().read == 7.5
+        assert config.max_keepalive_connections == 20
+
+    def test_models_share_http_clients(self, factory):
+        """Test that the LLM, embedding model and judge use the same pools."""
+        llm = factory.llm("gpt-3.5-turbo", api_key="sk-test")
+        embed_model = factory.embed_model(api_key="sk-test")
+        judge = factory.judge(api_key="sk-test")
+
+        assert llm._http_client is factory.http_client
+        assert embed_model._http_client is factory.http_client
+        assert llm._async_http_client is embed_model._async_http_client is factory.async_http_client
+        assert judge.client._client is factory.http_client
+        assert factory.judge(api_key="sk-test").client is judge.client
+
+    def test_judge_generates_through_pool(self, factory):
+        """Test that the judge returns the completion text sync and async."""
+        judge = factory.judge("gpt-4o", api_key="sk-test")
+        assert judge.generate("Is this faithful?") == '{"verdict": "yes"}'
+        assert asyncio.run(judge.a_generate("Is this faithful?")) == '{"verdict": "yes"}'
+
+    def test_judge_parses_schema(self, factory):
+        """Test that a schema is sent as a structured output and parsed, also through CountingJudge."""
+        ledger = CostLedger()
+        judge = CountingJudge(ledger, inner=factory.judge("gpt-4o", api_key="sk-test"))
+
+        assert judge.generate("Is this faithful?", schema=Verdict) == Verdict(verdict="yes")
+        assert asyncio.run(judge.a_generate("Is this faithful?", schema=Verdict)) == Verdict(verdict="yes")
+        assert [r.prompt_tokens for r in ledger.records] == [5, 5]
+
+    def test_counting_judge_records_reported_usage(self, factory):
+        """Test that judge calls are recorded with the usage of the request sent."""
+        ledger = CostLedger()
+        judge = CountingJudge(ledger, inner=factory.judge("gpt-4o", api_key="sk-test", assemble=True))
+
+        with attribute(case_id="a", stage="metric:Faithfulness"):
+            judge.generate("Is this faithful?")
+            asyncio.run(judge.a_generate("Is this faithful?"))
+
+        assert [(r.prompt_tokens, r.completion_tokens) for r in ledger.records] == [(5, 3), (5, 3)]
+        assert {r.stage for r in ledger.records} == {"metric:Faithfulness"}
+
+    def test_async_pool_per_event_loop(self, factory):
+        """Test that each event loop gets its own pool, reused within the loop."""
+        client = factory.async_http_client
+
+        async def pools():
+            return client.pool(), client.pool()
+
+        first, again = asyncio.run(pools())
+        second, _ = asyncio.run(pools())
+        assert first is again
+        assert first is not second
+        assert first.is_closed and second.is_closed
+
+    def test_aclose_closes_running_loop_pool(self, factory):
+        """Test that closing the shared async client closes the running loop's pool."""
+        client = factory.async_http_client
+
+        async def close():
+            pool = client.pool()
+            await client.aclose()
+            return pool
+
+        assert asyncio.run(close()).is_closed
@@ -0,0 +1,148 @@
+"""
+Unit Tests for the Model Comparison Runner
+
+Tests shared retrieval, concurrent fan-out and the comparison matrix.
+"""
+
+import time
+
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from src.compare import ModelComparison, Variant, cheapest_passing, format_matrix
+from src.cost import CostLedger
+
+
+class SharedRetrieval:
+    """``RAGApplication`` stand-in that counts retrievals."""
+
+    def __init__(self):
+        self.batches = []
+
+    def retrieve_batch(self, questions):
+        self.batches.append(list(questions))
+        return [[NodeWithScore(node=TextNode(text=f"Context for {q}"), score=1.0)] for q in questions]
+
+
+class ScriptedSynthesizer:
+    """Synthesizer stand-in whose answer quality and price depend on the model."""
+
+    def __init__(self, variant, ledger, delay=0.05):
+        self.variant = variant
+        self.ledger = ledger
+        self.delay = delay
+        self.contexts = []
+
+    def synthesize(self, question, nodes):
+        time.sleep(self.delay)
+        self.contexts.append(nodes[0].node.get_content())
+        self.ledger.record(self.variant.model, 1000, 100)
+        quality = "good" if self.variant.model != "gpt-3.5-turbo" else "vague"
+        return f"A {quality} answer to {question}"
+
+
+class AnswerQualityMetric:
+    """Metric stand-in scoring good answers 0.9 and vague ones 0.4."""
+
+    def __init__(self, threshold=0.7):
+        self.threshold = threshold
+        self.score = None
+        self.success = None
+
+    def measure(self, test_case):
+        assert test_case.retrieval_context == [f"Context for {test_case.input}"]
+        self.score = 0.9 if "good" in test_case.actual_output else 0.4
+        self.success = self.score >= self.threshold
+        return self.score
+
+
+class TimeoutMetric(AnswerQualityMetric):
+    """Metric stand-in whose judge times out on one question."""
+
+    def measure(self, test_case):
+        if "pool" in test_case.input:
+            raise TimeoutError("judge timed out")
+        return super().measure(test_case)
+
+
+class MisconfiguredMetric(AnswerQualityMetric):
+    """Metric stand-in that fails on every answer."""
+
+    def measure(self, test_case):
+        raise PermissionError("invalid judge API key")
+
+
+def compare(variants, ledger, metrics=(AnswerQualityMetric,)):
+    """Comparison over stand-ins, keeping the synthesizers for inspection."""
+    synthesizers = {}
+
+    def factory(variant):
+        synthesizers[variant.label] = ScriptedSynthesizer(variant, ledger)
+        return synthesizers[variant.label]
+
+    rag_app = SharedRetrieval()
+    comparison = ModelComparison(rag_app, variants, list(metrics), ledger=ledger, synthesizer_factory=factory)
+    return comparison, rag_app, synthesizers
+
+
+@pytest.mark.unit
+class TestModelComparison:
+    """Test comparing synthesis variants."""
+
+    def test_variant_parsing(self):
+        """Test model and model@temperature specs."""
+        assert Variant.parse("gpt-4o-mini") == Variant("gpt-4o-mini", 0.0)
+        assert Variant.parse(" gpt-4o@0.7 ").label == "gpt-4o@0.7"
+        with pytest.raises(ValueError):
+            ModelComparison(SharedRetrieval(), [Variant("a"), Variant("a")], [], synthesizer_factory=lambda v: None)
+
+    def test_retrieval_shared_and_synthesis_concurrent(self):
+        """Test that one retrieval feeds every variant and variants run side by side."""
+        ledger = CostLedger()
+        variants = [Variant("gpt-4o-mini"), Variant("gpt-3.5-turbo"), Variant("gpt-4o", 0.7)]
+        comparison, rag_app, synthesizers = compare(variants, ledger)
+        questions = ["What roles are defined?", "What is the message pool?"]
+
+        start = time.perf_counter()
+        comparison.run(questions)
+        elapsed = time.perf_counter() - start
+
+        assert rag_app.batches == [questions]
+        assert all(sorted(s.contexts) == [f"Context for {q}" for q in sorted(questions)] for s in synthesizers.values())
+        # Six 50 ms synthesis calls on eight workers
+        assert elapsed < 0.2
+
+    def test_matrix_and_cheapest_passing(self):
+        """Test per-variant cost and quality and picking the cheapest passing variant."""
+        ledger = CostLedger()
+        variants = [Variant("gpt-4o"), Variant("gpt-4o-mini"), Variant("gpt-3.5-turbo")]
+        comparison, _, _ = compare(variants, ledger)
+        matrix = comparison.run(["What roles are defined?", "What is the message pool?"])
+        rows = {row["variant"]: row for row in matrix}
+
+        assert rows["gpt-4o@0"]["prompt_tokens"] == 2000
+        assert rows["gpt-4o@0"]["cost"] > rows["gpt-4o-mini@0"]["cost"]
+        assert rows["gpt-3.5-turbo@0"]["AnswerQuality"] == pytest.approx(0.4)
+        assert rows["gpt-3.5-turbo@0"]["pass_rate"] == 0.0
+        assert cheapest_passing(matrix)["variant"] == "gpt-4o-mini@0"
+        assert "gpt-4o-mini@0" in format_matrix(matrix)
+
+    def test_metric_errors_recorded_and_reported(self):
+        """Test that a metric error fails the answer and shows up in the matrix."""
+        comparison, _, _ = compare([Variant("gpt-4o")], CostLedger(), metrics=[TimeoutMetric])
+        matrix = comparison.run(["What roles are defined?", "What is the message pool?"])
+
+        row, = matrix
+        failed = next(a for a in comparison.answers if "pool" in a.question)
+        assert failed.errors == {"Timeout": "TimeoutError: judge timed out"} and not failed.passed
+        assert row["pass_rate"] == 0.5 and row["errors"] == 1
+        assert "1 metric errors, first: Timeout: TimeoutError: judge timed out" in format_matrix(matrix)
+
+    def test_systematic_metric_failure_raises(self):
+        """Test that a metric failing on every answer is re-raised."""
+        comparison, _, _ = compare(
+            [Variant("gpt-4o"), Variant("gpt-4o-mini")], CostLedger(), metrics=[AnswerQualityMetric, MisconfiguredMetric]
+        )
+        with pytest.raises(PermissionError, match="invalid judge API key"):
+            comparison.run(["What roles are defined?"])
+        assert len(comparison.answers) == 2
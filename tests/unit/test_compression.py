@@ -0,0 +1,91 @@
+"""
+Unit Tests for Context Compression
+
+Tests the sentence-level compression stages applied after retrieval.
+"""
+
+import pytest
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from src.compression import (
+    ContextCompressor,
+    DuplicateSentenceFilter,
+    RelevanceFilter,
+    TokenBudget,
+    split_sentences,
+)
+from src.tokens import count_tokens
+
+
+class TopicEmbedding:
+    """Two-dimensional embedding: (mentions agents, mentions anything else)."""
+
+    def _embed(self, text):
+        return [1.0, 0.0] if "agent" in text.lower() else [0.0, 1.0]
+
+    def get_text_embedding_batch(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def get_query_embedding(self, query):
+        return self._embed(query)
+
+
+@pytest.mark.unit
+class TestCompressionStages:
+    """Test individual compression stages."""
+
+    def test_split_sentences(self):
+        """Test that chunks are split on sentence boundaries."""
+        assert split_sentences("One. Two!  Three?\n\nFour") == ["One.", "Two!", "Three?", "Four"]
+
+    def test_duplicate_sentences_removed_across_chunks(self):
+        """Test that a sentence is only kept in its first chunk."""
+        chunks = [["MetaGPT uses SOPs.", "Roles are defined."], ["metagpt uses SOPs", "New fact."]]
+        result = DuplicateSentenceFilter().compress(chunks, "q")
+        assert result == [["MetaGPT uses SOPs.", "Roles are defined."], ["New fact."]]
+
+    def test_relevance_filter_keeps_similar_sentences(self):
+        """Test that sentences far from the query are dropped."""
+        chunks = [["Agents collaborate.", "The weather is nice.", "Tables list results."]]
+        result = RelevanceFilter(TopicEmbedding(), keep_ratio=0.3).compress(chunks, "How do agents work?")
+        assert result == [["Agents collaborate."]]
+
+    def test_token_budget_enforced(self):
+        """Test that the total context fits the budget."""
+        chunks = [["word " * 30], ["word " * 30]]
+        result = TokenBudget(max_tokens=40).compress(chunks, "q")
+        total = sum(count_tokens(s) for chunk in result for s in chunk)
+        assert total <= 40
+        assert result[0] == chunks[0]
+
+
+@pytest.mark.unit
+class TestContextCompressor:
+    """Test the compressor as a node postprocessor."""
+
+    def test_postprocess_drops_emptied_chunks(self):
+        """Test that chunks compressed to nothing are dropped."""
+        compressor = ContextCompressor(stages=[DuplicateSentenceFilter()])
+        nodes = [
+            NodeWithScore(node=TextNode(text="Same sentence.", metadata={"page": 1}), score=0.9),
+            NodeWithScore(node=TextNode(text="Same sentence."), score=0.8),
+        ]
+        result = compressor.postprocess_nodes(nodes, query_bundle=QueryBundle("q"))
+
+        assert len(result) == 1
+        assert result[0].node.metadata == {"page": 1}
+        assert result[0].score == 0.9
+
+    def test_original_nodes_not_mutated(self):
+        """Test that compression does not rewrite stored nodes."""
+        original = TextNode(text="A. A. B.")
+        compressor = ContextCompressor(stages=[DuplicateSentenceFilter()])
+        compressor.postprocess_nodes([NodeWithScore(node=original)], query_bundle=QueryBundle("q"))
+        assert original.text == "A. A. B."
+
+    def test_compression_stats(self):
+        """Test that stats report fewer tokens after compression."""
+        compressor = ContextCompressor(stages=[DuplicateSentenceFilter()])
+        stats = compressor.compression_stats(["Repeat this. Repeat this. Repeat this."], "q")
+        assert stats["tokens_after"] < stats["tokens_before"]
+        assert 0 < stats["ratio"] < 1
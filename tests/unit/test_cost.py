@@ -0,0 +1,125 @@
+"""
+Unit Tests for Cost Accounting
+
+Tests token attribution, cost profiles and budget assertions.
+"""
+
+import pytest
+from deepeval.models import DeepEvalBaseLLM
+
+from src.cost import CostLedger, CountingJudge, attribute, estimate_cost
+
+
+class EchoJudge(DeepEvalBaseLLM):
+    """Offline judge returning a fixed JSON verdict."""
+
+    def __init__(self):
+        super().__init__(model_name="gpt-4o")
+
+    def load_model(self):
+        return None
+
+    def generate(self, prompt):
+        return '{"verdict": "yes"}'
+
+    async def a_generate(self, prompt):
+        return self.generate(prompt)
+
+    def get_model_name(self):
+        return "gpt-4o"
+
+
+@pytest.mark.unit
+class TestEstimateCost:
+    """Test per-model pricing."""
+
+    def test_known_model(self):
+        """Test pricing of a listed model."""
+        assert estimate_cost("gpt-3.5-turbo", 1000, 1000) == pytest.approx(0.002)
+
+    def test_dated_snapshot_uses_family_price(self):
+        """Test that the longest matching model prefix is used."""
+        assert estimate_cost("gpt-4o-mini-2024-07-18", 1000, 0) == pytest.approx(0.00015)
+
+    def test_unknown_model_is_free(self):
+        """Test that unknown models do not raise."""
+        assert estimate_cost("local-model", 1000, 1000) == 0.0
+
+
+@pytest.mark.unit
+class TestCostLedger:
+    """Test attribution and profiles."""
+
+    def test_attribution_context(self):
+        """Test that records pick up the enclosing case and stage."""
+        ledger = CostLedger()
+        with attribute(case_id="test_a"):
+            with attribute(stage="synthesis"):
+                ledger.record("gpt-3.5-turbo", 100, 20)
+            ledger.record("text-embedding-ada-002", 10)
+
+        synthesis, embedding = ledger.records
+        assert (synthesis.case_id, synthesis.stage) == ("test_a", "synthesis")
+        assert (embedding.case_id, embedding.stage) == ("test_a", "unattributed")
+
+    def test_profile_groups_by_case_and_stage(self):
+        """Test that the profile sums usage per case and per stage."""
+        ledger = CostLedger()
+        ledger.record("gpt-3.5-turbo", 100, 10, case_id="a", stage="synthesis")
+        ledger.record("gpt-3.5-turbo", 50, 5, case_id="b", stage="synthesis")
+        ledger.record("gpt-4o", 200, 20, case_id="a", stage="judge")
+
+        profile = ledger.profile()
+
+        assert profile["total"]["calls"] == 3
+        assert profile["by_case"]["a"]["total_tokens"] == 330
+        assert profile["by_stage"]["synthesis"]["prompt_tokens"] == 150
+        assert "gpt-4o" in ledger.format_profile()
+
+    def test_budget_assertion(self):
+        """Test that exceeding a per-case budget fails."""
+        ledger = CostLedger()
+        ledger.record("gpt-3.5-turbo", 900, 200, case_id="a")
+
+        ledger.assert_within_budget("a", max_tokens=2000)
+        with pytest.raises(AssertionError, match="1100 tokens"):
+            ledger.assert_within_budget("a", max_tokens=1000)
+
+
+@pytest.mark.unit
+class TestCountingJudge:
+    """Test DeepEval judge token counting."""
+
+    def test_judge_records_usage(self):
+        """Test that each judge call is recorded under the current stage."""
+        ledger = CostLedger()
+        judge = CountingJudge(ledger, inner=EchoJudge(), tokenizer=lambda text: len(text.split()))
+
+        with attribute(case_id="a", stage="metric:Faithfulness"):
+            output = judge.generate("Is the claim supported by the context?")
+
+        record, = ledger.records
+        assert output == '{"verdict": "yes"}'
+        assert record.stage == "metric:Faithfulness"
+        assert (record.prompt_tokens, record.completion_tokens) == (7, 2)
+
+    def test_reported_usage_preferred(self):
+        """Test that the usage a judge reports is recorded instead of a count."""
+        class ReportingJudge(EchoJudge):
+            def generate_with_usage(self, prompt):
+                return self.generate(prompt), {"prompt_tokens": 120, "completion_tokens": 8}
+
+        ledger = CostLedger()
+        judge = CountingJudge(ledger, inner=ReportingJudge(), tokenizer=lambda text: 1 / 0)
+
+        judge.generate("Is the claim supported by the context?")
+
+        assert (ledger.records[0].prompt_tokens, ledger.records[0].completion_tokens) == (120, 8)
+
+    def test_schema_rejected_by_plain_judge(self):
+        """Test that a judge without structured outputs makes DeepEval fall back to plain text."""
+        ledger = CostLedger()
+        judge = CountingJudge(ledger, inner=EchoJudge())
+        with pytest.raises(TypeError):
+            judge.generate("prompt", schema=dict)
+        assert ledger.records == []
@@ -0,0 +1,121 @@
+"""
+Unit Tests for the Query Front End
+
+Tests query normalization, empty query rejection and single-flight
+coalescing against the offline stand-in backend.
+"""
+
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.frontend import EmptyQueryError, QueryFrontend, QueryNormalizer, SingleFlight, collapse_repetitions
+from src.server import RAGServer
+from src.stand_in import LatencyModel, StandInRAGApplication
+
+
+def _request(address, question):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    connection.request("POST", "/query", body=json.dumps({"question": question}))
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+
+def words(text, max_tokens):
+    """Word-count truncation standing in for tiktoken."""
+    return " ".join(text.split()[:max_tokens])
+
+
+@pytest.mark.unit
+class TestQueryNormalizer:
+    """Test canonical query forms."""
+
+    def test_normalize(self):
+        """Test whitespace, Unicode, repetition and length normalization."""
+        normalizer = QueryNormalizer(max_tokens=6, truncate=words)
+        assert normalizer.normalize("What is " * 50 + "the main topic?") == "What is the main topic?"
+        assert normalizer.normalize("  What\tare\n the  ｒｏｌｅｓ? ") == "What are the roles?"
+        assert normalizer.normalize("Explain " + "the the " * 3 + "message pool in great detail") == \
+            "Explain the message pool in great"
+        assert collapse_repetitions("a b a b a b c a b") == "a b c a b"
+
+    def test_empty_rejected(self):
+        """Test that queries without letters or digits never reach the backend."""
+        normalizer = QueryNormalizer(truncate=words)
+        for query in ["", "   ", "?!", None]:
+            with pytest.raises(EmptyQueryError):
+                normalizer.normalize(query)
+
+
+@pytest.mark.unit
+class TestQueryFrontend:
+    """Test the front end in front of a backend."""
+
+    def test_identical_requests_coalesced(self):
+        """Test that a burst of identical (once normalized) questions runs one pipeline."""
+        backend = StandInRAGApplication(synthesis_latency=LatencyModel(mean_ms=100))
+        frontend = QueryFrontend(backend, QueryNormalizer(truncate=words))
+        questions = ["What are the roles?", "what  are the roles?", " What are the roles? "] * 4
+
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            answers = list(pool.map(frontend.query, questions))
+
+        assert len(set(answers)) == 1
+        assert backend.calls["synthesize"] == 1
+        assert frontend.stats()["coalesced"] == 11
+
+    def test_batch_deduplicated_and_empty_response(self):
+        """Test batched retrieval of distinct questions and the fixed empty answer."""
+        backend = StandInRAGApplication()
+        frontend = QueryFrontend(backend, QueryNormalizer(truncate=words), empty_response="Please ask a question.")
+        contexts = frontend.get_retrieval_contexts(["What are the roles?", "What are  the roles?", "?!", "Costs?"])
+
+        assert contexts[0] == contexts[1] and contexts[2] == [] and len(contexts) == 4
+        assert frontend.query("") == "Please ask a question."
+        assert list(frontend.stream_query(" ")) == ["Please ask a question."]
+        assert backend.calls == {"retrieve": 0, "retrieve_batch": 1, "synthesize": 0}
+        assert frontend.stats()["rejected"] == 3
+
+    def test_failure_shared(self):
+        """Test that every waiter gets the failure of the one execution, and it is not kept."""
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fail():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            raise RuntimeError("backend down")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flights.do, "q", fail)
+            started.wait(5)
+            follower = pool.submit(flights.do, "q", fail)
+            while flights.coalesced == 0:
+                pass
+            release.set()
+            for future in (leader, follower):
+                with pytest.raises(RuntimeError, match="backend down"):
+                    future.result()
+        assert len(calls) == 1
+        assert flights.do("q", lambda: "recovered") == "recovered"
+
+    def test_server_rejects_empty_query(self):
+        """Test that the server answers 400 for questions that normalize to nothing."""
+        frontend = QueryFrontend(StandInRAGApplication(), QueryNormalizer(truncate=words))
+        server = RAGServer(frontend, port=0, max_wait_ms=50)
+        address = server.run_in_thread()
+        try:
+            assert _request(address, "???") == 400
+            assert _request(address, "roles " * 3) == 200
+            # An empty question batched with a real one fails alone
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                assert sorted(pool.map(lambda q: _request(address, q), ["What is X?", "???"])) == [200, 400]
+        finally:
+            server.stop()
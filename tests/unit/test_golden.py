@@ -0,0 +1,145 @@
+"""
+Unit Tests for the Golden Dataset Builder
+
+Tests chunk sampling, parallel generation, de-duplication and lazy loading.
+"""
+
+import json
+import re
+import threading
+
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+
+from src.cost import current_stage
+from src.golden import (
+    GoldenDataset,
+    GoldenDatasetBuilder,
+    dedupe_questions,
+    index_dataset,
+    read_case,
+    sample_chunks,
+)
+
+
+TOPICS = ["roles", "roles", "message pool", "executable feedback", "benchmarks", "costs"]
+
+
+class QuestionLLM:
+    """LLM stand-in asking one question per passage about the passage's topic."""
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def complete(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        pairs = [
+            {"passage": int(number), "question": f"What does MetaGPT say about {topic}?", "answer": f"It uses {topic}."}
+            for number, topic in re.findall(r"\[(\d+)\]\nPassage about (.+?)\.", prompt)
+        ]
+        return "Here you go:\n" + json.dumps(pairs)
+
+
+class WordEmbedding:
+    """Bag-of-words embedding stand-in."""
+
+    vocabulary = ["roles", "role", "message", "pool", "executable", "feedback", "benchmarks", "costs", "agent"]
+
+    def get_text_embedding_batch(self, texts):
+        return [
+            [float(word in text.lower().replace("?", "").split()) for word in self.vocabulary] + [1.0]
+            for text in texts
+        ]
+
+
+def chunks():
+    """One chunk per topic, long enough to be sampled."""
+    return [
+        TextNode(text=f"Passage about {topic}. " + "Filler sentence. " * 20, id_=f"node-{i}")
+        for i, topic in enumerate(TOPICS)
+    ]
+
+
+@pytest.mark.unit
+class TestGoldenDatasetBuilder:
+    """Test building datasets."""
+
+    def test_build_batches_and_dedupes(self):
+        """Test that chunks are sent in batches and duplicate questions dropped."""
+        llm = QuestionLLM()
+        builder = GoldenDatasetBuilder(llm=llm, embed_model=WordEmbedding(), chunks_per_call=4, max_workers=2)
+        dataset = builder.build(chunks(), n_chunks=10, metadata={"document": "paper.pdf"})
+
+        assert len(llm.prompts) == 2
+        questions = [case.question for case in dataset.cases]
+        assert questions == [f"What does MetaGPT say about {t}?" for t in dict.fromkeys(TOPICS)]
+        roles = dataset.cases[0]
+        assert roles.expected_answer == "It uses roles."
+        assert roles.expected_context[0].startswith("Passage about roles.")
+        assert roles.source["node_id"] == "node-0"
+        assert dataset.metadata["generated"] == 6 and dataset.metadata["cases"] == 5
+        assert dataset.metadata["document"] == "paper.pdf"
+
+    def test_generation_attributed_and_bad_passages_skipped(self):
+        """Test that pool threads run in the "golden" stage and unknown passage numbers are dropped."""
+        stages = []
+
+        class StrayLLM(QuestionLLM):
+            def complete(self, prompt):
+                stages.append(current_stage())
+                reply = json.loads(super().complete(prompt).split("\n", 1)[1])
+                reply += [
+                    {"passage": 0, "question": "Zero?", "answer": "No."},
+                    {"passage": 99, "question": "Past the end?", "answer": "No."},
+                    {"passage": "two", "question": "Not a number?", "answer": "No."},
+                ]
+                return json.dumps(reply)
+
+        builder = GoldenDatasetBuilder(llm=StrayLLM(), embed_model=WordEmbedding(), chunks_per_call=4, max_workers=2)
+        dataset = builder.build(chunks(), n_chunks=10)
+
+        assert stages == ["golden", "golden"]
+        assert dataset.metadata["generated"] == 6
+
+    def test_dedupe_by_similarity(self):
+        """Test that near-duplicates of an earlier question are dropped."""
+        embeddings = np.array([[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]])
+        assert dedupe_questions(embeddings, threshold=0.9) == [0, 2]
+        assert dedupe_questions(np.empty((0, 2))) == []
+
+    def test_sample_spreads_across_document(self):
+        """Test that the sample takes one chunk per slice of the document, skipping short ones."""
+        nodes = [TextNode(text="x" * 300, id_=str(i)) for i in range(100)] + [TextNode(text="tiny")]
+        sample = sample_chunks(nodes, 10, seed=1)
+        positions = [int(node.node_id) for node in sample]
+        assert [p // 10 for p in positions] == list(range(10))
+        assert sample_chunks(nodes, 10, seed=1) == sample
+        assert len(sample_chunks(nodes, 500)) == 100
+
+
+@pytest.mark.unit
+class TestGoldenDatasetFile:
+    """Test the JSON Lines format."""
+
+    def test_lazy_index_and_read(self, tmp_path):
+        """Test that cases are indexed by offset and read one at a time."""
+        builder = GoldenDatasetBuilder(llm=QuestionLLM(), embed_model=WordEmbedding())
+        dataset = builder.build(chunks(), n_chunks=6)
+        path = str(tmp_path / "golden.jsonl")
+        dataset.save(path)
+
+        index = index_dataset(path)
+        assert [case_id for case_id, _ in index] == [case.id for case in dataset.cases]
+        assert read_case(path, index[2][1]) == dataset.cases[2]
+        assert len(index_dataset(path, limit=2)) == 2
+        assert GoldenDataset.load(path).cases == dataset.cases
+
+    def test_other_version_rejected(self, tmp_path):
+        """Test that a file of another format version is refused."""
+        path = tmp_path / "golden.jsonl"
+        path.write_text(json.dumps({"version": 99, "metadata": {}}) + "\n")
+        with pytest.raises(ValueError):
+            index_dataset(str(path))
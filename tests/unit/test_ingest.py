@@ -0,0 +1,144 @@
+"""
+Unit Tests for Streaming Ingestion
+
+Tests page-by-page PDF parsing, batched embedding and progress reporting.
+"""
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+
+from src.chunking import ChunkStore, SentenceChunker, iter_pages
+from src.ingest import StreamingIngestor, iter_batches
+
+
+def make_pdf(path, pages):
+    """Write a minimal PDF with one line of text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 712 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
+
+class CountingEmbedding(MockEmbedding):
+    """Mock embedding that records the size of each batch request."""
+
+    batch_sizes: list = []
+
+    def get_text_embedding_batch(self, texts, **kwargs):
+        if texts:
+            self.batch_sizes.append(len(texts))
+        return super().get_text_embedding_batch(texts, **kwargs)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    """A ten-page PDF."""
+    return make_pdf(tmp_path / "paper.pdf", [f"Page {i} discusses MetaGPT agents." for i in range(1, 11)])
+
+
+@pytest.fixture
+def embed_model():
+    """Embedding model that counts batch sizes."""
+    return CountingEmbedding(embed_dim=8, batch_sizes=[])
+
+
+@pytest.mark.unit
+class TestStreamingIngestion:
+    """Test the streaming ingestion pipeline."""
+
+    def test_iter_batches(self):
+        """Test that batches are full except the last."""
+        assert [len(b) for b in iter_batches(range(10), 4)] == [4, 4, 2]
+        with pytest.raises(ValueError):
+            list(iter_batches([], 0))
+
+    def test_pages_are_read_lazily(self, pdf_path):
+        """Test that pages are yielded one at a time with their labels."""
+        pages = iter_pages(pdf_path)
+        first = next(pages)
+        assert first.text.startswith("Page 1")
+        assert first.metadata["page_label"] == "1"
+        assert "file_name" in first.excluded_embed_metadata_keys
+        assert len(list(pages)) == 9
+
+    def test_ingest_embeds_in_bounded_batches(self, pdf_path, embed_model):
+        """Test that every chunk is indexed with embedding requests of at most batch_size."""
+        reports = []
+        ingestor = StreamingIngestor(
+            embed_model=embed_model, batch_size=3, on_progress=lambda p: reports.append(p.chunks)
+        )
+        index = ingestor.ingest(pdf_path)
+
+        progress = ingestor.history[-1]
+        assert progress.pages == 10
+        assert progress.chunks == progress.embedded == 10
+        assert embed_model.batch_sizes == [3, 3, 3, 1]
+        assert reports == [3, 6, 9, 10]
+        assert len(index.docstore.docs) == 10
+        assert len(index.as_retriever(similarity_top_k=2).retrieve("MetaGPT")) == 2
+
+    def test_chunk_store_skips_parsing(self, pdf_path, embed_model, tmp_path):
+        """Test that a second ingestion reuses cached chunks."""
+        store = ChunkStore(str(tmp_path / "chunks"))
+        strategy = SentenceChunker(chunk_size=128, chunk_overlap=0)
+        StreamingIngestor(embed_model=embed_model, strategy=strategy, store=store).ingest(pdf_path)
+
+        ingestor = StreamingIngestor(
+            embed_model=embed_model, strategy=strategy, store=ChunkStore(str(tmp_path / "chunks"))
+        )
+        index = ingestor.ingest(pdf_path)
+        progress = ingestor.history[-1]
+        assert progress.from_cache and progress.pages == 0
+        assert len(index.docstore.docs) == 10
+        assert all(node.embedding is None for node in store.lookup(pdf_path, strategy))
+
+    def test_artifact_written_per_batch(self, pdf_path, embed_model, tmp_path):
+        """Test that parsed chunks go to the artifact batch by batch instead of being kept in memory."""
+        store = ChunkStore(str(tmp_path / "chunks"))
+        strategy = SentenceChunker(chunk_size=128, chunk_overlap=0)
+        artifact = lambda: list((tmp_path / "chunks").glob("*"))  # noqa: E731
+        line_counts = []
+
+        def on_progress(progress):
+            [tmp] = artifact()
+            line_counts.append(len(tmp.read_text().splitlines()))
+
+        StreamingIngestor(
+            embed_model=embed_model, strategy=strategy, batch_size=4, store=store, on_progress=on_progress
+        ).ingest(pdf_path)
+
+        assert line_counts == [5, 9, 11]
+        assert store._memory == {}
+        [path] = artifact()
+        assert path.suffix == ".jsonl" and len(path.read_text().splitlines()) == 11
+
+    def test_failed_ingestion_leaves_no_artifact(self, pdf_path, tmp_path):
+        """Test that a partly written artifact is discarded when embedding fails."""
+
+        class FailingEmbedding(MockEmbedding):
+            def get_text_embedding_batch(self, texts, **kwargs):
+                raise RuntimeError("rate limited")
+
+        store = ChunkStore(str(tmp_path / "chunks"))
+        with pytest.raises(RuntimeError):
+            StreamingIngestor(embed_model=FailingEmbedding(embed_dim=8), store=store).ingest(pdf_path)
+        assert list((tmp_path / "chunks").glob("*")) == []
@@ -0,0 +1,101 @@
+"""
+Unit Tests for the Load-Testing Harness
+
+Tests open-loop scheduling and reporting against the offline stand-in backend.
+"""
+
+import json
+
+import pytest
+
+from src.loadtest import arrival_times, find_saturation, load_question_mix, main, run_load_test
+from src.questions import COMPLEX_QUESTIONS, TEST_QUESTIONS
+from src.stand_in import LatencyModel, StandInError, StandInRAGApplication
+from src.stats import percentile
+
+
+@pytest.mark.unit
+class TestSchedule:
+    """Test arrival schedules and percentiles."""
+
+    def test_constant_arrivals(self):
+        """Test that constant arrivals are evenly spaced."""
+        times = arrival_times(qps=10, duration_s=1, poisson=False)
+        assert len(times) == 10
+        assert times[1] - times[0] == pytest.approx(0.1)
+
+    def test_poisson_arrivals_match_rate(self):
+        """Test that Poisson arrivals average the target rate."""
+        times = arrival_times(qps=50, duration_s=20, seed=7)
+        assert 900 < len(times) < 1100
+
+    def test_percentile_nearest_rank(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) == 0.0
+
+    def test_question_mix_from_jsonl(self, tmp_path):
+        """Test loading a weighted question mix from JSONL."""
+        path = tmp_path / "questions.jsonl"
+        path.write_text(json.dumps({"question": "Q1", "weight": 2}) + "\n" + json.dumps({"input": "Q2"}) + "\n")
+        assert load_question_mix(str(path)) == [("Q1", 2.0), ("Q2", 1.0)]
+
+    def test_default_mix_uses_fixture_questions(self):
+        """Test that the default mix covers the shared fixture questions."""
+        questions = [question for question, _ in load_question_mix()]
+        assert questions == [question for question, _ in TEST_QUESTIONS] + COMPLEX_QUESTIONS
+
+    def test_agentic_rag_targets_need_checkout(self, tmp_path, monkeypatch):
+        """Test that router and agent targets fail clearly without an Agentic-RAG checkout."""
+        monkeypatch.delenv("AGENTIC_RAG_PATH", raising=False)
+        for target in ("router", "agent"):
+            with pytest.raises(SystemExit, match="Agentic-RAG not found"):
+                main(["--target", target, "--document", "doc.pdf", "--agentic-rag", str(tmp_path)])
+
+
+@pytest.mark.unit
+class TestLoadTest:
+    """Test load runs against the stand-in backend."""
+
+    def test_summary_reports_latency_and_throughput(self):
+        """Test that every scheduled request is recorded and summarized."""
+        app = StandInRAGApplication(synthesis_latency=LatencyModel(mean_ms=5))
+        summary = run_load_test(app.query, qps=40, duration_s=0.5, poisson=False).summary()
+
+        assert summary["requests"] == 20
+        assert summary["error_rate"] == 0.0
+        assert summary["latency_ms"]["p50"] >= 5
+        assert sum(summary["histogram"].values()) == summary["succeeded"]
+
+    def test_errors_are_counted(self):
+        """Test that injected failures show up in the error rate."""
+        app = StandInRAGApplication(synthesis_latency=LatencyModel(error_rate=1.0))
+        summary = run_load_test(app.query, qps=20, duration_s=0.3, poisson=False).summary()
+
+        assert summary["error_rate"] == 1.0
+        assert summary["errors"] == {"StandInError": summary["requests"]}
+
+    def test_saturation_detected(self):
+        """Test that a rate beyond backend capacity is flagged."""
+        app = StandInRAGApplication(synthesis_latency=LatencyModel(mean_ms=50, max_concurrency=1))
+        report = find_saturation(app.query, [5, 100], duration_s=0.5, poisson=False)
+
+        assert report["levels"][0]["saturated"] is False
+        assert report["saturation_qps"] == 100
+
+
+@pytest.mark.unit
+class TestStandInBackend:
+    """Test the offline stand-in."""
+
+    def test_retrieves_relevant_chunk(self):
+        """Test that keyword overlap ranks the matching chunk first."""
+        app = StandInRAGApplication(corpus=["Cats purr.", "The methodology uses SOPs."])
+        assert app.get_retrieval_context("What methodology was used?")[0] == "The methodology uses SOPs."
+
+    def test_injected_failure(self):
+        """Test that the latency model raises injected errors."""
+        with pytest.raises(StandInError):
+            LatencyModel(error_rate=1.0).wait()
@@ -0,0 +1,76 @@
+"""
+Unit Tests for Memory Profiling
+
+Tests tracemalloc measurements, object footprints and RSS limits.
+"""
+
+import pytest
+from llama_index.core.schema import TextNode
+
+from src.memory import MB, MemoryProfiler, footprint
+
+
+@pytest.mark.unit
+class TestMemoryProfiler:
+    """Test measuring fixture builds and queries."""
+
+    def test_measure_nested(self):
+        """Test that allocations are measured and nested blocks count toward the outer one."""
+        profiler = MemoryProfiler()
+        try:
+            with profiler.measure("outer") as outer:
+                kept = [bytearray(1024) for _ in range(1000)]
+                with profiler.measure("inner", kind="query") as inner:
+                    temporary = bytearray(4 * MB)
+                    del temporary
+        finally:
+            profiler.stop()
+
+        assert inner.kind == "query"
+        assert inner.peak >= 4 * MB and inner.allocated < MB
+        assert outer.peak >= 4 * MB + 1000 * 1024
+        assert outer.allocated >= 1000 * 1024
+        assert outer.top and ".py:" in outer.top[0][0]
+        assert [s.label for s in profiler.samples] == ["inner", "outer"]
+        assert "outer" in profiler.format_report()
+        del kept
+
+    def test_check_limits(self):
+        """Test RSS and per-sample limits."""
+        profiler = MemoryProfiler(top=0)
+        try:
+            with profiler.measure("build"):
+                data = bytearray(2 * MB)
+        finally:
+            profiler.stop()
+        assert profiler.check(max_rss_mb=1e6, max_peak_mb=100) == []
+        failures = profiler.check(max_rss_mb=1, max_peak_mb=1)
+        assert len(failures) == 2 and "build" in failures[1]
+        del data
+
+
+@pytest.mark.unit
+class TestFootprint:
+    """Test object graph footprints."""
+
+    def test_categories(self):
+        """Test that nodes and embeddings are told apart."""
+        nodes = [TextNode(text="text " * 200, id_=f"node-{i}", embedding=[0.5] * 64) for i in range(20)]
+        result = footprint({"nodes": nodes, "plain": ["x" * 1000]})
+
+        assert result.by_category["nodes"] > 20 * 1000
+        assert result.by_category["embeddings"] >= 20 * 64 * 8
+        assert result.by_category["other"] > 1000
+        assert result.bytes == sum(result.by_category.values())
+        assert result.by_type["TextNode"][0] == 20
+
+    def test_shared_objects_counted_once(self):
+        """Test that a fixture is only charged for what it adds."""
+        profiler = MemoryProfiler()
+        shared = ["y" * 10000]
+        first = profiler.add_footprint("first", {"docs": shared})
+        second = profiler.add_footprint("second", {"docs": shared, "own": "z" * 500})
+
+        assert first.bytes > 10000
+        assert 500 < second.bytes < 10000
+        assert set(profiler.footprints) == {"first", "second"}
@@ -0,0 +1,119 @@
+"""
+Unit Tests for Parallel Tool Execution
+
+Tests concurrent fan-out of one query to several per-paper tools.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from llama_index.core.tools import FunctionTool
+
+from src.parallel_tools import ParallelToolExecutor, add_fan_out_tool, create_fan_out_tool, query_kwargs
+
+
+def make_paper_tool(name, delay=0.0, tracker=None):
+    """Create a slow per-paper tool that records peak concurrency."""
+
+    def query(query: str) -> str:
+        """Answer a question about one paper."""
+        if tracker is not None:
+            with tracker["lock"]:
+                tracker["active"] += 1
+                tracker["peak"] = max(tracker["peak"], tracker["active"])
+        time.sleep(delay)
+        if tracker is not None:
+            with tracker["lock"]:
+                tracker["active"] -= 1
+        return f"{name}: {query}"
+
+    return FunctionTool.from_defaults(fn=query, name=name, description=f"Query {name}")
+
+
+@pytest.fixture
+def tracker():
+    """Shared concurrency counters."""
+    return {"lock": threading.Lock(), "active": 0, "peak": 0}
+
+
+@pytest.mark.unit
+class TestParallelToolExecutor:
+    """Test the capped concurrent executor."""
+
+    def test_calls_run_concurrently(self):
+        """Test that independent calls overlap instead of running in turn."""
+        tools = [make_paper_tool(f"paper_{i}", delay=0.2) for i in range(4)]
+        start = time.perf_counter()
+        outputs = ParallelToolExecutor(max_concurrency=4).run(
+            [(tool, {"query": "methods"}) for tool in tools]
+        )
+        elapsed = time.perf_counter() - start
+
+        assert [o.content for o in outputs] == [f"paper_{i}: methods" for i in range(4)]
+        assert elapsed < 0.6
+
+    def test_concurrency_cap_respected(self, tracker):
+        """Test that no more than max_concurrency calls run at once."""
+        tools = [make_paper_tool(f"paper_{i}", delay=0.05, tracker=tracker) for i in range(6)]
+        ParallelToolExecutor(max_concurrency=2).run([(tool, {"query": "q"}) for tool in tools])
+        assert tracker["peak"] <= 2
+
+    def test_failing_call_returns_error_output(self):
+        """Test that one failing tool does not sink the batch."""
+
+        def broken(query: str) -> str:
+            """Always fails."""
+            raise RuntimeError("index unavailable")
+
+        tools = [make_paper_tool("ok"), FunctionTool.from_defaults(fn=broken)]
+        ok, failed = ParallelToolExecutor().run([(tool, {"query": "q"}) for tool in tools])
+
+        assert ok.content == "ok: q"
+        assert failed.is_error
+        assert "index unavailable" in failed.content
+
+    def test_invalid_concurrency_rejected(self):
+        """Test that a non-positive cap is rejected."""
+        with pytest.raises(ValueError):
+            ParallelToolExecutor(max_concurrency=0)
+
+
+@pytest.mark.unit
+class TestFanOutTool:
+    """Test the fan-out tool exposed to agents."""
+
+    def test_fan_out_merges_labelled_answers(self):
+        """Test that every paper answers and is labelled by tool name."""
+        fan_out = create_fan_out_tool([make_paper_tool("a"), make_paper_tool("b")])
+        content = fan_out(query="What method?").content
+
+        assert "[a]\na: What method?" in content
+        assert "[b]\nb: What method?" in content
+
+    def test_fan_out_restricts_to_tool_names(self):
+        """Test that tool_names limits which papers are queried."""
+        fan_out = create_fan_out_tool([make_paper_tool("a"), make_paper_tool("b")])
+        content = fan_out(query="q", tool_names=["b"]).content
+
+        assert "[a]" not in content
+        assert "[b]" in content
+
+    def test_query_kwargs_uses_tool_parameter_name(self):
+        """Test that the query is passed under the tool's own parameter."""
+        assert query_kwargs(make_paper_tool("a"), "q") == {"query": "q"}
+
+    def test_agent_fan_out_filtered_and_reused(self):
+        """Test that only matching tools are fanned out and tool sets share one fan-out tool."""
+        tools = {name: make_paper_tool(name) for name in ["vector_tool_a", "vector_tool_b", "summary_tool_a"]}
+        retrieved = [list(tools.values())]
+        worker = SimpleNamespace(_get_tools=lambda message: retrieved[0])
+        add_fan_out_tool(worker, tool_filter=lambda tool: tool.metadata.name.startswith("vector_tool_"), cache_size=1)
+
+        first = worker._get_tools("q")[-1]
+        assert "[summary_tool_a]" not in first(query="q").content
+        retrieved[0] = list(reversed(retrieved[0]))
+        assert worker._get_tools("q")[-1] is first
+        retrieved[0] = [tools["vector_tool_a"], tools["summary_tool_a"]]
+        assert len(worker._get_tools("q")) == 2
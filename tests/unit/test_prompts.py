@@ -0,0 +1,126 @@
+"""
+Unit Tests for Prompt Assembly
+
+Tests shared-prefix judge prompts and prefix reuse tracking.
+"""
+
+import json
+
+import httpx
+import pytest
+
+from src.clients import ClientFactory, PoolConfig
+from src.prompts import (
+    JUDGE_SYSTEM_PROMPT,
+    PrefixTracker,
+    assemble_judge_messages,
+    cacheable_tokens,
+    shared_context,
+)
+
+
+CONTEXT = [
+    "MetaGPT assigns roles such as product manager, architect and engineer to agents.",
+    "Agents exchange structured documents through a shared message pool, not free chat.",
+]
+ANSWER = "MetaGPT defines product manager, architect, project manager and engineer roles."
+
+
+class Case:
+    """``LLMTestCase`` stand-in."""
+
+    input = "What roles are defined?"
+    actual_output = ANSWER
+    retrieval_context = CONTEXT
+    context = CONTEXT
+
+
+def chars(text, model):
+    """One token per character, so tests need no tokenizer download."""
+    return [ord(c) for c in text]
+
+
+@pytest.mark.unit
+class TestAssembly:
+    """Test judge prompt reordering."""
+
+    def test_metrics_share_a_prefix(self):
+        """Test that differently templated prompts for one case start with the same messages."""
+        faithfulness = "Extract the truths from this text:\n" + "\n\n".join(CONTEXT) + "\nJSON:"
+        hallucination = f"For each context, give a verdict.\nActual output: {ANSWER}\nContexts: {CONTEXT}\nJSON:"
+        with shared_context(Case()) as blocks:
+            first = assemble_judge_messages(faithfulness)
+            second = assemble_judge_messages(hallucination)
+
+        assert len(blocks) == 3
+        assert first[:2] == second[:2]
+        assert first[0]["content"] == JUDGE_SYSTEM_PROMPT
+        assert first[2]["content"] == "Extract the truths from this text:\n[ref 1]\n\n[ref 2]\nJSON:"
+        assert second[2]["content"] == (
+            "For each context, give a verdict.\nActual output: [ref 3]\nContexts: ['[ref 1]', '[ref 2]']\nJSON:"
+        )
+
+    def test_prompt_without_shared_texts_is_unchanged(self):
+        """Test that prompts outside a shared context are sent as one user message."""
+        assert assemble_judge_messages("Rate this.") == [{"role": "user", "content": "Rate this."}]
+        with shared_context(texts=["x" * 100]):
+            assert assemble_judge_messages("Rate this.") == [{"role": "user", "content": "Rate this."}]
+
+
+@pytest.mark.unit
+class TestPrefixTracker:
+    """Test prefix reuse measurement."""
+
+    def test_cacheable_tokens_follow_provider_rules(self):
+        """Test the 1024-token minimum and 128-token increments."""
+        assert cacheable_tokens(1000) == 0
+        assert cacheable_tokens(1024) == 1024
+        assert cacheable_tokens(1300) == 1280
+
+    def test_prefix_shared_with_earlier_prompt(self):
+        """Test that each call reports the longest prefix shared with an earlier one per model."""
+        tracker = PrefixTracker(tokenize=chars, stage=lambda: "metric:Faithfulness")
+        stable = "s" * 1500
+        tracker.observe("gpt-4o", [{"role": "user", "content": stable + "first"}])
+        stats = tracker.observe("gpt-4o", [{"role": "user", "content": stable + "second"}], cached_tokens=1408)
+        other_model = tracker.observe("gpt-4o-mini", [{"role": "user", "content": stable}])
+
+        assert stats.prefix_tokens == len("<|user|>") + 1500
+        assert stats.cacheable_tokens == 1408
+        assert other_model.prefix_tokens == 0
+        summary = tracker.summary()
+        assert summary["by_stage"]["metric:Faithfulness"]["calls"] == 3
+        assert summary["total"]["cached_tokens"] == 1408
+        assert "metric:Faithfulness" in tracker.format_summary()
+
+    def test_judge_sends_assembled_prompt(self):
+        """Test that the pooled judge sends reordered messages and records cached tokens."""
+        sent = []
+
+        def completion(request):
+            sent.append(json.loads(request.content)["messages"])
+            return httpx.Response(200, json={
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": 2000,
+                    "completion_tokens": 3,
+                    "total_tokens": 2003,
+                    "prompt_tokens_details": {"cached_tokens": 1920},
+                },
+            })
+
+        tracker = PrefixTracker(tokenize=chars)
+        factory = ClientFactory(PoolConfig(), transport=httpx.MockTransport(completion))
+        judge = factory.judge("gpt-4o", api_key="sk-test", assemble=True, tracker=tracker)
+        with shared_context(Case()):
+            judge.generate(f"Is this relevant?\n{ANSWER}")
+        factory.close()
+
+        assert [m["role"] for m in sent[0]] == ["system", "user", "user"]
+        assert sent[0][2]["content"] == "Is this relevant?\n[ref 3]"
+        assert tracker.records[0].cached_tokens == 1920
+        assert tracker.records[0].stage == "judge"
@@ -0,0 +1,184 @@
+"""
+Unit Tests for the Test Budget Plugin
+
+Tests run history, component coverage, budgeted selection and the plugin
+inside a nested pytest run.
+"""
+
+import json
+import textwrap
+
+import pytest
+
+from src.pytest_budget import (
+    CaseEstimate,
+    RunHistory,
+    components_of,
+    order_key,
+    scope_order,
+    select_within_budget,
+)
+
+
+def estimate(nodeid, duration, cost=0.0, failed=False, fixtures=()):
+    """Estimate with the components of its fixtures."""
+    return CaseEstimate(nodeid, duration, cost, components_of(fixtures), failed)
+
+
+class OrderRecorder:
+    """Plugin recording the order tests ran in."""
+
+    def __init__(self):
+        self.ran = []
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == "call":
+            self.ran.append(report.nodeid.split("::")[-1])
+
+
+@pytest.mark.unit
+class TestRunHistory:
+    """Test recording and estimating test durations and costs."""
+
+    def test_record_and_estimate(self, tmp_path):
+        """Test moving averages, persistence and estimates for unseen tests."""
+        path = tmp_path / "history.json"
+        history = RunHistory(str(path), smoothing=0.5)
+        assert history.estimate("new").duration == 1.0
+
+        history.record("a", 2.0, cost=0.10)
+        history.record("a", 4.0, cost=0.30, failed=True)
+        history.record("b", 10.0)
+        history.save()
+
+        reloaded = RunHistory(str(path))
+        a = reloaded.estimate("a")
+        assert (a.duration, a.cost, a.failed) == (3.0, pytest.approx(0.2), True)
+        assert reloaded.tests["a"]["runs"] == 2
+        unseen = reloaded.estimate("c")
+        assert unseen.duration == 6.5 and not unseen.measured
+        with pytest.raises(ValueError):
+            RunHistory(smoothing=0)
+
+    def test_components(self):
+        """Test that requested fixtures, not names, map to components."""
+        assert components_of(["router_engine", "request"]) == {"router"}
+        assert components_of(["multi_document_agent", "tool_cache", "tool_index"]) == {"agents", "multi_doc"}
+        assert components_of(["rag_app", "judge_model", "cost_ledger"]) == {"metrics", "rag"}
+        assert components_of(["sample_document_path", "tmp_path"]) == frozenset()
+        assert components_of(["rag_app"], {"rag_app": ("retrieval",)}) == {"retrieval"}
+
+
+@pytest.mark.unit
+class TestSelection:
+    """Test picking tests within a budget."""
+
+    def test_coverage_first(self):
+        """Test that one test per component beats several cheap tests of one component."""
+        estimates = [
+            estimate("test_router_a", 1.0, fixtures=["router_engine"]),
+            estimate("test_router_b", 1.0, fixtures=["router_engine"]),
+            estimate("test_router_c", 1.0, fixtures=["router_engine"]),
+            estimate("test_agent", 3.0, cost=0.05, fixtures=["agent"]),
+            estimate("test_tool", 2.0, fixtures=["document_tools"]),
+            estimate("test_metric_expensive", 2.0, cost=0.50, fixtures=["judge_model"]),
+        ]
+        selection = select_within_budget(estimates, max_seconds=7.0, max_cost=0.10)
+
+        assert [e.nodeid for e in selection.selected] == ["test_router_a", "test_router_b", "test_agent", "test_tool"]
+        assert selection.covered == {"router", "agents", "tools"}
+        assert selection.uncovered == {"metrics"}
+        assert (selection.duration, selection.cost) == (7.0, 0.05)
+        summary = selection.format_summary()
+        assert "selected 4 of 6 tests" in summary and "not covered: metrics" in summary
+        assert summary.index("test_metric_expensive") < summary.index("test_router_c")
+
+        assert len(select_within_budget(estimates).selected) == 6
+        with pytest.raises(ValueError):
+            select_within_budget(estimates, max_cost=-1)
+
+    def test_order(self):
+        """Test that last failures run first, then the cheapest and fastest."""
+        estimates = [
+            estimate("slow", 5.0),
+            estimate("paid", 0.1, cost=0.01),
+            estimate("fast", 0.1),
+            estimate("broken", 9.0, cost=1.0, failed=True),
+        ]
+        assert [e.nodeid for e in sorted(estimates, key=order_key)] == ["broken", "fast", "slow", "paid"]
+
+    def test_order_keeps_scopes_together(self):
+        """Test that modules and classes stay contiguous and are ordered by their totals."""
+        estimates = [
+            estimate("a.py::test_fast", 0.1),
+            estimate("a.py::test_slow", 9.0),
+            estimate("b.py::TestX::test_one", 2.0),
+            estimate("b.py::test_free", 0.5),
+            estimate("b.py::TestX::test_two", 1.0),
+            estimate("c.py::test_broken", 20.0, failed=True),
+        ]
+        assert [e.nodeid for e in scope_order(estimates)] == [
+            "c.py::test_broken",
+            "b.py::test_free",
+            "b.py::TestX::test_two",
+            "b.py::TestX::test_one",
+            "a.py::test_fast",
+            "a.py::test_slow",
+        ]
+
+
+@pytest.mark.unit
+class TestBudgetPlugin:
+    """Test the plugin in a nested pytest session."""
+
+    def test_budgeted_run(self, tmp_path, capsys):
+        """Test that a budgeted run deselects, reorders, reports and records."""
+        (tmp_path / "test_sample.py").write_text(textwrap.dedent("""
+            import pytest
+
+            @pytest.fixture
+            def router_engine():
+                return "router"
+
+            @pytest.fixture
+            def agent():
+                return "agent"
+
+            @pytest.fixture
+            def document_tools():
+                return "tools"
+
+            def test_router_slow(router_engine):
+                pass
+
+            def test_router_fast(router_engine):
+                pass
+
+            def test_agent(agent):
+                pass
+
+            def test_new_tool(document_tools):
+                pass
+        """))
+        nodeid = "test_sample.py::{}".format
+        history = tmp_path / "history.json"
+        history.write_text(json.dumps({"version": 1, "tests": {
+            nodeid("test_router_slow"): {"duration": 50.0, "cost": 0.0, "runs": 3, "failed": False},
+            nodeid("test_router_fast"): {"duration": 2.0, "cost": 0.0, "runs": 3, "failed": False},
+            nodeid("test_agent"): {"duration": 4.0, "cost": 0.0, "runs": 3, "failed": True},
+        }}))
+        recorder = OrderRecorder()
+
+        exit_code = pytest.main([
+            str(tmp_path), "-p", "src.pytest_budget", "-p", "no:cacheprovider", "-q",
+            "--rootdir", str(tmp_path), "--budget-seconds", "12", "--budget-history", str(history),
+        ], plugins=[recorder])
+
+        assert exit_code == 0
+        assert recorder.ran == ["test_agent", "test_router_fast", "test_new_tool"]
+        output = capsys.readouterr().out
+        assert "selected 3 of 4 tests" in output and "test_router_slow" in output
+        assert "[router]" in output
+        recorded = json.loads(history.read_text())["tests"]
+        assert recorded[nodeid("test_agent")]["runs"] == 4 and not recorded[nodeid("test_agent")]["failed"]
+        assert recorded[nodeid("test_router_slow")]["runs"] == 3
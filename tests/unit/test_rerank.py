@@ -0,0 +1,98 @@
+"""
+Unit Tests for the Adaptive Reranker
+
+Tests lexical scoring, MMR diversity and adaptive top-k cutting.
+"""
+
+import numpy as np
+import pytest
+from llama_index.core import MockEmbedding, VectorStoreIndex
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from src.rerank import AdaptiveReranker, adaptive_cut, lexical_scores, mmr_order
+
+
+TOPICS = ["metagpt", "agents", "weather", "cooking"]
+
+
+class TopicEmbedding:
+    """Embedding with one dimension per topic word, counting embedded texts."""
+
+    def __init__(self):
+        self.embedded = 0
+
+    def _embed(self, text):
+        return [float(topic in text.lower()) for topic in TOPICS]
+
+    def get_text_embedding_batch(self, texts):
+        self.embedded += len(texts)
+        return [self._embed(t) for t in texts]
+
+    def get_query_embedding(self, query):
+        return self._embed(query)
+
+
+def make_nodes(texts):
+    """Retrieved candidates with descending vector scores."""
+    return [NodeWithScore(node=TextNode(text=t, id_=f"n{i}"), score=1.0 - i / 10) for i, t in enumerate(texts)]
+
+
+@pytest.mark.unit
+class TestScoring:
+    """Test the scoring helpers."""
+
+    def test_lexical_scores_prefer_matching_terms(self):
+        """Test that chunks containing more query terms score higher."""
+        scores = lexical_scores("How do MetaGPT agents work?", ["MetaGPT agents", "MetaGPT", "The weather"])
+        assert scores[0] == pytest.approx(1.0)
+        assert scores[0] > scores[1] > scores[2] == 0
+
+    def test_mmr_skips_near_duplicates(self):
+        """Test that a duplicate of a selected candidate is ranked after a novel one."""
+        relevance = np.array([0.9, 0.89, 0.6], dtype=np.float32)
+        similarity = np.array([[1.0, 1.0, 0.0], [1.0, 1.0, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+        assert mmr_order(relevance, similarity, mmr_lambda=0.5, limit=3) == [0, 2, 1]
+        assert mmr_order(relevance, similarity, mmr_lambda=1.0, limit=2) == [0, 1]
+
+    def test_adaptive_cut(self):
+        """Test that results are cut where relevance drops off."""
+        assert adaptive_cut([0.9, 0.85, 0.3, 0.29]) == 2
+        assert adaptive_cut([0.9, 0.88, 0.86]) == 3
+        assert adaptive_cut([0.9, 0.1], min_k=2) == 2
+        assert adaptive_cut([]) == 0
+
+
+@pytest.mark.unit
+class TestAdaptiveReranker:
+    """Test the reranking postprocessor."""
+
+    def test_keeps_fewer_better_chunks(self):
+        """Test that off-topic candidates are dropped and relevant ones promoted."""
+        nodes = make_nodes(["The weather is nice.", "MetaGPT coordinates agents.", "Cooking pasta.", "MetaGPT agents."])
+        reranker = AdaptiveReranker(embed_model=TopicEmbedding(), top_n=3, mmr_lambda=1.0)
+        result = reranker.postprocess_nodes(nodes, query_bundle=QueryBundle("How do MetaGPT agents work?"))
+        assert {n.node.node_id for n in result} == {"n1", "n3"}
+        assert result[0].score >= result[1].score
+
+    def test_candidate_embeddings_are_cached(self):
+        """Test that repeated candidates are embedded once."""
+        embed_model = TopicEmbedding()
+        reranker = AdaptiveReranker(embed_model=embed_model)
+        nodes = make_nodes(["MetaGPT agents.", "The weather."])
+        for _ in range(3):
+            reranker.postprocess_nodes(nodes, query_bundle=QueryBundle("MetaGPT"))
+        assert embed_model.embedded == 2
+
+    def test_stored_embeddings_are_reused(self):
+        """Test that candidates stored in the vector store are not embedded again."""
+        embed_model = TopicEmbedding()
+        stored = [TextNode(text=t, id_=f"n{i}", embedding=embed_model._embed(t))
+                  for i, t in enumerate(["MetaGPT agents.", "The weather."])]
+        index = VectorStoreIndex(stored, embed_model=MockEmbedding(embed_dim=len(TOPICS)))
+        reranker = AdaptiveReranker(embed_model=embed_model, vector_store=index.vector_store)
+
+        retrieved = index.as_retriever(similarity_top_k=2).retrieve(QueryBundle("MetaGPT", embedding=[1, 0, 0, 0]))
+        assert all(n.node.embedding is None for n in retrieved)
+        result = reranker.postprocess_nodes(retrieved, query_bundle=QueryBundle("MetaGPT", embedding=[1, 0, 0, 0]))
+        assert result[0].node.node_id == "n0"
+        assert embed_model.embedded == 0
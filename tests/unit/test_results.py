@@ -0,0 +1,186 @@
+"""
+Unit Tests for the Evaluation Result Store
+
+Tests persisting metric results and querying trends, regressions and percentiles.
+"""
+
+import math
+
+import numpy as np
+import pytest
+from deepeval import assert_test
+from deepeval.metrics import BaseMetric
+from deepeval.test_case import LLMTestCase
+
+from src import results
+from src.cost import CostLedger
+from src.results import CaseResults, EvalResult, ResultRecorder, ResultStore, assert_measured
+
+
+class FakeMetric:
+    """Measured DeepEval metric stand-in."""
+
+    def __init__(self, score, threshold=0.5, reason="ok"):
+        self.score = score
+        self.threshold = threshold
+        self.success = score is not None and score >= threshold
+        self.reason = reason
+        self.evaluation_model = "gpt-4o"
+
+
+class FaithfulnessMetric(FakeMetric):
+    """Named like the DeepEval metric."""
+
+
+class AnswerRelevancyMetric(FakeMetric):
+    """Named like the DeepEval metric."""
+
+
+class ToxicityMetric(BaseMetric):
+    """Offline DeepEval metric with a fixed score."""
+
+    def __init__(self, fixed_score, threshold=0.5):
+        self.fixed_score = fixed_score
+        self.threshold = threshold
+
+    def measure(self, test_case, *args, **kwargs):
+        self.score = self.fixed_score
+        self.success = self.score <= self.threshold
+        self.reason = "scored offline"
+        return self.score
+
+    async def a_measure(self, test_case, *args, **kwargs):
+        return self.measure(test_case)
+
+    def is_successful(self):
+        return self.success
+
+    @property
+    def __name__(self):
+        return "Toxicity"
+
+
+class Case:
+    """``LLMTestCase`` stand-in."""
+
+    def __init__(self, question):
+        self.input = question
+
+
+def rows(scores, metric="Faithfulness"):
+    """One result per (question, score) pair."""
+    return [
+        EvalResult(case_id=f"test[{q}]", question=q, metric=metric, score=s, passed=s >= 0.7, latency_ms=100 * s)
+        for q, s in scores
+    ]
+
+
+@pytest.fixture(params=["arrow", "sqlite"])
+def store(request, tmp_path):
+    """Empty store on each backend."""
+    if request.param == "arrow" and results.pa is None:
+        pytest.skip("pyarrow is not installed")
+    return ResultStore(str(tmp_path / "results"), backend=request.param)
+
+
+@pytest.mark.unit
+class TestResultStore:
+    """Test appends and queries on both backends."""
+
+    def test_append_and_read_columns(self, store):
+        """Test that appended rows read back as typed numpy columns."""
+        run_id = store.append(rows([("q1", 0.9), ("q2", 0.5)]), run_id="run-1")
+        data = store.columns(["question", "score", "passed", "prompt_tokens"])
+        assert run_id == "run-1"
+        assert list(data["question"]) == ["q1", "q2"]
+        assert data["score"].dtype == np.float64
+        assert list(data["passed"]) == [True, False]
+        assert store.runs()[0]["rows"] == 2
+
+    def test_trend_per_run(self, store):
+        """Test that the trend reports one row per run, oldest first."""
+        store.append(rows([("q1", 0.9), ("q2", 0.7)]), run_id="nightly-1")
+        store.append(rows([("q1", 0.5), ("q2", 0.6)]), run_id="nightly-2")
+        trend = store.trend("Faithfulness")
+        assert [t["run_id"] for t in trend] == ["nightly-1", "nightly-2"]
+        assert trend[0]["mean"] == pytest.approx(0.8)
+        assert trend[0]["pass_rate"] == 1.0
+        assert trend[1]["pass_rate"] == 0.0
+        assert store.trend("Faithfulness", question="q1")[1]["mean"] == pytest.approx(0.5)
+
+    def test_regressions_between_latest_runs(self, store):
+        """Test that questions whose score dropped are listed, largest drop first."""
+        store.append(rows([("q1", 0.9), ("q2", 0.8), ("q3", 0.7)]), run_id="a")
+        store.append(rows([("q1", 0.4), ("q2", 0.75), ("q3", 0.5)]), run_id="b")
+        regressions = store.regressions("Faithfulness")
+        assert [r["question"] for r in regressions] == ["q1", "q3"]
+        assert regressions[0]["delta"] == pytest.approx(-0.5)
+
+    def test_percentiles_match_nearest_rank(self, store):
+        """Test vectorized per-group percentiles against a direct computation."""
+        rng = np.random.default_rng(0)
+        scores = rng.random(500)
+        store.append(rows([(f"q{i % 7}", float(s)) for i, s in enumerate(scores)]))
+        summary = store.percentiles("latency_ms", by="question", pcts=(50, 95))
+        values = np.sort(100 * scores[np.arange(500) % 7 == 3])
+        assert summary["q3"]["count"] == len(values)
+        assert summary["q3"]["p95"] == pytest.approx(values[math.ceil(0.95 * len(values)) - 1])
+        assert summary["q3"]["mean"] == pytest.approx(values.mean())
+
+    def test_unfinished_metric_is_ignored_in_stats(self, store):
+        """Test that NaN scores are stored but left out of aggregates."""
+        store.append(rows([("q1", 0.9)]) + [EvalResult(case_id="c", question="q1", metric="Faithfulness", score=float("nan"))])
+        assert store.percentiles()["Faithfulness"]["count"] == 1
+
+    def test_non_numeric_percentile_column(self, store):
+        """Test that percentiles of a text column are rejected."""
+        with pytest.raises(ValueError):
+            store.percentiles("reason")
+
+
+@pytest.mark.unit
+class TestCaseResults:
+    """Test recording metrics of a test case."""
+
+    def test_usage_split_across_metrics(self, tmp_path):
+        """Test that each metric gets its own judge usage plus a share of the rest."""
+        ledger = CostLedger()
+        ledger.record("gpt-3.5-turbo", 100, 20, case_id="case", stage="synthesis")
+        ledger.record("gpt-4o", 300, 30, case_id="case", stage="metric:Faithfulness")
+        recorder = ResultRecorder(ResultStore(str(tmp_path), backend="sqlite"), run_id="run")
+        case = CaseResults(recorder, "case", ledger)
+
+        with case.timer():
+            pass
+        test_case = Case("What is MetaGPT?")
+        case.add(test_case, FaithfulnessMetric(0.9), AnswerRelevancyMetric(0.4))
+        faithfulness, relevancy = case.finish()
+
+        assert faithfulness.prompt_tokens == 350
+        assert relevancy.prompt_tokens == 50
+        assert faithfulness.cost + relevancy.cost == pytest.approx(ledger.usage(case_id="case")["cost"])
+        assert faithfulness.passed and not relevancy.passed
+        assert faithfulness.latency_ms >= 0
+        assert recorder.flush() == 2
+        assert recorder.store.runs()[0]["run_id"] == "run"
+
+    def test_scores_recorded_through_assert_measured(self, tmp_path):
+        """Test that metrics asserted like the assert_metrics fixture are recorded with their scores."""
+        recorder = ResultRecorder(ResultStore(str(tmp_path), backend="sqlite"), run_id="run")
+        test_case = LLMTestCase(input="What is MetaGPT?", actual_output="A multi-agent framework.")
+
+        # DeepEval's assert_test measures copies: the registered metric stays unscored
+        copied = CaseResults(recorder, "copied")
+        metric = ToxicityMetric(0.1)
+        copied.add(test_case, metric)
+        assert_test(test_case, [metric])
+        assert metric.score is None
+
+        case = CaseResults(recorder, "case")
+        passing, failing = ToxicityMetric(0.1), ToxicityMetric(0.9)
+        case.add(test_case, passing, failing)
+        with pytest.raises(AssertionError, match="Toxicity \\(score: 0.9"):
+            assert_measured(test_case, [passing, failing])
+        [low, high] = case.finish()
+        assert (low.score, low.passed) == (0.1, True)
+        assert (high.score, high.passed) == (0.9, False)
@@ -0,0 +1,134 @@
+"""
+Unit Tests for Borderline Metric Resampling
+
+Tests confidence intervals, pass/fail decisions and targeted resampling.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.cost import CostLedger, attribute
+from src.sampling import MetricSampler, SamplingPolicy, confidence_interval, decide, t_critical
+
+
+class ScriptedMetric:
+    """DeepEval metric stand-in returning scripted scores, shared across copies."""
+
+    def __init__(self, scores, threshold=0.6, delay=0.0, ledger=None):
+        self.scores = iter(scores)
+        self.threshold = threshold
+        self.delay = delay
+        self.ledger = ledger
+        self.calls = []
+        self.lock = threading.Lock()
+        self.score = None
+        self.success = None
+        self.reason = "judge says so"
+
+    def measure(self, test_case):
+        time.sleep(self.delay)
+        with self.lock:
+            self.score = next(self.scores)
+            self.calls.append(threading.current_thread().name)
+        if self.ledger is not None:
+            self.ledger.record("gpt-4o", 100, 10)
+        self.success = self.score >= self.threshold
+        return self.score
+
+
+class FaithfulnessMetric(ScriptedMetric):
+    """Named like the DeepEval metric."""
+
+
+class HallucinationMetric(ScriptedMetric):
+    """Lower is better, like the DeepEval metric."""
+
+    def measure(self, test_case):
+        score = super().measure(test_case)
+        self.success = score <= self.threshold
+        return score
+
+
+@pytest.mark.unit
+class TestConfidence:
+    """Test intervals and decisions."""
+
+    def test_t_critical_values(self):
+        """Test critical values against tabulated ones."""
+        assert t_critical(0.95, 1) == pytest.approx(12.706, abs=1e-3)
+        assert t_critical(0.95, 2) == pytest.approx(4.303, abs=1e-3)
+        assert t_critical(0.95, 4) == pytest.approx(2.776, abs=1e-3)
+        assert t_critical(0.95, 9) == pytest.approx(2.262, abs=1e-3)
+
+    def test_interval(self):
+        """Test the t interval of a small sample."""
+        mean, low, high = confidence_interval([0.5, 0.6, 0.7], 0.95)
+        assert mean == pytest.approx(0.6)
+        assert high - mean == pytest.approx(4.303 * 0.1 / 3 ** 0.5, abs=1e-3)
+        assert confidence_interval([0.4]) == (0.4, 0.4, 0.4)
+
+    def test_decisions_respect_metric_direction(self):
+        """Test pass, fail and inconclusive verdicts for higher- and lower-is-better metrics."""
+        assert decide("Faithfulness", 0.6, [0.66, 0.67, 0.68, 0.66, 0.67]).verdict == "pass"
+        assert decide("Faithfulness", 0.6, [0.5, 0.52, 0.51, 0.5, 0.49]).verdict == "fail"
+        unsure = decide("Faithfulness", 0.6, [0.4, 0.9, 0.6, 0.7, 0.55])
+        assert unsure.verdict == "inconclusive" and unsure.passed
+        assert decide("Hallucination", 0.4, [0.3, 0.31, 0.29]).verdict == "pass"
+        assert not decide("Hallucination", 0.4, [0.5, 0.52, 0.51]).passed
+
+    def test_invalid_policy(self):
+        """Test that inconsistent sample counts are rejected."""
+        with pytest.raises(ValueError):
+            SamplingPolicy(samples=5, max_samples=3)
+
+
+@pytest.mark.unit
+class TestMetricSampler:
+    """Test targeted resampling."""
+
+    def test_clear_score_is_measured_once(self):
+        """Test that a score far from its threshold is not resampled."""
+        metric = FaithfulnessMetric([0.95])
+        outcome, = MetricSampler(SamplingPolicy(samples=5)).assert_test("case", [metric])
+        assert len(metric.calls) == 1
+        assert not outcome.resampled and metric.score == 0.95
+
+    def test_borderline_score_resampled_concurrently(self):
+        """Test that a borderline score is resampled in parallel and decided by its interval."""
+        metric = FaithfulnessMetric([0.58, 0.66, 0.67, 0.68, 0.66], delay=0.05)
+        sampler = MetricSampler(SamplingPolicy(samples=5, band=0.1, max_workers=4))
+
+        start = time.perf_counter()
+        outcome, = sampler.assert_test("case", [metric])
+        elapsed = time.perf_counter() - start
+
+        assert outcome.verdict == "pass" and len(outcome.scores) == 5
+        assert metric.score == pytest.approx(0.65) and metric.success
+        assert "5 samples" in metric.reason
+        # One measurement, then four resamples side by side
+        assert elapsed < 0.18
+
+    def test_inconclusive_takes_another_round(self):
+        """Test that an inconclusive interval draws more samples up to the cap."""
+        scores = [0.55, 0.7, 0.5, 0.65, 0.6, 0.62, 0.58, 0.61, 0.59, 0.6]
+        metric = FaithfulnessMetric(scores)
+        outcome, = MetricSampler(SamplingPolicy(samples=4, max_samples=8)).measure("case", [metric])
+        assert len(outcome.scores) == 8
+        assert outcome.verdict == "inconclusive"
+
+    def test_confident_failure_raises(self):
+        """Test that a borderline hallucination score that holds up fails the test."""
+        metric = HallucinationMetric([0.45, 0.5, 0.48, 0.47, 0.49], threshold=0.4)
+        with pytest.raises(AssertionError, match="Hallucination"):
+            MetricSampler(SamplingPolicy(samples=5)).assert_test("case", [metric])
+        assert metric.success is False
+
+    def test_resamples_attributed_to_metric_stage(self):
+        """Test that resample judge calls are charged to the case and metric."""
+        ledger = CostLedger()
+        metric = FaithfulnessMetric([0.6, 0.6, 0.6], ledger=ledger)
+        with attribute(case_id="case"):
+            MetricSampler(SamplingPolicy(samples=3)).measure("case", [metric])
+        assert ledger.usage(case_id="case", stage="metric:Faithfulness")["calls"] == 3
@@ -0,0 +1,122 @@
+"""
+Unit Tests for the HTTP Serving Layer
+
+Tests routing, micro-batching, streaming and metrics against the offline
+stand-in backend.
+"""
+
+import http.client
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.cost import attribute, current_stage
+from src.server import RAGServer
+from src.stand_in import LatencyModel, StandInRAGApplication
+
+
+class AttributedBackend(StandInRAGApplication):
+    """Stand-in whose stream holds a cost attribution across its yields, like ``RAGApplication``."""
+
+    def __init__(self, fail_after=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after = fail_after
+        self.stages = []
+
+    def stream_query(self, question):
+        with attribute(stage="synthesis"):
+            for i, chunk in enumerate(super().stream_query(question)):
+                if i == self.fail_after:
+                    raise RuntimeError("synthesis failed")
+                self.stages.append(current_stage())
+                yield chunk
+
+
+def _request(address, method, path, payload=None):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    body = json.dumps(payload) if payload is not None else None
+    connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+
+@pytest.fixture
+def served():
+    """Serve a stand-in backend on a free port."""
+    backend = StandInRAGApplication(retrieval_latency=LatencyModel(mean_ms=20))
+    server = RAGServer(backend, port=0, max_batch_size=8, max_wait_ms=20)
+    address = server.run_in_thread()
+    yield server, backend, address
+    server.stop()
+
+
+@pytest.mark.unit
+class TestRAGServer:
+    """Test the HTTP server."""
+
+    def test_query_with_context(self, served):
+        """Test that answers and their retrieval context are returned."""
+        _, _, address = served
+        status, data = _request(address, "POST", "/query_with_context", {"question": "What are the findings?"})
+        payload = json.loads(data)
+        assert status == 200
+        assert "findings" in payload["answer"]
+        assert any("findings" in chunk for chunk in payload["retrieval_context"])
+
+    def test_concurrent_requests_are_batched(self, served):
+        """Test that concurrent retrievals share backend calls."""
+        server, backend, address = served
+        questions = [f"What is finding number {i}?" for i in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda q: _request(address, "POST", "/query", {"question": q}), questions))
+        assert all(status == 200 for status, _ in results)
+        assert backend.calls["retrieve_batch"] < len(questions)
+        assert backend.calls["retrieve"] == 0
+        assert server.metrics.batched_requests == len(questions)
+
+    def test_stream(self, served):
+        """Test that streamed chunks reassemble into the full answer."""
+        _, backend, address = served
+        status, data = _request(address, "POST", "/stream", {"question": "What is MetaGPT?"})
+        assert status == 200
+        assert data.decode() == backend.query("What is MetaGPT?")
+
+    def test_stream_with_attribution(self):
+        """Test streams whose generator holds a context across yields, and failures mid-stream."""
+        backend = AttributedBackend(retrieval_latency=LatencyModel(mean_ms=5))
+        server = RAGServer(backend, port=0, workers=4)
+        address = server.run_in_thread()
+        try:
+            status, data = _request(address, "POST", "/stream", {"question": "What is MetaGPT?"})
+            assert status == 200 and data.decode() == backend.query("What is MetaGPT?")
+            assert set(backend.stages) == {"synthesis"}
+
+            backend.fail_after = 2
+            with pytest.raises(http.client.IncompleteRead):
+                _request(address, "POST", "/stream", {"question": "What is MetaGPT?"})
+            assert _request(address, "GET", "/health")[0] == 200
+            assert server.metrics.requests[("/stream", 500)] == 1
+        finally:
+            server.stop()
+
+    def test_errors(self, served):
+        """Test bad requests and unknown routes."""
+        _, _, address = served
+        assert _request(address, "POST", "/query", {"question": ""})[0] == 400
+        assert _request(address, "GET", "/query")[0] == 405
+        assert _request(address, "GET", "/nope")[0] == 404
+
+    def test_health_and_metrics(self, served):
+        """Test the health check and Prometheus metrics."""
+        _, _, address = served
+        _request(address, "POST", "/query", {"question": "What is MetaGPT?"})
+        status, data = _request(address, "GET", "/health")
+        assert status == 200 and json.loads(data)["status"] == "ok"
+        status, data = _request(address, "GET", "/metrics")
+        text = data.decode()
+        assert 'rag_requests_total{path="/query",status="200"} 1' in text
+        assert "rag_retrieval_batches_total 1" in text
+        assert 'rag_request_duration_seconds_bucket{le="+Inf"}' in text
@@ -0,0 +1,162 @@
+"""
+Unit Tests for Document Sharding
+
+Tests partitioning, scatter/gather across worker processes, usage reporting
+and shard failures.
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.tools import FunctionTool
+
+from src.cost import CostLedger, attribute
+from src.parallel_tools import create_fan_out_tool
+from src.sharding import ShardCoordinator, ShardError, partition_documents
+
+
+class CountingLLM(CustomLLM):
+    """LLM stand-in reporting one prompt token per word and a two-token answer."""
+
+    model: str = "gpt-4o-mini"
+
+    @property
+    def metadata(self):
+        return LLMMetadata(model_name=self.model)
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": 2}
+        return CompletionResponse(text="An answer.", additional_kwargs=usage)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        yield self.complete(prompt)
+
+
+def text_tools(path):
+    """Worker tool builder: a query tool and a slow summary tool per text file."""
+    name = Path(path).stem
+    text = Path(path).read_text()
+    if text == "unreadable":
+        raise ValueError(f"cannot parse {name}")
+
+    def vector_query(query: str) -> str:
+        """Answer questions over the paper."""
+        if query == "fail":
+            raise RuntimeError("index unavailable")
+        CountingLLM().complete(f"Answer from {name}: {query}")
+        return f"{name} in {os.getpid()}: {text}"
+
+    def summarize(input: str) -> str:
+        """Summarize the paper."""
+        time.sleep(0.3)
+        return f"Summary of {name}"
+
+    return [
+        FunctionTool.from_defaults(fn=vector_query, name=f"vector_tool_{name}"),
+        FunctionTool.from_defaults(fn=summarize, name=f"summary_tool_{name}"),
+    ]
+
+
+def papers(tmp_path, texts):
+    """Write one text file per paper."""
+    paths = []
+    for name, text in texts.items():
+        path = tmp_path / f"{name}.txt"
+        path.write_text(text)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture(scope="module")
+def coordinator(tmp_path_factory):
+    """Two shards over three papers."""
+    paths = papers(tmp_path_factory.mktemp("papers"), {
+        "metagpt": "Roles and SOPs. " * 40,
+        "swe_bench": "Real GitHub issues. " * 20,
+        "longlora": "Shifted sparse attention. " * 10,
+    })
+    with ShardCoordinator(paths, n_shards=2, builder=text_tools, timeout=60, ledger=CostLedger()) as coordinator:
+        yield coordinator
+
+
+@pytest.mark.unit
+class TestPartition:
+    """Test splitting documents into shards."""
+
+    def test_balanced_by_size(self, tmp_path):
+        """Test that the largest documents are spread first."""
+        paths = papers(tmp_path, {"a": "x" * 900, "b": "x" * 500, "c": "x" * 400, "d": "x" * 100})
+        shards = partition_documents(paths, 2)
+        assert [[Path(p).stem for p in shard] for shard in shards] == [["a", "d"], ["b", "c"]]
+        assert len(partition_documents(paths[:1], 4)) == 1
+        with pytest.raises(ValueError):
+            partition_documents(paths, 0)
+
+
+@pytest.mark.unit
+class TestShardCoordinator:
+    """Test scatter/gather over worker processes."""
+
+    def test_scatter_across_processes(self, coordinator):
+        """Test that every document answers from the process that owns it."""
+        outputs = coordinator.scatter("roles", [n for n in coordinator.tool_names if n.startswith("vector")])
+
+        assert len(outputs) == 3 and not any(o.is_error for o in outputs)
+        pids = {o.tool_name: o.content.split(": ")[0].split(" in ")[1] for o in outputs}
+        assert len(set(pids.values())) == 2
+        assert str(os.getpid()) not in pids.values()
+        assert pids["vector_tool_swe_bench"] == pids["vector_tool_longlora"]
+        assert coordinator.shard_of("vector_tool_swe_bench") == coordinator.shard_of("summary_tool_longlora")
+
+    def test_calls_on_one_shard_run_concurrently(self, coordinator):
+        """Test that slow calls to documents on the same shard overlap."""
+        start = time.perf_counter()
+        outputs = coordinator.scatter("summary", [n for n in coordinator.tool_names if n.startswith("summary")])
+        assert [o.content for o in outputs][0].startswith("Summary of")
+        assert time.perf_counter() - start < 0.6
+
+    def test_proxy_tools(self, coordinator):
+        """Test that proxies keep the remote schema and work sync, async and in a fan-out."""
+        tools = {tool.metadata.name: tool for tool in coordinator.tools()}
+        assert tools["summary_tool_metagpt"].metadata.get_parameters_dict()["required"] == ["input"]
+        assert tools["vector_tool_metagpt"].call(query="roles").content.startswith("metagpt in ")
+        output = asyncio.run(tools["summary_tool_longlora"].acall(input="summary"))
+        assert output.content == "Summary of longlora"
+
+        fan_out = create_fan_out_tool([tools["summary_tool_metagpt"], tools["summary_tool_swe_bench"]])
+        merged = fan_out.call(query="summary").content
+        assert "[summary_tool_metagpt]\nSummary of metagpt" in merged
+
+    def test_usage_recorded_for_caller(self, coordinator):
+        """Test that LLM usage in the workers is recorded under the calling case and stage."""
+        with attribute(case_id="case-1", stage="agent"):
+            coordinator.call("vector_tool_metagpt", query="roles please")
+            coordinator.scatter("x", ["vector_tool_swe_bench", "vector_tool_longlora"])
+
+        [first, *rest] = coordinator.ledger.take("case-1")
+        assert (first.model, first.prompt_tokens, first.completion_tokens) == ("gpt-4o-mini", 5, 2)
+        assert first.stage == "agent" and first.cost > 0
+        assert len(rest) == 2
+        with attribute(case_id="case-2"):
+            coordinator.call("vector_tool_metagpt", query="q")
+        assert [r.stage for r in coordinator.ledger.take("case-2")] == ["llm"]
+
+    def test_tool_errors(self, coordinator):
+        """Test that a failing remote tool is an error, not a hang."""
+        with pytest.raises(ShardError, match="index unavailable"):
+            coordinator.call("vector_tool_metagpt", query="fail")
+        [output] = coordinator.scatter("fail", ["vector_tool_longlora"])
+        assert output.is_error and "index unavailable" in output.content
+
+    def test_failed_build(self, tmp_path):
+        """Test that a shard that cannot build its tools fails the start."""
+        paths = papers(tmp_path, {"ok": "text", "broken": "unreadable"})
+        with pytest.raises(ShardError, match="cannot parse broken"):
+            ShardCoordinator(paths, n_shards=2, builder=text_tools, start_method="fork", timeout=60).start()
@@ -0,0 +1,117 @@
+"""
+Unit Tests for Warm-Start Snapshots
+
+Tests snapshotting built indexes and tools, rebinding live clients and
+rejecting snapshots from other environments or inputs.
+"""
+
+import json
+import threading
+
+import pytest
+from llama_index.core import Settings, SummaryIndex, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.schema import TextNode
+from llama_index.core.tools import FunctionTool, QueryEngineTool
+from llama_index.llms.openai import OpenAI
+
+from src.clients import ClientFactory
+from src.snapshot import SnapshotMismatch, SnapshotStore, pinned_versions
+
+
+def build_tools(llm, embed_model):
+    """Vector and summary tools over a small index, like ``build_doc_tools``."""
+    nodes = [TextNode(text=f"MetaGPT assigns role {i} to an agent.", id_=f"node-{i}") for i in range(5)]
+    vector_index = VectorStoreIndex(nodes, embed_model=embed_model)
+    lock = threading.Lock()
+
+    def vector_query(query: str) -> str:
+        """Answer questions over the paper."""
+        with lock:
+            engine = vector_index.as_query_engine(llm=llm, similarity_top_k=2)
+            return str(engine.query(query))
+
+    summary_engine = SummaryIndex(nodes).as_query_engine(llm=llm, response_mode="tree_summarize")
+    return (
+        FunctionTool.from_defaults(fn=vector_query, name="vector_tool_metagpt"),
+        QueryEngineTool.from_defaults(summary_engine, name="summary_tool_metagpt", description="Summaries"),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Snapshot store on a client factory without network access."""
+    return SnapshotStore(str(tmp_path / "snapshots"), client_factory=ClientFactory())
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Source document of the snapshotted tools."""
+    path = tmp_path / "metagpt.txt"
+    path.write_text("MetaGPT")
+    return str(path)
+
+
+@pytest.mark.unit
+class TestSnapshotStore:
+    """Test snapshot and restore."""
+
+    def test_round_trip(self, store, source):
+        """Test that restored tools answer like the originals, with fresh live objects."""
+        llm = MockLLM(max_tokens=8)
+        tools = build_tools(llm, MockEmbedding(embed_dim=8))
+        store.save("tools-metagpt", tools, sources=[source], config={"CHUNK_SIZE": "512"})
+        vector_tool, summary_tool = store.load("tools-metagpt", sources=[source], config={"CHUNK_SIZE": "512"})
+
+        assert vector_tool.metadata.name == "vector_tool_metagpt"
+        assert vector_tool.call(query="roles").content == tools[0].call(query="roles").content
+        assert summary_tool.call(input="summary").content == tools[1].call(input="summary").content
+        restored_index = vector_tool.fn.__closure__[-1].cell_contents
+        assert len(restored_index.docstore.docs) == 5
+        assert restored_index._callback_manager is Settings.callback_manager
+
+    def test_openai_models_rebound_to_pooled_clients(self, store, monkeypatch):
+        """Test that OpenAI LLMs are rebuilt on the factory's HTTP pool, without the saved key."""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-restoring")
+        llm = OpenAI(model="gpt-4o-mini", temperature=0.2, api_key="sk-saving")
+        store.save("llm", {"llm": llm})
+        restored = store.load("llm")["llm"]
+
+        assert (restored.model, restored.temperature) == ("gpt-4o-mini", 0.2)
+        assert restored.api_key == "sk-restoring"
+        assert restored._http_client is store.client_factory.http_client
+
+    def test_stale_snapshots_rebuilt(self, store, source, tmp_path):
+        """Test that changed sources, settings or library versions trigger a rebuild."""
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {"nodes": [TextNode(text="MetaGPT")]}
+
+        store.load_or_build("nodes", build, sources=[source])
+        store.load_or_build("nodes", build, sources=[source])
+        assert store.stats() == {"hits": 1, "misses": 1}
+
+        with pytest.raises(SnapshotMismatch, match="config"):
+            store.load("nodes", sources=[source], config={"CHUNKING_STRATEGY": "semantic"})
+        (tmp_path / "metagpt.txt").write_text("MetaGPT, revised")
+        with pytest.raises(SnapshotMismatch, match="sources"):
+            store.load("nodes", sources=[source])
+
+        path = store.path("nodes")
+        header_line, payload = path.read_bytes().split(b"\n", 1)
+        header = json.loads(header_line)
+        header["libraries"]["llama-index-core"] = "0.10.0"
+        path.write_bytes(json.dumps(header).encode() + b"\n" + payload)
+        with pytest.raises(SnapshotMismatch, match="libraries"):
+            store.load("nodes", sources=[source])
+        store.load_or_build("nodes", build, sources=[source])
+        assert len(builds) == 2
+
+    def test_pinned_versions(self):
+        """Test that the versions pinned in requirements.txt are checked."""
+        pins = pinned_versions()
+        assert pins["llama-index-core"] == "0.11.20"
+        assert "pytest" in pins
@@ -0,0 +1,83 @@
+"""
+Unit Tests for the Summary Tree
+
+Tests building, persisting and querying precomputed hierarchical summaries.
+"""
+
+import threading
+
+import pytest
+from llama_index.core.schema import TextNode
+
+from src.summary_tree import SummaryTree, SummaryTreeBuilder, SummaryTreeQueryEngine, build_summary_tool
+
+
+class CountingLLM:
+    """LLM stand-in that returns numbered summaries and counts calls."""
+
+    model = "counting-test"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt):
+        with self._lock:
+            self.calls += 1
+        return f"summary #{self.calls}"
+
+
+def make_chunks(n):
+    """Chunks spread over pages, two per page."""
+    return [TextNode(text=f"Chunk {i} about MetaGPT.", metadata={"page_label": str(i // 2 + 1)}) for i in range(n)]
+
+
+@pytest.mark.unit
+class TestSummaryTree:
+    """Test summary tree construction and queries."""
+
+    def test_levels_reduce_to_single_root(self):
+        """Test that 20 chunks with group size 4 form 20 -> 5 -> 2 -> 1 summaries."""
+        llm = CountingLLM()
+        tree = SummaryTreeBuilder(llm=llm, group_size=4).build(make_chunks(20))
+        assert [len(level) for level in tree.levels] == [20, 5, 2, 1]
+        assert llm.calls == 28
+        assert tree.root.pages == [str(p) for p in range(1, 11)]
+        assert len(tree.top_sections()) == 2
+
+    def test_chunk_text_as_leaves(self):
+        """Test that leaves can reuse chunk text without summary calls."""
+        llm = CountingLLM()
+        tree = SummaryTreeBuilder(llm=llm, group_size=4, summarize_chunks=False).build(make_chunks(8))
+        assert tree.levels[0][0].text == "Chunk 0 about MetaGPT."
+        assert llm.calls == 3
+
+    def test_query_is_one_call_regardless_of_length(self):
+        """Test that answering uses one LLM call and cites the top summaries."""
+        for n_chunks in (4, 64):
+            tree = SummaryTreeBuilder(llm=CountingLLM(), group_size=4).build(make_chunks(n_chunks))
+            llm = CountingLLM()
+            response = SummaryTreeQueryEngine(tree=tree, llm=llm).query("Summarize the key points")
+            assert llm.calls == 1
+            assert len(response.source_nodes) == 1 + len(tree.top_sections())
+
+    def test_persisted_tree_is_reused(self, tmp_path):
+        """Test that a saved tree is loaded instead of rebuilt, and rebuilt when chunks change."""
+        path = str(tmp_path / "tree.json")
+        chunks = make_chunks(6)
+        SummaryTreeBuilder(llm=CountingLLM(), group_size=4).load_or_build(chunks, path)
+
+        llm = CountingLLM()
+        tree = SummaryTreeBuilder(llm=llm, group_size=4).load_or_build(chunks, path)
+        assert llm.calls == 0
+        assert isinstance(SummaryTree.load(path), SummaryTree)
+        assert tree.depth == 3
+
+        SummaryTreeBuilder(llm=llm, group_size=4).load_or_build(make_chunks(7), path)
+        assert llm.calls > 0
+
+    def test_summary_tool_name(self):
+        """Test that the tool is named like the get_doc_tools summary tool."""
+        tree = SummaryTreeBuilder(llm=CountingLLM()).build(make_chunks(3))
+        tool = build_summary_tool(tree, "metagpt", llm=CountingLLM())
+        assert tool.metadata.name == "summary_tool_metagpt"
@@ -0,0 +1,105 @@
+"""
+Unit Tests for Tool Result Memoization
+
+Tests the session-scoped TTL cache wrapped around agent tools.
+"""
+
+import pytest
+from llama_index.core.tools import FunctionTool
+
+from src.tool_cache import CachedTool, ToolResultCache, make_cache_key, memoize_tools
+
+
+@pytest.fixture
+def counting_tool():
+    """Function tool that records how many times it actually ran."""
+    calls = []
+
+    def vector_tool(query: str) -> str:
+        """Answer a question about the test document."""
+        calls.append(query)
+        return f"answer to {query}"
+
+    return FunctionTool.from_defaults(fn=vector_tool), calls
+
+
+@pytest.mark.unit
+class TestCacheKey:
+    """Test argument normalization."""
+
+    def test_near_identical_queries_share_key(self):
+        """Test that case, whitespace and trailing punctuation are ignored."""
+        first = make_cache_key("vector_tool", (), {"query": "What is MetaGPT?"})
+        second = make_cache_key("vector_tool", (), {"query": "what is  metagpt"})
+        assert first == second
+
+    def test_page_number_order_ignored(self):
+        """Test that page number lists are order-insensitive."""
+        first = make_cache_key("vector_tool", (), {"query": "x", "page_numbers": ["2", "1"]})
+        second = make_cache_key("vector_tool", (), {"query": "x", "page_numbers": ["1", "2"]})
+        assert first == second
+
+    def test_different_tools_do_not_collide(self):
+        """Test that the tool name is part of the key."""
+        assert make_cache_key("a", ("q",), {}) != make_cache_key("b", ("q",), {})
+
+
+@pytest.mark.unit
+class TestCachedTool:
+    """Test the memoizing tool wrapper."""
+
+    def test_repeated_call_served_from_cache(self, counting_tool):
+        """Test that an identical call does not re-run the tool."""
+        tool, calls = counting_tool
+        cache = ToolResultCache()
+        cached = CachedTool(tool, cache)
+
+        first = cached(query="What is this about?")
+        second = cached(query="what is this about")
+
+        assert str(first) == str(second)
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["hit_rate"] == pytest.approx(0.5)
+
+    def test_metadata_passthrough(self, counting_tool):
+        """Test that the wrapper exposes the wrapped tool's metadata."""
+        tool, _ = counting_tool
+        cached = CachedTool(tool, ToolResultCache())
+        assert cached.metadata.name == tool.metadata.name
+
+    def test_sessions_are_isolated(self, counting_tool):
+        """Test that one session never sees another session's entries."""
+        tool, calls = counting_tool
+        cache = ToolResultCache()
+        first, = memoize_tools([tool], cache, session_id="a")
+        second, = memoize_tools([tool], cache, session_id="b")
+
+        first(query="q")
+        second(query="q")
+
+        assert len(calls) == 2
+
+    def test_expired_entries_are_recomputed(self, counting_tool, monkeypatch):
+        """Test that entries older than the TTL are not reused."""
+        tool, calls = counting_tool
+        cache = ToolResultCache(ttl_seconds=10)
+        cached = CachedTool(tool, cache)
+        clock = [100.0]
+        monkeypatch.setattr("src.tool_cache.time.monotonic", lambda: clock[0])
+
+        cached(query="q")
+        clock[0] += 11
+        cached(query="q")
+
+        assert len(calls) == 2
+
+    async def test_async_call_uses_cache(self, counting_tool):
+        """Test that acall shares entries with call."""
+        tool, calls = counting_tool
+        cached = CachedTool(tool, ToolResultCache())
+
+        cached(query="q")
+        await cached.acall(query="q")
+
+        assert len(calls) == 1
@@ -0,0 +1,105 @@
+"""
+Unit Tests for the Tool Index
+
+Tests top-k tool retrieval, persistence and incremental registration.
+"""
+
+import pytest
+from llama_index.core.tools import FunctionTool
+
+from src.tool_index import ToolIndex
+
+
+VOCABULARY = ["metagpt", "agents", "lora", "finetuning", "swe", "bench", "summary"]
+
+
+class KeywordEmbedding:
+    """Bag-of-words embedding over a tiny vocabulary, counting embedded texts."""
+
+    model_name = "keyword-test"
+
+    def __init__(self):
+        self.embedded = 0
+
+    def _embed(self, text):
+        words = text.lower().replace("_", " ").split()
+        return [float(sum(w.startswith(v) for w in words)) for v in VOCABULARY]
+
+    def get_text_embedding_batch(self, texts):
+        self.embedded += len(texts)
+        return [self._embed(t) for t in texts]
+
+    def get_query_embedding(self, query):
+        return self._embed(query)
+
+
+def make_tool(name, description):
+    """Create a named tool with a description."""
+
+    def query(query: str) -> str:
+        return name
+
+    return FunctionTool.from_defaults(fn=query, name=name, description=description)
+
+
+@pytest.fixture
+def paper_tools():
+    """Per-paper tools for three papers."""
+    return [
+        make_tool("vector_tool_metagpt", "Questions about MetaGPT agents"),
+        make_tool("vector_tool_lora", "Questions about LoRA finetuning"),
+        make_tool("vector_tool_swebench", "Questions about SWE bench"),
+    ]
+
+
+@pytest.mark.unit
+class TestToolIndex:
+    """Test tool retrieval by description similarity."""
+
+    def test_retrieves_most_relevant_tool(self, paper_tools):
+        """Test that the tool matching the query ranks first."""
+        index = ToolIndex(embed_model=KeywordEmbedding())
+        index.add_tools(paper_tools)
+
+        tools = index.retrieve("How does LoRA finetuning work?", top_k=1)
+
+        assert [t.metadata.name for t in tools] == ["vector_tool_lora"]
+
+    def test_restricts_to_named_tools(self, paper_tools):
+        """Test that retrieval only considers the given tool names."""
+        index = ToolIndex(embed_model=KeywordEmbedding())
+        index.add_tools(paper_tools)
+
+        tools = index.retrieve("lora", top_k=1, names=["vector_tool_metagpt", "vector_tool_swebench"])
+
+        assert tools[0].metadata.name != "vector_tool_lora"
+
+    def test_incremental_add_only_embeds_new_tools(self, paper_tools):
+        """Test that re-registering known tools does not re-embed them."""
+        embed_model = KeywordEmbedding()
+        index = ToolIndex(embed_model=embed_model)
+
+        assert index.add_tools(paper_tools[:2]) == 2
+        assert index.add_tools(paper_tools) == 1
+        assert embed_model.embedded == 3
+        assert len(index) == 3
+
+    def test_persisted_embeddings_are_reused(self, paper_tools, tmp_path):
+        """Test that a new index loads embeddings instead of recomputing."""
+        path = tmp_path / "tool_index.json"
+        ToolIndex(embed_model=KeywordEmbedding(), persist_path=str(path)).add_tools(paper_tools)
+
+        embed_model = KeywordEmbedding()
+        reloaded = ToolIndex(embed_model=embed_model, persist_path=str(path))
+
+        assert reloaded.add_tools(paper_tools) == 0
+        assert embed_model.embedded == 0
+        assert reloaded.retrieve("metagpt agents", top_k=1)[0].metadata.name == "vector_tool_metagpt"
+
+    def test_changed_description_is_re_embedded(self, paper_tools):
+        """Test that a tool whose description changed gets a new embedding."""
+        index = ToolIndex(embed_model=KeywordEmbedding())
+        index.add_tools(paper_tools)
+
+        updated = make_tool("vector_tool_lora", "Questions about SWE bench results")
+        assert index.add_tools([updated]) == 1